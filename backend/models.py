@@ -215,6 +215,9 @@ class Portfolio(db.Model):
 
     id = db.Column(Integer, primary_key=True)
     name = db.Column(String(100), nullable=False)
+    # Incrementado a cada gravação de posições ou métricas editáveis; compõe o
+    # carimbo dos caches de resumo em todos os processos
+    data_version = db.Column(Integer, nullable=False, default=0, server_default='0')
 
     positions = relationship(
         "PortfolioPosition",
@@ -234,6 +237,12 @@ class Portfolio(db.Model):
         cascade="all, delete-orphan",
     )
 
+    daily_metrics = relationship(
+        "PortfolioDailyMetric",
+        back_populates="portfolio",
+        cascade="all, delete-orphan",
+    )
+
 
 class PortfolioPosition(db.Model):
     __tablename__ = 'portfolio_positions'
@@ -256,6 +265,10 @@ class PortfolioPosition(db.Model):
         uselist=False,
     )
 
+    __table_args__ = (
+        db.UniqueConstraint('portfolio_id', 'symbol', name='uix_portfolio_position_symbol'),
+    )
+
 
 class PortfolioDailyValue(db.Model):
     __tablename__ = 'portfolio_daily_values'
@@ -276,6 +289,139 @@ class PortfolioDailyValue(db.Model):
     )
 
 
+class PortfolioIntradayCota(db.Model):
+    """Cota intradiária consolidada por minuto (horário de Brasília)."""
+    __tablename__ = 'portfolio_intraday_cotas'
+
+    id = db.Column(Integer, primary_key=True)
+    portfolio_id = db.Column(Integer, ForeignKey('portfolios.id'), nullable=False)
+    minute = db.Column(DateTime, nullable=False)
+    cota_open = db.Column(Numeric(20, 8), nullable=False)
+    cota_high = db.Column(Numeric(20, 8), nullable=False)
+    cota_low = db.Column(Numeric(20, 8), nullable=False)
+    cota_close = db.Column(Numeric(20, 8), nullable=False)
+    variacao_cota_pct = db.Column(Numeric(12, 6), nullable=False)
+    patrimonio_liquido = db.Column(Numeric(20, 2), nullable=False)
+    samples = db.Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        db.UniqueConstraint('portfolio_id', 'minute', name='uix_portfolio_intraday_minute'),
+    )
+
+
+class BenchmarkWeight(db.Model):
+    """Composição de um índice de referência (ex.: IBOV) vigente a partir de ``date``."""
+    __tablename__ = 'benchmark_weights'
+
+    id = db.Column(Integer, primary_key=True)
+    benchmark = db.Column(String(20), nullable=False)
+    symbol = db.Column(String(20), nullable=False)
+    weight = db.Column(Numeric(12, 6), nullable=False)
+    date = db.Column(Date, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('benchmark', 'symbol', 'date', name='uix_benchmark_symbol_date'),
+    )
+
+
+class DailyPrice(db.Model):
+    """Barra diária OHLCV de um ativo ou índice (ex.: ^BVSP)."""
+    __tablename__ = 'daily_prices'
+
+    symbol = db.Column(String(20), primary_key=True)
+    date = db.Column(Date, primary_key=True)
+    open = db.Column(Numeric(20, 6))
+    high = db.Column(Numeric(20, 6))
+    low = db.Column(Numeric(20, 6))
+    close = db.Column(Numeric(20, 6), nullable=False)
+    # adj_close = close * adj_factor, mantidos pelo motor de ajustes (price_adjustments)
+    adj_close = db.Column(Numeric(20, 6))
+    volume = db.Column(Numeric(24, 2))
+    adj_factor = db.Column(Numeric(20, 10), nullable=False, default=1, server_default='1')
+    # Marca d'água da matriz de preços (price_matrix): toda gravação da barra a atualiza
+    updated_at = db.Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True
+    )
+
+
+class DailyPriceStatus(db.Model):
+    """Último pregão já consultado por símbolo, com ou sem barra no download."""
+    __tablename__ = 'daily_price_status'
+
+    symbol = db.Column(String(20), primary_key=True)
+    checked_through = db.Column(Date, nullable=False)
+    checked_at = db.Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class CorporateAction(db.Model):
+    """Evento que ajusta a série de preços: provento em dinheiro ou desdobramento."""
+    __tablename__ = 'corporate_actions'
+
+    symbol = db.Column(String(20), primary_key=True)
+    ex_date = db.Column(Date, primary_key=True)
+    kind = db.Column(String(10), primary_key=True)  # cash, split
+    # cash: valor por ação; split: ações novas por ação antiga (bonificação de 10% = 1.1)
+    value = db.Column(Numeric(20, 8), nullable=False)
+    # Barras anteriores a esta data são ajustadas (padrão: ex_date)
+    applies_before = db.Column(Date)
+    factor = db.Column(Numeric(20, 10))
+    source = db.Column(String(20))
+    applied_at = db.Column(DateTime(timezone=True))
+
+
+class IntradayBar(db.Model):
+    """Candle intradiário de um ativo (horário do servidor MT5)."""
+    __tablename__ = 'intraday_bars'
+
+    symbol = db.Column(String(20), primary_key=True)
+    timeframe = db.Column(String(4), primary_key=True)
+    bar_time = db.Column(DateTime, primary_key=True)
+    open = db.Column(Numeric(20, 6), nullable=False)
+    high = db.Column(Numeric(20, 6), nullable=False)
+    low = db.Column(Numeric(20, 6), nullable=False)
+    close = db.Column(Numeric(20, 6), nullable=False)
+    volume = db.Column(Numeric(24, 2), nullable=False, default=0)
+    ticks = db.Column(Integer, nullable=False, default=0)
+
+
+class PortfolioAttributionDaily(db.Model):
+    """Componentes diários da atribuição de Brinson por setor."""
+    __tablename__ = 'portfolio_attribution_daily'
+
+    id = db.Column(Integer, primary_key=True)
+    portfolio_id = db.Column(Integer, ForeignKey('portfolios.id'), nullable=False)
+    date = db.Column(Date, nullable=False)
+    sector = db.Column(String(255), nullable=False)
+    portfolio_weight = db.Column(Numeric(20, 10), nullable=False)
+    benchmark_weight = db.Column(Numeric(20, 10), nullable=False)
+    portfolio_return = db.Column(Numeric(20, 10), nullable=False)
+    benchmark_return = db.Column(Numeric(20, 10), nullable=False)
+    allocation = db.Column(Numeric(20, 10), nullable=False)
+    selection = db.Column(Numeric(20, 10), nullable=False)
+    interaction = db.Column(Numeric(20, 10), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('portfolio_id', 'date', 'sector', name='uix_portfolio_attribution_day_sector'),
+    )
+
+
+class PortfolioDailyMetric(db.Model):
+    __tablename__ = 'portfolio_daily_metrics'
+
+    id = db.Column(Integer, primary_key=True)
+    portfolio_id = db.Column(Integer, ForeignKey('portfolios.id'), nullable=False, index=True)
+    metric_id = db.Column(String(100), nullable=False)
+    value = db.Column(Numeric(20, 4), nullable=False)
+    date = db.Column(Date, nullable=False, server_default=func.current_date())
+    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
+
+    portfolio = relationship("Portfolio", back_populates="daily_metrics")
+
+    __table_args__ = (
+        db.UniqueConstraint('portfolio_id', 'metric_id', 'date', name='uix_portfolio_metric_date'),
+    )
+
+
 
 
 
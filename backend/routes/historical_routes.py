@@ -1,18 +1,106 @@
 from flask import Blueprint, jsonify, request
-from backend.models import AssetMetrics
+from sqlalchemy import func
+from backend.models import AssetMetrics, IntradayBar
 from backend import db
-from datetime import datetime, timedelta
+from backend.services.intraday_bars import TIMEFRAMES, intraday_bars
+from backend.services.price_adjustments import update_adjustments
+from backend.services.price_history import daily_price_history, refresh_daily_prices
+from backend.services.price_matrix import price_matrix
+from backend.utils.downsample import downsample_ohlc, parse_points
+from datetime import date, datetime, timedelta
 
 historical_bp = Blueprint('historical_bp', __name__)
 
+
+def _parse_range(args, default_days: int = 365):
+    """Lê ``start``/``end`` (YYYY-MM-DD) da query; retorna (start, end, resposta de erro)."""
+    try:
+        end = datetime.strptime(args["end"], "%Y-%m-%d").date() if args.get("end") else date.today()
+        start = (
+            datetime.strptime(args["start"], "%Y-%m-%d").date()
+            if args.get("start")
+            else end - timedelta(days=default_days)
+        )
+    except (TypeError, ValueError):
+        return None, None, (jsonify({"success": False, "error": "Datas devem estar no formato YYYY-MM-DD"}), 400)
+    if end < start:
+        return None, None, (jsonify({"success": False, "error": "Data inicial deve ser anterior à final"}), 400)
+    return start, end, None
+
+
+@historical_bp.route('/daily', methods=['GET'])
+def get_daily_history():
+    """Barras diárias de vários tickers (``tickers`` repetido ou separado por vírgula)."""
+    tickers = [
+        t.strip().upper()
+        for value in request.args.getlist("tickers")
+        for t in value.split(",")
+        if t.strip()
+    ]
+    if not tickers:
+        return jsonify({"success": False, "error": "Informe ao menos um ticker em 'tickers'"}), 400
+    start, end, error = _parse_range(request.args)
+    if error:
+        return error
+    points, _, error = parse_points(request.args)
+    if error:
+        return error
+
+    try:
+        history = daily_price_history(tickers, start, end)
+        return jsonify({
+            "success": True,
+            "data": {symbol: downsample_ohlc(bars, points) for symbol, bars in history.items()},
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": "Erro ao obter histórico diário.", "details": str(e)}), 500
+
+
+@historical_bp.route('/refresh', methods=['POST'])
+def refresh_daily_history():
+    """Completa o histórico diário (padrão: símbolos das carteiras e Ibovespa) e a matriz de preços.
+
+    Os eventos corporativos pendentes são aplicados; ``full_adjustment``
+    recalcula todos os fatores dos símbolos.
+    """
+    data = request.get_json(silent=True) or {}
+    symbols = data.get("symbols")
+    if symbols is not None and (
+        not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols)
+    ):
+        return jsonify({"success": False, "error": "'symbols' deve ser uma lista de tickers"}), 400
+
+    try:
+        symbols = [s.upper() for s in symbols] if symbols else None
+        report = refresh_daily_prices(symbols)
+        report["adjustments"] = update_adjustments(symbols, full=bool(data.get("full_adjustment")))
+        db.session.commit()
+        report["matrix"] = price_matrix.build()
+        return jsonify({"success": True, "report": report})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Erro ao atualizar histórico diário.", "details": str(e)}), 500
+
 @historical_bp.route('/<string:ticker>', methods=['GET'])
 def get_historical_data(ticker):
     """
     Fornece dados históricos para um ticker.
-    NOTA: Atualmente, esta rota retorna dados limitados da tabela de métricas.
-    Para um histórico completo, um ETL para popular uma tabela de 'quotes' diários é necessário.
+    Lê as barras de daily_prices no intervalo ``start``/``end`` (padrão: 365
+    dias); sem histórico gravado, recorre aos dados da tabela de métricas.
+    Com ``points``, as barras são agrupadas em até esse número de candles.
     """
+    start, end, error = _parse_range(request.args)
+    if error:
+        return error
+    points, _, error = parse_points(request.args)
+    if error:
+        return error
+
     try:
+        history = daily_price_history([ticker.upper()], start, end)[ticker.upper()]
+        if history:
+            return jsonify({"success": True, "ticker": ticker.upper(), "data": downsample_ohlc(history, points)})
+
         # Por enquanto, vamos retornar os dados mais recentes que temos na tabela de métricas.
         # Esta é uma simplificação. O ideal é ter uma tabela de histórico de preços.
         metric = db.session.query(AssetMetrics).filter(AssetMetrics.ticker.ilike(ticker)).first()
@@ -44,4 +132,61 @@ def get_historical_data(ticker):
         })
 
     except Exception as e:
-        return jsonify({"success": False, "error": "Erro ao obter dados históricos.", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": "Erro ao obter dados históricos.", "details": str(e)}), 500
+
+
+@historical_bp.route('/<string:ticker>/intraday', methods=['GET'])
+def get_intraday_bars(ticker):
+    """Candles do pregão corrente (``tf`` = 1m, 5m, 15m ou 60m).
+
+    As barras vêm da memória do agregador alimentado pelo RTD worker; em um
+    processo sem o worker, são lidas da tabela intraday_bars.
+    """
+    timeframe = request.args.get("tf", "5m")
+    if timeframe not in TIMEFRAMES:
+        return jsonify({"success": False, "error": f"tf deve ser um de: {', '.join(TIMEFRAMES)}"}), 400
+    limit = request.args.get("limit", type=int)
+    points, _, error = parse_points(request.args)
+    if error:
+        return error
+    symbol = ticker.upper()
+
+    try:
+        bars = intraday_bars.bars(symbol, timeframe, limit)
+        source = "memory"
+        if not bars:
+            source = "database"
+            last_time = db.session.query(func.max(IntradayBar.bar_time)).filter(
+                IntradayBar.symbol == symbol, IntradayBar.timeframe == timeframe
+            ).scalar()
+            rows = []
+            if last_time is not None:
+                session_start = last_time.replace(hour=0, minute=0, second=0, microsecond=0)
+                query = IntradayBar.query.filter(
+                    IntradayBar.symbol == symbol,
+                    IntradayBar.timeframe == timeframe,
+                    IntradayBar.bar_time >= session_start,
+                ).order_by(IntradayBar.bar_time.desc())
+                rows = (query.limit(limit) if limit else query).all()[::-1]
+            bars = [
+                {
+                    "time": row.bar_time.isoformat(),
+                    "open": float(row.open),
+                    "high": float(row.high),
+                    "low": float(row.low),
+                    "close": float(row.close),
+                    "volume": float(row.volume),
+                    "ticks": row.ticks,
+                }
+                for row in rows
+            ]
+
+        return jsonify({
+            "success": True,
+            "ticker": symbol,
+            "timeframe": timeframe,
+            "source": source,
+            "data": downsample_ohlc(bars, points, time_key="time"),
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": "Erro ao obter barras intradiárias.", "details": str(e)}), 500
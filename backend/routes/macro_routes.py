@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from backend import db
 from sqlalchemy import text
+from backend.utils.downsample import downsample_records, parse_points
 import logging
 import os
 from datetime import datetime
@@ -66,6 +67,9 @@ def get_indicator_history(indicator):
             jsonify({"success": False, "error": "Datas devem estar no formato YYYY-MM-DD"}),
             400,
         )
+    points, method, error = parse_points(request.args)
+    if error:
+        return error
 
     if start_date and end_date and end_date < start_date:
         return (
@@ -91,6 +95,7 @@ def get_indicator_history(indicator):
             {"date": r.date.isoformat(), "value": float(r.value) if r.value is not None else None}
             for r in rows
         ]
+        history = downsample_records(history, points, "value", method=method)
         return jsonify({"success": True, "indicator": indicator, "history": history})
     except Exception as e:
         logger.error(f"Erro em get_indicator_history: {e}")
@@ -1,10 +1,13 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from backend.services.metatrader5_rtd_worker import get_rtd_worker
+from backend.services.quote_board import quote_board
 from backend.models import AssetMetrics
 from backend import db
 import logging
 from datetime import datetime, timedelta
-import yfinance as yf
+from backend.services.portfolio_attribution import BENCHMARK_SYMBOL
+from backend.services.price_history import fetch_daily_ohlcv, load_daily_prices
+from backend.utils.downsample import downsample_records, parse_points
 
 logger = logging.getLogger(__name__)
 market_bp = Blueprint('market_bp', __name__)
@@ -57,12 +60,17 @@ def get_market_status():
 @market_bp.route('/quote/<string:ticker>', methods=['GET'])
 def get_quote(ticker):
     """Retorna a cotação em tempo real para um ticker específico."""
-    rtd_worker = get_rtd_worker()
-    if not rtd_worker or not rtd_worker.mt5_connected:
-        return jsonify({"error": "Serviço de cotações (MT5) não disponível."}), 503
-
     ticker_upper = ticker.upper()
-    quote = rtd_worker.get_mt5_quote(ticker_upper)
+    # Leitura do quadro em memória compartilhada publicado pelo RTD worker
+    quote = quote_board.get(ticker_upper)
+
+    if not quote:
+        rtd_worker = get_rtd_worker()
+        worker_connected = bool(rtd_worker and rtd_worker.mt5_connected)
+        if not worker_connected and not quote_board.attach():
+            return jsonify({"error": "Serviço de cotações (MT5) não disponível."}), 503
+        if worker_connected:
+            quote = rtd_worker.get_mt5_quote(ticker_upper)
 
     if quote:
         return jsonify({"success": True, "ticker": ticker_upper, "quote": quote})
@@ -72,15 +80,25 @@ def get_quote(ticker):
 
 @market_bp.route('/ibov-history', methods=['GET'])
 def get_ibov_history():
-    """Retorna a série histórica do Ibovespa."""
+    """Retorna a série histórica do Ibovespa (até ``points`` pontos)."""
+    points, method, error = parse_points(request.args)
+    if error:
+        return error
     try:
         end = datetime.today().date()
         start = end - timedelta(days=365)
-        data = yf.download('^BVSP', start=start, end=end, progress=False)[['Adj Close']]
+        # Só leitura de daily_prices, mantido pelo snapshot de fechamento
+        closes = load_daily_prices([BENCHMARK_SYMBOL], start, end)[BENCHMARK_SYMBOL].dropna()
+        if closes.empty:
+            # Histórico ainda não carregado: busca direto, sem gravar
+            logger.warning("daily_prices sem histórico do Ibovespa; consultando o yfinance")
+            frame = fetch_daily_ohlcv([BENCHMARK_SYMBOL], start, end)
+            closes = frame.set_index("date")["close"].dropna() if not frame.empty else closes
         history = [
-            {"date": idx.strftime('%Y-%m-%d'), "close": float(row['Adj Close'])}
-            for idx, row in data.iterrows()
+            {"date": day.strftime('%Y-%m-%d'), "close": float(close)}
+            for day, close in closes.items()
         ]
+        history = downsample_records(history, points, "close", method=method)
         return jsonify({"success": True, "history": history})
     except Exception as e:
         logger.error(f"Erro ao obter histórico do Ibovespa: {e}")
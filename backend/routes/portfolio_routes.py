@@ -1,5 +1,5 @@
 import logging
-from datetime import date
+from datetime import date, datetime, timedelta
 from flask import Blueprint, jsonify, request
 from sqlalchemy.sql import func
 
@@ -9,473 +9,159 @@ from backend.models import (
     PortfolioPosition,
     AssetMetrics,
     PortfolioDailyValue,
+    PortfolioDailyMetric,
     PortfolioEditableMetric,
+    PortfolioIntradayCota,
     Ticker,
     Company,
 )
+from backend.utils.bulk_upsert import dialect_insert
+from backend.utils.downsample import downsample_records, parse_points
+from backend.services.editable_metrics_cache import editable_metrics_cache, summary_inputs
+from backend.services.eod_snapshot import snapshot_all_portfolios
+from backend.services.intraday_cota_recorder import downsample_bars
+from backend.services.market_calendar import MARKET_TZ
+from backend.services.portfolio_attribution import (
+    BENCHMARK,
+    attribution_over_range,
+    benchmark_sector_weights,
+    build_daily_attribution,
+    load_sectors,
+    store_benchmark_weights,
+)
+from backend.services.portfolio_backfill import backfill_portfolio
+from backend.services.portfolio_rebalance import RebalanceProblem
+from backend.services.portfolio_risk import portfolio_risk_engine
+from backend.services.portfolio_state_cache import PortfolioState, portfolio_state_cache
+from backend.services.portfolio_summary_cache import portfolio_summary_cache
+from backend.services.portfolio_valuation import (
+    PortfolioBook,
+    books_from_rows,
+    load_position_rows,
+)
 
 logger = logging.getLogger(__name__)
 portfolio_bp = Blueprint("portfolio_bp", __name__)
 
+# Pontos da série intradiária da cota quando ``points`` não é informado
+INTRADAY_COTA_DEFAULT_POINTS = 500
+
 
 def calculate_portfolio_summary(portfolio_id: int):
     """Calcula o resumo e holdings do portfólio."""
     try:
+        stamp = portfolio_summary_cache.stamp(portfolio_id)
+        # Com o RTD worker ativo, o estado em memória já está atualizado pelos
+        # ticks, desde que posições e métricas não tenham mudado em outro processo
+        summary = portfolio_state_cache.summary(portfolio_id, version=stamp.data_version)
+        if summary is not None:
+            return summary
+
+        # Sem o worker, reutiliza o último cálculo enquanto posições, métricas
+        # editáveis e preços dos ativos da carteira não mudarem
+        summary = portfolio_summary_cache.get(portfolio_id, stamp)
+        if summary is not None:
+            return summary
+
         portfolio = Portfolio.query.get(portfolio_id)
         if not portfolio:
             return None
 
-        positions = (
-            PortfolioPosition.query.filter_by(portfolio_id=portfolio_id)
-            .join(
-                AssetMetrics,
-                PortfolioPosition.symbol == AssetMetrics.symbol,
-                isouter=True,
-            )
-            .all()
+        # Posições e preços são carregados uma única vez em arrays NumPy
+        book = PortfolioBook.from_rows(load_position_rows([portfolio_id]))
+        cota_d1, qtd_cotas, caixa_bruto = editable_metrics_cache.summary_inputs(
+            portfolio_id, version=stamp.data_version
         )
 
-        holdings = []
-        total_value = 0.0
-        total_cost = 0.0
-        total_long = 0.0
-        total_short = 0.0
-        
-        # Log para debug
-        logger.info(f"Iniciando cálculo do portfólio {portfolio_id}")
-        logger.info(f"Número de posições encontradas: {len(positions)}")
-        for pos in positions:
-            # Tratamento mais robusto para valores ausentes
-            last_price = 0.0
-            daily_change_pct = 0.0
-            
-            if pos.metrics:
-                try:
-                    # Obter o preço atual do ativo
-                    last_price = float(pos.metrics.last_price) if pos.metrics.last_price is not None else 0.0
-
-                    # Usar a nova coluna previous_close_correct se disponível
-                    previous_close = pos.metrics.get_previous_close() or 0.0
-                    open_price = float(pos.metrics.open_price) if pos.metrics.open_price is not None else 0.0
-                    logger.debug(
-                        f"Dados do banco para {pos.symbol}: last_price={last_price}, previous_close={previous_close}, open_price={open_price}"
-                    )
-
-                    # Calcular a variação diária corretamente usando o fechamento anterior
-                    if previous_close and previous_close != 0:
-                        daily_change_pct = ((last_price / previous_close) - 1) * 100
-                        logger.debug(
-                            f"Calculando variação para {pos.symbol}: last_price={last_price}, previous_close={previous_close}, variação={daily_change_pct:.4f}%"
-                        )
-                    else:
-                        daily_change_pct = 0.0
-                        logger.debug(
-                            f"Sem previous_close para {pos.symbol}: last_price={last_price}, previous_close={previous_close}"
-                        )
-                        # Verificar se temos open_price como fallback
-                        if open_price and open_price != 0:
-                            daily_change_pct = ((last_price / open_price) - 1) * 100
-                            logger.debug(
-                                f"Usando open_price como fallback para {pos.symbol}: last_price={last_price}, open_price={open_price}, variação={daily_change_pct:.4f}%"
-                            )
-                except (ValueError, TypeError, ZeroDivisionError) as e:
-                    last_price = 0.0
-                    daily_change_pct = 0.0
-                    logger.error(f"Erro ao calcular variação para {pos.symbol}: {e}")
-
-                # Fallback: se ainda não obtivemos variação e há price_change_percent
-                if daily_change_pct == 0.0:
-                    try:
-                        pct = (
-                            float(pos.metrics.price_change_percent)
-                            if pos.metrics.price_change_percent is not None
-                            else 0.0
-                        )
-                        if pct != 0.0:
-                            daily_change_pct = pct
-                    except (ValueError, TypeError):
-                        pass
-            else:
-                last_price = 0.0
-                daily_change_pct = 0.0
-
-            quantity = float(pos.quantity) if pos.quantity is not None else 0.0
-            avg_price = float(pos.avg_price) if pos.avg_price is not None else 0.0
-            target_weight = float(pos.target_weight) if pos.target_weight is not None else 0.0
-            
-            # Log para depuração
-            logger.debug(f"Valores da posição {pos.symbol}: quantity={quantity}, avg_price={avg_price}, target_weight={target_weight}")
-
-            position_value = quantity * last_price
-            cost = quantity * avg_price
-            gain = position_value - cost
-            gain_percent = (gain / cost * 100) if cost else 0.0
-
-            holdings.append(
-                {
-                    "symbol": pos.symbol,
-                    "quantity": quantity,
-                    "avg_price": avg_price,
-                    "last_price": last_price,
-                    "daily_change_pct": daily_change_pct,
-                    "position_value": position_value,
-                    "value": position_value,
-                    "cost": cost,
-                    "gain": gain,
-                    "gain_percent": gain_percent,
-                    "contribution": 0.0,
-                    "position_pct": 0.0,
-                    "target_pct": target_weight,  # Usando target_weight
-                    "difference": 0.0,
-                    "adjustment_qty": 0.0,
-                }
+        summary = portfolio_state_cache.store(
+            PortfolioState(
+                portfolio.id,
+                portfolio.name,
+                book,
+                caixa_bruto=caixa_bruto,
+                qtd_cotas=qtd_cotas,
+                cota_d1=cota_d1,
+                data_version=stamp.data_version,
             )
+        )
 
-            total_value += position_value
-            total_cost += cost
-            if position_value >= 0:
-                total_long += position_value
-            else:
-                total_short += position_value
-                
-        # Log após o cálculo das posições
-        logger.info(f"Total value after positions: {total_value}")
-        logger.info(f"Total cost after positions: {total_cost}")
-        logger.info(f"Total long after positions: {total_long}")
-        logger.info(f"Total short after positions: {total_short}")
+        portfolio_summary_cache.put(portfolio_id, stamp, summary)
 
-        # Calcula campos dependentes do valor total
-        try:
-            total_value = float(total_value) if total_value is not None else 0.0
-        except (ValueError, TypeError):
-            total_value = 0.0
-            
-        for h in holdings:
-            try:
-                # Inicialmente apenas garantir que position_pct esteja presente; será recalculado depois
-                position_value = float(h["position_value"]) if h["position_value"] is not None else 0.0
-                position_pct = (position_value / total_value * 100) if total_value and total_value != 0 else 0.0
-                h["position_pct"] = position_pct
-            except (ValueError, TypeError, ZeroDivisionError) as e:
-                logger.error(f"Erro no cálculo inicial das métricas para holding {h.get('symbol', 'unknown')}: {e}")
-                h["position_pct"] = 0.0
-
-        # Garantir que os valores sejam números válidos
-        try:
-            total_value = float(total_value) if total_value is not None else 0.0
-        except (ValueError, TypeError):
-            total_value = 0.0
-            
-        try:
-            total_cost = float(total_cost) if total_cost is not None else 0.0
-        except (ValueError, TypeError):
-            total_cost = 0.0
+        logger.debug(
+            f"Portfólio {portfolio_id}: {len(book)} posições, "
+            f"patrimonio_liquido={summary['patrimonio_liquido']}, valor_cota={summary['valor_cota']}"
+        )
+        return summary
+    except Exception as e:
+        logger.error(f"Erro em calculate_portfolio_summary: {e}")
+        import traceback
+        logger.error(f"Traceback completo: {traceback.format_exc()}")
+        raise
 
-        total_gain = total_value - total_cost
-        total_gain_percent = (total_gain / total_cost * 100) if total_cost and total_cost != 0 else 0.0
 
-        today = date.today()
-        # Removendo o acesso à tabela PortfolioDailyMetric que não existe
-        metrics = {}
+@portfolio_bp.route("/summaries", methods=["GET"])
+def get_portfolio_summaries():
+    """Retorna os resumos de várias carteiras calculados em conjunto."""
+    try:
+        portfolio_ids = [
+            int(value) for value in request.args.get("ids", "").split(",") if value.strip()
+        ]
+    except ValueError:
+        return jsonify({"success": False, "error": "Parâmetro ids inválido"}), 400
+    if not portfolio_ids:
+        return jsonify({"success": False, "error": "Parâmetro ids obrigatório"}), 400
 
-        # Obter valores editáveis diretamente da tabela portfolio_editable_metrics
-        try:
-            editable_metrics = {}
-            
-            # Primeiro tentar buscar métricas para a data atual
-            editable_metrics_records = PortfolioEditableMetric.query.filter_by(
-                portfolio_id=portfolio_id, date=today
-            ).all()
-            
-            # Se não encontrar métricas para a data atual, buscar a data mais recente disponível
-            if not editable_metrics_records:
-                logger.info(f"Não encontradas métricas para {today} no cálculo do portfólio, buscando data mais recente...")
-                latest_metric = PortfolioEditableMetric.query.filter_by(
-                    portfolio_id=portfolio_id
-                ).order_by(PortfolioEditableMetric.date.desc()).first()
-                
-                if latest_metric:
-                    latest_date = latest_metric.date
-                    logger.info(f"Encontrada data mais recente para métricas: {latest_date}")
-                    editable_metrics_records = PortfolioEditableMetric.query.filter_by(
-                        portfolio_id=portfolio_id, date=latest_date
-                    ).all()
-                else:
-                    logger.info("Nenhuma métrica encontrada no banco de dados para o cálculo do portfólio")
-                    editable_metrics_records = []
+    try:
+        summaries = {}
+        pending = []
+        versions = dict(
+            db.session.query(Portfolio.id, Portfolio.data_version)
+            .filter(Portfolio.id.in_(portfolio_ids))
+            .all()
+        )
+        for portfolio_id in dict.fromkeys(portfolio_ids):
+            if portfolio_id not in versions:
+                continue
+            cached = portfolio_state_cache.summary(portfolio_id, version=versions[portfolio_id])
+            if cached is not None:
+                summaries[portfolio_id] = cached
             else:
-                logger.info(f"Registros de métricas editáveis encontrados: {len(editable_metrics_records)}")
-            
-            for record in editable_metrics_records:
-                try:
-                    editable_metrics[record.metric_key] = float(record.metric_value) if record.metric_value is not None else 0.0
-                    logger.info(f"Metric {record.metric_key}: {record.metric_value}")
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Erro ao converter valor da métrica {record.metric_key}: {e}")
-                    editable_metrics[record.metric_key] = 0.0
-            
-            cota_d1 = editable_metrics.get("cotaD1", 0.0)
-            qtd_cotas = editable_metrics.get("qtdCotas", 0.0)
-            caixa_bruto = editable_metrics.get("caixaBruto", 0.0)
-            
-            # Garantir que os valores sejam números válidos
-            try:
-                cota_d1 = float(cota_d1) if cota_d1 is not None else 0.0
-            except (ValueError, TypeError):
-                cota_d1 = 0.0
-                
-            try:
-                qtd_cotas = float(qtd_cotas) if qtd_cotas is not None else 0.0
-            except (ValueError, TypeError):
-                qtd_cotas = 0.0
-                
-            try:
-                caixa_bruto = float(caixa_bruto) if caixa_bruto is not None else 0.0
-            except (ValueError, TypeError):
-                caixa_bruto = 0.0
-            
-            # Log para depuração
-            logger.info(f"Dados para cálculo da cota - patrimonio_liquido: {total_value}, qtd_cotas: {qtd_cotas}, cota_d1: {cota_d1}")
-        except Exception as e:
-            logger.error(f"Erro ao obter métricas editáveis: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            cota_d1 = 0.0
-            qtd_cotas = 0.0
-            caixa_bruto = 0.0
-
-        patrimonio_liquido = total_value
-        # Garantir que os valores sejam números válidos
-        try:
-            patrimonio_liquido = float(patrimonio_liquido) if patrimonio_liquido is not None else 0.0
-        except (ValueError, TypeError):
-            patrimonio_liquido = 0.0
-            
-        # Log antes do cálculo do patrimônio líquido ajustado
-        logger.info(f"Patrimônio líquido antes do ajuste: {patrimonio_liquido}")
-        logger.info(f"Caixa bruto: {caixa_bruto}")
-        
-        # Ajustar o patrimônio líquido com a caixa bruta
-        # O patrimonio_liquido representa o valor das posições
-        # A caixa bruta precisa ser adicionada para obter o patrimônio líquido total
-        patrimonio_liquido_ajustado = patrimonio_liquido + caixa_bruto
-        logger.info(f"Patrimônio líquido ajustado (com caixa): {patrimonio_liquido_ajustado}")
-
-        # Recalcular position_pct e diferença com base no patrimônio líquido ajustado
-        for h in holdings:
-            try:
-                position_value = float(h["position_value"]) if h["position_value"] is not None else 0.0
-                target_pct = float(h["target_pct"]) if h["target_pct"] is not None else 0.0
-                position_pct = (
-                    (position_value / patrimonio_liquido_ajustado) * 100
-                    if patrimonio_liquido_ajustado and patrimonio_liquido_ajustado != 0
-                    else 0.0
-                )
-                h["position_pct"] = position_pct
-                h["difference"] = target_pct - position_pct
-            except (ValueError, TypeError, ZeroDivisionError) as e:
-                logger.error(
-                    f"Erro no recálculo das métricas para holding {h.get('symbol', 'unknown')}: {e}"
-                )
-                h["position_pct"] = 0.0
-                h["difference"] = 0.0
-
-        # Calcular a contribuição de cada ativo para a variação diária e o ajuste necessário
-        # Contribuição = (valor da variação da posição no ativo / patrimonio_liquido_ajustado) * 100
-        for h in holdings:
-            try:
-                position_value = float(h["position_value"]) if h["position_value"] is not None else 0.0
-                daily_pct = float(h["daily_change_pct"]) if h["daily_change_pct"] is not None else 0.0
-                diff_pct = float(h["difference"]) if h["difference"] is not None else 0.0
-                last_price = float(h["last_price"]) if h["last_price"] is not None else 0.0
-
-                daily_change_value = position_value * daily_pct / 100
-                if patrimonio_liquido_ajustado and patrimonio_liquido_ajustado != 0:
-                    h["contribution"] = (daily_change_value / patrimonio_liquido_ajustado) * 100
-                    h["adjustment_qty"] = (
-                        (diff_pct / 100 * patrimonio_liquido_ajustado) / last_price
-                        if last_price
-                        else 0.0
+                pending.append(portfolio_id)
+
+        if pending:
+            portfolios = Portfolio.query.filter(Portfolio.id.in_(pending)).all()
+            # Uma única consulta para posições e preços de todas as carteiras
+            books = books_from_rows(load_position_rows([p.id for p in portfolios]))
+            editable = editable_metrics_cache.get_many(
+                [p.id for p in portfolios], versions={p.id: p.data_version for p in portfolios}
+            )
+            for portfolio in portfolios:
+                cota_d1, qtd_cotas, caixa_bruto = summary_inputs(editable[portfolio.id])
+                summaries[portfolio.id] = portfolio_state_cache.store(
+                    PortfolioState(
+                        portfolio.id,
+                        portfolio.name,
+                        books.get(portfolio.id) or PortfolioBook.from_rows([]),
+                        caixa_bruto=caixa_bruto,
+                        qtd_cotas=qtd_cotas,
+                        cota_d1=cota_d1,
+                        data_version=portfolio.data_version,
                     )
-                else:
-                    h["contribution"] = 0.0
-                    h["adjustment_qty"] = 0.0
-            except (ValueError, TypeError, ZeroDivisionError) as e:
-                logger.error(
-                    f"Erro no cálculo da contribuição/ajuste para holding {h.get('symbol', 'unknown')}: {e}"
                 )
-                h["contribution"] = 0.0
-                h["adjustment_qty"] = 0.0
-        
-        # Usar o patrimônio líquido ajustado para os cálculos
-        logger.info(f"Usando patrimonio_liquido_ajustado para cálculos: {patrimonio_liquido_ajustado}")
-            
-        try:
-            qtd_cotas = float(qtd_cotas) if qtd_cotas is not None else 0.0
-        except (ValueError, TypeError):
-            qtd_cotas = 0.0
-
-        # Log detalhado antes do cálculo
-        logger.info(f"Valores antes do cálculo da cota - patrimonio_liquido_ajustado: {patrimonio_liquido_ajustado}, qtd_cotas: {qtd_cotas}")
-        logger.info(f"Tipo de patrimonio_liquido_ajustado: {type(patrimonio_liquido_ajustado)}, tipo de qtd_cotas: {type(qtd_cotas)}")
-        if qtd_cotas and qtd_cotas != 0:
-            try:
-                resultado_divisao = patrimonio_liquido_ajustado / qtd_cotas
-                logger.info(f"Divisão: {patrimonio_liquido_ajustado} / {qtd_cotas} = {resultado_divisao}")
-                valor_cota = resultado_divisao
-            except (ZeroDivisionError, ValueError, TypeError) as e:
-                logger.error(f"Erro na divisão para cálculo da cota: {e}")
-                valor_cota = 0.0
-        else:
-            logger.info("qtd_cotas é zero ou None, definindo valor_cota como 0.0")
-            valor_cota = 0.0
-        logger.info(f"Valor da cota calculado: {valor_cota}")
-        
-        # Log adicional para debug
-        logger.info(f"Valores para cálculo da variação da cota - valor_cota: {valor_cota}, cota_d1: {cota_d1}")
-        if cota_d1 and cota_d1 != 0:
-            try:
-                variacao = ((valor_cota / cota_d1) - 1) * 100
-                logger.info(f"Variação da cota: (({valor_cota} / {cota_d1}) - 1) * 100 = {variacao}")
-                variacao_cota_pct = variacao
-            except (ZeroDivisionError, ValueError, TypeError) as e:
-                logger.error(f"Erro no cálculo da variação da cota: {e}")
-                variacao_cota_pct = 0.0
-        else:
-            logger.info("cota_d1 é zero ou None, definindo variacao_cota_pct como 0.0")
-            variacao_cota_pct = 0.0
-        logger.info(f"Variação da cota calculada: {variacao_cota_pct}")
-        # Garantir que os valores sejam números válidos
-        try:
-            valor_cota = float(valor_cota) if valor_cota is not None else 0.0
-        except (ValueError, TypeError):
-            valor_cota = 0.0
-            
-        try:
-            cota_d1 = float(cota_d1) if cota_d1 is not None else 0.0
-        except (ValueError, TypeError):
-            cota_d1 = 0.0
 
-        try:
-            variacao_cota_pct = float(variacao_cota_pct) if variacao_cota_pct is not None else 0.0
-        except (ValueError, TypeError):
-            variacao_cota_pct = 0.0
-            
-        try:
-            total_long = float(total_long) if total_long is not None else 0.0
-        except (ValueError, TypeError):
-            total_long = 0.0
-            
-        try:
-            total_short = float(total_short) if total_short is not None else 0.0
-        except (ValueError, TypeError):
-            total_short = 0.0
-            
-        try:
-            caixa_bruto = float(caixa_bruto) if caixa_bruto is not None else 0.0
-        except (ValueError, TypeError):
-            caixa_bruto = 0.0
-            
-        try:
-            patrimonio_liquido_ajustado = float(patrimonio_liquido_ajustado) if patrimonio_liquido_ajustado is not None else 0.0
-        except (ValueError, TypeError):
-            patrimonio_liquido_ajustado = 0.0
-
-        # Log adicional para os cálculos de posição
-        logger.info(f"Cálculos de posição - total_long: {total_long}, total_short: {total_short}, caixa_bruto: {caixa_bruto}")
-        logger.info(f"Valores antes dos cálculos de posição - patrimonio_liquido_ajustado: {patrimonio_liquido_ajustado}")
-
-        # Ajustar os cálculos para considerar o caixa como redutor
-        # O caixa reduz a posição comprada e a exposição total
-        logger.info(f"Valores para cálculo de posição - total_long: {total_long}, caixa_bruto: {caixa_bruto}, patrimonio_liquido_ajustado: {patrimonio_liquido_ajustado}")
-        if patrimonio_liquido_ajustado and patrimonio_liquido_ajustado != 0:
-            try:
-                posicao_comprada_pct = ((total_long - caixa_bruto) / patrimonio_liquido_ajustado * 100)
-                posicao_vendida_pct = (abs(total_short) / patrimonio_liquido_ajustado * 100)
-                logger.info(f"Posição comprada calculada: {posicao_comprada_pct}, posição vendida: {posicao_vendida_pct}")
-            except (ZeroDivisionError, ValueError, TypeError) as e:
-                logger.error(f"Erro no cálculo das posições: {e}")
-                posicao_comprada_pct = 0.0
-                posicao_vendida_pct = 0.0
-        else:
-            posicao_comprada_pct = 0.0
-            posicao_vendida_pct = 0.0
-            logger.info("patrimonio_liquido_ajustado é zero, definindo posições como 0.0")
-        
-        try:
-            net_long_pct = posicao_comprada_pct - posicao_vendida_pct
-            logger.info(f"Net long calculado: {net_long_pct}")
-        except (ValueError, TypeError) as e:
-            logger.error(f"Erro no cálculo do net long: {e}")
-            net_long_pct = 0.0
-            
-        if patrimonio_liquido_ajustado and patrimonio_liquido_ajustado != 0:
-            try:
-                exposicao_total_pct = ((total_long - caixa_bruto + abs(total_short)) / patrimonio_liquido_ajustado * 100)
-                logger.info(f"Exposição total calculada: {exposicao_total_pct}")
-            except (ZeroDivisionError, ValueError, TypeError) as e:
-                logger.error(f"Erro no cálculo da exposição total: {e}")
-                exposicao_total_pct = 0.0
-        else:
-            exposicao_total_pct = 0.0
-            logger.info("patrimonio_liquido_ajustado é zero, definindo exposição total como 0.0")
-            
-        # Log dos valores finais
-        logger.info(f"VALORES FINAIS CALCULADOS:")
-        logger.info(f"  patrimonio_liquido_ajustado: {patrimonio_liquido_ajustado}")
-        logger.info(f"  valor_cota: {valor_cota}")
-        logger.info(f"  variacao_cota_pct: {variacao_cota_pct}")
-        logger.info(f"  posicao_comprada_pct: {posicao_comprada_pct}")
-        logger.info(f"  posicao_vendida_pct: {posicao_vendida_pct}")
-        logger.info(f"  net_long_pct: {net_long_pct}")
-        logger.info(f"  exposicao_total_pct: {exposicao_total_pct}")
-            
-        # Log dos valores finais das posições
-        logger.info(f"Valores finais das posições:")
-        logger.info(f"  posicao_comprada_pct: {posicao_comprada_pct}")
-        logger.info(f"  posicao_vendida_pct: {posicao_vendida_pct}")
-        logger.info(f"  net_long_pct: {net_long_pct}")
-        logger.info(f"  exposicao_total_pct: {exposicao_total_pct}")
-
-        summary = {
-            "id": portfolio.id if portfolio else portfolio_id,
-            "name": portfolio.name if portfolio else f"Portfolio {portfolio_id}",
-            "total_value": total_value,
-            "total_cost": total_cost,
-            "total_gain": total_gain,
-            "total_gain_percent": total_gain_percent,
-            "holdings": holdings,
-            "patrimonio_liquido": patrimonio_liquido_ajustado,  # Usar o valor ajustado
-            "valor_cota": valor_cota,
-            "variacao_cota_pct": variacao_cota_pct,
-            "posicao_comprada_pct": posicao_comprada_pct,
-            "posicao_vendida_pct": posicao_vendida_pct,
-            "net_long_pct": net_long_pct,
-            "exposicao_total_pct": exposicao_total_pct,
-        }
-        
-        # Log para depuração
-        logger.debug(f"Resumo do portfólio {portfolio_id}:")
-        logger.debug(f"  Total de holdings: {len(holdings)}")
-        for holding in holdings:
-            logger.debug(f"  Holding {holding['symbol']}: quantity={holding['quantity']}, target_pct={holding['target_pct']}")
-        
-        # Log específico para os valores da cota
-        logger.info(f"VALORES FINAIS DO PORTFÓLIO {portfolio_id}:")
-        logger.info(f"  patrimonio_liquido: {patrimonio_liquido_ajustado}")
-        logger.info(f"  valor_cota: {valor_cota}")
-        logger.info(f"  variacao_cota_pct: {variacao_cota_pct}")
-        logger.info(f"  posicao_comprada_pct: {posicao_comprada_pct}")
-        logger.info(f"  posicao_vendida_pct: {posicao_vendida_pct}")
-        logger.info(f"  net_long_pct: {net_long_pct}")
-        logger.info(f"  exposicao_total_pct: {exposicao_total_pct}")
-        
-        return summary
+        return jsonify({
+            "success": True,
+            "summaries": {str(pid): summary for pid, summary in summaries.items()},
+            "not_found": [pid for pid in dict.fromkeys(portfolio_ids) if pid not in summaries],
+        })
     except Exception as e:
-        logger.error(f"Erro em calculate_portfolio_summary: {e}")
+        logger.error(f"Erro em get_portfolio_summaries para {portfolio_ids}: {e}")
         import traceback
         logger.error(f"Traceback completo: {traceback.format_exc()}")
-        raise
+        return (
+            jsonify({"success": False, "error": "Erro interno ao calcular resumos das carteiras", "details": str(e)}),
+            500,
+        )
 
 
 @portfolio_bp.route("/<int:portfolio_id>/summary", methods=["GET"])
@@ -529,6 +215,112 @@ def get_portfolio_summary(portfolio_id: int):
         )
 
 
+@portfolio_bp.route("/<int:portfolio_id>/risk", methods=["GET"])
+def get_portfolio_risk(portfolio_id: int):
+    """Retorna VaR/CVaR, volatilidade, beta e risco por ativo do portfólio."""
+    try:
+        confidence = float(request.args.get("confidence", 0.95))
+    except ValueError:
+        confidence = 0.0
+    if not 0.5 <= confidence < 1:
+        return (
+            jsonify({"success": False, "error": "confidence deve estar entre 0.5 e 1"}),
+            400,
+        )
+
+    try:
+        summary = calculate_portfolio_summary(portfolio_id)
+        if not summary:
+            return (
+                jsonify({"success": False, "error": "Portfólio não encontrado"}),
+                404,
+            )
+
+        risk = portfolio_risk_engine.evaluate({portfolio_id: summary}, confidence)[portfolio_id]
+        if risk is None:
+            return (
+                jsonify({"success": False, "error": "Histórico de preços indisponível"}),
+                503,
+            )
+        return jsonify({"success": True, "risk": risk})
+    except Exception as e:
+        logger.error(f"Erro ao calcular risco do portfólio {portfolio_id}: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao calcular risco"}),
+            500,
+        )
+
+
+@portfolio_bp.route("/<int:portfolio_id>/rebalance", methods=["GET", "POST"])
+def rebalance_portfolio(portfolio_id: int):
+    """Gera ordens em lotes para levar o portfólio aos pesos-alvo.
+
+    GET usa os ``target_weight`` cadastrados. POST aceita vários cenários
+    ``{"scenarios": [{"name": ..., "targets": {"VALE3": 10}}], "min_cash": 0}``;
+    ativos omitidos em um cenário mantêm o alvo cadastrado.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "error": "Formato inválido"}), 400
+
+    scenarios = data.get("scenarios") or [{"name": "cadastrado", "targets": {}}]
+    lot_sizes = data.get("lot_sizes") or {}
+    try:
+        min_cash = float(data.get("min_cash", 0))
+        names = [str(sc.get("name", k)) for k, sc in enumerate(scenarios)]
+        targets = [
+            {str(sym): float(pct) for sym, pct in (sc.get("targets") or {}).items()}
+            for sc in scenarios
+        ]
+        lot_sizes = {str(sym): int(lot) for sym, lot in lot_sizes.items()}
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"success": False, "error": "Formato inválido"}), 400
+
+    try:
+        summary = calculate_portfolio_summary(portfolio_id)
+        if not summary:
+            return (
+                jsonify({"success": False, "error": "Portfólio não encontrado"}),
+                404,
+            )
+
+        problem = RebalanceProblem.from_summary(
+            summary,
+            extra_symbols=[sym for t in targets for sym in t],
+            lot_sizes=lot_sizes,
+        )
+        try:
+            target_pct = problem.target_matrix(targets)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        results = problem.evaluate(target_pct, min_cash=min_cash)
+        for name, result in zip(names, results):
+            result["name"] = name
+
+        return jsonify({"success": True, "scenarios": results})
+    except Exception as e:
+        logger.error(f"Erro ao calcular rebalanceamento do portfólio {portfolio_id}: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao calcular rebalanceamento"}),
+            500,
+        )
+
+
+def _position_unchanged(current, row) -> bool:
+    """Indica se a posição enviada é igual à gravada (evita regravar linhas)."""
+    if current is None:
+        return False
+    try:
+        return all(
+            stored is not None and float(stored) == float(sent)
+            for stored, sent in zip(
+                current, (row["quantity"], row["avg_price"], row["target_weight"])
+            )
+        )
+    except (ValueError, TypeError):
+        return False
+
+
 @portfolio_bp.route("/<int:portfolio_id>/positions", methods=["POST"])
 def upsert_positions(portfolio_id: int):
     """Insere, atualiza ou remove posições de um portfólio."""
@@ -537,83 +329,99 @@ def upsert_positions(portfolio_id: int):
         return jsonify({"success": False, "error": "Formato inválido"}), 400
 
     try:
-        # Garante que todos os tickers existam ou cria novos
+        # Último item de cada símbolo prevalece, como nas atualizações sequenciais
+        incoming = {}
         for item in data:
             symbol = item.get("symbol")
             if not symbol:
                 continue
-            ticker = Ticker.query.filter_by(symbol=symbol).first()
-            if not ticker:
-                # Se o ticker não existe, cria um novo com tipo padrão 'stock'
-                ticker_type = item.get("type", "stock")  # Define 'stock' como padrão se não fornecido
-                ticker = Ticker(symbol=symbol, type=ticker_type, company_id=None)
-                db.session.add(ticker)
+            incoming[symbol] = item
+
+        # Resolve todos os tickers em uma única consulta e cria os ausentes em lote
+        if incoming:
+            existing_tickers = {
+                row.symbol
+                for row in db.session.query(Ticker.symbol).filter(Ticker.symbol.in_(list(incoming)))
+            }
+            new_tickers = [
+                {
+                    "symbol": symbol,
+                    # Se o ticker não existe, cria um novo com tipo padrão 'stock'
+                    "type": item.get("type", "stock"),
+                    "company_id": None,
+                }
+                for symbol, item in incoming.items()
+                if symbol not in existing_tickers
+            ]
+            if new_tickers:
+                db.session.execute(
+                    dialect_insert(Ticker.__table__)
+                    .values(new_tickers)
+                    .on_conflict_do_nothing(index_elements=["symbol"])
+                )
 
         portfolio = Portfolio.query.get(portfolio_id)
         if not portfolio:
             portfolio = Portfolio(id=portfolio_id, name=f"Portfolio {portfolio_id}")
             db.session.add(portfolio)
+            db.session.flush()
+
+        # Diferença em memória contra as posições atuais
+        current = {
+            row.symbol: (row.quantity, row.avg_price, row.target_weight)
+            for row in db.session.query(
+                PortfolioPosition.symbol,
+                PortfolioPosition.quantity,
+                PortfolioPosition.avg_price,
+                PortfolioPosition.target_weight,
+            ).filter(PortfolioPosition.portfolio_id == portfolio_id)
+        }
 
-        # Obter todos os símbolos que estão sendo enviados
-        symbols_to_keep = [item.get("symbol") for item in data if item.get("symbol")]
-        
-        # Remover posições que não estão na lista enviada
-        if symbols_to_keep:
-            positions_to_remove = PortfolioPosition.query.filter(
-                PortfolioPosition.portfolio_id == portfolio_id,
-                ~PortfolioPosition.symbol.in_(symbols_to_keep)
-            ).all()
-        else:
-            # Se não há posições enviadas, remover todas
-            positions_to_remove = PortfolioPosition.query.filter_by(
-                portfolio_id=portfolio_id
-            ).all()
-        
-        for position in positions_to_remove:
-            db.session.delete(position)
-
-        # Inserir ou atualizar posições
-        for item in data:
-            symbol = item.get("symbol")
-            quantity = item.get("quantity", 0)
-            avg_price = item.get("avg_price", 0)
-            target_weight = item.get("target_weight", 0)  # Adicionando target_weight
-            if not symbol:
+        symbols_to_remove = [symbol for symbol in current if symbol not in incoming]
+        rows_to_upsert = []
+        for symbol, item in incoming.items():
+            row = {
+                "portfolio_id": portfolio_id,
+                "symbol": symbol,
+                "quantity": item.get("quantity", 0),
+                "avg_price": item.get("avg_price", 0),
+                "target_weight": item.get("target_weight", 0),
+            }
+            if _position_unchanged(current.get(symbol), row):
                 continue
+            rows_to_upsert.append(row)
 
-            position = PortfolioPosition.query.filter_by(
-                portfolio_id=portfolio_id, symbol=symbol
-            ).first()
-            if position:
-                position.quantity = quantity
-                position.avg_price = avg_price
-                position.target_weight = target_weight  # Atualizando target_weight
-                logger.debug(f"Atualizando posição {symbol}: quantity={quantity}, avg_price={avg_price}, target_weight={target_weight}")
-            else:
-                new_position = PortfolioPosition(
-                    portfolio=portfolio,
-                    symbol=symbol,
-                    quantity=quantity,
-                    avg_price=avg_price,
-                    target_weight=target_weight,  # Adicionando target_weight
+        if symbols_to_remove:
+            db.session.execute(
+                PortfolioPosition.__table__.delete().where(
+                    PortfolioPosition.portfolio_id == portfolio_id,
+                    PortfolioPosition.symbol.in_(symbols_to_remove),
                 )
-                db.session.add(new_position)
-                logger.debug(f"Criando nova posição {symbol}: quantity={quantity}, avg_price={avg_price}, target_weight={target_weight}")
+            )
 
-        # Log para verificar as posições antes de salvar
-        positions = PortfolioPosition.query.filter_by(portfolio_id=portfolio_id).all()
-        logger.debug(f"Posições antes do commit para portfolio {portfolio_id}:")
-        for pos in positions:
-            logger.debug(f"  {pos.symbol}: quantity={pos.quantity}, avg_price={pos.avg_price}, target_weight={pos.target_weight}")
-        
+        if rows_to_upsert:
+            stmt = dialect_insert(PortfolioPosition.__table__).values(rows_to_upsert)
+            db.session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["portfolio_id", "symbol"],
+                    set_={
+                        "quantity": stmt.excluded.quantity,
+                        "avg_price": stmt.excluded.avg_price,
+                        "target_weight": stmt.excluded.target_weight,
+                    },
+                )
+            )
+
+        logger.debug(
+            f"Posições do portfolio {portfolio_id}: {len(rows_to_upsert)} gravadas, "
+            f"{len(symbols_to_remove)} removidas, "
+            f"{len(incoming) - len(rows_to_upsert)} inalteradas"
+        )
+
+        portfolio_summary_cache.touch(portfolio_id)
         db.session.commit()
-        
-        # Log para verificar as posições após salvar
-        positions = PortfolioPosition.query.filter_by(portfolio_id=portfolio_id).all()
-        logger.debug(f"Posições após commit para portfolio {portfolio_id}:")
-        for pos in positions:
-            logger.debug(f"  {pos.symbol}: quantity={pos.quantity}, avg_price={pos.avg_price}, target_weight={pos.target_weight}")
-        
+        portfolio_state_cache.invalidate(portfolio_id)
+
         return jsonify({"success": True}), 201
     except Exception as e:
         db.session.rollback()
@@ -624,6 +432,31 @@ def upsert_positions(portfolio_id: int):
         )
 
 
+@portfolio_bp.route("/snapshots", methods=["POST"])
+def create_all_portfolio_snapshots():
+    """Salva o snapshot diário de todas as carteiras de uma só vez."""
+    data = request.get_json(silent=True) or {}
+    try:
+        as_of = datetime.strptime(data["date"], "%Y-%m-%d").date() if data.get("date") else None
+    except (TypeError, ValueError):
+        return (
+            jsonify({"success": False, "error": "Datas devem estar no formato YYYY-MM-DD"}),
+            400,
+        )
+
+    try:
+        report = snapshot_all_portfolios(as_of)
+        db.session.commit()
+        return jsonify({"success": True, "report": report}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao salvar snapshots: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao salvar snapshots"}),
+            500,
+        )
+
+
 @portfolio_bp.route("/<int:portfolio_id>/snapshot", methods=["POST"])
 def create_portfolio_snapshot(portfolio_id: int):
     """Salva um snapshot diário do valor do portfólio."""
@@ -721,9 +554,148 @@ def update_daily_metrics(portfolio_id: int):
         )
 
 
+def _parse_date_range(data, default_days: int = 365):
+    """Lê ``start``/``end`` (YYYY-MM-DD); retorna (start, end, resposta de erro)."""
+    try:
+        end = datetime.strptime(data["end"], "%Y-%m-%d").date() if data.get("end") else date.today()
+        start = (
+            datetime.strptime(data["start"], "%Y-%m-%d").date()
+            if data.get("start")
+            else end - timedelta(days=default_days)
+        )
+    except (TypeError, ValueError):
+        return None, None, (
+            jsonify({"success": False, "error": "Datas devem estar no formato YYYY-MM-DD"}),
+            400,
+        )
+    if end < start:
+        return None, None, (
+            jsonify({"success": False, "error": "Data inicial deve ser anterior à final"}),
+            400,
+        )
+    return start, end, None
+
+
+@portfolio_bp.route("/<int:portfolio_id>/backfill", methods=["POST"])
+def backfill_portfolio_history(portfolio_id: int):
+    """Reconstrói o histórico diário de patrimônio e cota do portfólio.
+
+    Só preenche datas sem registro; ``overwrite: true`` substitui também os
+    fechamentos já gravados.
+    """
+    data = request.get_json(silent=True) or {}
+    start, end, error = _parse_date_range(data)
+    if error:
+        return error
+
+    try:
+        if not Portfolio.query.get(portfolio_id):
+            return (
+                jsonify({"success": False, "error": "Portfólio não encontrado"}),
+                404,
+            )
+
+        result = backfill_portfolio(
+            portfolio_id, start, end, overwrite=bool(data.get("overwrite"))
+        )
+        db.session.commit()
+        return jsonify({"success": True, **result}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao reconstruir histórico: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao reconstruir histórico"}),
+            500,
+        )
+
+
+@portfolio_bp.route("/benchmark-weights", methods=["POST"])
+def update_benchmark_weights():
+    """Grava a composição do índice de referência vigente a partir de uma data."""
+    data = request.get_json(silent=True) or {}
+    weights = data.get("weights")
+    if not isinstance(weights, dict) or not weights:
+        return (
+            jsonify({"success": False, "error": "Pesos do índice são obrigatórios"}),
+            400,
+        )
+    try:
+        as_of = datetime.strptime(data["date"], "%Y-%m-%d").date() if data.get("date") else date.today()
+        weights = {str(symbol).upper(): float(weight) for symbol, weight in weights.items()}
+    except (TypeError, ValueError):
+        return (
+            jsonify({"success": False, "error": "Data ou pesos inválidos"}),
+            400,
+        )
+
+    try:
+        benchmark = str(data.get("benchmark") or BENCHMARK).upper()
+        count = store_benchmark_weights(benchmark, as_of, weights)
+        db.session.commit()
+        return (
+            jsonify({"success": True, "benchmark": benchmark, "date": as_of.isoformat(), "symbols": count}),
+            201,
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao gravar composição do índice: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao gravar composição do índice"}),
+            500,
+        )
+
+
+@portfolio_bp.route("/<int:portfolio_id>/attribution", methods=["POST"])
+def build_portfolio_attribution(portfolio_id: int):
+    """Calcula e grava a atribuição diária de Brinson do portfólio no período."""
+    data = request.get_json(silent=True) or {}
+    start, end, error = _parse_date_range(data)
+    if error:
+        return error
+
+    try:
+        if not Portfolio.query.get(portfolio_id):
+            return (
+                jsonify({"success": False, "error": "Portfólio não encontrado"}),
+                404,
+            )
+
+        result = build_daily_attribution(portfolio_id, start, end)
+        db.session.commit()
+        return jsonify({"success": True, **result}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao calcular atribuição: {e}", exc_info=True)
+        return (
+            jsonify({"success": False, "error": "Erro ao calcular atribuição"}),
+            500,
+        )
+
+
+@portfolio_bp.route("/<int:portfolio_id>/attribution", methods=["GET"])
+def get_portfolio_attribution(portfolio_id: int):
+    """Retorna a atribuição por setor acumulada no período."""
+    start, end, error = _parse_date_range(request.args, default_days=30)
+    if error:
+        return error
+
+    try:
+        result = attribution_over_range(portfolio_id, start, end)
+        return jsonify({"success": True, **result})
+    except Exception as e:
+        logger.error(f"Erro ao buscar atribuição: {e}")
+        return (
+            jsonify({"success": False, "error": "Erro ao buscar atribuição"}),
+            500,
+        )
+
+
 @portfolio_bp.route("/<int:portfolio_id>/daily-values", methods=["GET"])
 def get_portfolio_daily_values(portfolio_id: int):
-    """Retorna a série de valores diários do portfólio."""
+    """Retorna a série de valores diários do portfólio (até ``points`` pontos)."""
+    points, method, error = parse_points(request.args)
+    if error:
+        return error
     try:
         values = (
             PortfolioDailyValue.query.filter_by(portfolio_id=portfolio_id)
@@ -742,7 +714,10 @@ def get_portfolio_daily_values(portfolio_id: int):
             for v in values
         ]
 
-        return jsonify({"success": True, "values": result})
+        return jsonify({
+            "success": True,
+            "values": downsample_records(result, points, "total_value", method=method),
+        })
     except Exception as e:
         logger.error(f"Erro ao buscar histórico: {e}")
         return (
@@ -751,6 +726,55 @@ def get_portfolio_daily_values(portfolio_id: int):
         )
 
 
+@portfolio_bp.route("/<int:portfolio_id>/intraday-cota", methods=["GET"])
+def get_portfolio_intraday_cota(portfolio_id: int):
+    """Retorna a série intradiária da cota, agrupada em até ``points`` pontos."""
+    try:
+        start_str = request.args.get("start")
+        end_str = request.args.get("end")
+        start = (
+            datetime.strptime(start_str, "%Y-%m-%d").date()
+            if start_str
+            else datetime.now(MARKET_TZ).date()
+        )
+        end = datetime.strptime(end_str, "%Y-%m-%d").date() if end_str else start
+    except ValueError:
+        return (
+            jsonify({"success": False, "error": "Datas devem estar no formato YYYY-MM-DD"}),
+            400,
+        )
+    if end < start:
+        return jsonify({"success": False, "error": "Data inicial deve ser anterior à final"}), 400
+    points, _, error = parse_points(request.args)
+    if error:
+        return error
+    # Sem ``points``, limita a um pregão de minutos
+    points = points if "points" in request.args else INTRADAY_COTA_DEFAULT_POINTS
+
+    try:
+        rows = (
+            PortfolioIntradayCota.query.filter(
+                PortfolioIntradayCota.portfolio_id == portfolio_id,
+                PortfolioIntradayCota.minute >= datetime.combine(start, datetime.min.time()),
+                PortfolioIntradayCota.minute
+                < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+            )
+            .order_by(PortfolioIntradayCota.minute)
+            .all()
+        )
+        return jsonify({
+            "success": True,
+            "minutes": len(rows),
+            "points": downsample_bars(rows, points),
+        })
+    except Exception as e:
+        logger.error(f"Erro ao buscar cota intradiária: {e}")
+        return (
+            jsonify({"success": False, "error": "Erro ao buscar cota intradiária"}),
+            500,
+        )
+
+
 @portfolio_bp.route("/<int:portfolio_id>/daily-contribution", methods=["GET"])
 def get_portfolio_daily_contribution(portfolio_id: int):
     """Retorna a contribuição diária por ativo do portfólio."""
@@ -859,31 +883,21 @@ def get_portfolio_sector_weights(portfolio_id: int):
                 404,
             )
 
-        position_pct = {h["symbol"]: h["position_pct"] for h in summary["holdings"]}
-
-        positions = (
-            PortfolioPosition.query.filter_by(portfolio_id=portfolio_id)
-            .join(
-                AssetMetrics,
-                PortfolioPosition.symbol == AssetMetrics.symbol,
-                isouter=True,
-            )
-            .all()
-        )
-
+        sectors = load_sectors(h["symbol"] for h in summary["holdings"])
         weights = {}
-        for pos in positions:
-            sector = pos.metrics.sector if pos.metrics and pos.metrics.sector else "Unknown"
-            weights[sector] = weights.get(sector, 0.0) + position_pct.get(pos.symbol, 0.0)
+        for h in summary["holdings"]:
+            sector = sectors[h["symbol"]]
+            weights[sector] = weights.get(sector, 0.0) + h["position_pct"]
+        ibov = benchmark_sector_weights(date.today())
 
         result = [
             {
                 "sector": sector,
-                "ibovWeight": 0,
-                "portfolioWeight": pct,
-                "owUw": pct,
+                "ibovWeight": ibov.get(sector, 0.0),
+                "portfolioWeight": weights.get(sector, 0.0),
+                "owUw": weights.get(sector, 0.0) - ibov.get(sector, 0.0),
             }
-            for sector, pct in weights.items()
+            for sector in sorted(set(weights) | set(ibov))
         ]
 
         return jsonify({"success": True, "weights": result})
@@ -953,7 +967,10 @@ def update_editable_metrics(portfolio_id: int):
         for metric in metrics:
             logger.info(f"  {metric.metric_key}: {metric.metric_value} (ID: {metric.id})")
 
+        portfolio_summary_cache.touch(portfolio_id)
         db.session.commit()
+        editable_metrics_cache.invalidate(portfolio_id)
+        portfolio_state_cache.invalidate(portfolio_id)
         logger.info(f"Métricas editáveis atualizadas com sucesso para o portfólio {portfolio_id}")
         
         # Verificar as métricas após o commit
@@ -980,51 +997,12 @@ def update_editable_metrics(portfolio_id: int):
 
 @portfolio_bp.route("/<int:portfolio_id>/editable-metrics", methods=["GET"])
 def get_editable_metrics(portfolio_id: int):
-    """Retorna as métricas editáveis do portfólio para a data atual ou a data mais recente disponível."""
+    """Retorna o valor mais recente de cada métrica editável do portfólio."""
     try:
-        today = date.today()
-        logger.info(f"Buscando métricas editáveis para portfolio {portfolio_id} na data {today}")
-        
-        # Primeiro tentar buscar métricas para a data atual
-        metrics = PortfolioEditableMetric.query.filter_by(
-            portfolio_id=portfolio_id, date=today
-        ).all()
-        
-        # Se não encontrar métricas para a data atual, buscar a data mais recente disponível
-        if not metrics:
-            logger.info(f"Não encontradas métricas para {today}, buscando data mais recente...")
-            latest_metric = PortfolioEditableMetric.query.filter_by(
-                portfolio_id=portfolio_id
-            ).order_by(PortfolioEditableMetric.date.desc()).first()
-            
-            if latest_metric:
-                latest_date = latest_metric.date
-                logger.info(f"Encontrada data mais recente: {latest_date}")
-                metrics = PortfolioEditableMetric.query.filter_by(
-                    portfolio_id=portfolio_id, date=latest_date
-                ).all()
-            else:
-                logger.info("Nenhuma métrica encontrada no banco de dados")
-                metrics = []
-        else:
-            logger.info(f"Encontradas {len(metrics)} métricas no banco de dados para a data {today}")
-
-        result = []
-        for m in metrics:
-            try:
-                metric_value = float(m.metric_value) if m.metric_value is not None else 0.0
-                result.append({
-                    "metric_key": m.metric_key,
-                    "metric_value": metric_value
-                })
-                logger.info(f"Métrica encontrada: {m.metric_key} = {metric_value}")
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Erro ao converter valor da métrica {m.metric_key}: {e}")
-                result.append({
-                    "metric_key": m.metric_key,
-                    "metric_value": 0.0
-                })
-
+        metrics = editable_metrics_cache.get(portfolio_id)
+        result = [
+            {"metric_key": key, "metric_value": value} for key, value in metrics.items()
+        ]
         logger.info(f"Retornando {len(result)} métricas: {result}")
         return jsonify({"success": True, "metrics": result})
     except Exception as e:
@@ -1,7 +1,8 @@
 import logging
 from flask import Blueprint, jsonify
-from backend.models import Portfolio
+from backend.models import db, Portfolio
 from backend.routes.portfolio_routes import calculate_portfolio_summary
+from backend.services.portfolio_state_cache import portfolio_state_cache
 
 logger = logging.getLogger(__name__)
 portfolio_summary_bp = Blueprint("portfolio_summary_bp", __name__)
@@ -12,8 +13,12 @@ def get_portfolio_summary_data(portfolio_id: int):
     try:
         logger.info(f"Iniciando obtenção dos dados do resumo do portfólio {portfolio_id}")
         
-        # Calcular o resumo do portfólio
-        summary = calculate_portfolio_summary(portfolio_id)
+        # Snapshot em O(1) do estado mantido pelo RTD worker, se ainda for da versão
+        # gravada no banco; sem ele, calcula do banco
+        version = db.session.query(Portfolio.data_version).filter(Portfolio.id == portfolio_id).scalar()
+        summary = (
+            portfolio_state_cache.snapshot(portfolio_id, version=version) if version is not None else None
+        ) or calculate_portfolio_summary(portfolio_id)
         
         if not summary:
             logger.info(f"Portfólio {portfolio_id} não encontrado")
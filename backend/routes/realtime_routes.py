@@ -2,6 +2,7 @@ import logging
 from flask import Blueprint, request, jsonify
 from flask_socketio import emit, join_room, leave_room
 from backend.services.metatrader5_rtd_worker import get_rtd_worker
+from backend.services.quote_board import quote_board
 
 logger = logging.getLogger(__name__)
 realtime_bp = Blueprint('realtime_bp', __name__)
@@ -20,17 +21,23 @@ def get_realtime_status_http():
 @realtime_bp.route('/quotes', methods=['GET'])
 def get_realtime_quotes_http():
     """Retorna cotações em tempo real para uma lista de tickers."""
+    tickers = [t.upper() for t in request.args.getlist("tickers") or ["VALE3", "PETR4", "ITUB4"]]
+
+    # Leitura do quadro em memória compartilhada publicado pelo RTD worker
+    quotes = quote_board.get_many(tickers)
+
     worker = get_rtd_worker()
-    if not worker or not worker.mt5_connected:
+    worker_connected = bool(worker and worker.mt5_connected)
+    if not quotes and not worker_connected and not quote_board.attach():
         return jsonify({'status': 'error', 'message': 'Worker não inicializado'}), 503
 
-    tickers = request.args.getlist("tickers") or ["VALE3", "PETR4", "ITUB4"]
-
-    quotes = {}
-    for t in tickers:
-        quote = worker.get_mt5_quote(t.upper())
-        if quote:
-            quotes[t.upper()] = quote
+    # Símbolos ainda não publicados: consulta direta se o worker roda neste processo
+    if worker_connected:
+        for t in tickers:
+            if t not in quotes:
+                quote = worker.get_mt5_quote(t)
+                if quote:
+                    quotes[t] = quote
     return jsonify({'status': 'success', 'data': quotes})
 
 # --- EVENTOS WEBSOCKET ---
@@ -45,8 +52,8 @@ def register_socketio_events(socketio):
     @socketio.on('disconnect')
     def handle_disconnect():
         logger.info(f"Cliente desconectado: {request.sid}")
-        if worker and hasattr(worker, 'active_subscriptions') and request.sid in worker.active_subscriptions:
-            del worker.active_subscriptions[request.sid]
+        if worker:
+            worker.unsubscribe_room(request.sid)
 
     @socketio.on('subscribe_quotes')
     def handle_subscribe(data):
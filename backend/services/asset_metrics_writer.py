@@ -0,0 +1,168 @@
+# backend/services/asset_metrics_writer.py
+# Persistência em lote das cotações do RTD worker em asset_metrics.
+# As cotações ficam em um buffer (só a mais recente de cada símbolo) e são
+# gravadas a cada intervalo com um único INSERT ... ON CONFLICT de várias
+# linhas; tickers desconhecidos são criados em lote antes do upsert.
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import case, func
+
+from backend.models import AssetMetrics, Ticker
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Linhas por INSERT, para ficar abaixo do limite de parâmetros do driver
+_CHUNK_ROWS = 1000
+
+
+def _positive(value) -> Optional[float]:
+    value = float(value) if value is not None else 0.0
+    return value if value > 0 else None
+
+
+def quote_row(quote: Dict) -> Dict:
+    """Linha de asset_metrics a partir de uma cotação do worker.
+
+    A variação usa o fechamento anterior da cotação; sem ele, o upsert usa o
+    fechamento anterior já gravado, e só um símbolo novo cai na abertura.
+    """
+    last_price = float(quote.get("last") or 0)
+    previous_close = _positive(quote.get("previous_close"))
+    open_price = _positive(quote.get("open_price", quote.get("open")))
+    reference = previous_close or open_price
+
+    price_change = last_price - reference if reference else 0.0
+    return {
+        "symbol": quote["symbol"],
+        "last_price": last_price,
+        "previous_close": previous_close,
+        "previous_close_correct": previous_close,
+        "price_change": price_change,
+        "price_change_percent": price_change / reference * 100 if reference else 0.0,
+        "volume": float(quote.get("volume") or 0),
+        "open_price": open_price,
+        "high_price": _positive(quote.get("high_price", quote.get("high"))) or last_price,
+        "low_price": _positive(quote.get("low_price", quote.get("low"))) or last_price,
+    }
+
+
+class AssetMetricsWriter:
+    """Buffer de cotações gravado em asset_metrics a cada ``flush_interval`` segundos."""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval or float(
+            os.getenv("ASSET_METRICS_FLUSH_SECONDS", "1")
+        )
+        self.engine = None
+        self.running = False
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def add(self, quote: Dict):
+        """Enfileira a cotação; uma mais nova do mesmo símbolo substitui a anterior."""
+        row = quote_row(quote)
+        with self._lock:
+            self._pending[row["symbol"]] = row
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self, engine=None) -> int:
+        """Grava o buffer com um upsert de várias linhas; retorna quantas."""
+        engine = engine or self.engine
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or engine is None:
+            return 0
+
+        rows = list(pending.values())
+        try:
+            with engine.begin() as conn:
+                for i in range(0, len(rows), _CHUNK_ROWS):
+                    chunk = rows[i:i + _CHUNK_ROWS]
+                    conn.execute(self._tickers_statement(engine, chunk))
+                    conn.execute(self._upsert_statement(engine, chunk))
+        except Exception as e:
+            logger.error(f"Erro ao gravar AssetMetrics em lote ({len(rows)} símbolos): {e}")
+            # Devolve as linhas ao buffer sem sobrescrever cotações mais novas
+            with self._lock:
+                self._pending = {**pending, **self._pending}
+            return 0
+
+        self.flushes += 1
+        self.rows_written += len(rows)
+        logger.debug(f"AssetMetrics: {len(rows)} símbolos gravados")
+        return len(rows)
+
+    @staticmethod
+    def _tickers_statement(engine, rows):
+        """Cria em lote os tickers ainda desconhecidos."""
+        return dialect_insert(Ticker.__table__, bind=engine).values(
+            [{"symbol": row["symbol"], "type": "STOCK"} for row in rows]
+        ).on_conflict_do_nothing(index_elements=["symbol"])
+
+    @staticmethod
+    def _upsert_statement(engine, rows):
+        table = AssetMetrics.__table__
+        stmt = dialect_insert(table, bind=engine).values(rows)
+        excluded = stmt.excluded
+        # Sem fechamento anterior na cotação, vale o que já está gravado
+        reference = func.coalesce(excluded.previous_close, table.c.previous_close_correct)
+        return stmt.on_conflict_do_update(
+            index_elements=["symbol"],
+            set_={
+                "last_price": excluded.last_price,
+                "previous_close": func.coalesce(excluded.previous_close, table.c.previous_close),
+                "previous_close_correct": reference,
+                "price_change": case(
+                    (reference > 0, excluded.last_price - reference),
+                    else_=excluded.price_change,
+                ),
+                "price_change_percent": case(
+                    (reference > 0, (excluded.last_price - reference) / reference * 100),
+                    else_=excluded.price_change_percent,
+                ),
+                "volume": excluded.volume,
+                "open_price": excluded.open_price,
+                "high_price": excluded.high_price,
+                "low_price": excluded.low_price,
+                "updated_at": func.now(),
+            },
+        )
+
+    def _run(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro no gravador de AssetMetrics: {e}")
+            time.sleep(max(0.0, self.flush_interval - (time.monotonic() - started)))
+
+    def start(self, engine):
+        if self.running:
+            return
+        self.engine = engine
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Gravador de AssetMetrics em lote ativo (intervalo {self.flush_interval}s)")
+
+    def stop(self):
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+asset_metrics_writer = AssetMetricsWriter()
@@ -0,0 +1,121 @@
+# backend/services/daily_bar_cache.py
+# Cache por pregão das barras diárias (D1) usadas pelo RTD worker.
+# O fechamento anterior e a abertura/máxima/mínima do dia são buscados no
+# terminal uma única vez por símbolo e pregão; a partir daí a máxima e a
+# mínima acompanham os ticks, sem novas chamadas a copy_rates_from_pos.
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Recebe o símbolo e devolve as últimas barras D1 (mais antiga primeiro)
+BarLoader = Callable[[str], Optional[list]]
+
+
+class DailyBar:
+    """Fechamento anterior e OHLC corrente de um símbolo em um pregão."""
+
+    __slots__ = ("trading_day", "previous_close", "open", "high", "low", "seeded")
+
+    def __init__(self, trading_day: date):
+        self.trading_day = trading_day
+        self.previous_close = 0.0
+        self.open = 0.0
+        self.high = 0.0
+        self.low = 0.0
+        self.seeded = False
+
+    def apply_price(self, price: float):
+        if price <= 0:
+            return
+        if self.open <= 0:
+            self.open = price
+        self.high = max(self.high, price)
+        self.low = price if self.low <= 0 else min(self.low, price)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "previous_close": self.previous_close,
+        }
+
+
+def _bar_date(rate) -> date:
+    # O MT5 grava o horário do servidor como se fosse UTC
+    return datetime.fromtimestamp(int(rate["time"]), timezone.utc).date()
+
+
+class DailyBarCache:
+    """Barras D1 por símbolo, semeadas uma vez por pregão e atualizadas por tick."""
+
+    # Intervalo mínimo entre tentativas de semear um símbolo sem barras
+    RESEED_INTERVAL_SECONDS = 60
+
+    def __init__(self, loader: BarLoader):
+        self.loader = loader
+        self._bars: Dict[str, DailyBar] = {}
+        self._next_seed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, symbol: str, trading_day: date) -> DailyBar:
+        """Barra do pregão ``trading_day``; consulta o terminal só na virada do dia."""
+        with self._lock:
+            bar = self._bars.get(symbol)
+            if bar is not None and bar.trading_day == trading_day and (
+                bar.seeded or time.monotonic() < self._next_seed.get(symbol, 0.0)
+            ):
+                return bar
+
+            fresh = DailyBar(trading_day)
+            if bar is not None and bar.trading_day == trading_day:
+                # Preserva a máxima e a mínima já vistas nos ticks
+                fresh.open, fresh.high, fresh.low = bar.open, bar.high, bar.low
+            self._seed(symbol, fresh)
+            self._bars[symbol] = fresh
+            return fresh
+
+    def _seed(self, symbol: str, bar: DailyBar):
+        self.loads += 1
+        try:
+            rates = self.loader(symbol)
+        except Exception as e:
+            logger.error(f"Erro ao carregar barras diárias de {symbol}: {e}")
+            rates = None
+
+        if rates is None or len(rates) == 0:
+            self._next_seed[symbol] = time.monotonic() + self.RESEED_INTERVAL_SECONDS
+            logger.debug(f"{symbol}: sem barras diárias para o pregão {bar.trading_day}")
+            return
+
+        last = rates[-1]
+        if _bar_date(last) == bar.trading_day:
+            # A barra de hoje já existe: o fechamento anterior é a barra antes dela
+            if len(rates) > 1:
+                bar.previous_close = float(rates[-2]["close"])
+            bar.open = float(last["open"])
+            bar.apply_price(float(last["high"]))
+            bar.apply_price(float(last["low"]))
+        else:
+            # Antes do primeiro negócio do dia a última barra é a do pregão anterior
+            bar.previous_close = float(last["close"])
+        bar.seeded = True
+        self._next_seed.pop(symbol, None)
+
+    def update(self, symbol: str, price: float, trading_day: date) -> DailyBar:
+        """Incorpora o preço de um tick à máxima/mínima do pregão."""
+        bar = self.get(symbol, trading_day)
+        with self._lock:
+            bar.apply_price(price)
+        return bar
+
+    def clear(self):
+        with self._lock:
+            self._bars.clear()
+            self._next_seed.clear()
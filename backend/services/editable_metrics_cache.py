@@ -0,0 +1,134 @@
+# backend/services/editable_metrics_cache.py
+# Valores mais recentes das métricas editáveis (caixa, cotas, cota D-1) por
+# carteira. Uma única consulta com ROW_NUMBER() resolve o último valor de cada
+# metric_key. O resultado fica em cache associado a portfolios.data_version:
+# quem já leu a versão (ex.: o carimbo do resumo) a informa e recebe valores
+# coerentes com o banco; sem versão, a entrada vale por um TTL curto, de modo
+# que gravações feitas em outro processo apareçam em poucos segundos.
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+
+from backend.models import db, PortfolioEditableMetric
+
+logger = logging.getLogger(__name__)
+
+
+def load_latest_editable_metrics(portfolio_ids: Iterable[int], session=None) -> Dict[int, Dict[str, float]]:
+    """Último valor de cada métrica editável das carteiras, em uma única consulta."""
+    portfolio_ids = list(portfolio_ids)
+    session = session or db.session
+    ranked = (
+        session.query(
+            PortfolioEditableMetric.portfolio_id,
+            PortfolioEditableMetric.metric_key,
+            PortfolioEditableMetric.metric_value,
+            func.row_number()
+            .over(
+                partition_by=(PortfolioEditableMetric.portfolio_id, PortfolioEditableMetric.metric_key),
+                order_by=(PortfolioEditableMetric.date.desc(), PortfolioEditableMetric.id.desc()),
+            )
+            .label("rn"),
+        )
+        .filter(PortfolioEditableMetric.portfolio_id.in_(portfolio_ids))
+        .subquery()
+    )
+    rows = (
+        session.query(ranked.c.portfolio_id, ranked.c.metric_key, ranked.c.metric_value)
+        .filter(ranked.c.rn == 1)
+        .all()
+    )
+
+    result: Dict[int, Dict[str, float]] = {pid: {} for pid in portfolio_ids}
+    for row in rows:
+        try:
+            value = float(row.metric_value) if row.metric_value is not None else 0.0
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Erro ao converter valor da métrica {row.metric_key}: {e}")
+            value = 0.0
+        result[row.portfolio_id][row.metric_key] = value
+    return result
+
+
+class EditableMetricsCache:
+    """Métricas editáveis mais recentes por carteira."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = (
+            ttl_seconds if ttl_seconds is not None
+            else float(os.getenv("EDITABLE_METRICS_CACHE_TTL_SECONDS", "5"))
+        )
+        self._lock = threading.Lock()
+        # id → (métricas, data_version informada na carga, instante da carga)
+        self._entries: Dict[int, Tuple[Dict[str, float], Optional[int], float]] = {}
+        # Incrementado a cada invalidação: uma leitura iniciada antes de uma
+        # gravação não sobrescreve o cache com valores antigos
+        self._generation = 0
+
+    def _valid(self, entry, version: Optional[int], now: float) -> bool:
+        if version is not None:
+            return entry[1] == version
+        return now - entry[2] < self.ttl_seconds
+
+    def get_many(
+        self, portfolio_ids: Iterable[int], versions: Optional[Dict[int, int]] = None
+    ) -> Dict[int, Dict[str, float]]:
+        """Métricas das carteiras; as ausentes ou desatualizadas são lidas juntas.
+
+        ``versions`` (id → portfolios.data_version) valida as entradas contra
+        o banco; sem ela vale o TTL. Os dicionários retornados são
+        compartilhados e devem ser tratados como somente leitura.
+        """
+        portfolio_ids = list(dict.fromkeys(portfolio_ids))
+        versions = versions or {}
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for pid in portfolio_ids:
+                entry = self._entries.get(pid)
+                if entry is not None and self._valid(entry, versions.get(pid), now):
+                    result[pid] = entry[0]
+            generation = self._generation
+        missing = [pid for pid in portfolio_ids if pid not in result]
+        if missing:
+            loaded = load_latest_editable_metrics(missing)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.update(
+                        (pid, (metrics, versions.get(pid), now)) for pid, metrics in loaded.items()
+                    )
+            result.update(loaded)
+        return result
+
+    def get(self, portfolio_id: int, version: Optional[int] = None) -> Dict[str, float]:
+        versions = {portfolio_id: version} if version is not None else None
+        return self.get_many([portfolio_id], versions)[portfolio_id]
+
+    def summary_inputs(self, portfolio_id: int, version: Optional[int] = None) -> Tuple[float, float, float]:
+        """Retorna (cota_d1, qtd_cotas, caixa_bruto) usados no resumo da carteira."""
+        return summary_inputs(self.get(portfolio_id, version))
+
+    def invalidate(self, portfolio_id: int):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(portfolio_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def summary_inputs(metrics: Dict[str, float]) -> Tuple[float, float, float]:
+    return (
+        metrics.get("cotaD1", 0.0),
+        metrics.get("qtdCotas", 0.0),
+        metrics.get("caixaBruto", 0.0),
+    )
+
+
+editable_metrics_cache = EditableMetricsCache()
@@ -0,0 +1,208 @@
+# backend/services/eod_snapshot.py
+# Snapshot de fechamento de todas as carteiras.
+# Todas as posições e preços são carregados em uma única consulta e valorizados
+# juntos; portfolio_daily_values e portfolio_daily_metrics recebem um upsert
+# cada. Um agendador dispara a rotina uma vez por pregão após o fechamento,
+# seguida da atualização incremental do histórico diário (daily_prices) e
+# da matriz de preços em mmap. Com vários processos (gunicorn/socketio),
+# só o que detém o advisory lock do Postgres agenda.
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from backend.models import db, Portfolio
+from backend.services.editable_metrics_cache import editable_metrics_cache, summary_inputs
+from backend.services.market_calendar import MARKET_TZ, MarketCalendar, b3_calendar
+from backend.services.portfolio_backfill import (
+    daily_metric_rows,
+    daily_value_rows,
+    upsert_daily_metrics,
+    upsert_daily_values,
+)
+from backend.services.portfolio_valuation import PortfolioBook, books_from_rows, load_position_rows
+from backend.services.price_adjustments import update_adjustments
+from backend.services.price_history import refresh_daily_prices
+from backend.services.price_matrix import price_matrix
+
+logger = logging.getLogger(__name__)
+
+_SERIES_KEYS = (
+    "total_value", "total_cost", "total_gain", "total_gain_percent",
+    "patrimonio_liquido", "valor_cota",
+)
+
+
+def snapshot_all_portfolios(as_of: Optional[date] = None) -> Dict:
+    """Grava o fechamento de todas as carteiras em ``as_of`` (padrão: hoje).
+
+    Idempotente: rodar de novo no mesmo dia sobrescreve os valores. Não faz
+    commit; retorna o relatório com os tempos de cada etapa.
+    """
+    started = time.perf_counter()
+    as_of = as_of or datetime.now(MARKET_TZ).date()
+
+    portfolios = db.session.query(Portfolio.id, Portfolio.data_version).all()
+    ids = [p.id for p in portfolios]
+    books = books_from_rows(load_position_rows(ids))
+    editable = editable_metrics_cache.get_many(ids, versions={p.id: p.data_version for p in portfolios})
+    loaded = time.perf_counter()
+
+    value_rows, metric_rows = [], []
+    for pid in ids:
+        cota_d1, qtd_cotas, caixa_bruto = summary_inputs(editable[pid])
+        book = books.get(pid) or PortfolioBook.from_rows([])
+        summary = book.value(caixa_bruto=caixa_bruto, qtd_cotas=qtd_cotas, cota_d1=cota_d1)
+        series = {key: [summary[key]] for key in _SERIES_KEYS}
+        value_rows.extend(daily_value_rows(pid, [as_of], series))
+        metric_rows.extend(daily_metric_rows(pid, [as_of], series))
+    valued = time.perf_counter()
+
+    upsert_daily_values(value_rows, overwrite=True)
+    upsert_daily_metrics(metric_rows, overwrite=True)
+    written = time.perf_counter()
+
+    report = {
+        "date": as_of.isoformat(),
+        "portfolios": len(ids),
+        "positions": sum(len(b) for b in books.values()),
+        "load_ms": round((loaded - started) * 1000, 1),
+        "value_ms": round((valued - loaded) * 1000, 1),
+        "write_ms": round((written - valued) * 1000, 1),
+        "total_ms": round((written - started) * 1000, 1),
+    }
+    logger.info(f"Snapshot de fechamento: {report}")
+    return report
+
+
+class EodSnapshotScheduler:
+    """Dispara ``snapshot_all_portfolios`` uma vez por pregão após o fechamento."""
+
+    CHECK_INTERVAL_SECONDS = 30
+    RETRY_DELAY_SECONDS = 300
+    # Chave do pg_try_advisory_lock que elege o processo agendador ("EOD")
+    LOCK_KEY = 0x454F44
+
+    def __init__(self, calendar: Optional[MarketCalendar] = None):
+        self.calendar = calendar or b3_calendar
+        # Minutos após o fim do call de fechamento (17:00 ou 18:00, conforme a época)
+        self.delay = timedelta(minutes=int(os.getenv("EOD_SNAPSHOT_DELAY_MINUTES", "30")))
+        self.app = None
+        self.running = False
+        self.last_run_date: Optional[date] = None
+        self.last_report: Optional[Dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._retry_at = 0.0
+        self._leader = False
+        self._lock_conn = None
+
+    def due(self, now: datetime) -> bool:
+        today = now.date()
+        return (
+            self.calendar.is_trading_day(today)
+            and now >= self.calendar.close_at(today) + self.delay
+            and self.last_run_date != today
+        )
+
+    def is_leader(self) -> bool:
+        """Só um processo agenda: o que obtém o advisory lock e mantém a conexão.
+
+        Fora do Postgres (SQLite em desenvolvimento) o processo é único.
+        """
+        if self._leader and self._lock_conn is not None:
+            try:
+                self._lock_conn.execute(text("SELECT 1"))
+            except Exception:
+                # Conexão perdida libera o lock no servidor: disputar de novo
+                logger.warning("Conexão do lock do snapshot de fechamento perdida")
+                self._release()
+        if self._leader:
+            return True
+
+        with self.app.app_context():
+            engine = db.engine
+        if engine.dialect.name != "postgresql":
+            self._leader = True
+            return True
+        conn = engine.connect()
+        try:
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.LOCK_KEY}
+            ).scalar()
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return False
+        self._lock_conn = conn
+        self._leader = True
+        logger.info("Este processo agenda o snapshot de fechamento")
+        return True
+
+    def _release(self):
+        if self._lock_conn is not None:
+            try:
+                self._lock_conn.close()
+            except Exception:
+                pass
+        self._lock_conn = None
+        self._leader = False
+
+    def run(self, as_of: Optional[date] = None) -> Dict:
+        """Executa o snapshot no contexto da aplicação e registra o relatório."""
+        with self.app.app_context():
+            try:
+                report = snapshot_all_portfolios(as_of)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        self.last_run_date = date.fromisoformat(report["date"])
+        self.last_report = report
+        return report
+
+    def refresh_history(self):
+        """Completa daily_prices, os ajustes por eventos e a matriz de preços; falhas não afetam o snapshot."""
+        with self.app.app_context():
+            try:
+                refresh_daily_prices()
+                update_adjustments()
+                db.session.commit()
+                price_matrix.build()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao atualizar histórico diário: {e}", exc_info=True)
+
+    def _run(self):
+        while self.running:
+            try:
+                now = datetime.now(MARKET_TZ).replace(tzinfo=None)
+                if self.due(now) and time.monotonic() >= self._retry_at and self.is_leader():
+                    self.run()
+                    self.refresh_history()
+            except Exception as e:
+                logger.error(f"Erro no snapshot de fechamento: {e}", exc_info=True)
+                self._retry_at = time.monotonic() + self.RETRY_DELAY_SECONDS
+            time.sleep(self.CHECK_INTERVAL_SECONDS)
+
+    def start(self, app):
+        if self.running:
+            return
+        self.app = app
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Agendador de snapshot de fechamento ativo (fechamento + {self.delay})")
+
+    def stop(self):
+        self.running = False
+        self._release()
+
+
+eod_snapshot_scheduler = EodSnapshotScheduler()
@@ -0,0 +1,309 @@
+# backend/services/intraday_bars.py
+# Candles intradiários (1m/5m/15m/60m) montados a partir dos negócios vistos
+# pelo RTD worker. Cada símbolo e intervalo tem um buffer circular de tamanho
+# fixo com as barras do pregão corrente; a barra fechada entra na fila de
+# gravação e é persistida em intraday_bars com um único upsert. A rota de
+# histórico lê as barras direto da memória.
+#
+# O volume e a contagem ``ticks`` de cada barra vêm dos negócios do terminal
+# (copy_ticks_from com COPY_TICKS_TRADE), e não das consultas do worker: cada
+# negócio entra uma única vez, inclusive os ocorridos entre duas consultas.
+# ``ticks`` é, portanto, o número de negócios agregados na barra.
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.models import IntradayBar
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = {"1m": 60, "5m": 300, "15m": 900, "60m": 3600}
+
+
+def _bar_time(seconds: int) -> datetime:
+    # O MT5 grava o horário do servidor como se fosse UTC
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+class BarRing:
+    """Buffer circular de barras OHLCV de um símbolo em um intervalo."""
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = seconds
+        self.capacity = capacity
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.ohlc = np.zeros((capacity, 4), dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.ticks = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self.head = -1  # slot da barra mais recente (em formação)
+        self.queued: Optional[int] = None  # início da barra já enviada para gravação
+
+    def current_start(self) -> Optional[int]:
+        return int(self.start[self.head]) if self.count else None
+
+    def add(self, seconds: int, price: float, volume: float, trades: int = 1) -> Optional[int]:
+        """Aplica o tick; retorna o slot da barra que fechou, se houver.
+
+        ``trades`` é quantos negócios o tick representa (0 para uma cotação
+        que só atualiza o preço).
+        """
+        bucket = seconds - seconds % self.seconds
+        current = self.current_start()
+        if current is not None and bucket < current:
+            return None  # tick atrasado de uma barra já fechada
+        if current == bucket:
+            o, h, l, c = self.ohlc[self.head]
+            self.ohlc[self.head] = (o, max(h, price), min(l, price), price)
+            self.volume[self.head] += volume
+            self.ticks[self.head] += trades
+            if self.queued == bucket:
+                self.queued = None  # barra já gravada mudou: gravar de novo
+            return None
+
+        closed = self.head if self.count and self.queued != current else None
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.start[self.head] = bucket
+        self.ohlc[self.head] = (price, price, price, price)
+        self.volume[self.head] = volume
+        self.ticks[self.head] = trades
+        return closed
+
+    def row(self, slot: int) -> Dict:
+        o, h, l, c = self.ohlc[slot]
+        return {
+            "bar_time": _bar_time(int(self.start[slot])),
+            "open": float(o),
+            "high": float(h),
+            "low": float(l),
+            "close": float(c),
+            "volume": float(self.volume[slot]),
+            "ticks": int(self.ticks[slot]),
+        }
+
+    def rows(self, limit: Optional[int] = None) -> List[Dict]:
+        """Barras da mais antiga para a mais recente (inclui a em formação)."""
+        n = self.count if not limit else min(limit, self.count)
+        slots = [(self.head - i) % self.capacity for i in range(n - 1, -1, -1)]
+        return [self.row(slot) for slot in slots]
+
+
+class IntradayBarAggregator:
+    """Barras de todos os símbolos e intervalos do pregão corrente."""
+
+    def __init__(self, capacity: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.capacity = capacity or int(os.getenv("INTRADAY_BAR_CAPACITY", "720"))
+        self.flush_interval = flush_interval or float(os.getenv("INTRADAY_BAR_FLUSH_SECONDS", "1"))
+        self.engine = None
+        self.running = False
+        self._rings: Dict[Tuple[str, str], BarRing] = {}
+        self._days: Dict[str, date] = {}
+        # Último negócio incorporado por símbolo: (time_msc, negócios nesse ms)
+        self._cursors: Dict[str, Tuple[int, int]] = {}
+        self._closed: List[Dict] = []
+        # Relógio do servidor MT5: horário do tick mais recente visto
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.late_ticks = 0
+        self.bars_written = 0
+
+    def trade_cursor(self, symbol: str) -> Optional[int]:
+        """time_msc do último negócio já incorporado (None antes do primeiro)."""
+        with self._lock:
+            cursor = self._cursors.get(symbol)
+        return cursor[0] if cursor else None
+
+    def add_trades(self, symbol: str, trades) -> int:
+        """Incorpora ticks de negócio do terminal; retorna quantos eram novos.
+
+        ``trades`` vem de ``copy_ticks_from(..., COPY_TICKS_TRADE)`` a partir
+        de ``trade_cursor``; negócios já vistos (mesmo time_msc) são ignorados.
+        """
+        with self._lock:
+            last_msc, seen = self._cursors.get(symbol, (-1, 0))
+        added = 0
+        at_last = 0  # negócios em last_msc já percorridos neste lote
+        for trade in trades:
+            msc = int(trade["time_msc"])
+            if msc < last_msc:
+                continue
+            if msc == last_msc:
+                at_last += 1
+                if at_last <= seen:
+                    continue
+                seen = at_last
+            else:
+                last_msc, seen, at_last = msc, 1, 1
+            price = float(trade["last"])
+            if price > 0:
+                self.add_tick(symbol, msc // 1000, price, float(trade["volume"]))
+                added += 1
+        if last_msc >= 0:
+            with self._lock:
+                self._cursors[symbol] = (last_msc, seen)
+        return added
+
+    def add_quote(self, quote: Dict):
+        """Alimenta as barras com uma cotação do worker.
+
+        Usado quando o terminal não entrega os negócios: a cotação conta como
+        um negócio só se o seu time_msc for novo; repetida, atualiza apenas o
+        preço. Negócios entre duas consultas não aparecem no volume.
+        """
+        price = float(quote.get("last") or 0) or float(quote.get("bid") or 0)
+        if price <= 0:
+            return
+        if quote.get("time_msc"):
+            msc = int(quote["time_msc"])
+        elif quote.get("time"):
+            msc = int(datetime.fromisoformat(quote["time"]).timestamp()) * 1000
+        else:
+            return
+        symbol = quote["symbol"]
+        with self._lock:
+            cursor = self._cursors.get(symbol)
+            new_trade = cursor is None or msc > cursor[0]
+            if new_trade:
+                self._cursors[symbol] = (msc, 1)
+        if new_trade:
+            self.add_tick(symbol, msc // 1000, price, float(quote.get("volume") or 0))
+        else:
+            self.add_tick(symbol, msc // 1000, price, 0.0, trades=0)
+
+    def add_tick(self, symbol: str, seconds: int, price: float, volume: float = 0.0, trades: int = 1):
+        day = _bar_time(seconds).date()
+        with self._lock:
+            self._clock = max(self._clock, seconds)
+            if self._days.get(symbol) != day:
+                # Novo pregão: fecha o anterior e recomeça os buffers
+                self._close_symbol(symbol)
+                self._days[symbol] = day
+            late = False
+            for tf, tf_seconds in TIMEFRAMES.items():
+                ring = self._rings.get((symbol, tf))
+                if ring is None:
+                    ring = self._rings[(symbol, tf)] = BarRing(tf_seconds, self.capacity)
+                before = ring.current_start()
+                closed = ring.add(seconds, price, volume, trades)
+                if closed is not None:
+                    self._closed.append(self._row(symbol, tf, ring, closed))
+                elif before is not None and seconds < before:
+                    late = True
+            # Tick atrasado: descartado nos intervalos cuja barra já fechou
+            self.late_ticks += late
+
+    def close_due(self, now_seconds: Optional[int] = None) -> int:
+        """Fecha barras cujo intervalo terminou sem novos ticks; retorna quantas.
+
+        Por padrão o relógio é o do tick mais recente de qualquer símbolo, no
+        mesmo fuso do servidor MT5, para que símbolos pouco negociados também
+        tenham a barra gravada no fechamento do intervalo.
+        """
+        closed = 0
+        with self._lock:
+            now_seconds = self._clock if now_seconds is None else now_seconds
+            for (symbol, tf), ring in self._rings.items():
+                start = ring.current_start()
+                if start is None or ring.queued == start or start + ring.seconds > now_seconds:
+                    continue
+                self._closed.append(self._row(symbol, tf, ring, ring.head))
+                ring.queued = start
+                closed += 1
+        return closed
+
+    def bars(self, symbol: str, timeframe: str, limit: Optional[int] = None) -> List[Dict]:
+        """Barras do pregão corrente em memória."""
+        with self._lock:
+            ring = self._rings.get((symbol, timeframe))
+            if ring is None:
+                return []
+            rows = ring.rows(limit)
+        for row in rows:
+            row["time"] = row.pop("bar_time").isoformat()
+        return rows
+
+    def flush(self, engine=None) -> int:
+        """Grava as barras fechadas com um único upsert; retorna quantas."""
+        engine = engine or self.engine
+        with self._lock:
+            rows, self._closed = self._closed, []
+        if not rows or engine is None:
+            return 0
+
+        # Uma barra pode ter sido fechada mais de uma vez; vale a última
+        latest = {(r["symbol"], r["timeframe"], r["bar_time"]): r for r in rows}
+        table = IntradayBar.__table__
+        stmt = dialect_insert(table, bind=engine).values(list(latest.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["symbol", "timeframe", "bar_time"],
+            set_={col: stmt.excluded[col] for col in ("open", "high", "low", "close", "volume", "ticks")},
+        )
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt)
+        except Exception as e:
+            logger.error(f"Erro ao gravar barras intradiárias: {e}")
+            with self._lock:
+                self._closed = rows + self._closed
+            return 0
+        self.bars_written += len(latest)
+        return len(latest)
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._days.clear()
+            self._cursors.clear()
+            self._closed = []
+            self._clock = 0
+
+    def _close_symbol(self, symbol: str):
+        for tf in TIMEFRAMES:
+            ring = self._rings.pop((symbol, tf), None)
+            if ring is not None and ring.count and ring.queued != ring.current_start():
+                self._closed.append(self._row(symbol, tf, ring, ring.head))
+
+    @staticmethod
+    def _row(symbol: str, timeframe: str, ring: BarRing, slot: int) -> Dict:
+        return {"symbol": symbol, "timeframe": timeframe, **ring.row(slot)}
+
+    def _run(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.close_due()
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro no agregador de barras intradiárias: {e}")
+            time.sleep(max(0.0, self.flush_interval - (time.monotonic() - started)))
+
+    def start(self, engine):
+        if self.running:
+            return
+        self.engine = engine
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Agregador de barras intradiárias ativo ({', '.join(TIMEFRAMES)})")
+
+    def stop(self):
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        with self._lock:
+            for symbol in list(self._days):
+                self._close_symbol(symbol)
+            self._days.clear()
+        self.flush()
+
+
+intraday_bars = IntradayBarAggregator()
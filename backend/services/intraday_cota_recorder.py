@@ -0,0 +1,265 @@
+# backend/services/intraday_cota_recorder.py
+# Gravador da cota intradiária das carteiras.
+# Amostra periodicamente os resumos já mantidos pelo cache de estado (sem
+# recalcular nada), consolida as amostras em barras de um minuto por carteira
+# e grava os minutos fechados em portfolio_intraday_cotas com um único upsert.
+# Todas as carteiras são carregadas no cache ao iniciar, após cada
+# invalidação e periodicamente (carteiras novas), para que nenhuma fique sem
+# cota só por não ter sido aberta desde o início do worker.
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.models import Portfolio, PortfolioIntradayCota
+from backend.services.editable_metrics_cache import load_latest_editable_metrics, summary_inputs
+from backend.services.market_calendar import MARKET_TZ, MarketCalendar, b3_calendar
+from backend.services.portfolio_state_cache import PortfolioState, portfolio_state_cache
+from backend.services.portfolio_valuation import PortfolioBook, books_from_rows, load_position_rows
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+class _MinuteBar:
+    """Amostras da cota de uma carteira dentro de um minuto."""
+
+    __slots__ = ("minute", "open", "high", "low", "close", "variacao", "patrimonio", "samples")
+
+    def __init__(self, minute: datetime, cota: float, variacao: float, patrimonio: float):
+        self.minute = minute
+        self.open = self.high = self.low = self.close = cota
+        self.variacao = variacao
+        self.patrimonio = patrimonio
+        self.samples = 1
+
+    def add(self, cota: float, variacao: float, patrimonio: float):
+        self.high = max(self.high, cota)
+        self.low = min(self.low, cota)
+        self.close = cota
+        self.variacao = variacao
+        self.patrimonio = patrimonio
+        self.samples += 1
+
+    def row(self, portfolio_id: int) -> Dict:
+        return {
+            "portfolio_id": portfolio_id,
+            "minute": self.minute,
+            "cota_open": self.open,
+            "cota_high": self.high,
+            "cota_low": self.low,
+            "cota_close": self.close,
+            "variacao_cota_pct": self.variacao,
+            "patrimonio_liquido": round(self.patrimonio, 2),
+            "samples": self.samples,
+        }
+
+
+class IntradayCotaRecorder:
+    """Amostra a cota das carteiras em cache durante o pregão."""
+
+    def __init__(self, interval_seconds: Optional[float] = None, calendar: Optional[MarketCalendar] = None):
+        self.interval_seconds = interval_seconds or float(
+            os.getenv("INTRADAY_COTA_INTERVAL_SECONDS", "15")
+        )
+        self.calendar = calendar or b3_calendar
+        self.reload_seconds = float(os.getenv("INTRADAY_COTA_RELOAD_SECONDS", "60"))
+        self.engine = None
+        self._loaded_generation: Optional[int] = None
+        self._loaded_at = float("-inf")
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._bars: Dict[int, _MinuteBar] = {}
+        self._closed: List[Dict] = []
+
+    def in_market_hours(self, now: datetime) -> bool:
+        return self.calendar.is_open(now)
+
+    def load_states(self, engine=None) -> int:
+        """Carrega no cache de estado as carteiras ausentes ou desatualizadas; retorna quantas.
+
+        Uma carteira em cache é recarregada quando o seu data_version no banco
+        mudou (gravação feita por outro processo). Posições, preços e métricas
+        editáveis vêm em uma consulta cada, pelo ``engine`` do worker (fora de
+        um contexto de aplicação).
+        """
+        engine = engine or self.engine
+        if engine is None or not portfolio_state_cache.live:
+            return 0
+        generation = portfolio_state_cache.generation
+        cached = portfolio_state_cache.versions()
+        with Session(engine) as session:
+            portfolios = [
+                p
+                for p in session.query(Portfolio.id, Portfolio.name, Portfolio.data_version).all()
+                if p.id not in cached or cached[p.id] != p.data_version
+            ]
+            ids = [p.id for p in portfolios]
+            books = books_from_rows(load_position_rows(ids, session)) if ids else {}
+            editable = load_latest_editable_metrics(ids, session) if ids else {}
+        for portfolio in portfolios:
+            cota_d1, qtd_cotas, caixa_bruto = summary_inputs(editable[portfolio.id])
+            portfolio_state_cache.store(
+                PortfolioState(
+                    portfolio.id,
+                    portfolio.name,
+                    books.get(portfolio.id) or PortfolioBook.from_rows([]),
+                    caixa_bruto=caixa_bruto,
+                    qtd_cotas=qtd_cotas,
+                    cota_d1=cota_d1,
+                    data_version=portfolio.data_version,
+                )
+            )
+        self._loaded_generation = generation
+        self._loaded_at = time.monotonic()
+        return len(portfolios)
+
+    def _ensure_states(self):
+        """Recarrega as carteiras após uma invalidação ou a cada ``reload_seconds``."""
+        if self.engine is None:
+            return
+        stale = time.monotonic() - self._loaded_at >= self.reload_seconds
+        if stale or portfolio_state_cache.generation != self._loaded_generation:
+            try:
+                self.load_states()
+            except Exception as e:
+                logger.error(f"Erro ao carregar carteiras no cache de estado: {e}")
+                self._loaded_at = time.monotonic()
+
+    def sample(self, now: Optional[datetime] = None) -> int:
+        """Registra uma amostra de cada carteira em cache; retorna quantas.
+
+        Usa ``portfolio_state_cache.snapshots()``, que devolve os totais já
+        mantidos pelos ticks; carteiras ausentes do cache são carregadas antes.
+        """
+        now = now or datetime.now(MARKET_TZ).replace(tzinfo=None)
+        if not self.in_market_hours(now):
+            self.close_bars()
+            return 0
+
+        self._ensure_states()
+        minute = now.replace(second=0, microsecond=0)
+        snapshots = portfolio_state_cache.snapshots()
+        with self._lock:
+            for snap in snapshots:
+                if not snap["valor_cota"]:
+                    continue
+                values = (snap["valor_cota"], snap["variacao_cota_pct"], snap["patrimonio_liquido"])
+                bar = self._bars.get(snap["id"])
+                if bar is not None and bar.minute == minute:
+                    bar.add(*values)
+                    continue
+                if bar is not None:
+                    self._closed.append(bar.row(snap["id"]))
+                self._bars[snap["id"]] = _MinuteBar(minute, *values)
+        return len(snapshots)
+
+    def close_bars(self):
+        """Fecha os minutos em aberto (fim do pregão ou parada do gravador)."""
+        with self._lock:
+            for portfolio_id, bar in self._bars.items():
+                self._closed.append(bar.row(portfolio_id))
+            self._bars.clear()
+
+    def flush(self, engine=None) -> int:
+        """Grava os minutos fechados com um único upsert; retorna quantos."""
+        engine = engine or self.engine
+        with self._lock:
+            rows, self._closed = self._closed, []
+        if not rows or engine is None:
+            return 0
+
+        table = PortfolioIntradayCota.__table__
+        stmt = dialect_insert(table, bind=engine).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["portfolio_id", "minute"],
+            set_={
+                col: stmt.excluded[col]
+                for col in (
+                    "cota_open", "cota_high", "cota_low", "cota_close",
+                    "variacao_cota_pct", "patrimonio_liquido", "samples",
+                )
+            },
+        )
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt)
+        except Exception as e:
+            logger.error(f"Erro ao gravar cota intradiária: {e}")
+            # Devolve as linhas para a próxima tentativa
+            with self._lock:
+                self._closed = rows + self._closed
+            return 0
+        return len(rows)
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while self.running:
+            try:
+                self.sample()
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro no gravador de cota intradiária: {e}")
+            # Dorme até o próximo prazo; se atrasou, recomeça a contagem
+            next_sample = max(next_sample + self.interval_seconds, time.monotonic())
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+
+    def start(self, engine):
+        if self.running:
+            return
+        self.engine = engine
+        self.running = True
+        try:
+            loaded = self.load_states()
+            logger.info(f"{loaded} carteiras carregadas no cache de estado")
+        except Exception as e:
+            logger.error(f"Erro ao carregar carteiras no cache de estado: {e}")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Gravador de cota intradiária ativo (intervalo {self.interval_seconds}s)")
+
+    def stop(self):
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.close_bars()
+        self.flush()
+
+
+def downsample_bars(rows: List[PortfolioIntradayCota], points: int) -> List[Dict]:
+    """Agrupa barras consecutivas até no máximo ``points`` pontos.
+
+    Cada grupo preserva abertura, máxima, mínima e fechamento da cota; a
+    variação e o patrimônio são os do último minuto do grupo.
+    """
+    if not rows:
+        return []
+    n = len(rows)
+    size = max(1, -(-n // points)) if points else 1
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+
+    high = np.maximum.reduceat(np.array([float(r.cota_high) for r in rows]), starts)
+    low = np.minimum.reduceat(np.array([float(r.cota_low) for r in rows]), starts)
+    return [
+        {
+            "time": rows[s].minute.isoformat(),
+            "open": float(rows[s].cota_open),
+            "high": float(high[i]),
+            "low": float(low[i]),
+            "close": float(rows[e].cota_close),
+            "valor_cota": float(rows[e].cota_close),
+            "variacao_cota_pct": float(rows[e].variacao_cota_pct),
+            "patrimonio_liquido": float(rows[e].patrimonio_liquido),
+        }
+        for i, (s, e) in enumerate(zip(starts, ends))
+    ]
+
+
+intraday_cota_recorder = IntradayCotaRecorder()
@@ -0,0 +1,128 @@
+# backend/services/market_calendar.py
+# Calendário e horário do pregão à vista da B3.
+# O fechamento (fim do call de fechamento) acompanha o horário de verão dos
+# EUA: 17:00 enquanto ele vigora e 18:00 no restante do ano (horário de
+# Brasília). Feriados nacionais e os dias sem pregão da B3 (24 e 31/12) são
+# calculados por ano; datas extras entram por B3_HOLIDAYS. Todos os módulos
+# que dependem do horário do pregão usam a instância ``b3_calendar``.
+
+import os
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/Sao_Paulo")
+_US_TZ = ZoneInfo("America/New_York")
+
+
+def parse_hhmm(value: str) -> dtime:
+    hours, minutes = value.split(":")
+    return dtime(int(hours), int(minutes))
+
+
+def easter(year: int) -> date:
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def b3_holidays(year: int) -> frozenset:
+    """Dias úteis sem pregão na B3: feriados nacionais, Carnaval e 24/31 de dezembro."""
+    sunday = easter(year)
+    days = {
+        date(year, 1, 1),
+        sunday - timedelta(days=48),  # Carnaval (segunda)
+        sunday - timedelta(days=47),  # Carnaval (terça)
+        sunday - timedelta(days=2),   # Sexta-feira Santa
+        date(year, 4, 21),
+        date(year, 5, 1),
+        sunday + timedelta(days=60),  # Corpus Christi
+        date(year, 9, 7),
+        date(year, 10, 12),
+        date(year, 11, 2),
+        date(year, 11, 15),
+        date(year, 12, 24),
+        date(year, 12, 25),
+        date(year, 12, 31),
+    }
+    if year >= 2024:
+        days.add(date(year, 11, 20))  # Consciência Negra, feriado nacional desde 2024
+    return frozenset(days)
+
+
+class MarketCalendar:
+    """Dias de pregão e horário de abertura/fechamento do mercado à vista."""
+
+    def __init__(
+        self,
+        market_open: Optional[dtime] = None,
+        close_us_dst: Optional[dtime] = None,
+        close_us_standard: Optional[dtime] = None,
+        extra_holidays: Optional[Iterable[date]] = None,
+    ):
+        self.market_open = market_open or parse_hhmm(os.getenv("MARKET_OPEN", "10:00"))
+        fixed = os.getenv("MARKET_CLOSE")
+        # MARKET_CLOSE fixa o fechamento o ano todo; sem ela vale a regra sazonal
+        self.close_us_dst = close_us_dst or parse_hhmm(fixed or os.getenv("MARKET_CLOSE_US_DST", "17:00"))
+        self.close_us_standard = close_us_standard or parse_hhmm(
+            fixed or os.getenv("MARKET_CLOSE_US_STANDARD", "18:00")
+        )
+        if extra_holidays is None:
+            extra_holidays = [
+                date.fromisoformat(value.strip())
+                for value in os.getenv("B3_HOLIDAYS", "").split(",")
+                if value.strip()
+            ]
+        self.extra_holidays: Set[date] = set(extra_holidays)
+
+    @staticmethod
+    def now() -> datetime:
+        """Horário de Brasília sem tz, como usado nas comparações de pregão."""
+        return datetime.now(MARKET_TZ).replace(tzinfo=None)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in b3_holidays(day.year) and day not in self.extra_holidays
+
+    def session(self, day: date) -> Tuple[dtime, dtime]:
+        """Abertura e fim do call de fechamento em ``day``."""
+        noon = datetime(day.year, day.month, day.day, 12, tzinfo=_US_TZ)
+        close = self.close_us_dst if noon.dst() else self.close_us_standard
+        return self.market_open, close
+
+    def close_at(self, day: date) -> datetime:
+        return datetime.combine(day, self.session(day)[1])
+
+    def is_open(self, now: datetime) -> bool:
+        """Pregão aberto em ``now`` (horário de Brasília, sem tz)."""
+        if not self.is_trading_day(now.date()):
+            return False
+        market_open, close = self.session(now.date())
+        return market_open <= now.time() < close
+
+    def previous_trading_day(self, day: date) -> date:
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def last_complete_session(self, now: Optional[datetime] = None) -> date:
+        """Último pregão encerrado: hoje após o fechamento, senão o pregão anterior."""
+        now = now or self.now()
+        today = now.date()
+        if self.is_trading_day(today) and now >= self.close_at(today):
+            return today
+        return self.previous_trading_day(today)
+
+
+b3_calendar = MarketCalendar()
@@ -7,12 +7,24 @@ import sys
 import time
 import threading
 import logging
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set
 from datetime import datetime, timedelta
 import pandas as pd
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+from backend.services.asset_metrics_writer import asset_metrics_writer
+from backend.services.daily_bar_cache import DailyBarCache
+from backend.services.intraday_bars import intraday_bars
+from backend.services.intraday_cota_recorder import intraday_cota_recorder
+from backend.services.market_calendar import MARKET_TZ
+from backend.services.poll_scheduler import PollScheduler
+from backend.services.quote_board import quote_board
+from backend.services.portfolio_state_cache import portfolio_state_cache
+from backend.services.quote_conflation import QuoteChangeDetector, QuoteConflator
+from backend.services.quote_subscriptions import QuoteSubscriptions
+from backend.services.tick_journal import tick_journal
+
 if sys.stdout.encoding.lower() != "utf-8":
     sys.stdout.reconfigure(encoding="utf-8")
     sys.stderr.reconfigure(encoding="utf-8")
@@ -22,13 +34,20 @@ handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s -
 logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
 logger = logging.getLogger(__name__)
 
-try:
-    import MetaTrader5 as mt5
+if os.getenv("MT5_SIMULATOR"):
+    # Terminal simulado (Linux/CI/testes de carga); ver mt5_simulator.py
+    from backend.services.mt5_simulator import simulator_from_env
+    mt5 = simulator_from_env()
     MT5_AVAILABLE = True
-    logger.info("MetaTrader5 disponível")
-except ImportError:
-    MT5_AVAILABLE = False
-    logger.warning("MetaTrader5 não disponível - conexão MT5 inativa")
+    logger.warning("MetaTrader5 SIMULADO ativo (MT5_SIMULATOR)")
+else:
+    try:
+        import MetaTrader5 as mt5
+        MT5_AVAILABLE = True
+        logger.info("MetaTrader5 disponível")
+    except ImportError:
+        MT5_AVAILABLE = False
+        logger.warning("MetaTrader5 não disponível - conexão MT5 inativa")
 
 class MetaTrader5RTDWorker:
     """
@@ -40,7 +59,13 @@ class MetaTrader5RTDWorker:
         self.socketio = socketio
         self.running = False
         self.mt5_connected = False
-        self.active_subscriptions: Dict[str, Set[str]] = {}
+        # Subscrições sala → símbolos, com índice reverso símbolo → salas
+        self.subscriptions = QuoteSubscriptions()
+        self.active_subscriptions: Dict[str, Set[str]] = self.subscriptions.rooms
+        # Ticks sem mudança não são enviados nem gravados; clientes lentos
+        # recebem só a cotação mais recente de cada símbolo
+        self.change_detector = QuoteChangeDetector()
+        self.conflator = QuoteConflator()
         self.ticker_prices: Dict[str, Dict] = {}
         self.db_engine = None
         self.worker_thread = None
@@ -48,6 +73,15 @@ class MetaTrader5RTDWorker:
         self.realtime_symbols: Set[str] = set()  # Símbolos com ticks em tempo real
         self.failed_symbols: Set[str] = set()    # Símbolos que falharam na ativação
         self.activation_failures: Dict[str, int] = {}
+        # Barras D1 por pregão: evita copy_rates_from_pos a cada iteração
+        self.daily_bars = DailyBarCache(self._load_daily_bars)
+        # Frequência de consulta por prioridade: inscritos > carteira > fundo
+        self.scheduler = PollScheduler()
+        self._portfolio_symbols: List[str] = []
+        self._portfolio_symbols_at = float("-inf")
+        # Última cotação de cada símbolo com negócio novo ainda não lido do terminal
+        self._pending_trades: Dict[str, Dict] = {}
+        self._trades_read_at = time.monotonic()
 
         # Símbolos principais a serem ativados ao iniciar
         self.main_symbols: List[str] = [
@@ -74,8 +108,13 @@ class MetaTrader5RTDWorker:
             logger.warning("MT5_SERVER ausente; usando valor padrão")
         
         # Configurações de timing
-        self.PAUSE_INTERVAL_SECONDS = 1  # Atualizar a cada 1 segundo para tempo real
         self.RETRY_DELAY_SECONDS = 30
+        self.PORTFOLIO_SYMBOLS_REFRESH_SECONDS = 30
+        # Máximo de negócios lidos por símbolo e leitura para as barras intradiárias
+        self.TRADE_TICKS_LIMIT = int(os.getenv("INTRADAY_TRADE_TICKS_LIMIT", "5000"))
+        # Intervalo entre leituras dos negócios: fora delas o ciclo faz só um
+        # symbol_info_tick por símbolo
+        self.TRADE_READ_SECONDS = float(os.getenv("INTRADAY_TRADE_READ_SECONDS", "5"))
 
         # Inicializar conexão com banco
         self._initialize_database()
@@ -226,35 +265,14 @@ class MetaTrader5RTDWorker:
                 logger.warning(f"⚠️ Ticker '{ticker}' não encontrado")
                 return None
 
-            # --- NOVO: LÓGICA PARA BUSCAR DADOS DIÁRIOS (OHLC) ---
-            daily_data = {
-                'open': 0.0,
-                'high': 0.0,
-                'low': 0.0,
-                'previous_close': 0.0
-            }
-            rates_d1 = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 0, 2)
-            if rates_d1 is not None and len(rates_d1) == 2:
-                # rates_d1[0] é o candle de ontem (D-1)
-                # rates_d1[1] é o candle de hoje (D)
-                daily_data['previous_close'] = rates_d1[0]['close']
-                daily_data['open'] = rates_d1[1]['open']
-                daily_data['high'] = rates_d1[1]['high']
-                daily_data['low'] = rates_d1[1]['low']
-            elif rates_d1 is not None and len(rates_d1) == 1:
-                 # Se só temos o candle de hoje, não temos o fechamento anterior por este método
-                 daily_data['open'] = rates_d1[0]['open']
-                 daily_data['high'] = rates_d1[0]['high']
-                 daily_data['low'] = rates_d1[0]['low']
-
-            # --- LÓGICA EXISTENTE PARA BUSCAR O TICK EM TEMPO REAL ---
-            
+            # Dados diários (OHLC e fechamento anterior) vêm do cache do pregão
+            trading_day = datetime.now(MARKET_TZ).date()
+
             # PRIORIDADE 1: Se já tem tempo real ativo, usar tick
             if ticker in self.realtime_symbols:
                 tick = mt5.symbol_info_tick(ticker)
                 if tick and tick.bid > 0:
-                    # MODIFICADO: Passar os dados diários para a função de formatação
-                    return self._format_realtime_quote(ticker, tick, daily_data)
+                    return self._quote_from_tick(ticker, tick, trading_day)
                 else:
                     logger.warning(f"⚠️ {ticker}: tempo real ativo, mas tick inválido")
             
@@ -263,24 +281,22 @@ class MetaTrader5RTDWorker:
                 if self._activate_realtime_for_symbol(ticker):
                     tick = mt5.symbol_info_tick(ticker)
                     if tick and tick.bid > 0:
-                        # MODIFICADO: Passar os dados diários
-                        return self._format_realtime_quote(ticker, tick, daily_data)
+                        return self._quote_from_tick(ticker, tick, trading_day)
             
             # PRIORIDADE 3: Tentar forçar tick sem ativação
             tick = mt5.symbol_info_tick(ticker)
             if tick and tick.bid > 0:
                 logger.info(f"✅ {ticker}: Tick obtido sem ativação prévia")
-                # MODIFICADO: Passar os dados diários
-                return self._format_realtime_quote(ticker, tick, daily_data)
+                return self._quote_from_tick(ticker, tick, trading_day)
             
             # ÚLTIMO RECURSO: Dados mais recentes possíveis (M1)
             logger.warning(f"⚠️ {ticker}: usando dados M1 como último recurso")
             rates_m1 = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_M1, 0, 1)
             if rates_m1 is not None and len(rates_m1) > 0:
                 rate = rates_m1[0]
-                # MODIFICADO: Passar os dados diários aqui também
+                bar = self.daily_bars.update(ticker, float(rate['close']), trading_day)
                 quote = self._format_quote_from_rate(ticker, rate, "M1_fallback")
-                quote.update(daily_data) # Adicionar dados diários ao fallback
+                quote.update(bar.as_dict()) # Adicionar dados diários ao fallback
                 return quote
 
             logger.error(f"❌ {ticker}: nenhum tick válido encontrado")
@@ -290,6 +306,16 @@ class MetaTrader5RTDWorker:
             logger.error(f"❌ Erro ao obter cotação para {ticker}: {e}")
             return None
 
+    def _load_daily_bars(self, ticker: str):
+        """Últimas duas barras D1 do terminal (pregão anterior e o atual, se já aberto)."""
+        return mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 0, 2)
+
+    def _quote_from_tick(self, ticker: str, tick, trading_day) -> Dict:
+        """Atualiza a barra do pregão com o tick e formata a cotação."""
+        price = tick.last if tick.last > 0 else tick.bid
+        bar = self.daily_bars.update(ticker, float(price), trading_day)
+        return self._format_realtime_quote(ticker, tick, bar.as_dict())
+
     def _format_realtime_quote(self, ticker: str, tick, daily_data: dict) -> Dict:
         """
         Formata cotação em tempo real, agora incluindo dados OHLC e previous_close.
@@ -305,6 +331,7 @@ class MetaTrader5RTDWorker:
             "price": float(price), # Preço atual para cálculo de variação
             "volume": int(tick.volume),
             "time": datetime.fromtimestamp(tick.time).isoformat(),
+            "time_msc": int(getattr(tick, 'time_msc', 0) or tick.time * 1000),
             "source": "mt5_realtime",
             "flags": tick.flags,
             "volume_real": float(getattr(tick, 'volume_real', 0)),
@@ -329,52 +356,13 @@ class MetaTrader5RTDWorker:
         return result
 
     def _get_previous_close(self, ticker: str) -> Optional[float]:
-        """Obtém o preço de fechamento do pregão anterior."""
+        """Obtém o preço de fechamento do pregão anterior (cache D1 do pregão)."""
         if not self.mt5_connected or not MT5_AVAILABLE:
             logger.debug(f"MT5 não conectado para obter previous_close de {ticker}")
             return None
-            
-        try:
-            logger.debug(f"Tentando obter previous_close para {ticker}")
-            # Obter dados do dia anterior (TIMEFRAME_D1, 1 barra a partir de 1 posição atrás)
-            # Isso nos dá o fechamento do dia útil anterior
-            rates = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 1, 1)
-            logger.debug(f"Dados brutos do MT5 para {ticker} (1 dia atrás): {rates}")
-            if rates is not None and len(rates) > 0:
-                previous_close = float(rates[0]['close'])
-                open_price = float(rates[0]['open'])
-                high_price = float(rates[0]['high'])
-                low_price = float(rates[0]['low'])
-                logger.debug(f"Preço de fechamento anterior para {ticker}: {previous_close}")
-                logger.debug(f"Preço de abertura do dia anterior para {ticker}: {open_price}")
-                logger.debug(f"Preço máximo do dia anterior para {ticker}: {high_price}")
-                logger.debug(f"Preço mínimo do dia anterior para {ticker}: {low_price}")
-                logger.debug(f"Verificando se são iguais: {previous_close == open_price}")
-                return previous_close
-            else:
-                logger.debug(f"Não obtive dados do MT5 para {ticker} (1 dia atrás)")
-                # Tentativa alternativa: obter dados de 2 dias atrás
-                rates = mt5.copy_rates_from_pos(ticker, mt5.TIMEFRAME_D1, 2, 1)
-                logger.debug(f"Dados brutos do MT5 para {ticker} (2 dias atrás): {rates}")
-                if rates is not None and len(rates) > 0:
-                    previous_close = float(rates[0]['close'])
-                    open_price = float(rates[0]['open'])
-                    high_price = float(rates[0]['high'])
-                    low_price = float(rates[0]['low'])
-                    logger.debug(f"Preço de fechamento alternativo para {ticker}: {previous_close}")
-                    logger.debug(f"Preço de abertura do dia alternativo para {ticker}: {open_price}")
-                    logger.debug(f"Preço máximo do dia alternativo para {ticker}: {high_price}")
-                    logger.debug(f"Preço mínimo do dia alternativo para {ticker}: {low_price}")
-                    logger.debug(f"Verificando se são iguais: {previous_close == open_price}")
-                    return previous_close
-                else:
-                    logger.debug(f"Não obtive dados do MT5 para {ticker} (2 dias atrás)")
-        except Exception as e:
-            logger.error(f"Erro ao obter preço de fechamento anterior para {ticker}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            
-        return None
+
+        bar = self.daily_bars.get(ticker, datetime.now(MARKET_TZ).date())
+        return bar.previous_close if bar.previous_close > 0 else None
 
     def _format_quote_from_rate(self, ticker: str, rate, source: str) -> Dict:
         """Formata cotação a partir de dados históricos (último recurso)."""
@@ -418,6 +406,7 @@ class MetaTrader5RTDWorker:
         logger.debug(f"  price_change: {result['price_change']:.4f}")
         logger.debug(f"  price_change_percent: {result['price_change_percent']:.4f}%")
         logger.debug(f"  VERIFICANDO TROCA - previous_close == open_price? {previous_close == result['open_price']}")
+        return result
 
     def _price_update_loop(self):
         """Loop principal para atualização de preços EM TEMPO REAL."""
@@ -426,59 +415,113 @@ class MetaTrader5RTDWorker:
         while self.running:
             try:
                 if self.mt5_connected:
-                    # Obter todos os símbolos da carteira e símbolos principais
-                    portfolio_symbols = self._get_portfolio_symbols()
-                    all_symbols = set(list(self.main_symbols) + portfolio_symbols)
-                    
-                    # Atualizar preços dos tickers subscritos e da carteira
-                    active_symbols = set()
-                    
-                    # Adicionar símbolos ativos por subscrição
-                    for room, tickers in self.active_subscriptions.items():
-                        active_symbols.update(tickers)
-                    
-                    # Combinar todos os símbolos que precisam ser monitorados
-                    symbols_to_monitor = all_symbols.union(active_symbols)
-                    
-                    logger.debug(f"Símbolos a monitorar: {symbols_to_monitor}")
-                    logger.debug(f"Símbolos da carteira: {portfolio_symbols}")
-                    logger.debug(f"Símbolos principais: {self.main_symbols}")
-                    logger.debug(f"Símbolos ativos por subscrição: {active_symbols}")
-                    logger.debug(f"Subscrições ativas: {self.active_subscriptions}")
-                    
-                    # Atualizar preços para todos os símbolos
-                    updated_count = 0
-                    for symbol in symbols_to_monitor:
-                        logger.debug(f"Processing symbol: {symbol}")
-                        quote = self.get_mt5_quote(symbol)
-                        if quote:
-                            logger.debug(f"Got quote for {symbol}: {quote}")
-                            # Enviar via WebSocket para subscrições ativas
-                            if self.socketio and active_symbols and symbol in active_symbols:
-                                logger.debug(f"Enviando atualização para {symbol}")
-                                for room, tickers in self.active_subscriptions.items():
-                                    if symbol in tickers:
-                                        logger.debug(f"Enviando dados para room {room}")
-                                        # Enviar dados no formato esperado pelo frontend
-                                        self.socketio.emit('price_update', quote, room=room)
-                            
-                            # Atualizar no banco de dados
-                            self._update_asset_metrics(quote)
-                            updated_count += 1
-                        else:
-                            logger.debug(f"No quote available for {symbol}")
-                    
+                    # Símbolos com alguma sala inscrita (índice reverso)
+                    active_symbols = self.subscriptions.symbols()
+                    due = self.scheduler.due(
+                        active_symbols,
+                        self._portfolio_symbols_cached(),
+                        self.main_symbols,
+                        market_now=datetime.now(MARKET_TZ).replace(tzinfo=None),
+                    )
+                    logger.debug(f"Símbolos vencidos no ciclo: {due}")
+
+                    # Sem símbolos vencidos o ciclo ainda libera lotes conflacionados
+                    updated_count = self._poll_symbols(due, active_symbols)
+
                     if updated_count > 0:
                         logger.info(f"Atualizados {updated_count} ativos em tempo real")
-                
-                time.sleep(self.PAUSE_INTERVAL_SECONDS)  # 1 segundo para tempo real
-                
+
+                # Dormir até o próximo prazo de consulta
+                time.sleep(self.scheduler.sleep_seconds())
+
             except Exception as e:
                 logger.error(f"Erro no loop de atualização: {e}")
                 import traceback
                 logger.error(f"Traceback: {traceback.format_exc()}")
                 time.sleep(self.RETRY_DELAY_SECONDS)
 
+    def _poll_symbols(self, symbols: Iterable[str], active_symbols: Set[str]) -> int:
+        """Um ciclo do loop: cotações novas vão para carteiras, banco e clientes."""
+        updated_count = 0
+        batch: Dict[str, Dict] = {}
+        for symbol in symbols:
+            logger.debug(f"Processing symbol: {symbol}")
+            quote = self.get_mt5_quote(symbol)
+            if not quote:
+                logger.debug(f"No quote available for {symbol}")
+                continue
+            # Tick igual ao último enviado: nada a propagar
+            if not self.change_detector.changed(quote):
+                continue
+            if symbol in active_symbols:
+                batch[symbol] = quote
+
+            # Leitura pelas rotas HTTP de qualquer processo, sem tocar no MT5
+            quote_board.publish(quote)
+            if tick_journal.running:
+                tick_journal.append(quote)
+            self._feed_intraday_bars(quote)
+
+            # Reavaliar as carteiras em memória antes de gravar no banco
+            self._update_portfolio_state(quote)
+
+            # Enfileirar para a gravação em lote no banco de dados
+            asset_metrics_writer.add(quote)
+            updated_count += 1
+
+        if time.monotonic() - self._trades_read_at >= self.TRADE_READ_SECONDS:
+            self._read_pending_trades()
+
+        # Uma mensagem por cliente com todos os seus símbolos do ciclo
+        self._emit_price_batch(batch)
+        quote_board.touch()
+        return updated_count
+
+    def _feed_intraday_bars(self, quote: Dict):
+        """Barras intradiárias: negócios do terminal, lidos em lote, ou a própria cotação.
+
+        Com copy_ticks_from disponível, a cotação só marca o símbolo quando
+        indica um negócio novo (time_msc posterior ao último incorporado e
+        volume); os negócios são lidos a cada ``TRADE_READ_SECONDS``. As barras
+        desses símbolos são montadas só com negócios, em ordem, para que nenhum
+        chegue depois de a sua barra ter sido substituída pela seguinte.
+        """
+        if not (MT5_AVAILABLE and hasattr(mt5, "copy_ticks_from")):
+            intraday_bars.add_quote(quote)
+            return
+        since = intraday_bars.trade_cursor(quote["symbol"])
+        if since is None or (int(quote.get("time_msc") or 0) > since and quote.get("volume")):
+            self._pending_trades[quote["symbol"]] = quote
+
+    def _read_pending_trades(self):
+        """Lê do terminal os negócios dos símbolos marcados desde a última leitura."""
+        pending, self._pending_trades = self._pending_trades, {}
+        self._trades_read_at = time.monotonic()
+        for symbol, quote in pending.items():
+            since = intraday_bars.trade_cursor(symbol)
+            if since is None:
+                since = int(quote.get("time_msc") or 0)
+            trades = None
+            if since:
+                try:
+                    trades = mt5.copy_ticks_from(
+                        symbol, since // 1000, self.TRADE_TICKS_LIMIT, mt5.COPY_TICKS_TRADE
+                    )
+                except Exception as e:
+                    logger.debug(f"{symbol}: negócios indisponíveis ({e})")
+            if trades is None:
+                intraday_bars.add_quote(quote)
+            else:
+                intraday_bars.add_trades(symbol, trades)
+
+    def _portfolio_symbols_cached(self) -> List[str]:
+        """Símbolos da carteira, relidos do banco a cada ``PORTFOLIO_SYMBOLS_REFRESH_SECONDS``."""
+        now = time.monotonic()
+        if now - self._portfolio_symbols_at >= self.PORTFOLIO_SYMBOLS_REFRESH_SECONDS:
+            self._portfolio_symbols = self._get_portfolio_symbols()
+            self._portfolio_symbols_at = now
+        return self._portfolio_symbols
+
     def _get_portfolio_symbols(self) -> List[str]:
         """Obtém todos os símbolos que estão nas posições da carteira."""
         if not self.db_engine:
@@ -491,7 +534,7 @@ class MetaTrader5RTDWorker:
             query = text("""
                 SELECT DISTINCT symbol 
                 FROM portfolio_positions 
-                WHERE quantity > 0
+                WHERE quantity <> 0
             """)
             
             with self.db_engine.connect() as conn:
@@ -507,162 +550,45 @@ class MetaTrader5RTDWorker:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return []
 
-    def _update_asset_metrics(self, quote: Dict):
-        """Atualiza os dados de AssetMetrics no banco de dados."""
-        if not self.db_engine:
-            logger.warning("Database engine não disponível para atualização de métricas")
-            return
-            
+    def _update_portfolio_state(self, quote: Dict):
+        """Repassa a cotação ao cache de carteiras em memória."""
         try:
-            from sqlalchemy import text
-            
-            symbol = quote["symbol"]
-            logger.debug(f"Atualizando AssetMetrics para {symbol}")
-            
-            # Verificar se o ticker existe na tabela tickers
-            check_ticker_sql = text("SELECT COUNT(*) FROM tickers WHERE symbol = :symbol")
-            with self.db_engine.connect() as conn:
-                result = conn.execute(check_ticker_sql, {"symbol": symbol})
-                count = result.scalar()
-                
-                if count == 0:
-                    # Se o ticker não existe, inserir na tabela tickers
-                    insert_ticker_sql = text("""
-                        INSERT INTO tickers (symbol, type, company_id) 
-                        VALUES (:symbol, 'STOCK', NULL)
-                        ON CONFLICT (symbol) DO NOTHING
-                    """)
-                    conn.execute(insert_ticker_sql, {"symbol": symbol})
-                
-                # Calcular variações de preço usando o fechamento anterior
-                last_price = float(quote.get("last", 0))
-                logger.debug(f"Last price para {symbol}: {last_price}")
-                
-                # Obter o previous_close corretamente (usando a nova coluna corrigida)
-                previous_close = None
-                if "previous_close" in quote and quote["previous_close"] is not None:
-                    previous_close = float(quote["previous_close"])
-                    logger.debug(f"Previous close do quote para {symbol}: {previous_close}")
-                    # Verificar se o previous_close é realmente o fechamento anterior ou se é o open_price
-                    open_price_check = float(quote.get("open_price", 0)) if quote.get("open_price") is not None else 0
-                    last_price_check = float(quote.get("last", 0)) if quote.get("last") is not None else 0
-                    logger.debug(f"Verificação - {symbol}: previous_close={previous_close}, open_price={open_price_check}, last_price={last_price_check}")
-                    logger.debug(f"Suspeita de troca - {symbol}: previous_close == open_price? {previous_close == open_price_check}")
-                
-                # Se não tivermos o previous_close no quote, tentar obter do banco de dados (usando a nova coluna corrigida)
-                if previous_close is None or previous_close <= 0:
-                    try:
-                        get_previous_close_sql = text("""
-                            SELECT previous_close_correct FROM asset_metrics WHERE symbol = :symbol
-                        """)
-                        result = conn.execute(get_previous_close_sql, {"symbol": symbol})
-                        row = result.fetchone()
-                        if row and row[0] is not None:
-                            previous_close = float(row[0])
-                            logger.debug(f"Previous close corrigido do banco para {symbol}: {previous_close}")
-                    except Exception as e:
-                        logger.debug(f"Erro ao obter previous_close_corrigido do banco para {symbol}: {e}")
-                
-                # Se ainda não tivermos o previous_close, tentar obter do MT5
-                if previous_close is None or previous_close <= 0:
-                    previous_close = self._get_previous_close(symbol)
-                    if previous_close is not None and previous_close > 0:
-                        logger.debug(f"Obtido previous_close do MT5 para {symbol}: {previous_close}")
-                    else:
-                        logger.debug(f"Não foi possível obter previous_close para {symbol}")
-                
-                # Calcular a variação percentual usando o fechamento anterior
-                price_change = 0
-                price_change_percent = 0
-                open_price = float(quote.get("open_price", 0))
-                logger.debug(f"Open price para {symbol}: {open_price}")
-                logger.debug(f"Last price para {symbol}: {last_price}")
-                logger.debug(f"Previous close para {symbol}: {previous_close}")
-                
-                # Verificar se os valores estão corretos antes de calcular
-                if previous_close is not None and previous_close > 0:
-                    price_change = last_price - previous_close
-                    price_change_percent = (price_change / previous_close * 100)
-                    logger.debug(f"Cálculo no banco para {symbol}: last={last_price}, previous_close={previous_close}, change={price_change:.4f}, change_percent={price_change_percent:.4f}%")
-                else:
-                    logger.debug(f"Não foi possível calcular variação para {symbol}: previous_close={previous_close}")
-                    # Tentar usar open_price como fallback apenas para debugging
-                    if open_price > 0:
-                        price_change = last_price - open_price
-                        price_change_percent = (price_change / open_price * 100)
-                        logger.debug(f"Fallback para debugging - {symbol}: last={last_price}, open_price={open_price}, change={price_change:.4f}, change_percent={price_change_percent:.4f}%")
-                
-                # O previous_close já foi obtido anteriormente, não precisamos obter novamente
-                
-                # Atualizar ou inserir os dados na tabela asset_metrics
-                upsert_sql = text("""
-                    INSERT INTO asset_metrics (
-                        symbol, last_price, previous_close, previous_close_correct, price_change, price_change_percent, 
-                        volume, open_price, high_price, low_price, updated_at
-                    ) VALUES (
-                        :symbol, :last_price, :previous_close, :previous_close, :price_change, :price_change_percent,
-                        :volume, :open_price, :high_price, :low_price, NOW()
-                    )
-                    ON CONFLICT (symbol) 
-                    DO UPDATE SET
-                        last_price = EXCLUDED.last_price,
-                        previous_close = COALESCE(EXCLUDED.previous_close, asset_metrics.previous_close),
-                        previous_close_correct = COALESCE(EXCLUDED.previous_close_correct, asset_metrics.previous_close_correct),
-                        price_change = EXCLUDED.price_change,
-                        price_change_percent = EXCLUDED.price_change_percent,
-                        volume = EXCLUDED.volume,
-                        open_price = EXCLUDED.open_price,
-                        high_price = EXCLUDED.high_price,
-                        low_price = EXCLUDED.low_price,
-                        updated_at = NOW()
-                """)
-                
-                logger.debug(f"Atualizando banco de dados para {symbol}: open_price={open_price}, previous_close={previous_close}, last_price={last_price}, price_change={price_change:.4f}, price_change_percent={price_change_percent:.4f}%")
-                
-                # Verificar se os valores estão corretos antes de atualizar
-                logger.debug(f"Valores finais para {symbol}:")
-                logger.debug(f"  last_price: {last_price}")
-                logger.debug(f"  previous_close: {previous_close}")
-                logger.debug(f"  open_price: {open_price}")
-                logger.debug(f"  price_change: {price_change:.4f}")
-                logger.debug(f"  price_change_percent: {price_change_percent:.4f}%")
-                
-                conn.execute(upsert_sql, {
-                    "symbol": symbol,
-                    "last_price": last_price,
-                    "previous_close": previous_close,
-                    "price_change": price_change,
-                    "price_change_percent": price_change_percent,
-                    "volume": float(quote.get("volume", 0)),
-                    "open_price": open_price if open_price > 0 else None,
-                    "high_price": float(quote.get("high_price", last_price)),
-                    "low_price": float(quote.get("low_price", last_price))
-                })
-                
-                conn.commit()
-                logger.info(f"AssetMetrics atualizado com sucesso para {symbol}")
-                
+            portfolio_state_cache.apply_quote(
+                quote["symbol"],
+                float(quote.get("last", 0)),
+                previous_close=quote.get("previous_close"),
+                open_price=quote.get("open_price", quote.get("open")),
+            )
         except Exception as e:
-            logger.error(f"Erro ao atualizar AssetMetrics para {quote.get('symbol', 'unknown')}: {e}")
-            logger.error(f"Dados do quote: {quote}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
+            logger.error(f"Erro ao atualizar estado das carteiras para {quote.get('symbol', 'unknown')}: {e}")
+
+    def _emit_price_batch(self, quotes: Dict[str, Dict]) -> int:
+        """Envia um ``price_batch`` por sala com as cotações do ciclo; retorna quantos."""
+        if not self.socketio:
+            return 0
+
+        # Mesmo sem cotações novas, salas conflacionadas podem ter lote pendente
+        batches = self.subscriptions.batches(quotes) if quotes else {}
+        ready = self.conflator.push(batches)
+        for room, room_quotes in ready.items():
+            self.socketio.emit('price_batch', {'quotes': room_quotes}, room=room)
+        if ready:
+            logger.debug(f"price_batch: {len(quotes)} símbolos para {len(ready)} salas")
+        return len(ready)
 
     def subscribe_ticker(self, room: str, ticker: str):
         """Subscreve um ticker e ativa tempo real imediatamente."""
         try:
-            if room not in self.active_subscriptions:
-                self.active_subscriptions[room] = set()
-            
             ticker_upper = ticker.upper()
-            self.active_subscriptions[room].add(ticker_upper)
+            self.subscriptions.subscribe(room, ticker_upper)
+            # O novo cliente recebe a cotação no próximo ciclo, mesmo sem mudança
+            self.change_detector.invalidate(ticker_upper)
             
             # Tentar ativar tempo real para este ticker IMEDIATAMENTE
             if ticker_upper in self.mt5_symbols and ticker_upper not in self.realtime_symbols:
                 self._activate_realtime_for_symbol(ticker_upper)
             
             logger.info(f"Ticker {ticker} subscrito para room {room}")
-            logger.debug(f"Active subscriptions: {self.active_subscriptions}")
         except Exception as e:
             logger.error(f"Erro ao subscrever ticker {ticker} para room {room}: {e}")
             import traceback
@@ -670,34 +596,43 @@ class MetaTrader5RTDWorker:
 
     def unsubscribe_ticker(self, room: str, ticker: str):
         """Remove subscrição de um ticker."""
-        if room in self.active_subscriptions:
-            self.active_subscriptions[room].discard(ticker.upper())
-            if not self.active_subscriptions[room]:
-                del self.active_subscriptions[room]
-        
+        self.subscriptions.unsubscribe(room, ticker.upper())
         logger.info(f"Ticker {ticker} removido do room {room}")
-        logger.debug(f"Active subscriptions: {self.active_subscriptions}")
+
+    def unsubscribe_room(self, room: str):
+        """Remove todas as subscrições de uma sala (cliente desconectado)."""
+        symbols = self.subscriptions.remove_room(room)
+        self.conflator.drop(room)
+        logger.info(f"Room {room} removido ({len(symbols)} tickers)")
 
     def get_subscription_stats(self):
         """Retorna estatísticas das subscrições."""
         try:
-            total_subscriptions = sum(len(tickers) for tickers in self.active_subscriptions.values())
+            subscribed = self.subscriptions.snapshot()
             
             stats = {
                 "status": "active" if self.running else "inactive",
                 "mt5_connected": self.mt5_connected,
-                "total_rooms": len(self.active_subscriptions),
-                "total_subscriptions": total_subscriptions,
+                "total_rooms": len(subscribed),
+                "total_subscriptions": sum(len(tickers) for tickers in subscribed.values()),
                 "total_symbols": len(self.mt5_symbols),
                 "realtime_symbols": len(self.realtime_symbols),
                 "failed_symbols": len(self.failed_symbols),
-                "active_rooms": list(self.active_subscriptions.keys()),
+                "active_rooms": list(subscribed.keys()),
                 "database_connected": self.db_engine is not None,
+                "asset_metrics_pending": asset_metrics_writer.pending(),
+                "asset_metrics_flushes": asset_metrics_writer.flushes,
+                "quotes_suppressed": self.change_detector.suppressed,
+                **self.conflator.stats(),
+                **self.scheduler.stats(),
+                "quote_board": quote_board.name if quote_board.owner else None,
+                "ticks_pending": tick_journal.pending(),
+                "ticks_written": tick_journal.ticks_written,
                 "worker_running": self.running,
                 "last_update": datetime.now().isoformat(),
                 "realtime_active": list(self.realtime_symbols),
                 "realtime_failed": list(self.failed_symbols),
-                "subscribed_tickers": {room: list(tickers) for room, tickers in self.active_subscriptions.items()}
+                "subscribed_tickers": subscribed
             }
             
             logger.debug(f"Subscription stats: {stats}")
@@ -731,6 +666,18 @@ class MetaTrader5RTDWorker:
             raise  
 
         self.running = True
+        try:
+            quote_board.create()
+        except Exception as e:
+            logger.error(f"Erro ao criar quadro de cotações em memória compartilhada: {e}")
+        portfolio_state_cache.start()
+        if os.getenv("TICK_JOURNAL_ENABLED", "1") == "1":
+            tick_journal.start()
+        # Sem banco as barras ficam só em memória
+        intraday_bars.start(self.db_engine)
+        if self.db_engine is not None:
+            asset_metrics_writer.start(self.db_engine)
+            intraday_cota_recorder.start(self.db_engine)
         self.worker_thread = threading.Thread(target=self._price_update_loop, daemon=True)
         self.worker_thread.start()
         logger.info("MetaTrader5 RTD Worker TEMPO REAL iniciado com sucesso.")
@@ -742,6 +689,12 @@ class MetaTrader5RTDWorker:
         self.running = False
         if self.worker_thread and self.worker_thread.is_alive():
             self.worker_thread.join(timeout=5)
+        intraday_cota_recorder.stop()
+        asset_metrics_writer.stop()
+        tick_journal.stop()
+        intraday_bars.stop()
+        portfolio_state_cache.stop()
+        quote_board.close()
         
         if self.mt5_connected and MT5_AVAILABLE:
             # Remover market books ativos
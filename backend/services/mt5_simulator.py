@@ -0,0 +1,312 @@
+# backend/services/mt5_simulator.py
+# Substituto do módulo MetaTrader5 para Linux, CI e testes de carga.
+# Implementa as funções usadas pelo RTD worker (initialize, symbols_get,
+# symbol_select, market_book_add, symbol_info_tick, copy_rates_from_pos...)
+# sobre fluxos de ticks sintéticos (passeio aleatório) ou gravados (CSV),
+# reproduzidos em um relógio próprio com taxa configurável.
+#
+# Ativado no worker com MT5_SIMULATOR=1; MT5_SIMULATOR_SYMBOLS define quantos
+# símbolos sintéticos criar e MT5_SIMULATOR_FILE aponta um CSV gravado
+# (colunas time, symbol, bid, ask, last, volume; time em segundos).
+
+import csv
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from backend.services.market_calendar import MARKET_TZ
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_D1 = 16408
+
+_TIMEFRAMES = (TIMEFRAME_M1, TIMEFRAME_D1)
+
+COPY_TICKS_ALL = -1
+COPY_TICKS_TRADE = 2
+
+TICK_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("volume", "<u8"),
+    ("time_msc", "<i8"),
+    ("flags", "<u4"),
+    ("volume_real", "<f8"),
+])
+
+RATE_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+DEFAULT_SYMBOLS = [
+    "VALE3", "PETR4", "ITUB4", "BBDC4", "ABEV3",
+    "MGLU3", "WEGE3", "RENT3", "LREN3", "BOVA11",
+]
+
+
+class Tick(NamedTuple):
+    time: int
+    bid: float
+    ask: float
+    last: float
+    volume: int
+    time_msc: int
+    flags: int
+    volume_real: float
+
+
+class SymbolInfo(NamedTuple):
+    name: str
+
+
+class _TickStream:
+    """Ticks de um símbolo: instantes (s desde o início) e preços."""
+
+    def __init__(self, times: np.ndarray, bid: np.ndarray, ask: np.ndarray,
+                 last: np.ndarray, volume: np.ndarray, previous_close: float):
+        self.times = times
+        self.bid = bid
+        self.ask = ask
+        self.last = last
+        self.volume = volume
+        self.previous_close = previous_close
+        self.duration = float(times[-1]) if len(times) else 0.0
+
+    def index_at(self, elapsed: float, loop: bool) -> int:
+        if loop and self.duration > 0:
+            elapsed = elapsed % (self.duration + 1e-9)
+        return max(0, int(np.searchsorted(self.times, elapsed, side="right")) - 1)
+
+    def tick_time(self, elapsed: float, loop: bool) -> float:
+        """Instante (s desde o início) do último tick até ``elapsed``."""
+        offset = 0.0
+        if loop and self.duration > 0:
+            period = self.duration + 1e-9
+            offset = (elapsed // period) * period
+        return offset + float(self.times[self.index_at(elapsed, loop)])
+
+    def between(self, start: float, end: float, loop: bool):
+        """Instantes e índices dos ticks em [start, end] (s desde o início)."""
+        if not loop or self.duration <= 0:
+            lo = int(np.searchsorted(self.times, start, side="left"))
+            hi = int(np.searchsorted(self.times, end, side="right"))
+            return self.times[lo:hi].astype(np.float64), np.arange(lo, hi)
+        period = self.duration + 1e-9
+        times, indices = [], []
+        k = max(0.0, start // period)
+        while k * period <= end:
+            base = k * period
+            lo = int(np.searchsorted(self.times, start - base, side="left"))
+            hi = int(np.searchsorted(self.times, end - base, side="right"))
+            times.append(self.times[lo:hi] + base)
+            indices.append(np.arange(lo, hi))
+            k += 1
+        return np.concatenate(times), np.concatenate(indices)
+
+
+class SimulatedMT5:
+    """API do MetaTrader5 servida a partir de fluxos de ticks reproduzidos."""
+
+    TIMEFRAME_M1 = TIMEFRAME_M1
+    TIMEFRAME_D1 = TIMEFRAME_D1
+    COPY_TICKS_ALL = COPY_TICKS_ALL
+    COPY_TICKS_TRADE = COPY_TICKS_TRADE
+
+    def __init__(self, clock: Optional[Callable[[], float]] = None, speed: float = 1.0,
+                 loop: bool = True):
+        self.clock = clock or time.monotonic
+        self.speed = speed
+        self.loop = loop
+        self.streams: Dict[str, _TickStream] = {}
+        self.selected: set = set()
+        self.connected = False
+        self.calls: Dict[str, int] = {}
+        self._started = self.clock()
+        # Como no MT5, o horário do pregão é gravado como se fosse UTC
+        today = datetime.now(MARKET_TZ).date()
+        self._session_start = datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
+
+    # --- Carga dos fluxos ---
+    def load_synthetic(
+        self,
+        symbols: Iterable[str],
+        ticks_per_second: float = 1.0,
+        duration_seconds: float = 3600,
+        volatility: float = 0.0005,
+        seed: int = 0,
+    ):
+        """Passeio aleatório por símbolo, com ``ticks_per_second`` ticks por segundo."""
+        rng = np.random.default_rng(seed)
+        count = max(1, int(duration_seconds * ticks_per_second))
+        times = np.arange(count) / ticks_per_second
+        for symbol in symbols:
+            base = float(rng.uniform(5, 100))
+            last = base * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+            last = np.round(last, 2)
+            spread = np.maximum(0.01, np.round(last * 0.0005, 2))
+            self.streams[symbol] = _TickStream(
+                times, last - spread, last + spread, last,
+                rng.integers(100, 10_000, count), previous_close=round(base, 2),
+            )
+        self._started = self.clock()
+
+    def load_recorded(self, path: str):
+        """Carrega ticks gravados em CSV (time, symbol, bid, ask, last, volume)."""
+        rows: Dict[str, List[Sequence[float]]] = {}
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                rows.setdefault(row["symbol"], []).append((
+                    float(row["time"]), float(row["bid"]), float(row["ask"]),
+                    float(row["last"]), float(row.get("volume") or 0),
+                ))
+        for symbol, ticks in rows.items():
+            data = np.array(sorted(ticks))
+            times = data[:, 0] - data[0, 0]
+            self.streams[symbol] = _TickStream(
+                times, data[:, 1], data[:, 2], data[:, 3], data[:, 4].astype(int),
+                previous_close=float(data[0, 3]),
+            )
+        self._started = self.clock()
+        logger.info(f"Simulador MT5: {len(rows)} símbolos gravados carregados de {path}")
+
+    def elapsed(self) -> float:
+        return (self.clock() - self._started) * self.speed
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # --- API do MetaTrader5 ---
+    def initialize(self, *args, **kwargs) -> bool:
+        self._count("initialize")
+        self.connected = True
+        return True
+
+    def shutdown(self):
+        self.connected = False
+
+    def last_error(self):
+        return (1, "Success")
+
+    def symbols_get(self, *args, **kwargs):
+        self._count("symbols_get")
+        return tuple(SymbolInfo(name) for name in self.streams)
+
+    def symbol_select(self, symbol: str, enable: bool = True) -> bool:
+        self._count("symbol_select")
+        if symbol not in self.streams:
+            return False
+        if enable:
+            self.selected.add(symbol)
+        else:
+            self.selected.discard(symbol)
+        return True
+
+    def market_book_add(self, symbol: str) -> bool:
+        self._count("market_book_add")
+        return self.symbol_select(symbol, True)
+
+    def market_book_release(self, symbol: str) -> bool:
+        return symbol in self.streams
+
+    def symbol_info_tick(self, symbol: str) -> Optional[Tick]:
+        self._count("symbol_info_tick")
+        stream = self.streams.get(symbol)
+        if stream is None:
+            return None
+        elapsed = self.elapsed()
+        i = stream.index_at(elapsed, self.loop)
+        # Como no MT5, time/time_msc são do último tick, não da consulta
+        ts = self._session_start + timedelta(hours=13, seconds=stream.tick_time(elapsed, self.loop))
+        return Tick(
+            time=int(ts.timestamp()),
+            bid=float(stream.bid[i]),
+            ask=float(stream.ask[i]),
+            last=float(stream.last[i]),
+            volume=int(stream.volume[i]),
+            time_msc=int(round(ts.timestamp() * 1000)),
+            flags=0,
+            volume_real=float(stream.volume[i]),
+        )
+
+    def copy_ticks_from(self, symbol: str, date_from, count: int, flags: int):
+        """Ticks a partir de ``date_from`` (segundos ou datetime) até o instante atual.
+
+        Cada tick sintético é um negócio, então COPY_TICKS_TRADE e
+        COPY_TICKS_ALL devolvem o mesmo fluxo.
+        """
+        self._count("copy_ticks_from")
+        stream = self.streams.get(symbol)
+        if stream is None:
+            return None
+        if isinstance(date_from, datetime):
+            date_from = date_from.replace(tzinfo=date_from.tzinfo or timezone.utc).timestamp()
+        origin = (self._session_start + timedelta(hours=13)).timestamp()
+        start = max(0.0, float(date_from) - origin)
+        times, indices = stream.between(start, self.elapsed(), self.loop)
+        times, indices = times[:count], indices[:count]
+        msc = np.round((origin + times) * 1000).astype(np.int64)
+        ticks = np.zeros(len(indices), dtype=TICK_DTYPE)
+        ticks["time"] = msc // 1000
+        ticks["bid"] = stream.bid[indices]
+        ticks["ask"] = stream.ask[indices]
+        ticks["last"] = stream.last[indices]
+        ticks["volume"] = stream.volume[indices]
+        ticks["time_msc"] = msc
+        ticks["volume_real"] = stream.volume[indices]
+        return ticks
+
+    def copy_rates_from_pos(self, symbol: str, timeframe: int, start_pos: int, count: int):
+        """Barras até o tick corrente; D1 traz o pregão anterior e o atual."""
+        self._count("copy_rates_from_pos")
+        stream = self.streams.get(symbol)
+        if stream is None or timeframe not in _TIMEFRAMES:
+            return None
+
+        i = stream.index_at(self.elapsed(), self.loop)
+        if timeframe == TIMEFRAME_D1:
+            today = self._session_start
+            prev = stream.previous_close
+            bars = [
+                (today - timedelta(days=1), prev, prev, prev, prev, 0),
+                (today, stream.last[0], stream.last[: i + 1].max(),
+                 stream.last[: i + 1].min(), stream.last[i], int(stream.volume[: i + 1].sum())),
+            ]
+        else:
+            window = int(np.searchsorted(stream.times, stream.times[i] - 60))
+            minute = self._session_start + timedelta(hours=13, seconds=int(self.elapsed()) // 60 * 60)
+            prices = stream.last[window: i + 1]
+            bars = [(minute, prices[0], prices.max(), prices.min(), prices[-1], len(prices))]
+
+        rates = np.array(
+            [(int(t.timestamp()), o, h, l, c, v, 1, v) for t, o, h, l, c, v in bars],
+            dtype=RATE_DTYPE,
+        )
+        end = len(rates) - start_pos
+        return rates[max(0, end - count): end] if end > 0 else None
+
+
+def simulator_from_env() -> SimulatedMT5:
+    """Simulador configurado por MT5_SIMULATOR_FILE ou MT5_SIMULATOR_SYMBOLS."""
+    sim = SimulatedMT5(speed=float(os.getenv("MT5_SIMULATOR_SPEED", "1")))
+    path = os.getenv("MT5_SIMULATOR_FILE")
+    if path:
+        sim.load_recorded(path)
+    else:
+        extra = int(os.getenv("MT5_SIMULATOR_SYMBOLS", "0"))
+        symbols = DEFAULT_SYMBOLS + [f"SIM{i:04d}" for i in range(extra)]
+        sim.load_synthetic(symbols, float(os.getenv("MT5_SIMULATOR_TICKS_PER_SECOND", "1")))
+    return sim
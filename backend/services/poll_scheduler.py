@@ -0,0 +1,144 @@
+# backend/services/poll_scheduler.py
+# Agenda de consulta dos símbolos do RTD worker por prioridade.
+# Cada símbolo pertence ao nível mais prioritário em que aparece (inscrito por
+# algum cliente, em carteira ou de fundo) e é consultado no intervalo alvo do
+# nível; o loop dorme até o próximo prazo em vez de uma pausa fixa, e
+# símbolos com o mercado fechado não são consultados.
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.services.market_calendar import MarketCalendar, b3_calendar, parse_hhmm
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBED = "subscribed"
+PORTFOLIO = "portfolio"
+BACKGROUND = "background"
+TIERS = (SUBSCRIBED, PORTFOLIO, BACKGROUND)
+
+# Contratos futuros da B3 negociam fora do horário do mercado à vista
+FUTURES_PREFIXES = ("WIN", "WDO", "IND", "DOL")
+
+# Folga para não acordar um instante antes do prazo e perder a vez
+_DEADLINE_SLACK = 0.005
+
+
+class PollScheduler:
+    """Seleciona, a cada iteração, os símbolos cujo prazo de consulta venceu."""
+
+    def __init__(
+        self,
+        intervals: Optional[Dict[str, float]] = None,
+        max_per_cycle: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        calendar: Optional[MarketCalendar] = None,
+    ):
+        self.intervals = {
+            SUBSCRIBED: float(os.getenv("RTD_SUBSCRIBED_INTERVAL_SECONDS", "1")),
+            PORTFOLIO: float(os.getenv("RTD_PORTFOLIO_INTERVAL_SECONDS", "2")),
+            BACKGROUND: float(os.getenv("RTD_BACKGROUND_INTERVAL_SECONDS", "10")),
+        }
+        self.intervals.update(intervals or {})
+        self.max_per_cycle = (
+            max_per_cycle if max_per_cycle is not None
+            else int(os.getenv("RTD_MAX_SYMBOLS_PER_CYCLE", "0"))
+        )
+        self.clock = clock
+        # Horário do mercado à vista (sazonal, com feriados) vem do calendário da B3
+        self.calendar = calendar or b3_calendar
+        self.futures_open = parse_hhmm(os.getenv("FUTURES_MARKET_OPEN", "09:00"))
+        self.futures_close = parse_hhmm(os.getenv("FUTURES_MARKET_CLOSE", "18:25"))
+
+        self._next_due: Dict[str, float] = {}
+        self.tiers: Dict[str, str] = {}
+        self.polled = {tier: 0 for tier in TIERS}
+        self.skipped_closed = 0
+        self.deferred = 0
+
+    def is_open(self, symbol: str, now: datetime) -> bool:
+        """Pregão aberto para o símbolo em ``now`` (horário de Brasília, sem tz)."""
+        if symbol.startswith(FUTURES_PREFIXES) and len(symbol) == 6:
+            return (
+                self.calendar.is_trading_day(now.date())
+                and self.futures_open <= now.time() < self.futures_close
+            )
+        return self.calendar.is_open(now)
+
+    def assign(
+        self, subscribed: Iterable[str], portfolio: Iterable[str], background: Iterable[str]
+    ) -> Dict[str, str]:
+        """Nível de cada símbolo; o mais prioritário prevalece."""
+        tiers: Dict[str, str] = {}
+        for tier, symbols in ((BACKGROUND, background), (PORTFOLIO, portfolio), (SUBSCRIBED, subscribed)):
+            for symbol in symbols:
+                tiers[symbol] = tier
+        return tiers
+
+    def due(
+        self,
+        subscribed: Iterable[str],
+        portfolio: Iterable[str],
+        background: Iterable[str],
+        market_now: datetime,
+        now: Optional[float] = None,
+    ) -> List[str]:
+        """Símbolos a consultar agora, do mais prioritário para o menos."""
+        now = self.clock() if now is None else now
+        self.tiers = self.assign(subscribed, portfolio, background)
+        for symbol in set(self._next_due) - set(self.tiers):
+            del self._next_due[symbol]
+
+        candidates: List[Tuple[int, float, str]] = []
+        for symbol, tier in self.tiers.items():
+            interval = self.intervals[tier]
+            due_at = self._next_due.get(symbol)
+            if due_at is not None:
+                # Símbolo promovido (ex.: nova subscrição) não espera o prazo antigo
+                due_at = min(due_at, now + interval)
+                self._next_due[symbol] = due_at
+                if due_at > now + _DEADLINE_SLACK:
+                    continue
+                # Mercado fechado: só a primeira consulta, para ter um último preço
+                if not self.is_open(symbol, market_now):
+                    self.skipped_closed += 1
+                    self._next_due[symbol] = now + interval
+                    continue
+            candidates.append((TIERS.index(tier), due_at or 0.0, symbol))
+
+        candidates.sort()
+        if self.max_per_cycle and len(candidates) > self.max_per_cycle:
+            # Os que sobram continuam vencidos e passam à frente no próximo ciclo
+            self.deferred += len(candidates) - self.max_per_cycle
+            candidates = candidates[: self.max_per_cycle]
+
+        for _, due_at, symbol in candidates:
+            interval = self.intervals[self.tiers[symbol]]
+            next_due = (due_at or now) + interval
+            # Atrasos não viram rajada: prazos perdidos são pulados
+            self._next_due[symbol] = next_due if next_due > now else now + interval
+            self.polled[self.tiers[symbol]] += 1
+        return [symbol for _, _, symbol in candidates]
+
+    def sleep_seconds(self, now: Optional[float] = None) -> float:
+        """Tempo até o próximo prazo, limitado ao menor intervalo dos níveis."""
+        now = self.clock() if now is None else now
+        ceiling = min(self.intervals.values())
+        if not self._next_due:
+            return ceiling
+        return min(ceiling, max(0.0, min(self._next_due.values()) - now))
+
+    def stats(self) -> Dict:
+        counts = {tier: 0 for tier in TIERS}
+        for tier in self.tiers.values():
+            counts[tier] += 1
+        return {
+            "poll_intervals": dict(self.intervals),
+            "symbols_by_tier": counts,
+            "polls_by_tier": dict(self.polled),
+            "polls_skipped_closed": self.skipped_closed,
+            "polls_deferred": self.deferred,
+        }
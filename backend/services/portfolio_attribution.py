@@ -0,0 +1,330 @@
+# backend/services/portfolio_attribution.py
+# Atribuição de performance de Brinson-Fachler por setor contra o IBOV.
+# Os efeitos de alocação, seleção e interação de cada pregão são calculados
+# sobre matrizes datas × ativos (pesos e retornos) e gravados em
+# portfolio_attribution_daily; uma consulta por intervalo apenas soma os
+# vetores diários, ligados pelo fator de Carino para que o total feche com o
+# retorno ativo composto do período.
+
+import logging
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.models import (
+    db,
+    AssetMetrics,
+    BenchmarkWeight,
+    PortfolioAttributionDaily,
+    PortfolioPosition,
+)
+from backend.services.portfolio_backfill import (
+    PriceLoader,
+    editable_metric_series,
+    matrix_adjusted_closes,
+)
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK = "IBOV"
+BENCHMARK_SYMBOL = "^BVSP"
+CASH_SECTOR = "Caixa"
+UNKNOWN_SECTOR = "Unknown"
+
+_CARRY_IN_DAYS = 10
+
+
+def load_sectors(symbols: Iterable[str]) -> Dict[str, str]:
+    """Setor de cada símbolo segundo AssetMetrics (``Unknown`` se ausente)."""
+    symbols = list(symbols)
+    rows = (
+        db.session.query(AssetMetrics.symbol, AssetMetrics.sector)
+        .filter(AssetMetrics.symbol.in_(symbols))
+        .all()
+    )
+    sectors = {r.symbol: r.sector for r in rows if r.sector}
+    return {s: sectors.get(s, UNKNOWN_SECTOR) for s in symbols}
+
+
+def load_benchmark_weights(
+    dates: Sequence[date], benchmark: str = BENCHMARK
+) -> Optional[pd.DataFrame]:
+    """Pesos (frações) do índice vigentes em cada data, datas × símbolos.
+
+    Cada composição vale a partir da sua data até a próxima; retorna ``None``
+    se nenhuma composição anterior ao fim do período estiver cadastrada.
+    """
+    rows = (
+        db.session.query(BenchmarkWeight.date, BenchmarkWeight.symbol, BenchmarkWeight.weight)
+        .filter(BenchmarkWeight.benchmark == benchmark, BenchmarkWeight.date <= dates[-1])
+        .all()
+    )
+    if not rows:
+        return None
+
+    frame = pd.DataFrame(rows, columns=["date", "symbol", "weight"])
+    frame["weight"] = frame["weight"].astype(float)
+    table = frame.pivot_table(index="date", columns="symbol", values="weight", aggfunc="last")
+    # Símbolos ausentes de uma composição têm peso zero nela
+    table = table.fillna(0.0)
+    table = table.reindex(table.index.union(dates)).sort_index().ffill().reindex(dates).fillna(0.0)
+    totals = table.sum(axis=1).replace(0, np.nan)
+    return table.div(totals, axis=0).fillna(0.0)
+
+
+def brinson_components(
+    portfolio_weights: np.ndarray,
+    benchmark_weights: np.ndarray,
+    returns: np.ndarray,
+    sector_matrix: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Efeitos de Brinson-Fachler por dia e setor (datas × setores).
+
+    Os pesos de cada dia devem somar 1 em cada carteira (o caixa entra como
+    ativo de retorno zero). Setores fora do índice usam o retorno total do
+    índice como referência; setores sem posição não geram seleção.
+    """
+    bench_total = np.einsum("ds,ds->d", benchmark_weights, returns)[:, None]
+
+    wp = portfolio_weights @ sector_matrix
+    wb = benchmark_weights @ sector_matrix
+    rb = np.divide(
+        (benchmark_weights * returns) @ sector_matrix, wb,
+        out=np.broadcast_to(bench_total, wb.shape).copy(), where=wb != 0,
+    )
+    rp = np.divide(
+        (portfolio_weights * returns) @ sector_matrix, wp,
+        out=rb.copy(), where=wp != 0,
+    )
+
+    active = wp - wb
+    return {
+        "portfolio_weight": wp,
+        "benchmark_weight": wb,
+        "portfolio_return": rp,
+        "benchmark_return": rb,
+        "allocation": active * (rb - bench_total),
+        "selection": wb * (rp - rb),
+        "interaction": active * (rp - rb),
+    }
+
+
+def build_daily_attribution(
+    portfolio_id: int,
+    start: date,
+    end: date,
+    price_loader: Optional[PriceLoader] = None,
+    benchmark: str = BENCHMARK,
+) -> Dict:
+    """Calcula e grava os componentes diários da atribuição entre ``start`` e ``end``.
+
+    Como não há histórico de posições, a composição atual é mantida no
+    período, com os pesos derivando com os preços do fechamento anterior.
+    Retornos e pesos usam fechamentos ajustados por proventos.
+    Sem composição do índice cadastrada, o IBOV (^BVSP) entra como um único
+    bloco. Idempotente; não faz commit.
+    """
+    started = time.perf_counter()
+    price_loader = price_loader or matrix_adjusted_closes
+
+    positions = (
+        db.session.query(PortfolioPosition.symbol, PortfolioPosition.quantity)
+        .filter(PortfolioPosition.portfolio_id == portfolio_id)
+        .all()
+    )
+    holdings: Dict[str, float] = {}
+    for p in positions:
+        holdings[p.symbol] = holdings.get(p.symbol, 0.0) + float(p.quantity or 0)
+
+    bench_symbols = [
+        row.symbol
+        for row in db.session.query(BenchmarkWeight.symbol)
+        .filter(BenchmarkWeight.benchmark == benchmark, BenchmarkWeight.date <= end)
+        .distinct()
+    ]
+    universe = sorted((set(holdings) | set(bench_symbols)) - {BENCHMARK_SYMBOL}) + [BENCHMARK_SYMBOL]
+
+    closes = price_loader(universe, start - timedelta(days=_CARRY_IN_DAYS), end)
+    closes = closes.reindex(columns=universe).sort_index().ffill()
+    previous = closes[closes.index < start]
+    closes = pd.concat([previous.iloc[-1:], closes[(closes.index >= start) & (closes.index <= end)]])
+    if len(closes) < 2:
+        return {"days": 0, "sectors": 0, "elapsed_ms": _elapsed_ms(started)}
+
+    dates = list(closes.index[1:])
+    prices = closes.to_numpy(dtype=float)
+    returns = np.nan_to_num(prices[1:] / prices[:-1] - 1)
+    prior = np.nan_to_num(prices[:-1])
+
+    columns = list(universe) + [CASH_SECTOR]
+    returns = np.hstack([returns, np.zeros((len(dates), 1))])
+
+    # Pesos da carteira no início de cada dia, com o caixa vigente
+    quantity = np.array([holdings.get(s, 0.0) for s in universe])
+    value = prior * quantity
+    cash = editable_metric_series(portfolio_id, dates, ["caixaBruto"])["caixaBruto"]
+    nav = value.sum(axis=1) + cash
+    nav_safe = np.where(nav != 0, nav, np.nan)
+    wp = np.nan_to_num(np.hstack([value, cash[:, None]]) / nav_safe[:, None])
+
+    wb = np.zeros((len(dates), len(columns)))
+    if bench_symbols:
+        bench = load_benchmark_weights(dates, benchmark).reindex(columns=columns, fill_value=0.0)
+        wb = bench.to_numpy(dtype=float, copy=True)
+    # Dias anteriores à primeira composição cadastrada usam o índice como bloco
+    wb[wb.sum(axis=1) == 0, columns.index(BENCHMARK_SYMBOL)] = 1.0
+
+    sectors_by_symbol = load_sectors(universe[:-1])
+    sectors_by_symbol[BENCHMARK_SYMBOL] = BENCHMARK
+    sectors_by_symbol[CASH_SECTOR] = CASH_SECTOR
+    sector_names = sorted(set(sectors_by_symbol.values()))
+    sector_index = {name: g for g, name in enumerate(sector_names)}
+    sector_matrix = np.zeros((len(columns), len(sector_names)))
+    for i, symbol in enumerate(columns):
+        sector_matrix[i, sector_index[sectors_by_symbol[symbol]]] = 1.0
+
+    components = brinson_components(wp, wb, returns, sector_matrix)
+
+    # Grava só os setores com peso em algum dos lados
+    present = (components["portfolio_weight"] != 0) | (components["benchmark_weight"] != 0)
+    rows = [
+        {
+            "portfolio_id": portfolio_id,
+            "date": dates[d],
+            "sector": sector_names[g],
+            **{key: float(values[d, g]) for key, values in components.items()},
+        }
+        for d, g in zip(*np.nonzero(present))
+    ]
+    _upsert_components(portfolio_id, dates, rows)
+
+    result = {
+        "days": len(dates),
+        "sectors": len(sector_names),
+        "start": dates[0].isoformat(),
+        "end": dates[-1].isoformat(),
+        "benchmark": benchmark if bench_symbols else BENCHMARK_SYMBOL,
+        "elapsed_ms": _elapsed_ms(started),
+    }
+    logger.info(f"Atribuição diária do portfólio {portfolio_id}: {result}")
+    return result
+
+
+def _upsert_components(portfolio_id: int, dates: List[date], rows: List[Dict]):
+    """Substitui os componentes do período (setores que sumiram são removidos)."""
+    PortfolioAttributionDaily.query.filter(
+        PortfolioAttributionDaily.portfolio_id == portfolio_id,
+        PortfolioAttributionDaily.date >= dates[0],
+        PortfolioAttributionDaily.date <= dates[-1],
+    ).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(dialect_insert(PortfolioAttributionDaily.__table__).values(rows))
+
+
+def _carino(r: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Fator de ligação logarítmico de Carino, elemento a elemento."""
+    diff = r - b
+    safe = np.where(np.abs(diff) > 1e-12, diff, 1.0)
+    return np.where(
+        np.abs(diff) > 1e-12,
+        (np.log1p(r) - np.log1p(b)) / safe,
+        1 / (1 + r),
+    )
+
+
+def attribution_over_range(portfolio_id: int, start: date, end: date) -> Dict:
+    """Soma os componentes diários gravados no período, por setor."""
+    rows = (
+        PortfolioAttributionDaily.query.filter(
+            PortfolioAttributionDaily.portfolio_id == portfolio_id,
+            PortfolioAttributionDaily.date >= start,
+            PortfolioAttributionDaily.date <= end,
+        )
+        .order_by(PortfolioAttributionDaily.date)
+        .all()
+    )
+    if not rows:
+        return {"days": 0, "sectors": []}
+
+    dates = sorted({r.date for r in rows})
+    sectors = sorted({r.sector for r in rows})
+    d_index = {d: i for i, d in enumerate(dates)}
+    g_index = {s: i for i, s in enumerate(sectors)}
+    keys = ("portfolio_weight", "benchmark_weight", "portfolio_return", "benchmark_return",
+            "allocation", "selection", "interaction")
+    data = {key: np.zeros((len(dates), len(sectors))) for key in keys}
+    for r in rows:
+        for key in keys:
+            data[key][d_index[r.date], g_index[r.sector]] = float(getattr(r, key))
+
+    daily_portfolio = (data["portfolio_weight"] * data["portfolio_return"]).sum(axis=1)
+    daily_benchmark = (data["benchmark_weight"] * data["benchmark_return"]).sum(axis=1)
+    total_portfolio = float(np.prod(1 + daily_portfolio) - 1)
+    total_benchmark = float(np.prod(1 + daily_benchmark) - 1)
+
+    # Cada dia pesa k_t / K, e a soma dos efeitos fecha com R - B composto
+    link = _carino(daily_portfolio, daily_benchmark) / _carino(
+        np.array([total_portfolio]), np.array([total_benchmark])
+    )[0]
+    effects = {key: link @ data[key] for key in ("allocation", "selection", "interaction")}
+
+    result_sectors = [
+        {
+            "sector": sector,
+            "allocation_pct": float(effects["allocation"][g] * 100),
+            "selection_pct": float(effects["selection"][g] * 100),
+            "interaction_pct": float(effects["interaction"][g] * 100),
+            "total_pct": float(
+                (effects["allocation"][g] + effects["selection"][g] + effects["interaction"][g]) * 100
+            ),
+            "avg_portfolio_weight_pct": float(data["portfolio_weight"][:, g].mean() * 100),
+            "avg_benchmark_weight_pct": float(data["benchmark_weight"][:, g].mean() * 100),
+        }
+        for g, sector in enumerate(sectors)
+    ]
+    return {
+        "start": dates[0].isoformat(),
+        "end": dates[-1].isoformat(),
+        "days": len(dates),
+        "portfolio_return_pct": total_portfolio * 100,
+        "benchmark_return_pct": total_benchmark * 100,
+        "active_return_pct": (total_portfolio - total_benchmark) * 100,
+        "allocation_pct": float(effects["allocation"].sum() * 100),
+        "selection_pct": float(effects["selection"].sum() * 100),
+        "interaction_pct": float(effects["interaction"].sum() * 100),
+        "sectors": result_sectors,
+    }
+
+
+def benchmark_sector_weights(as_of: date, benchmark: str = BENCHMARK) -> Dict[str, float]:
+    """Peso percentual de cada setor na composição do índice vigente em ``as_of``."""
+    weights = load_benchmark_weights([as_of], benchmark)
+    if weights is None:
+        return {}
+    row = weights.iloc[0]
+    row = row[row != 0]
+    sectors = load_sectors(row.index)
+    result: Dict[str, float] = {}
+    for symbol, weight in row.items():
+        result[sectors[symbol]] = result.get(sectors[symbol], 0.0) + float(weight) * 100
+    return result
+
+
+def store_benchmark_weights(benchmark: str, as_of: date, weights: Dict[str, float]) -> int:
+    """Grava a composição do índice em ``as_of`` (pesos em %). Não faz commit."""
+    BenchmarkWeight.query.filter_by(benchmark=benchmark, date=as_of).delete(synchronize_session=False)
+    rows = [
+        {"benchmark": benchmark, "symbol": symbol, "date": as_of, "weight": float(weight) / 100}
+        for symbol, weight in weights.items()
+    ]
+    if rows:
+        db.session.execute(dialect_insert(BenchmarkWeight.__table__).values(rows))
+    return len(rows)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
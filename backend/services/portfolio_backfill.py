@@ -0,0 +1,327 @@
+# backend/services/portfolio_backfill.py
+# Reconstrução histórica do patrimônio e da cota das carteiras.
+# Os fechamentos diários formam uma matriz datas × símbolos que é multiplicada
+# pelas quantidades em uma única operação; o resultado é gravado em
+# portfolio_daily_values e portfolio_daily_metrics com um INSERT por tabela.
+# Por padrão só as datas ainda sem registro são preenchidas: fechamentos reais
+# (POST /snapshot e EOD) não são substituídos pela reconstrução.
+# Os preços vêm da matriz de preços (price_matrix); o yfinance só é consultado
+# para os símbolos que ainda não têm dados nela. O patrimônio usa os
+# fechamentos efetivos; risco e atribuição usam os ajustados por proventos.
+
+import logging
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from backend.models import (
+    db,
+    PortfolioPosition,
+    PortfolioDailyValue,
+    PortfolioDailyMetric,
+    PortfolioEditableMetric,
+)
+from backend.services.price_matrix import price_matrix
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+NAV_METRIC_ID = "patrimonioLiquido"
+COTA_METRIC_ID = "valorCota"
+
+# Dias corridos buscados antes de ``start`` para que o primeiro dia do
+# intervalo tenha um fechamento anterior a propagar (feriados, fins de semana)
+_CARRY_IN_DAYS = 10
+
+PriceLoader = Callable[[Sequence[str], date, date], pd.DataFrame]
+
+
+def fetch_daily_closes(
+    symbols: Sequence[str], start: date, end: date, adjusted: bool = False
+) -> pd.DataFrame:
+    """Fechamentos diários (datas × símbolos) via yfinance, em uma única chamada.
+
+    ``adjusted`` devolve os fechamentos ajustados por proventos e desdobramentos.
+    """
+    if not symbols:
+        return pd.DataFrame()
+
+    data = yf.download(
+        [_yahoo_symbol(s) for s in symbols],
+        start=start,
+        end=end + timedelta(days=1),
+        progress=False,
+        auto_adjust=adjusted,
+    )
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(symbols))
+
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(name=_yahoo_symbol(symbols[0]))
+    closes.columns = [str(c).removesuffix(".SA") for c in closes.columns]
+    closes.index = pd.to_datetime(closes.index).date
+    return closes
+
+
+def matrix_daily_closes(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """``PriceLoader`` padrão: fechamentos da matriz de preços, com yfinance para o que faltar."""
+    return _fill_missing(price_matrix.daily_closes(symbols, start, end), symbols, start, end, fetch_daily_closes)
+
+
+def fetch_adjusted_closes(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """``PriceLoader`` do yfinance com fechamentos ajustados."""
+    return fetch_daily_closes(symbols, start, end, adjusted=True)
+
+
+def matrix_adjusted_closes(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """Como ``matrix_daily_closes``, com os fechamentos ajustados por eventos corporativos."""
+    return _fill_missing(
+        price_matrix.adjusted_daily_closes(symbols, start, end), symbols, start, end, fetch_adjusted_closes
+    )
+
+
+def _fill_missing(
+    closes: pd.DataFrame, symbols: Sequence[str], start: date, end: date, fallback: PriceLoader
+) -> pd.DataFrame:
+    # Símbolos sem nenhum preço no período (fora da matriz ou ainda não
+    # gravados em daily_prices) são buscados em uma única chamada ao fallback
+    missing = [s for s in symbols if s not in closes.columns or closes[s].isna().all()]
+    if not missing:
+        return closes
+    logger.info(f"Sem dados na matriz de preços, buscando no yfinance: {missing}")
+    fetched = fallback(missing, start, end).reindex(columns=missing)
+    closes = pd.concat([closes.drop(columns=missing, errors="ignore"), fetched], axis=1)
+    return closes.sort_index().reindex(columns=list(symbols))
+
+
+def _yahoo_symbol(symbol: str) -> str:
+    # Índices (^BVSP) já vêm no formato do Yahoo; ações recebem o sufixo da B3
+    return symbol if symbol.startswith("^") else f"{symbol}.SA"
+
+
+def compute_nav_series(
+    quantity: np.ndarray,
+    avg_price: np.ndarray,
+    closes: np.ndarray,
+    caixa_bruto: np.ndarray,
+    qtd_cotas: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Séries diárias de valor, custo, ganho, patrimônio e cota.
+
+    ``closes`` é a matriz datas × símbolos (NaN para preço ausente);
+    ``quantity`` e ``avg_price`` podem ser vetores por símbolo (posição
+    constante no período) ou matrizes com o mesmo formato de ``closes``.
+    """
+    closes = np.nan_to_num(np.asarray(closes, dtype=float))
+    quantity = np.broadcast_to(np.asarray(quantity, dtype=float), closes.shape)
+    avg_price = np.broadcast_to(np.asarray(avg_price, dtype=float), closes.shape)
+
+    total_value = np.einsum("ds,ds->d", quantity, closes)
+    total_cost = np.einsum("ds,ds->d", quantity, avg_price)
+    total_gain = total_value - total_cost
+    total_gain_percent = np.divide(
+        total_gain * 100, total_cost, out=np.zeros_like(total_gain), where=total_cost != 0
+    )
+
+    patrimonio_liquido = total_value + caixa_bruto
+    valor_cota = np.divide(
+        patrimonio_liquido, qtd_cotas, out=np.zeros_like(patrimonio_liquido), where=qtd_cotas != 0
+    )
+
+    return {
+        "total_value": total_value,
+        "total_cost": total_cost,
+        "total_gain": total_gain,
+        "total_gain_percent": total_gain_percent,
+        "patrimonio_liquido": patrimonio_liquido,
+        "valor_cota": valor_cota,
+    }
+
+
+def editable_metric_series(
+    portfolio_id: int, dates: Sequence[date], keys: Sequence[str]
+) -> Dict[str, np.ndarray]:
+    """Valores das métricas editáveis vigentes em cada data (último valor lançado)."""
+    rows = (
+        db.session.query(
+            PortfolioEditableMetric.date,
+            PortfolioEditableMetric.metric_key,
+            PortfolioEditableMetric.metric_value,
+        )
+        .filter(
+            PortfolioEditableMetric.portfolio_id == portfolio_id,
+            PortfolioEditableMetric.metric_key.in_(keys),
+            PortfolioEditableMetric.date <= dates[-1],
+        )
+        .all()
+    )
+    if not rows:
+        return {key: np.zeros(len(dates)) for key in keys}
+
+    frame = pd.DataFrame(rows, columns=["date", "key", "value"])
+    frame["value"] = frame["value"].astype(float)
+    table = frame.pivot_table(index="date", columns="key", values="value", aggfunc="last")
+    table = table.reindex(table.index.union(dates)).sort_index().ffill().reindex(dates)
+    return {
+        key: table[key].fillna(0).to_numpy() if key in table else np.zeros(len(dates))
+        for key in keys
+    }
+
+
+def backfill_portfolio(
+    portfolio_id: int,
+    start: date,
+    end: date,
+    price_loader: Optional[PriceLoader] = None,
+    overwrite: bool = False,
+) -> Dict:
+    """Recalcula e grava o histórico diário do portfólio entre ``start`` e ``end``.
+
+    Não há histórico de posições: a composição atual é considerada constante
+    no período. O caixa e a quantidade de cotas seguem as métricas editáveis
+    lançadas em cada data. Datas em que algum ativo da carteira ainda não tem
+    preço são puladas. Só preenche datas sem registro, salvo ``overwrite``.
+    A operação é idempotente e não faz commit.
+    """
+    started = time.perf_counter()
+    price_loader = price_loader or matrix_daily_closes
+
+    positions = (
+        db.session.query(
+            PortfolioPosition.symbol, PortfolioPosition.quantity, PortfolioPosition.avg_price
+        )
+        .filter(PortfolioPosition.portfolio_id == portfolio_id)
+        .all()
+    )
+    symbols = sorted({p.symbol for p in positions})
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+    quantity = np.zeros(len(symbols))
+    cost = np.zeros(len(symbols))
+    for p in positions:
+        quantity[column[p.symbol]] += float(p.quantity or 0)
+        cost[column[p.symbol]] += float(p.quantity or 0) * float(p.avg_price or 0)
+    avg_price = np.divide(cost, quantity, out=np.zeros_like(cost), where=quantity != 0)
+
+    closes = price_loader(symbols, start - timedelta(days=_CARRY_IN_DAYS), end)
+    closes = closes.reindex(columns=symbols).sort_index().ffill()
+    closes = closes[(closes.index >= start) & (closes.index <= end)]
+    # Sem fechamento (nem anterior a propagar) o patrimônio do dia seria
+    # subavaliado: a data fica de fora em vez de valer o ativo a zero
+    held = closes.loc[:, quantity != 0]
+    priced = held.notna().all(axis=1).to_numpy()
+    skipped = int((~priced).sum())
+    closes = closes[priced]
+    dates = list(closes.index)
+    fetched = time.perf_counter()
+
+    if not dates:
+        return {
+            "days": 0,
+            "skipped_days": skipped,
+            "symbols": len(symbols),
+            "elapsed_ms": _elapsed_ms(started),
+        }
+
+    editable = editable_metric_series(portfolio_id, dates, ["caixaBruto", "qtdCotas"])
+    series = compute_nav_series(
+        quantity, avg_price, closes.to_numpy(), editable["caixaBruto"], editable["qtdCotas"]
+    )
+
+    written = upsert_daily_values(daily_value_rows(portfolio_id, dates, series), overwrite=overwrite)
+    upsert_daily_metrics(daily_metric_rows(portfolio_id, dates, series), overwrite=overwrite)
+
+    result = {
+        "days": len(dates),
+        "written_days": written,
+        "skipped_days": skipped,
+        "symbols": len(symbols),
+        "start": dates[0].isoformat(),
+        "end": dates[-1].isoformat(),
+        "prices_ms": round((fetched - started) * 1000, 1),
+        "elapsed_ms": _elapsed_ms(started),
+    }
+    logger.info(f"Backfill do portfólio {portfolio_id}: {result}")
+    return result
+
+
+def daily_value_rows(portfolio_id: int, dates: List[date], series: Dict[str, np.ndarray]) -> List[Dict]:
+    """Linhas de portfolio_daily_values a partir das séries de ``compute_nav_series``."""
+    return [
+        {
+            "portfolio_id": portfolio_id,
+            "date": d,
+            "total_value": round(float(series["total_value"][i]), 2),
+            "total_cost": round(float(series["total_cost"][i]), 2),
+            "total_gain": round(float(series["total_gain"][i]), 2),
+            "total_gain_percent": round(float(series["total_gain_percent"][i]), 4),
+        }
+        for i, d in enumerate(dates)
+    ]
+
+
+def daily_metric_rows(portfolio_id: int, dates: List[date], series: Dict[str, np.ndarray]) -> List[Dict]:
+    """Linhas de patrimônio e cota em portfolio_daily_metrics."""
+    return [
+        {
+            "portfolio_id": portfolio_id,
+            "metric_id": metric_id,
+            "date": d,
+            "value": round(float(series[key][i]), 4),
+        }
+        for metric_id, key in ((NAV_METRIC_ID, "patrimonio_liquido"), (COTA_METRIC_ID, "valor_cota"))
+        for i, d in enumerate(dates)
+    ]
+
+
+def upsert_daily_values(rows: List[Dict], overwrite: bool = False) -> int:
+    """Grava valores diários com um único INSERT ... ON CONFLICT (portfolio_id, date).
+
+    Datas já gravadas são mantidas, a menos que ``overwrite`` seja verdadeiro.
+    Retorna quantas linhas foram gravadas.
+    """
+    if not rows:
+        return 0
+    stmt = dialect_insert(PortfolioDailyValue.__table__).values(rows)
+    index_elements = ["portfolio_id", "date"]
+    if overwrite:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={
+                "total_value": stmt.excluded.total_value,
+                "total_cost": stmt.excluded.total_cost,
+                "total_gain": stmt.excluded.total_gain,
+                "total_gain_percent": stmt.excluded.total_gain_percent,
+            },
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return db.session.execute(stmt).rowcount
+
+
+def upsert_daily_metrics(rows: List[Dict], overwrite: bool = False) -> int:
+    """Grava métricas diárias com um único INSERT ... ON CONFLICT (portfolio_id, metric_id, date).
+
+    Datas já gravadas são mantidas, a menos que ``overwrite`` seja verdadeiro.
+    Retorna quantas linhas foram gravadas.
+    """
+    if not rows:
+        return 0
+    stmt = dialect_insert(PortfolioDailyMetric.__table__).values(rows)
+    index_elements = ["portfolio_id", "metric_id", "date"]
+    if overwrite:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={"value": stmt.excluded.value},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return db.session.execute(stmt).rowcount
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
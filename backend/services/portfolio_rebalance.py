@@ -0,0 +1,248 @@
+# backend/services/portfolio_rebalance.py
+# Otimizador de rebalanceamento com lotes da B3.
+# Converte pesos-alvo em ordens executáveis (múltiplos do lote padrão) que
+# minimizam o desvio quadrático em relação ao alvo sem consumir mais caixa do
+# que o disponível. Vários vetores de alvo (cenários) são resolvidos juntos
+# sobre arrays cenários × ativos.
+
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.models import db, Ticker, AssetMetrics
+
+logger = logging.getLogger(__name__)
+
+# Lote padrão por tipo de ativo; demais tipos (ETF, FII, futuros) negociam de 1 em 1
+ROUND_LOTS = {"stock": 100}
+DEFAULT_LOT = 1
+
+_EPS = 1e-9
+
+
+def solve_rebalance(
+    quantity: np.ndarray,
+    price: np.ndarray,
+    lot: np.ndarray,
+    targets: np.ndarray,
+    nav: float,
+    cash: float,
+    min_cash: float = 0.0,
+    max_iter: Optional[int] = None,
+) -> np.ndarray:
+    """Quantidades a negociar (cenários × ativos), em múltiplos de ``lot``.
+
+    ``targets`` são frações do patrimônio (negativas para vendido). Vendas,
+    inclusive a descoberto, liberam caixa; compras o consomem, e o caixa
+    final de cada cenário nunca fica abaixo de ``min_cash`` (a menos que já
+    esteja e não haja o que vender).
+    """
+    targets = np.atleast_2d(np.asarray(targets, dtype=float))
+    tradable = np.isfinite(price) & (price > 0)
+    p = np.where(tradable, price, 0.0)
+    value = quantity * p
+    budget = cash - min_cash
+
+    if nav <= 0:
+        return np.zeros_like(targets)
+
+    # Solução contínua; se as compras excedem o caixa, são reduzidas na mesma proporção
+    ideal = np.divide(targets * nav - value, p, out=np.zeros_like(targets), where=tradable)
+    buys = np.maximum(ideal, 0) @ p
+    available = budget + np.maximum(-ideal, 0) @ p
+    over = buys > available
+    scale = np.ones_like(buys)
+    scale[over] = np.clip(available[over] / buys[over], 0, 1)
+    ideal = np.where(ideal > 0, ideal * scale[:, None], ideal)
+
+    delta = np.round(ideal / lot) * lot
+    step = lot * p / nav
+    rows = np.arange(len(targets))
+    max_iter = max_iter or 4 * targets.shape[1] + 10
+
+    # Reparo: enquanto faltar caixa, cancela a compra (ou vende o lote) que
+    # menos aumenta o desvio
+    for _ in range(max_iter):
+        short = budget - delta @ p < -_EPS
+        if not short.any():
+            break
+        err = (quantity + delta) * p / nav - targets
+        can_sell = tradable & ((delta > 0) | (quantity + delta >= lot))
+        cost = np.where(can_sell, step * step - 2 * err * step, np.inf)
+        best = np.argmin(cost, axis=1)
+        fix = short & np.isfinite(cost[rows, best])
+        if not fix.any():
+            break
+        delta[rows[fix], best[fix]] -= lot[best[fix]]
+
+    # Busca local: aplica o lote (compra ou venda) que mais reduz o desvio
+    # enquanto houver melhora e caixa
+    for _ in range(max_iter):
+        err = (quantity + delta) * p / nav - targets
+        room = budget - delta @ p
+        add = np.where(
+            tradable & (room[:, None] - lot * p >= -_EPS), step * step + 2 * err * step, np.inf
+        )
+        remove = np.where(tradable, step * step - 2 * err * step, np.inf)
+        best_add = np.argmin(add, axis=1)
+        best_remove = np.argmin(remove, axis=1)
+        gain_add = add[rows, best_add]
+        gain_remove = remove[rows, best_remove]
+        do_add = (gain_add < -_EPS) & (gain_add <= gain_remove)
+        do_remove = (gain_remove < -_EPS) & ~do_add
+        if not (do_add.any() or do_remove.any()):
+            break
+        delta[rows[do_add], best_add[do_add]] += lot[best_add[do_add]]
+        delta[rows[do_remove], best_remove[do_remove]] -= lot[best_remove[do_remove]]
+
+    return delta
+
+
+class RebalanceProblem:
+    """Carteira atual (por ativo) pronta para avaliar vetores de alvo."""
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        quantity: np.ndarray,
+        price: np.ndarray,
+        lot: np.ndarray,
+        target_pct: np.ndarray,
+        nav: float,
+        cash: float,
+    ):
+        self.symbols = list(symbols)
+        self.column = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.quantity = quantity
+        self.price = price
+        self.lot = lot
+        self.target_pct = target_pct
+        self.nav = nav
+        self.cash = cash
+
+    @classmethod
+    def from_summary(
+        cls,
+        summary: Dict,
+        extra_symbols: Sequence[str] = (),
+        lot_sizes: Optional[Dict[str, int]] = None,
+    ) -> "RebalanceProblem":
+        """Monta o problema a partir do resumo da carteira.
+
+        Ativos citados apenas nos cenários entram com quantidade zero; preço e
+        tipo (para o lote) vêm de uma única consulta. Os que não estão
+        cadastrados em tickers ficam de fora (``target_matrix`` os rejeita).
+        """
+        holdings: Dict[str, List[float]] = {}
+        for h in summary["holdings"]:
+            entry = holdings.setdefault(h["symbol"], [0.0, 0.0, 0.0])
+            entry[0] += h["quantity"]
+            entry[1] = h["last_price"]
+            entry[2] += h["target_pct"]
+
+        extra = [s for s in dict.fromkeys(extra_symbols) if s not in holdings]
+        rows = (
+            db.session.query(Ticker.symbol, Ticker.type, AssetMetrics.last_price)
+            .outerjoin(AssetMetrics, Ticker.symbol == AssetMetrics.symbol)
+            .filter(Ticker.symbol.in_(list(holdings) + extra))
+            .all()
+        )
+        info = {r.symbol: r for r in rows}
+        symbols = list(holdings) + [s for s in extra if s in info]
+        lot_sizes = lot_sizes or {}
+
+        def lot_for(symbol):
+            if symbol in lot_sizes:
+                return lot_sizes[symbol]
+            ticker = info.get(symbol)
+            return ROUND_LOTS.get(ticker.type if ticker else None, DEFAULT_LOT)
+
+        def price_for(symbol):
+            if symbol in holdings:
+                return holdings[symbol][1]
+            ticker = info.get(symbol)
+            return float(ticker.last_price) if ticker and ticker.last_price is not None else 0.0
+
+        nav = float(summary.get("patrimonio_liquido") or 0.0)
+        return cls(
+            symbols,
+            quantity=np.array([holdings.get(s, [0.0])[0] for s in symbols], dtype=float),
+            price=np.array([price_for(s) for s in symbols], dtype=float),
+            lot=np.array([max(int(lot_for(s)), 1) for s in symbols], dtype=float),
+            target_pct=np.array([holdings[s][2] if s in holdings else 0.0 for s in symbols], dtype=float),
+            nav=nav,
+            cash=nav - float(summary.get("total_value") or 0.0),
+        )
+
+    def target_matrix(self, scenarios: Sequence[Dict[str, float]]) -> np.ndarray:
+        """Matriz cenários × ativos em %; ativos omitidos mantêm o alvo cadastrado.
+
+        Levanta ``ValueError`` para ativos desconhecidos ou sem preço, cujo
+        alvo não poderia ser atingido.
+        """
+        requested = list(dict.fromkeys(symbol for targets in scenarios for symbol in targets))
+        unknown = [s for s in requested if s not in self.column]
+        if unknown:
+            raise ValueError(f"Ativos desconhecidos: {', '.join(unknown)}")
+        unpriced = [
+            s for s in requested
+            if not (np.isfinite(self.price[self.column[s]]) and self.price[self.column[s]] > 0)
+        ]
+        if unpriced:
+            raise ValueError(f"Ativos sem preço: {', '.join(unpriced)}")
+
+        matrix = np.tile(self.target_pct, (len(scenarios), 1))
+        for k, targets in enumerate(scenarios):
+            for symbol, pct in targets.items():
+                matrix[k, self.column[symbol]] = float(pct)
+        return matrix
+
+    def evaluate(self, target_pct: np.ndarray, min_cash: float = 0.0) -> List[Dict]:
+        """Ordens e métricas de cada cenário (``target_pct`` em %)."""
+        target_pct = np.atleast_2d(target_pct)
+        targets = target_pct / 100
+        delta = solve_rebalance(
+            self.quantity, self.price, self.lot, targets, self.nav, self.cash, min_cash=min_cash
+        )
+
+        p = np.nan_to_num(self.price)
+        traded = delta * p
+        final_pct = (
+            (self.quantity + delta) * p / self.nav * 100 if self.nav > 0 else np.zeros_like(delta)
+        )
+        current_pct = (
+            self.quantity * p / self.nav * 100 if self.nav > 0 else np.zeros_like(self.quantity)
+        )
+        tracking_error = np.sqrt(((final_pct - target_pct) ** 2).sum(axis=1))
+        tracking_error_before = np.sqrt(((current_pct - target_pct) ** 2).sum(axis=1))
+        cash_after = self.cash - traded.sum(axis=1)
+        turnover = np.abs(traded).sum(axis=1)
+
+        results = []
+        for k in range(len(target_pct)):
+            orders = [
+                {
+                    "symbol": self.symbols[i],
+                    "side": "buy" if delta[k, i] > 0 else "sell",
+                    "quantity": int(abs(delta[k, i])),
+                    "lot_size": int(self.lot[i]),
+                    "price": float(p[i]),
+                    "value": float(abs(traded[k, i])),
+                    "current_pct": float(current_pct[i]),
+                    "target_pct": float(target_pct[k, i]),
+                    "final_pct": float(final_pct[k, i]),
+                }
+                for i in np.flatnonzero(delta[k])
+            ]
+            results.append(
+                {
+                    "orders": orders,
+                    "cash_before": self.cash,
+                    "cash_after": float(cash_after[k]),
+                    "turnover": float(turnover[k]),
+                    "tracking_error_before_pct": float(tracking_error_before[k]),
+                    "tracking_error_pct": float(tracking_error[k]),
+                }
+            )
+        return results
@@ -0,0 +1,256 @@
+# backend/services/portfolio_risk.py
+# Motor de risco das carteiras: VaR/CVaR histórico e paramétrico,
+# volatilidade anualizada, beta contra o IBOV e risco marginal/componente.
+# O histórico de preços de todo o universo é carregado uma vez por pregão, com
+# fechamentos ajustados por proventos (datas ex não viram quedas de preço), e a
+# covariância é calculada uma única vez; cada carteira é só um vetor de pesos
+# sobre a mesma matriz, de modo que avaliar todos os fundos no fechamento
+# custa uma multiplicação de matrizes.
+
+import logging
+import threading
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.services.portfolio_backfill import matrix_adjusted_closes
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_SYMBOL = "^BVSP"
+TRADING_DAYS = 252
+# Janela de ~1 ano de pregões (dias corridos)
+LOOKBACK_DAYS = 370
+
+PriceLoader = Callable[[Sequence[str], date, date], pd.DataFrame]
+
+
+class RiskModel:
+    """Retornos diários de um universo de ativos e do benchmark."""
+
+    def __init__(self, closes: pd.DataFrame, benchmark: Optional[str] = BENCHMARK_SYMBOL):
+        closes = closes.sort_index().ffill()
+        returns = closes.pct_change().iloc[1:]
+
+        self.as_of = closes.index[-1] if len(closes.index) else None
+        self.benchmark_returns = None
+        if benchmark in returns.columns:
+            bench = returns.pop(benchmark)
+            if bench.notna().any():
+                self.benchmark_returns = bench.fillna(0).to_numpy()
+
+        self.symbols = list(returns.columns)
+        self.column = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # Ativo sem cotação no dia contribui com retorno zero
+        self.returns = np.nan_to_num(returns.to_numpy(dtype=float))
+        n_assets = len(self.symbols)
+        if self.observations > 1 and n_assets:
+            self.cov = np.atleast_2d(np.cov(self.returns, rowvar=False))
+        else:
+            self.cov = np.zeros((n_assets, n_assets))
+
+        self.asset_betas = None
+        if self.benchmark_returns is not None and self.observations > 1:
+            bench_var = np.var(self.benchmark_returns, ddof=1)
+            if bench_var > 0:
+                centered = self.benchmark_returns - self.benchmark_returns.mean()
+                asset_cov = centered @ (self.returns - self.returns.mean(axis=0)) / (len(centered) - 1)
+                self.asset_betas = asset_cov / bench_var
+
+    @property
+    def observations(self) -> int:
+        return len(self.returns)
+
+    def weights_for(self, holdings: Sequence[Dict], nav: float) -> np.ndarray:
+        """Vetor de pesos (fração do patrimônio) no universo do modelo."""
+        weights = np.zeros(len(self.symbols))
+        gross = sum(abs(h.get("position_value") or 0.0) for h in holdings)
+        base = nav if nav > 0 else gross
+        if not base:
+            return weights
+        for h in holdings:
+            i = self.column.get(h["symbol"])
+            if i is not None:
+                weights[i] += (h.get("position_value") or 0.0) / base
+        return weights
+
+    def evaluate(self, weights: np.ndarray, confidence: float = 0.95) -> list:
+        """Métricas de risco para uma matriz de pesos (carteiras × ativos)."""
+        weights = np.atleast_2d(weights)
+        n_portfolios = weights.shape[0]
+        if not self.observations:
+            return [None] * n_portfolios
+
+        z = NormalDist().inv_cdf(confidence)
+        tail = 1 - confidence
+
+        # Retornos diários de todas as carteiras de uma vez (pregões × carteiras)
+        pnl = self.returns @ weights.T
+        mean = pnl.mean(axis=0)
+        var_hist = -np.quantile(pnl, tail, axis=0)
+        in_tail = pnl <= -var_hist
+        cvar_hist = -np.where(in_tail, pnl, 0).sum(axis=0) / np.maximum(in_tail.sum(axis=0), 1)
+
+        cov_w = weights @ self.cov
+        variance = np.einsum("ps,ps->p", cov_w, weights)
+        sigma = np.sqrt(np.maximum(variance, 0))
+        var_param = z * sigma - mean
+        cvar_param = sigma * NormalDist().pdf(z) / tail - mean
+
+        beta = None
+        if self.asset_betas is not None:
+            beta = weights @ self.asset_betas
+
+        results = []
+        for p in range(n_portfolios):
+            w = weights[p]
+            # Risco marginal (dσ/dw) e componente (w·dσ/dw), que somam σ
+            marginal = cov_w[p] / sigma[p] if sigma[p] > 0 else np.zeros_like(w)
+            component = w * marginal
+            held = np.flatnonzero(w)
+            results.append(
+                {
+                    "as_of": self.as_of.isoformat() if self.as_of else None,
+                    "observations": self.observations,
+                    "confidence": confidence,
+                    "volatility_daily_pct": float(sigma[p] * 100),
+                    "volatility_annual_pct": float(sigma[p] * np.sqrt(TRADING_DAYS) * 100),
+                    "var_historical_pct": float(var_hist[p] * 100),
+                    "cvar_historical_pct": float(cvar_hist[p] * 100),
+                    "var_parametric_pct": float(var_param[p] * 100),
+                    "cvar_parametric_pct": float(cvar_param[p] * 100),
+                    "beta": float(beta[p]) if beta is not None else None,
+                    "holdings": [
+                        {
+                            "symbol": self.symbols[i],
+                            "weight_pct": float(w[i] * 100),
+                            "marginal_risk_pct": float(marginal[i] * 100),
+                            "component_risk_pct": float(component[i] * 100),
+                            "risk_contribution_pct": (
+                                float(component[i] / sigma[p] * 100) if sigma[p] > 0 else 0.0
+                            ),
+                            "beta": (
+                                float(self.asset_betas[i]) if self.asset_betas is not None else None
+                            ),
+                        }
+                        for i in held
+                    ],
+                }
+            )
+        return results
+
+
+def _with_values(risk: Optional[Dict], nav: float) -> Optional[Dict]:
+    """Cópia de ``risk`` com os valores monetários (R$) das medidas de perda."""
+    if risk is None:
+        return None
+    risk = dict(risk)
+    for key in ("var_historical", "cvar_historical", "var_parametric", "cvar_parametric"):
+        risk[f"{key}_value"] = risk[f"{key}_pct"] / 100 * nav
+    return risk
+
+
+def _holdings_signature(summary: Dict) -> Tuple:
+    return tuple(sorted((h["symbol"], h["quantity"]) for h in summary["holdings"]))
+
+
+class PortfolioRiskEngine:
+    """Calcula e guarda, por pregão, as métricas de risco das carteiras.
+
+    O cache guarda só as medidas percentuais; os valores em R$ saem do
+    patrimônio do resumo recebido em cada chamada. O histórico de preços é
+    carregado fora do ``_lock`` (o loader pode cair na rede), com uma única
+    carga em andamento por pregão.
+    """
+
+    def __init__(self, price_loader: Optional[PriceLoader] = None):
+        self._lock = threading.Lock()
+        self._price_loader = price_loader
+        self._model: Optional[Tuple[date, frozenset, RiskModel]] = None
+        self._loading: Dict[date, threading.Lock] = {}
+        self._results: Dict[Tuple[int, float], Tuple[date, Tuple, Dict]] = {}
+
+    def _model_for(self, symbols: Sequence[str], trading_day: date) -> RiskModel:
+        """Modelo do pregão cobrindo ``symbols``; reaproveitado enquanto os cobrir."""
+        wanted = frozenset(symbols)
+        with self._lock:
+            loading = self._loading.setdefault(trading_day, threading.Lock())
+
+        # Quem chega durante a carga espera e reaproveita o modelo recém-montado
+        with loading:
+            with self._lock:
+                current = self._model
+            if current and current[0] == trading_day and wanted <= current[1]:
+                return current[2]
+
+            if current and current[0] == trading_day:
+                wanted |= current[1]
+            loader = self._price_loader or matrix_adjusted_closes
+            closes = loader(
+                sorted(wanted) + [BENCHMARK_SYMBOL], trading_day - timedelta(days=LOOKBACK_DAYS), trading_day
+            )
+            model = RiskModel(closes.reindex(columns=sorted(wanted) + [BENCHMARK_SYMBOL]))
+
+            with self._lock:
+                if self._model is None or self._model[0] <= trading_day:
+                    self._model = (trading_day, wanted, model)
+                for day in [d for d, lock in self._loading.items() if d < trading_day and not lock.locked()]:
+                    del self._loading[day]
+        return model
+
+    def evaluate(
+        self,
+        summaries: Dict[int, Dict],
+        confidence: float = 0.95,
+        trading_day: Optional[date] = None,
+    ) -> Dict[int, Optional[Dict]]:
+        """Risco de várias carteiras a partir dos resumos já calculados.
+
+        Resultados de carteiras cuja composição não mudou são reaproveitados
+        até o próximo pregão; as demais são avaliadas juntas sobre o mesmo
+        modelo de covariância.
+        """
+        trading_day = trading_day or date.today()
+        risks: Dict[int, Optional[Dict]] = {}
+        pending = {}
+
+        with self._lock:
+            for pid, summary in summaries.items():
+                cached = self._results.get((pid, confidence))
+                if cached and cached[0] == trading_day and cached[1] == _holdings_signature(summary):
+                    risks[pid] = cached[2]
+                else:
+                    pending[pid] = summary
+
+        if pending:
+            symbols = {h["symbol"] for s in pending.values() for h in s["holdings"]}
+            model = self._model_for(sorted(symbols), trading_day)
+            ids = list(pending)
+            weights = np.vstack(
+                [
+                    model.weights_for(pending[pid]["holdings"], pending[pid]["patrimonio_liquido"])
+                    for pid in ids
+                ]
+            )
+
+            computed = dict(zip(ids, model.evaluate(weights, confidence)))
+            with self._lock:
+                for pid, risk in computed.items():
+                    self._results[(pid, confidence)] = (trading_day, _holdings_signature(pending[pid]), risk)
+            risks.update(computed)
+            logger.debug(f"Risco calculado para {len(pending)} carteira(s) em {trading_day}")
+
+        return {
+            pid: _with_values(risks[pid], summaries[pid]["patrimonio_liquido"]) for pid in summaries
+        }
+
+    def clear(self):
+        with self._lock:
+            self._model = None
+            self._results.clear()
+
+
+portfolio_risk_engine = PortfolioRiskEngine()
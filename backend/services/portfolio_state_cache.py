@@ -0,0 +1,248 @@
+# backend/services/portfolio_state_cache.py
+# Cache em memória do estado valorizado das carteiras.
+# Alimentado pelo RTD worker a cada cotação: apenas as posições do símbolo
+# que mudou são reavaliadas e os totais são corrigidos por diferença.
+# Cada estado guarda o portfolios.data_version com que foi carregado; as
+# leituras informam a versão atual do banco e um estado de versão diferente
+# (posições ou métricas gravadas por outro processo) é descartado.
+
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services.portfolio_valuation import (
+    PortfolioBook,
+    compute_daily_change_pct,
+    summarize_totals,
+)
+
+logger = logging.getLogger(__name__)
+
+_NAN = float("nan")
+
+
+class PortfolioState:
+    """Carteira valorizada em memória, com totais mantidos por delta."""
+
+    def __init__(
+        self,
+        portfolio_id: int,
+        name: str,
+        book: PortfolioBook,
+        caixa_bruto: float = 0.0,
+        qtd_cotas: float = 0.0,
+        cota_d1: float = 0.0,
+        data_version: Optional[int] = None,
+    ):
+        self.portfolio_id = portfolio_id
+        self.name = name
+        self.book = book
+        self.data_version = data_version
+        self.caixa_bruto = caixa_bruto
+        self.qtd_cotas = qtd_cotas
+        self.cota_d1 = cota_d1
+
+        positions: Dict[str, list] = {}
+        for i, symbol in enumerate(book.symbols):
+            positions.setdefault(symbol, []).append(i)
+        self.index: Dict[str, np.ndarray] = {
+            symbol: np.array(idx, dtype=np.intp) for symbol, idx in positions.items()
+        }
+        self._resync()
+
+    def _resync(self):
+        """Recalcula os totais do zero, descartando o erro acumulado dos deltas."""
+        self.position_value = self.book.quantity * self.book.last_price
+        pv = self.position_value
+        self.total_value = float(pv.sum())
+        self.total_long = float(pv[pv >= 0].sum())
+        self.total_short = float(pv[pv < 0].sum())
+
+    def reprice(self, symbol: str, last_price: float, daily_change_pct: float) -> bool:
+        """Reavalia as posições de ``symbol`` e corrige os totais pela diferença."""
+        idx = self.index.get(symbol)
+        if idx is None:
+            return False
+
+        old = self.position_value[idx]
+        new = self.book.quantity[idx] * last_price
+        self.total_value += float((new - old).sum())
+        self.total_long += float(new[new >= 0].sum() - old[old >= 0].sum())
+        self.total_short += float(new[new < 0].sum() - old[old < 0].sum())
+
+        self.position_value[idx] = new
+        self.book.last_price[idx] = last_price
+        self.book.daily_change_pct[idx] = daily_change_pct
+        return True
+
+    def snapshot(self) -> Dict:
+        """Resumo sem holdings, obtido em O(1) a partir dos totais correntes."""
+        return {
+            "id": self.portfolio_id,
+            "name": self.name,
+            "total_value": self.total_value,
+            **summarize_totals(
+                self.total_value,
+                self.total_long,
+                self.total_short,
+                caixa_bruto=self.caixa_bruto,
+                qtd_cotas=self.qtd_cotas,
+                cota_d1=self.cota_d1,
+            ),
+        }
+
+    def summary(self) -> Dict:
+        """Resumo completo com holdings, calculado sobre os arrays em memória."""
+        result = {
+            "id": self.portfolio_id,
+            "name": self.name,
+            **self.book.value(
+                caixa_bruto=self.caixa_bruto,
+                qtd_cotas=self.qtd_cotas,
+                cota_d1=self.cota_d1,
+            ),
+        }
+        self._resync()
+        return result
+
+
+class PortfolioStateCache:
+    """Estados de carteira por id, atualizados incrementalmente pelas cotações.
+
+    O cache só é consultado enquanto está ativo (``start``), isto é, quando o
+    RTD worker deste processo o alimenta; do contrário as leituras retornam
+    ``None`` e o chamador recalcula a partir do banco.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: Dict[int, PortfolioState] = {}
+        # Última cotação conhecida por símbolo: (last, previous_close, open)
+        self._quotes: Dict[str, Tuple[float, float, float]] = {}
+        self.live = False
+        # Incrementado a cada invalidação, para quem recarrega as carteiras
+        self.generation = 0
+
+    def start(self):
+        self.live = True
+        logger.info("Cache de estado das carteiras ativo")
+
+    def stop(self):
+        with self._lock:
+            self.live = False
+            self._states.clear()
+            self._quotes.clear()
+
+    def invalidate(self, portfolio_id: Optional[int] = None):
+        """Descarta o estado de uma carteira (ou de todas)."""
+        with self._lock:
+            self.generation += 1
+            if portfolio_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(portfolio_id, None)
+
+    def versions(self) -> Dict[int, Optional[int]]:
+        """data_version de cada carteira em cache."""
+        with self._lock:
+            return {pid: state.data_version for pid, state in self._states.items()}
+
+    def _state(self, portfolio_id: int, version: Optional[int]) -> Optional[PortfolioState]:
+        # Chamado com o lock; ``version`` None dispensa a verificação
+        state = self._states.get(portfolio_id)
+        if state is not None and version is not None and state.data_version != version:
+            del self._states[portfolio_id]
+            return None
+        return state
+
+    def snapshot(self, portfolio_id: int, version: Optional[int] = None) -> Optional[Dict]:
+        """Resumo sem holdings; None se a carteira não está em cache ou ``version`` mudou."""
+        if not self.live:
+            return None
+        with self._lock:
+            state = self._state(portfolio_id, version)
+            return state.snapshot() if state else None
+
+    def snapshots(self) -> List[Dict]:
+        """Resumos sem holdings de todas as carteiras em cache."""
+        if not self.live:
+            return []
+        with self._lock:
+            return [state.snapshot() for state in self._states.values()]
+
+    def summary(self, portfolio_id: int, version: Optional[int] = None) -> Optional[Dict]:
+        """Resumo com holdings; None se a carteira não está em cache ou ``version`` mudou."""
+        if not self.live:
+            return None
+        with self._lock:
+            state = self._state(portfolio_id, version)
+            return state.summary() if state else None
+
+    def store(self, state: PortfolioState) -> Dict:
+        """Registra o estado recém-carregado do banco e retorna seu resumo.
+
+        Cotações recebidas antes do registro são reaplicadas, de modo que um
+        tick processado durante a leitura do banco não se perde.
+        """
+        with self._lock:
+            if self.live:
+                book = state.book
+                for symbol, idx in state.index.items():
+                    quote = self._quotes.get(symbol)
+                    if quote is None:
+                        self._quotes[symbol] = (
+                            _NAN,
+                            float(book.previous_close[idx[0]]),
+                            float(book.open_price[idx[0]]),
+                        )
+                    elif not np.isnan(quote[0]):
+                        state.reprice(symbol, quote[0], self._daily_change_pct(*quote))
+                self._states[state.portfolio_id] = state
+            return state.summary()
+
+    def apply_quote(
+        self,
+        symbol: str,
+        last_price: float,
+        previous_close: Optional[float] = None,
+        open_price: Optional[float] = None,
+    ) -> int:
+        """Reavalia ``symbol`` em todas as carteiras em cache.
+
+        Retorna o número de carteiras afetadas.
+        """
+        if not self.live:
+            return 0
+
+        with self._lock:
+            _, known_close, known_open = self._quotes.get(symbol, (_NAN, _NAN, _NAN))
+            # Referências ausentes mantêm o último valor conhecido, como o
+            # COALESCE do upsert em asset_metrics
+            if not previous_close or previous_close <= 0:
+                previous_close = known_close
+            if not open_price or open_price <= 0:
+                open_price = known_open
+
+            quote = (last_price, previous_close, open_price)
+            self._quotes[symbol] = quote
+            daily_change_pct = self._daily_change_pct(*quote)
+
+            updated = 0
+            for state in self._states.values():
+                if state.reprice(symbol, last_price, daily_change_pct):
+                    updated += 1
+            return updated
+
+    @staticmethod
+    def _daily_change_pct(last_price: float, previous_close: float, open_price: float) -> float:
+        nan = np.array([_NAN])
+        return float(
+            compute_daily_change_pct(
+                np.array([last_price]), nan, np.array([previous_close]), np.array([open_price]), nan
+            )[0]
+        )
+
+
+portfolio_state_cache = PortfolioStateCache()
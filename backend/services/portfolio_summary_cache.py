@@ -0,0 +1,89 @@
+# backend/services/portfolio_summary_cache.py
+# Cache versionado dos resumos calculados por calculate_portfolio_summary.
+# A chave combina portfolios.data_version, incrementado na mesma transação de
+# cada gravação de posições ou métricas editáveis, e o último updated_at de
+# AssetMetrics dos ativos da carteira. Como o carimbo vem do banco, uma
+# gravação feita por qualquer processo invalida o resumo em todos eles, e as
+# rotas que consultam o resumo compartilham um único cálculo por mudança.
+# O estado em memória do RTD worker (portfolio_state_cache), consultado antes
+# deste cache, é descartado pelo mesmo data_version.
+
+import logging
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.sql import func
+
+from backend.models import db, Portfolio, PortfolioPosition, AssetMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryStamp(NamedTuple):
+    data_version: Optional[int]
+    prices_updated_at: object
+
+
+class PortfolioSummaryCache:
+    """Resumos de carteira indexados por id e carimbo de versão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, tuple] = {}
+
+    def touch(self, portfolio_id: int):
+        """Marca posições ou métricas editáveis da carteira como alteradas.
+
+        Incrementa ``data_version`` na transação corrente; deve ser chamado
+        antes do commit da gravação.
+        """
+        db.session.execute(
+            update(Portfolio)
+            .where(Portfolio.id == portfolio_id)
+            .values(data_version=Portfolio.data_version + 1)
+        )
+        with self._lock:
+            self._entries.pop(portfolio_id, None)
+
+    def stamp(self, portfolio_id: int) -> SummaryStamp:
+        """Monta o carimbo de versão atual da carteira em uma única consulta.
+
+        Deve ser obtido antes do cálculo: se os preços mudarem durante o
+        cálculo, o resultado fica associado ao carimbo antigo e é refeito na
+        próxima leitura.
+        """
+        version = (
+            select(Portfolio.data_version).where(Portfolio.id == portfolio_id).scalar_subquery()
+        )
+        prices_updated_at = (
+            select(func.max(AssetMetrics.updated_at))
+            .join(PortfolioPosition, PortfolioPosition.symbol == AssetMetrics.symbol)
+            .where(PortfolioPosition.portfolio_id == portfolio_id)
+            .scalar_subquery()
+        )
+        row = db.session.execute(select(version, prices_updated_at)).one()
+        return SummaryStamp(row[0], row[1])
+
+    def get(self, portfolio_id: int, stamp: SummaryStamp) -> Optional[Dict]:
+        """Retorna o resumo em cache se o carimbo ainda for o mesmo.
+
+        O dicionário é compartilhado entre as chamadas e deve ser tratado
+        como somente leitura.
+        """
+        with self._lock:
+            entry = self._entries.get(portfolio_id)
+        if entry and entry[0] == stamp:
+            return entry[1]
+        return None
+
+    def put(self, portfolio_id: int, stamp: SummaryStamp, summary: Dict):
+        with self._lock:
+            self._entries[portfolio_id] = (stamp, summary)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+portfolio_summary_cache = PortfolioSummaryCache()
@@ -0,0 +1,305 @@
+# backend/services/portfolio_valuation.py
+# Motor vetorizado de valorização de carteiras.
+# Carrega posições e AssetMetrics em arrays NumPy uma única vez e calcula
+# valor, custo, ganho, pesos, contribuição e ajuste sobre o array inteiro.
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.models import db, PortfolioPosition, AssetMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def load_position_rows(portfolio_ids: Iterable[int], session=None):
+    """Busca posições e preços de uma ou mais carteiras em uma única consulta.
+
+    ``session`` permite a leitura fora de um contexto de aplicação (ex.: RTD worker).
+    """
+    session = session or db.session
+    return (
+        session.query(
+            PortfolioPosition.portfolio_id,
+            PortfolioPosition.symbol,
+            PortfolioPosition.quantity,
+            PortfolioPosition.avg_price,
+            PortfolioPosition.target_weight,
+            AssetMetrics.last_price,
+            AssetMetrics.previous_close_correct,
+            AssetMetrics.previous_close,
+            AssetMetrics.open_price,
+            AssetMetrics.price_change_percent,
+        )
+        .outerjoin(AssetMetrics, PortfolioPosition.symbol == AssetMetrics.symbol)
+        .filter(PortfolioPosition.portfolio_id.in_(list(portfolio_ids)))
+        .order_by(PortfolioPosition.portfolio_id, PortfolioPosition.id)
+        .all()
+    )
+
+
+def to_array(values: Iterable) -> np.ndarray:
+    """Converte valores Decimal/None em array float (None vira NaN)."""
+    return np.array(list(values), dtype=float)
+
+
+def compute_daily_change_pct(
+    last_price: np.ndarray,
+    previous_close_correct: np.ndarray,
+    previous_close: np.ndarray,
+    open_price: np.ndarray,
+    price_change_percent: np.ndarray,
+) -> np.ndarray:
+    """Calcula a variação diária (%) de cada ativo.
+
+    Usa o fechamento anterior (``previous_close_correct`` com fallback para
+    ``previous_close``); sem ele, a abertura. Se o resultado for zero,
+    recorre a ``price_change_percent`` gravado pelo worker.
+    """
+    prev = np.where(np.isnan(previous_close_correct), previous_close, previous_close_correct)
+    last = np.nan_to_num(last_price)
+    prev = np.nan_to_num(prev)
+    opn = np.nan_to_num(open_price)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        from_prev = (last / prev - 1) * 100
+        from_open = (last / opn - 1) * 100
+
+    pct = np.where(prev != 0, from_prev, np.where(opn != 0, from_open, 0.0))
+    return np.where(pct == 0, np.nan_to_num(price_change_percent), pct)
+
+
+def summarize_totals(
+    total_value: float,
+    total_long: float,
+    total_short: float,
+    caixa_bruto: float = 0.0,
+    qtd_cotas: float = 0.0,
+    cota_d1: float = 0.0,
+) -> Dict:
+    """Calcula patrimônio, cota e exposições a partir dos totais da carteira."""
+    # O caixa bruto compõe o patrimônio líquido e reduz a posição comprada
+    patrimonio_liquido = total_value + caixa_bruto
+
+    if patrimonio_liquido:
+        posicao_comprada_pct = (total_long - caixa_bruto) / patrimonio_liquido * 100
+        posicao_vendida_pct = abs(total_short) / patrimonio_liquido * 100
+        exposicao_total_pct = (
+            (total_long - caixa_bruto + abs(total_short)) / patrimonio_liquido * 100
+        )
+    else:
+        posicao_comprada_pct = 0.0
+        posicao_vendida_pct = 0.0
+        exposicao_total_pct = 0.0
+
+    valor_cota = patrimonio_liquido / qtd_cotas if qtd_cotas else 0.0
+    variacao_cota_pct = ((valor_cota / cota_d1) - 1) * 100 if cota_d1 else 0.0
+
+    return {
+        "patrimonio_liquido": patrimonio_liquido,
+        "valor_cota": valor_cota,
+        "variacao_cota_pct": variacao_cota_pct,
+        "posicao_comprada_pct": posicao_comprada_pct,
+        "posicao_vendida_pct": posicao_vendida_pct,
+        "net_long_pct": posicao_comprada_pct - posicao_vendida_pct,
+        "exposicao_total_pct": exposicao_total_pct,
+    }
+
+
+class PortfolioBook:
+    """Posições de uma carteira em arrays NumPy alinhados por símbolo."""
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        quantity: np.ndarray,
+        avg_price: np.ndarray,
+        target_pct: np.ndarray,
+        last_price: np.ndarray,
+        daily_change_pct: np.ndarray,
+        previous_close: Optional[np.ndarray] = None,
+        open_price: Optional[np.ndarray] = None,
+    ):
+        self.symbols: List[str] = list(symbols)
+        self.quantity = np.nan_to_num(quantity)
+        self.avg_price = np.nan_to_num(avg_price)
+        self.target_pct = np.nan_to_num(target_pct)
+        self.last_price = np.nan_to_num(last_price)
+        self.daily_change_pct = np.nan_to_num(daily_change_pct)
+        # Preços de referência da variação diária (NaN quando desconhecidos)
+        missing = np.full(len(self.symbols), np.nan)
+        self.previous_close = missing.copy() if previous_close is None else previous_close
+        self.open_price = missing.copy() if open_price is None else open_price
+
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> "PortfolioBook":
+        """Monta o livro a partir das linhas de ``load_position_rows``."""
+        last_price = to_array(r.last_price for r in rows)
+        previous_close_correct = to_array(r.previous_close_correct for r in rows)
+        previous_close = to_array(r.previous_close for r in rows)
+        open_price = to_array(r.open_price for r in rows)
+        daily_change_pct = compute_daily_change_pct(
+            last_price,
+            previous_close_correct,
+            previous_close,
+            open_price,
+            to_array(r.price_change_percent for r in rows),
+        )
+        return cls(
+            symbols=[r.symbol for r in rows],
+            quantity=to_array(r.quantity for r in rows),
+            avg_price=to_array(r.avg_price for r in rows),
+            target_pct=to_array(r.target_weight for r in rows),
+            last_price=last_price,
+            daily_change_pct=daily_change_pct,
+            previous_close=np.where(
+                np.isnan(previous_close_correct), previous_close, previous_close_correct
+            ),
+            open_price=open_price,
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def value(
+        self,
+        caixa_bruto: float = 0.0,
+        qtd_cotas: float = 0.0,
+        cota_d1: float = 0.0,
+    ) -> Dict:
+        """Valoriza a carteira e retorna totais, indicadores da cota e holdings."""
+        position_value = self.quantity * self.last_price
+        cost = self.quantity * self.avg_price
+        gain = position_value - cost
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gain_percent = np.where(cost != 0, gain / cost * 100, 0.0)
+
+        total_value = float(position_value.sum())
+        total_cost = float(cost.sum())
+        total_long = float(position_value[position_value >= 0].sum())
+        total_short = float(position_value[position_value < 0].sum())
+        header = summarize_totals(
+            total_value, total_long, total_short,
+            caixa_bruto=caixa_bruto, qtd_cotas=qtd_cotas, cota_d1=cota_d1,
+        )
+        patrimonio_liquido = header["patrimonio_liquido"]
+
+        if patrimonio_liquido:
+            position_pct = (position_value / patrimonio_liquido) * 100
+            difference = self.target_pct - position_pct
+            contribution = (position_value * self.daily_change_pct / 100) / patrimonio_liquido * 100
+            with np.errstate(divide="ignore", invalid="ignore"):
+                adjustment_qty = np.where(
+                    self.last_price != 0,
+                    (difference / 100 * patrimonio_liquido) / self.last_price,
+                    0.0,
+                )
+        else:
+            position_pct = np.zeros_like(position_value)
+            difference = self.target_pct - position_pct
+            contribution = np.zeros_like(position_value)
+            adjustment_qty = np.zeros_like(position_value)
+
+        holdings = [
+            {
+                "symbol": symbol,
+                "quantity": qty,
+                "avg_price": avg,
+                "last_price": last,
+                "daily_change_pct": daily,
+                "position_value": pv,
+                "value": pv,
+                "cost": c,
+                "gain": g,
+                "gain_percent": gp,
+                "contribution": contrib,
+                "position_pct": pct,
+                "target_pct": target,
+                "difference": diff,
+                "adjustment_qty": adj,
+            }
+            for (
+                symbol, qty, avg, last, daily, pv, c, g, gp,
+                contrib, pct, target, diff, adj,
+            ) in zip(
+                self.symbols,
+                self.quantity.tolist(),
+                self.avg_price.tolist(),
+                self.last_price.tolist(),
+                self.daily_change_pct.tolist(),
+                position_value.tolist(),
+                cost.tolist(),
+                gain.tolist(),
+                gain_percent.tolist(),
+                contribution.tolist(),
+                position_pct.tolist(),
+                self.target_pct.tolist(),
+                difference.tolist(),
+                adjustment_qty.tolist(),
+            )
+        ]
+
+        total_gain = total_value - total_cost
+        return {
+            "total_value": total_value,
+            "total_cost": total_cost,
+            "total_gain": total_gain,
+            "total_gain_percent": (total_gain / total_cost * 100) if total_cost else 0.0,
+            "holdings": holdings,
+            **header,
+        }
+
+
+def books_from_rows(rows: Sequence) -> Dict[int, PortfolioBook]:
+    """Monta um PortfolioBook por carteira a partir de ``load_position_rows``.
+
+    Cada símbolo é precificado uma única vez, mesmo que apareça em várias
+    carteiras; as linhas devem vir ordenadas por ``portfolio_id``.
+    """
+    if not rows:
+        return {}
+
+    symbols = np.array([r.symbol for r in rows], dtype=object)
+    unique_symbols, first_row, inverse = np.unique(
+        symbols, return_index=True, return_inverse=True
+    )
+    priced = [rows[i] for i in first_row]
+    last_price = to_array(r.last_price for r in priced)
+    previous_close_correct = to_array(r.previous_close_correct for r in priced)
+    previous_close = to_array(r.previous_close for r in priced)
+    open_price = to_array(r.open_price for r in priced)
+    daily_change_pct = compute_daily_change_pct(
+        last_price,
+        previous_close_correct,
+        previous_close,
+        open_price,
+        to_array(r.price_change_percent for r in priced),
+    )
+    reference_close = np.where(
+        np.isnan(previous_close_correct), previous_close, previous_close_correct
+    )
+
+    quantity = to_array(r.quantity for r in rows)
+    avg_price = to_array(r.avg_price for r in rows)
+    target_pct = to_array(r.target_weight for r in rows)
+    portfolio_ids = np.array([r.portfolio_id for r in rows])
+    bounds = np.concatenate(
+        ([0], np.flatnonzero(np.diff(portfolio_ids)) + 1, [len(rows)])
+    )
+
+    books = {}
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        idx = inverse[start:end]
+        books[int(portfolio_ids[start])] = PortfolioBook(
+            symbols=symbols[start:end].tolist(),
+            quantity=quantity[start:end],
+            avg_price=avg_price[start:end],
+            target_pct=target_pct[start:end],
+            last_price=last_price[idx],
+            daily_change_pct=daily_change_pct[idx],
+            previous_close=reference_close[idx],
+            open_price=open_price[idx],
+        )
+    return books
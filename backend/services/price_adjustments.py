@@ -0,0 +1,262 @@
+# backend/services/price_adjustments.py
+# Ajuste de daily_prices por eventos corporativos (proventos em dinheiro,
+# desdobramentos, grupamentos e bonificações).
+# Cada evento vira um fator multiplicativo aplicado às barras anteriores à
+# data-ex; o fator acumulado de um pregão é o produto dos fatores dos eventos
+# posteriores a ele, calculado de forma vetorizada. adj_factor e adj_close
+# ficam gravados ao lado do fechamento bruto, então retornos, risco e
+# indicadores leem a série ajustada pronta. Um evento novo só multiplica as
+# barras anteriores a ele, com um UPDATE por evento.
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text, update
+
+from backend.models import db, CorporateAction, DailyPrice
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+CASH = "cash"
+SPLIT = "split"
+
+# Tabela de proventos do scraper da CVM (scraper/models_extended.py)
+_REGISTERED_DIVIDENDS = "dividends"
+
+
+def corporate_action_rows(frame: pd.DataFrame, start: date) -> List[Dict]:
+    """Eventos das colunas ``dividends``/``splits`` de um download do yfinance.
+
+    O fechamento do Yahoo já vem corrigido pelos desdobramentos anteriores à
+    data do download, então um desdobramento só ajusta as barras gravadas
+    antes de ``start`` (início do lote baixado).
+    """
+    rows = []
+    for kind, column, applies_before in ((CASH, "dividends", None), (SPLIT, "splits", start)):
+        if column not in frame:
+            continue
+        events = frame[frame[column].fillna(0) > 0]
+        for rec in events[["symbol", "date", column]].itertuples(index=False):
+            rows.append({
+                "symbol": rec.symbol,
+                "ex_date": rec.date,
+                "kind": kind,
+                "value": float(rec[2]),
+                "applies_before": applies_before,
+                "source": "yahoo",
+            })
+    return rows
+
+
+def record_corporate_actions(rows: List[Dict]) -> int:
+    """Grava eventos novos; os já conhecidos são mantidos. Não faz commit."""
+    if not rows:
+        return 0
+    stmt = dialect_insert(CorporateAction.__table__).values(rows)
+    stmt = stmt.on_conflict_do_nothing(index_elements=["symbol", "ex_date", "kind"])
+    db.session.execute(stmt)
+    return len(rows)
+
+
+def registered_dividend_rows(symbols: Optional[Sequence[str]] = None) -> List[Dict]:
+    """Dividendos e JCP da tabela do scraper, somados por ticker e data-ex.
+
+    Bonificações ficam de fora: o Yahoo já as informa como desdobramento.
+    """
+    if not inspect(db.session.connection()).has_table(_REGISTERED_DIVIDENDS):
+        return []
+    rows = db.session.execute(text(
+        "SELECT ticker, dividend_type, ex_date, value_per_share FROM dividends "
+        "WHERE ticker IS NOT NULL AND ex_date IS NOT NULL AND value_per_share > 0"
+    )).fetchall()
+    wanted = set(symbols) if symbols is not None else None
+    totals: Dict = {}
+    for r in rows:
+        symbol = r.ticker.strip().upper()
+        if (wanted is not None and symbol not in wanted) or (r.dividend_type or "").lower().startswith("bonif"):
+            continue
+        ex_date = r.ex_date.date() if isinstance(r.ex_date, datetime) else pd.Timestamp(r.ex_date).date()
+        totals[(symbol, ex_date)] = totals.get((symbol, ex_date), 0.0) + float(r.value_per_share)
+    return [
+        {"symbol": s, "ex_date": d, "kind": CASH, "value": v, "applies_before": None, "source": "cvm"}
+        for (s, d), v in totals.items()
+    ]
+
+
+def event_factors(
+    dates: np.ndarray, closes: np.ndarray, kinds: np.ndarray, ex_dates: np.ndarray, values: np.ndarray
+) -> np.ndarray:
+    """Fator de cada evento sobre a série bruta de um símbolo.
+
+    Provento: 1 - valor / fechamento do pregão anterior à data-ex;
+    desdobramento: 1 / proporção. Sem pregão anterior, o fator é 1.
+    """
+    factors = np.ones(len(kinds), dtype=np.float64)
+    split = kinds == SPLIT
+    factors[split] = 1.0 / values[split]
+
+    cash = ~split
+    prev = np.searchsorted(dates, ex_dates[cash], "left") - 1
+    known = prev >= 0
+    cash_factors = np.ones(int(cash.sum()), dtype=np.float64)
+    cash_factors[known] = 1.0 - values[cash][known] / closes[prev[known]]
+    invalid = ~np.isfinite(cash_factors) | (cash_factors <= 0)
+    if invalid.any():
+        logger.warning(f"Proventos maiores que o preço ignorados em {ex_dates[cash][invalid].tolist()}")
+        cash_factors[invalid] = 1.0
+    factors[cash] = cash_factors
+    return factors
+
+
+def cumulative_factors(dates: np.ndarray, cutoffs: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """Fator acumulado de cada pregão: produto dos eventos com corte posterior a ele."""
+    order = np.argsort(cutoffs, kind="stable")
+    suffix = np.append(np.cumprod(factors[order][::-1])[::-1], 1.0)
+    return suffix[np.searchsorted(cutoffs[order], dates, "right")]
+
+
+def _price_series(symbols: Sequence[str]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Datas, fechamentos brutos e fatores gravados de cada símbolo, em ordem de data."""
+    rows = (
+        db.session.query(DailyPrice.symbol, DailyPrice.date, DailyPrice.close, DailyPrice.adj_factor)
+        .filter(DailyPrice.symbol.in_(list(symbols)))
+        .order_by(DailyPrice.symbol, DailyPrice.date)
+        .all()
+    )
+    series: Dict[str, Dict[str, np.ndarray]] = {}
+    if not rows:
+        return series
+    names = np.array([r.symbol for r in rows])
+    dates = np.array([r.date for r in rows], dtype="datetime64[D]")
+    closes = np.array([float(r.close) for r in rows])
+    factors = np.array([float(r.adj_factor) for r in rows])
+    bounds = np.flatnonzero(names[1:] != names[:-1]) + 1
+    for lo, hi in zip(np.append(0, bounds), np.append(bounds, len(rows))):
+        series[str(names[lo])] = {"dates": dates[lo:hi], "closes": closes[lo:hi], "factors": factors[lo:hi]}
+    return series
+
+
+def _evaluate(actions: List[CorporateAction], series: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, Dict]:
+    """Fatores, por símbolo, dos eventos cujo corte já tem pregão gravado.
+
+    Os demais (data-ex futura ou sem preços) ficam pendentes.
+    """
+    by_symbol: Dict[str, List[CorporateAction]] = {}
+    for action in actions:
+        by_symbol.setdefault(action.symbol, []).append(action)
+
+    evaluated = {}
+    for symbol, group in by_symbol.items():
+        prices = series.get(symbol)
+        if prices is None:
+            continue
+        cutoffs = np.array([a.applies_before or a.ex_date for a in group], dtype="datetime64[D]")
+        ready = cutoffs <= prices["dates"][-1]
+        if not ready.any():
+            continue
+        ready_actions = [a for a, ok in zip(group, ready) if ok]
+        evaluated[symbol] = {
+            "actions": ready_actions,
+            "cutoffs": cutoffs[ready],
+            "factors": event_factors(
+                prices["dates"],
+                prices["closes"],
+                np.array([a.kind for a in ready_actions]),
+                np.array([a.ex_date for a in ready_actions], dtype="datetime64[D]"),
+                np.array([float(a.value) for a in ready_actions]),
+            ),
+        }
+    return evaluated
+
+
+def _mark_applied(evaluated: Dict[str, Dict]):
+    now = datetime.now(timezone.utc)
+    for events in evaluated.values():
+        for action, factor in zip(events["actions"], events["factors"]):
+            action.factor = float(factor)
+            action.applied_at = now
+
+
+def apply_pending_adjustments(symbols: Optional[Sequence[str]] = None) -> Dict:
+    """Aplica os eventos ainda não aplicados às barras anteriores a eles.
+
+    Eventos com data-ex depois do último pregão gravado esperam a próxima
+    atualização. Não faz commit; retorna o relatório.
+    """
+    query = CorporateAction.query.filter(CorporateAction.applied_at.is_(None))
+    if symbols is not None:
+        query = query.filter(CorporateAction.symbol.in_(list(symbols)))
+    pending = query.all()
+    if not pending:
+        return {"pending": 0, "applied": 0}
+
+    evaluated = _evaluate(pending, _price_series({a.symbol for a in pending}))
+    applied = 0
+    for symbol, events in evaluated.items():
+        applied += len(events["actions"])
+        for cutoff, factor in zip(events["cutoffs"].astype(object), events["factors"]):
+            if factor == 1.0:
+                continue
+            db.session.execute(
+                update(DailyPrice)
+                .where(DailyPrice.symbol == symbol, DailyPrice.date < cutoff)
+                .values(
+                    adj_factor=DailyPrice.adj_factor * float(factor),
+                    adj_close=DailyPrice.close * DailyPrice.adj_factor * float(factor),
+                )
+                .execution_options(synchronize_session=False)
+            )
+    _mark_applied(evaluated)
+
+    report = {"pending": len(pending) - applied, "applied": applied}
+    logger.info(f"Ajustes por eventos corporativos: {report}")
+    return report
+
+
+def rebuild_adjustments(symbols: Optional[Sequence[str]] = None) -> Dict:
+    """Recalcula adj_factor/adj_close do zero (ex.: após corrigir um evento).
+
+    Só as barras cujo fator mudou são regravadas. Não faz commit.
+    """
+    if symbols is None:
+        symbols = [r[0] for r in db.session.query(DailyPrice.symbol).distinct()]
+    series = _price_series(symbols)
+    actions = CorporateAction.query.filter(CorporateAction.symbol.in_(list(symbols))).all()
+    evaluated = _evaluate(actions, series)
+
+    changes = []
+    for symbol, prices in series.items():
+        events = evaluated.get(symbol)
+        factors = (
+            cumulative_factors(prices["dates"], events["cutoffs"], events["factors"])
+            if events
+            else np.ones(len(prices["dates"]))
+        )
+        changed = ~np.isclose(factors, prices["factors"], rtol=0, atol=1e-10)
+        changes.extend(
+            {"symbol": symbol, "date": d, "adj_factor": float(f), "adj_close": float(c * f)}
+            for d, f, c in zip(
+                prices["dates"][changed].astype(object), factors[changed], prices["closes"][changed]
+            )
+        )
+    if changes:
+        db.session.execute(update(DailyPrice), changes)
+    _mark_applied(evaluated)
+
+    report = {
+        "symbols": len(series),
+        "events": sum(len(e["actions"]) for e in evaluated.values()),
+        "rows": len(changes),
+    }
+    logger.info(f"Ajustes por eventos corporativos recalculados: {report}")
+    return report
+
+
+def update_adjustments(symbols: Optional[Sequence[str]] = None, full: bool = False) -> Dict:
+    """Importa os proventos registrados e aplica os eventos pendentes (ou recalcula tudo)."""
+    record_corporate_actions(registered_dividend_rows(symbols))
+    return rebuild_adjustments(symbols) if full else apply_pending_adjustments(symbols)
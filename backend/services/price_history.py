@@ -0,0 +1,254 @@
+# backend/services/price_history.py
+# Histórico diário OHLCV em daily_prices.
+# A atualização consulta a última data gravada de cada símbolo e baixa só os
+# dias que faltam (mais o último gravado, para corrigir um fechamento
+# provisório), agrupando na mesma chamada ao yfinance os símbolos com o
+# mesmo ponto de partida; as linhas entram com um upsert em lote. O último
+# pregão consultado de cada símbolo fica em daily_price_status, para que
+# feriados e ativos sem negociação não gerem novos downloads. A leitura
+# cobre um ou vários símbolos em uma única consulta por faixa de datas.
+# Proventos e desdobramentos vindos no mesmo download são registrados para o
+# motor de ajustes (price_adjustments), que mantém adj_factor e adj_close.
+
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+import yfinance as yf
+from sqlalchemy import func
+
+from backend.models import db, DailyPrice, DailyPriceStatus, PortfolioPosition
+from backend.services.market_calendar import b3_calendar
+from backend.services.price_adjustments import SPLIT, corporate_action_rows, record_corporate_actions
+from backend.services.portfolio_attribution import BENCHMARK_SYMBOL
+from backend.services.portfolio_backfill import _yahoo_symbol
+from backend.utils.bulk_upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+PRICE_FIELDS = ("open", "high", "low", "close", "adj_close", "volume")
+_YAHOO_FIELDS = {
+    "Open": "open", "High": "high", "Low": "low",
+    "Close": "close", "Adj Close": "adj_close", "Volume": "volume",
+    "Dividends": "dividends", "Stock Splits": "splits",
+}
+_ACTION_FIELDS = ("dividends", "splits")
+
+# Linhas por INSERT, para ficar abaixo do limite de parâmetros do driver
+_CHUNK_ROWS = 1000
+
+# Recebe símbolos e intervalo e devolve linhas longas (symbol, date, campos)
+OhlcvLoader = Callable[[Sequence[str], date, date], pd.DataFrame]
+
+
+def fetch_daily_ohlcv(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """Barras diárias via yfinance, em uma única chamada, no formato longo.
+
+    Quando o Yahoo informa eventos, vêm também as colunas ``dividends`` e ``splits``.
+    """
+    columns = ["symbol", "date", *PRICE_FIELDS]
+    if not symbols:
+        return pd.DataFrame(columns=columns)
+
+    data = yf.download(
+        [_yahoo_symbol(s) for s in symbols],
+        start=start,
+        end=end + timedelta(days=1),
+        progress=False,
+        auto_adjust=False,
+        actions=True,
+        group_by="column",
+    )
+    if data is None or data.empty:
+        return pd.DataFrame(columns=columns)
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([data.columns, [_yahoo_symbol(symbols[0])]])
+    frame = data.stack(level=1, future_stack=True).reset_index()
+    frame.columns = ["date", "symbol", *frame.columns[2:]]
+    frame = frame.rename(columns=_YAHOO_FIELDS)
+    frame["symbol"] = frame["symbol"].astype(str).str.removesuffix(".SA")
+    frame["date"] = pd.to_datetime(frame["date"]).dt.date
+    columns += [field for field in _ACTION_FIELDS if field in frame]
+    return frame.dropna(subset=["close"]).reindex(columns=columns)
+
+
+def last_complete_session(now: Optional[datetime] = None) -> date:
+    """Último pregão encerrado: hoje após o fechamento, senão o pregão anterior."""
+    return b3_calendar.last_complete_session(now)
+
+
+def tracked_symbols() -> List[str]:
+    """Símbolos com histórico mantido: posições das carteiras e o Ibovespa."""
+    rows = db.session.query(PortfolioPosition.symbol).distinct().all()
+    return sorted({r.symbol for r in rows} | {BENCHMARK_SYMBOL})
+
+
+def daily_price_rows(frame: pd.DataFrame, through: date) -> List[Dict]:
+    """Linhas de daily_prices a partir do formato longo, até ``through``."""
+    rows = []
+    for rec in frame.to_dict("records"):
+        if rec["date"] > through:
+            continue
+        row = {"symbol": rec["symbol"], "date": rec["date"]}
+        for field in PRICE_FIELDS:
+            value = rec.get(field)
+            row[field] = None if value is None or pd.isna(value) else float(value)
+        rows.append(row)
+    return rows
+
+
+def upsert_daily_prices(rows: List[Dict]) -> int:
+    """Grava as barras com INSERT ... ON CONFLICT em lotes; não faz commit.
+
+    adj_close é derivado do fechamento e do adj_factor já gravado (1 em barras novas).
+    """
+    if not rows:
+        return 0
+    table = DailyPrice.__table__
+    rows = [{**row, "adj_close": row["close"]} for row in rows]
+    for i in range(0, len(rows), _CHUNK_ROWS):
+        stmt = dialect_insert(table).values(rows[i:i + _CHUNK_ROWS])
+        set_ = {field: stmt.excluded[field] for field in PRICE_FIELDS}
+        set_["adj_close"] = stmt.excluded.close * table.c.adj_factor
+        # ON CONFLICT DO UPDATE não aplica o onupdate da coluna
+        set_["updated_at"] = func.now()
+        stmt = stmt.on_conflict_do_update(index_elements=["symbol", "date"], set_=set_)
+        db.session.execute(stmt)
+    return len(rows)
+
+
+def mark_checked(symbols: Sequence[str], through: date):
+    """Registra que os símbolos já foram consultados até ``through``; não faz commit."""
+    if not symbols:
+        return
+    table = DailyPriceStatus.__table__
+    stmt = dialect_insert(table).values(
+        [{"symbol": symbol, "checked_through": through} for symbol in symbols]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["symbol"],
+        set_={"checked_through": stmt.excluded.checked_through, "checked_at": func.now()},
+    )
+    db.session.execute(stmt)
+
+
+def refresh_daily_prices(
+    symbols: Optional[Sequence[str]] = None,
+    through: Optional[date] = None,
+    history_days: Optional[int] = None,
+    loader: Optional[OhlcvLoader] = None,
+) -> Dict:
+    """Completa o histórico dos símbolos até ``through`` (último pregão encerrado).
+
+    Símbolos sem histórico buscam ``history_days`` dias; os demais, a partir
+    da última data gravada ou consultada, que é baixada de novo (exceto se o
+    lote trouxer um desdobramento, que já vem aplicado pelo Yahoo). Símbolos já
+    consultados até ``through`` são pulados mesmo sem barra nesse dia. Os
+    eventos corporativos do download são registrados, mas aplicados só por
+    ``update_adjustments``. Não faz commit; retorna o relatório.
+    """
+    through = through or last_complete_session()
+    symbols = sorted(set(symbols or tracked_symbols()))
+    history_days = history_days or int(os.getenv("DAILY_PRICE_HISTORY_DAYS", "1825"))
+    loader = loader or fetch_daily_ohlcv
+
+    last = dict(
+        db.session.query(DailyPrice.symbol, func.max(DailyPrice.date))
+        .filter(DailyPrice.symbol.in_(symbols))
+        .group_by(DailyPrice.symbol)
+        .all()
+    )
+    checked = dict(
+        db.session.query(DailyPriceStatus.symbol, DailyPriceStatus.checked_through)
+        .filter(DailyPriceStatus.symbol.in_(symbols))
+        .all()
+    )
+    groups: Dict[date, List[str]] = {}
+    for symbol in symbols:
+        if checked.get(symbol) is not None and checked[symbol] >= through:
+            continue
+        known = [d for d in (last.get(symbol), checked.get(symbol)) if d is not None]
+        start = max(known) if known else through - timedelta(days=history_days)
+        groups.setdefault(start, []).append(symbol)
+
+    rows, actions, fetched = [], [], []
+    for start, group in sorted(groups.items()):
+        try:
+            frame = loader(group, start, through)
+            for symbol in group:
+                bars = frame[frame["symbol"] == symbol] if not frame.empty else frame
+                # O desdobramento do lote ajusta só as barras gravadas antes dele
+                cutoff = last[symbol] + timedelta(days=1) if symbol in last else start
+                events = [a for a in corporate_action_rows(bars, cutoff) if a["ex_date"] <= through]
+                if any(a["kind"] == SPLIT for a in events) and symbol in last:
+                    # O Yahoo já corrigiu as barras rebaixadas pelo desdobramento: as
+                    # gravadas mantêm o fechamento efetivo
+                    bars = bars[bars["date"] > last[symbol]]
+                rows.extend(daily_price_rows(bars, through))
+                actions.extend(events)
+            fetched.extend(group)
+        except Exception as e:
+            logger.error(f"Erro ao baixar histórico diário de {group}: {e}")
+    written = upsert_daily_prices(rows)
+    record_corporate_actions(actions)
+    mark_checked(fetched, through)
+
+    report = {
+        "through": through.isoformat(),
+        "symbols": len(symbols),
+        "up_to_date": len(symbols) - sum(len(g) for g in groups.values()),
+        "downloads": len(groups),
+        "rows": written,
+    }
+    logger.info(f"Histórico diário atualizado: {report}")
+    return report
+
+
+def load_daily_prices(
+    symbols: Sequence[str], start: date, end: date, field: str = "close"
+) -> pd.DataFrame:
+    """Matriz datas × símbolos de ``field`` (NaN onde não há barra)."""
+    column = getattr(DailyPrice, field)
+    rows = (
+        db.session.query(DailyPrice.date, DailyPrice.symbol, column)
+        .filter(DailyPrice.symbol.in_(list(symbols)), DailyPrice.date.between(start, end))
+        .all()
+    )
+    if not rows:
+        return pd.DataFrame(columns=list(symbols), dtype=float)
+    frame = pd.DataFrame(rows, columns=["date", "symbol", field])
+    frame[field] = frame[field].astype(float)
+    matrix = frame.pivot(index="date", columns="symbol", values=field).sort_index()
+    return matrix.reindex(columns=list(symbols))
+
+
+def stored_daily_closes(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """``PriceLoader`` (ver portfolio_backfill) lido de daily_prices, sem rede."""
+    return load_daily_prices(symbols, start, end)
+
+
+def stored_adjusted_closes(symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+    """``PriceLoader`` com fechamentos ajustados por proventos e desdobramentos."""
+    return load_daily_prices(symbols, start, end, field="adj_close")
+
+
+def daily_price_history(symbols: Sequence[str], start: date, end: date) -> Dict[str, List[Dict]]:
+    """Barras por símbolo no intervalo, em ordem de data, com uma única consulta."""
+    rows = (
+        DailyPrice.query.filter(DailyPrice.symbol.in_(list(symbols)), DailyPrice.date.between(start, end))
+        .order_by(DailyPrice.symbol, DailyPrice.date)
+        .all()
+    )
+    history: Dict[str, List[Dict]] = {symbol: [] for symbol in symbols}
+    for row in rows:
+        history[row.symbol].append({
+            "date": row.date.isoformat(),
+            **{
+                field: float(getattr(row, field)) if getattr(row, field) is not None else None
+                for field in PRICE_FIELDS
+            },
+        })
+    return history
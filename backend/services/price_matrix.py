@@ -0,0 +1,289 @@
+# backend/services/price_matrix.py
+# Matriz datas × símbolos de fechamentos, pré-calculada a partir de daily_prices.
+# Cada versão é um diretório com closes.npy (float64, NaN sem pregão),
+# adj_closes.npy (fechamentos ajustados por eventos corporativos),
+# dates.npy (datetime64[D]) e symbols.json; o arquivo CURRENT aponta para a
+# versão vigente e é trocado de forma atômica. watermark.json guarda o maior
+# daily_prices.updated_at lido, para que a versão seguinte releia as barras
+# gravadas ou corrigidas depois (inclusive de datas antigas). Os leitores abrem os arrays com
+# mmap, então processos diferentes compartilham as páginas pelo cache do SO,
+# e os recortes por data ou por símbolo são views, sem cópia.
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.models import db, CorporateAction, DailyPrice
+
+logger = logging.getLogger(__name__)
+
+_CURRENT = "CURRENT"
+# Quantos eventos corporativos estavam aplicados quando a versão foi gerada
+_ACTIONS = "actions.json"
+# Maior daily_prices.updated_at visto pela versão
+_WATERMARK = "watermark.json"
+# Versões antigas mantidas para leitores que ainda as têm abertas
+_KEEP_VERSIONS = 2
+
+
+class PriceMatrix:
+    """Uma versão da matriz aberta via mmap (somente leitura)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.closes = np.load(os.path.join(path, "closes.npy"), mmap_mode="r")
+        adjusted = os.path.join(path, "adj_closes.npy")
+        self.adj_closes = np.load(adjusted, mmap_mode="r") if os.path.exists(adjusted) else None
+        try:
+            with open(os.path.join(path, _ACTIONS)) as f:
+                self.applied_actions: Optional[int] = json.load(f)["applied"]
+        except FileNotFoundError:
+            self.applied_actions = None
+        try:
+            with open(os.path.join(path, _WATERMARK)) as f:
+                value = json.load(f)["updated_at"]
+            self.watermark: Optional[datetime] = datetime.fromisoformat(value) if value else None
+        except FileNotFoundError:
+            self.watermark = None
+        self.dates = np.load(os.path.join(path, "dates.npy"))
+        with open(os.path.join(path, "symbols.json")) as f:
+            self.symbols: List[str] = json.load(f)
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def rows(self, start: Optional[date] = None, end: Optional[date] = None) -> slice:
+        """Faixa de linhas [start, end] (datas inclusivas)."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), "left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), "right"))
+        return slice(lo, hi)
+
+    def values(self, adjusted: bool = False) -> np.ndarray:
+        return self.adj_closes if adjusted else self.closes
+
+    def column(
+        self,
+        symbol: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        adjusted: bool = False,
+    ) -> Optional[np.ndarray]:
+        """Série de um símbolo: view com passo sobre o mmap, sem cópia."""
+        col = self.index.get(symbol)
+        if col is None:
+            return None
+        return self.values(adjusted)[self.rows(start, end), col]
+
+    def window(
+        self,
+        symbols: Optional[Sequence[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        adjusted: bool = False,
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """(datas, símbolos, matriz) do recorte.
+
+        Sem ``symbols``, ou com símbolos contíguos na matriz, o resultado é uma
+        view do mmap; uma seleção arbitrária de colunas exige cópia. Símbolos
+        desconhecidos são omitidos. ``adjusted`` lê os fechamentos ajustados.
+        """
+        rows = self.rows(start, end)
+        values = self.values(adjusted)
+        if symbols is None:
+            return self.dates[rows], list(self.symbols), values[rows]
+        cols = [self.index[s] for s in symbols if s in self.index]
+        names = [self.symbols[c] for c in cols]
+        if cols and cols == list(range(cols[0], cols[0] + len(cols))):
+            return self.dates[rows], names, values[rows, cols[0]:cols[0] + len(cols)]
+        return self.dates[rows], names, values[rows][:, cols]
+
+    def frame(
+        self,
+        symbols: Optional[Sequence[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        adjusted: bool = False,
+    ) -> pd.DataFrame:
+        """DataFrame datas × símbolos sobre o recorte (mesmo formato de ``fetch_daily_closes``)."""
+        dates, names, values = self.window(symbols, start, end, adjusted)
+        frame = pd.DataFrame(values, index=pd.Index(dates.astype("datetime64[D]").tolist()), columns=names, copy=False)
+        return frame.reindex(columns=list(symbols)) if symbols is not None else frame
+
+
+class PriceMatrixStore:
+    """Constrói as versões da matriz e entrega a vigente aos leitores."""
+
+    # Intervalo mínimo entre verificações de nova versão pelos leitores
+    CHECK_INTERVAL_SECONDS = 5
+    # Folga na marca d'água: updated_at é o início da transação que gravou a
+    # barra, que pode ter feito commit depois da leitura da versão anterior
+    WATERMARK_LAG_SECONDS = int(os.getenv("PRICE_MATRIX_WATERMARK_LAG_SECONDS", "300"))
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.getenv("PRICE_MATRIX_DIR", os.path.join("data", "price_matrix"))
+        self._matrix: Optional[PriceMatrix] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[PriceMatrix]:
+        """Versão vigente (reaberta quando CURRENT muda); None se não há matriz."""
+        with self._lock:
+            now = time.monotonic()
+            if self._matrix is not None and now - self._checked < self.CHECK_INTERVAL_SECONDS:
+                return self._matrix
+            self._checked = now
+            version = self._current_version()
+            if version is None:
+                self._matrix = None
+            elif self._matrix is None or os.path.basename(self._matrix.path) != version:
+                self._matrix = PriceMatrix(os.path.join(self.root, version))
+            return self._matrix
+
+    def clear(self, root: Optional[str] = None):
+        """Esquece a versão aberta; ``root`` troca o diretório das versões."""
+        with self._lock:
+            if root is not None:
+                self.root = root
+            self._matrix = None
+            self._checked = float("-inf")
+
+    def daily_closes(self, symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+        """``PriceLoader`` (ver portfolio_backfill) servido pela matriz."""
+        matrix = self.current()
+        if matrix is None:
+            return pd.DataFrame(columns=list(symbols), dtype=float)
+        return matrix.frame(symbols, start, end)
+
+    def adjusted_daily_closes(self, symbols: Sequence[str], start: date, end: date) -> pd.DataFrame:
+        """``PriceLoader`` com os fechamentos ajustados por eventos corporativos."""
+        matrix = self.current()
+        if matrix is None:
+            return pd.DataFrame(columns=list(symbols), dtype=float)
+        return matrix.frame(symbols, start, end, adjusted=True)
+
+    def build(self, full: bool = False) -> Dict:
+        """Gera uma nova versão a partir de daily_prices.
+
+        Incremental: só as datas posteriores à última da versão vigente, os
+        símbolos novos e as barras gravadas desde a marca d'água da versão
+        (fechamentos corrigidos, buracos preenchidos) são lidos do banco;
+        ``full`` relê tudo. Um evento corporativo aplicado desde a última
+        versão muda fechamentos ajustados antigos e também força a releitura
+        completa.
+        """
+        started = time.perf_counter()
+        applied = CorporateAction.query.filter(CorporateAction.applied_at.isnot(None)).count()
+        # Lida antes das barras: o que for gravado durante o build entra na próxima versão
+        watermark = db.session.query(db.func.max(DailyPrice.updated_at)).scalar()
+        base = None if full else self._open_latest()
+        if base is not None and (
+            base.adj_closes is None or base.applied_actions != applied or base.watermark is None
+        ):
+            base = None
+
+        symbols = [r[0] for r in db.session.query(DailyPrice.symbol).distinct().order_by(DailyPrice.symbol)]
+        if base is not None:
+            # Símbolos existentes mantêm a coluna; novos entram no fim
+            known = set(base.symbols)
+            symbols = base.symbols + [s for s in symbols if s not in known]
+        index = {s: i for i, s in enumerate(symbols)}
+
+        query = db.session.query(DailyPrice.date, DailyPrice.symbol, DailyPrice.close, DailyPrice.adj_close)
+        new_symbols = symbols[len(base.symbols):] if base is not None else symbols
+        if base is not None and len(base):
+            last = base.dates[-1].astype(object)
+            since = base.watermark - timedelta(seconds=self.WATERMARK_LAG_SECONDS)
+            query = query.filter(
+                db.or_(
+                    DailyPrice.date > last,
+                    DailyPrice.symbol.in_(new_symbols),
+                    DailyPrice.updated_at > since,
+                )
+            )
+        rows = query.all()
+
+        dates = np.array(sorted({r.date for r in rows}), dtype="datetime64[D]")
+        if base is not None:
+            dates = np.union1d(base.dates, dates)
+        version = self._new_version()
+        path = os.path.join(self.root, version)
+        os.makedirs(path)
+        closes = np.lib.format.open_memmap(
+            os.path.join(path, "closes.npy"), mode="w+", dtype=np.float64, shape=(len(dates), len(symbols))
+        )
+        adj_closes = np.lib.format.open_memmap(
+            os.path.join(path, "adj_closes.npy"), mode="w+", dtype=np.float64, shape=(len(dates), len(symbols))
+        )
+        closes[:] = np.nan
+        adj_closes[:] = np.nan
+        if base is not None and len(base):
+            base_rows = np.searchsorted(dates, base.dates)
+            closes[base_rows, : len(base.symbols)] = base.closes
+            adj_closes[base_rows, : len(base.symbols)] = base.adj_closes
+        if rows:
+            r = np.searchsorted(dates, np.array([row.date for row in rows], dtype="datetime64[D]"))
+            c = np.array([index[row.symbol] for row in rows])
+            closes[r, c] = np.array([float(row.close) for row in rows])
+            adj_closes[r, c] = np.array([
+                float(row.adj_close) if row.adj_close is not None else float(row.close) for row in rows
+            ])
+        closes.flush()
+        adj_closes.flush()
+        del closes, adj_closes
+        np.save(os.path.join(path, "dates.npy"), dates)
+        with open(os.path.join(path, "symbols.json"), "w") as f:
+            json.dump(symbols, f)
+        with open(os.path.join(path, _ACTIONS), "w") as f:
+            json.dump({"applied": applied}, f)
+        with open(os.path.join(path, _WATERMARK), "w") as f:
+            json.dump({"updated_at": watermark.isoformat() if watermark else None}, f)
+
+        self._publish(version)
+        report = {
+            "version": version,
+            "dates": len(dates),
+            "symbols": len(symbols),
+            "rows_read": len(rows),
+            "incremental": base is not None,
+            "build_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info(f"Matriz de preços atualizada: {report}")
+        return report
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, _CURRENT)) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if os.path.isdir(os.path.join(self.root, version)) else None
+
+    def _open_latest(self) -> Optional[PriceMatrix]:
+        version = self._current_version()
+        return PriceMatrix(os.path.join(self.root, version)) if version else None
+
+    def _new_version(self) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        existing = [int(n[1:]) for n in os.listdir(self.root) if n.startswith("v") and n[1:].isdigit()]
+        return f"v{max(existing, default=0) + 1:06d}"
+
+    def _publish(self, version: str):
+        tmp = os.path.join(self.root, _CURRENT + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, _CURRENT))
+        versions = sorted(n for n in os.listdir(self.root) if n.startswith("v") and n[1:].isdigit())
+        for old in versions[:-_KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.root, old), ignore_errors=True)
+
+
+price_matrix = PriceMatrixStore()
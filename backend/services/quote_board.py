@@ -0,0 +1,337 @@
+# backend/services/quote_board.py
+# Quadro de cotações em memória compartilhada.
+# O processo que roda o RTD worker publica a última cotação de cada símbolo
+# em um array de layout fixo (um slot por símbolo); qualquer processo web
+# (ex.: vários workers do gunicorn) lê o quadro sem tocar no terminal MT5.
+# Cada slot é protegido por um contador de sequência (seqlock): a escrita
+# deixa o contador ímpar enquanto grava e o leitor repete a leitura se o
+# contador mudou no meio da cópia.
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOARD_MAGIC = 0x51554F5445424431  # "QUOTEBD1"
+HEADER_BYTES = 64
+SOURCES = ("", "mt5_realtime", "M1_fallback")
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u8"),
+    ("capacity", "<u8"),
+    ("count", "<u8"),
+    ("heartbeat", "<f8"),
+])
+
+SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("symbol", "S16"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("price", "<f8"),
+    ("volume", "<f8"),
+    ("volume_real", "<f8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("previous_close", "<f8"),
+    ("time", "<f8"),
+    ("updated", "<f8"),
+    ("flags", "<i8"),
+    ("is_realtime", "u1"),
+    ("source", "u1"),
+])
+
+_READ_RETRIES = 16
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    # Leitores não são donos do segmento: sem isso o resource_tracker do
+    # Python o removeria quando o processo web terminasse
+    if os.name == "posix":
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _row_values(symbol: bytes, quote: Dict, seq: int) -> tuple:
+    def num(*keys):
+        for key in keys:
+            value = quote.get(key)
+            if value is not None:
+                return float(value)
+        return 0.0
+
+    source = quote.get("source", "")
+    return (
+        seq,
+        symbol,
+        num("bid"),
+        num("ask"),
+        num("last"),
+        num("price", "last"),
+        num("volume"),
+        num("volume_real"),
+        num("open", "open_price"),
+        num("high", "high_price"),
+        num("low", "low_price"),
+        num("previous_close"),
+        _timestamp(quote.get("time")),
+        time.time(),
+        int(quote.get("flags") or 0),
+        1 if quote.get("is_realtime") else 0,
+        SOURCES.index(source) if source in SOURCES else 0,
+    )
+
+
+def _row_to_quote(row) -> Dict:
+    return {
+        "symbol": row["symbol"].decode(),
+        "bid": float(row["bid"]),
+        "ask": float(row["ask"]),
+        "last": float(row["last"]),
+        "price": float(row["price"]),
+        "volume": int(row["volume"]),
+        "volume_real": float(row["volume_real"]),
+        "open": float(row["open"]),
+        "high": float(row["high"]),
+        "low": float(row["low"]),
+        "previous_close": float(row["previous_close"]),
+        "time": datetime.fromtimestamp(float(row["time"])).isoformat(),
+        "source": SOURCES[int(row["source"])],
+        "flags": int(row["flags"]),
+        "is_realtime": bool(row["is_realtime"]),
+        "updated_at": datetime.fromtimestamp(float(row["updated"])).isoformat(),
+    }
+
+
+class QuoteBoard:
+    """Últimas cotações por símbolo em um segmento de memória compartilhada."""
+
+    # Leitores reabrem o segmento se o escritor ficar este tempo sem sinal
+    STALE_SECONDS = 10
+    # Intervalo mínimo entre tentativas de abrir um segmento ausente
+    ATTACH_RETRY_SECONDS = 1
+
+    def __init__(self, name: Optional[str] = None, capacity: Optional[int] = None):
+        self.name = name or os.getenv("QUOTE_BOARD_NAME", "versaofinal_quotes")
+        self.capacity = capacity or int(os.getenv("QUOTE_BOARD_SLOTS", "4096"))
+        self.owner = False
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._header = None
+        self._rows = None
+        self._index: Dict[str, int] = {}
+        self._indexed = 0
+        self._last_attach = float("-inf")
+        self._lock = threading.Lock()
+        self.full_warned = False
+
+    # --- escritor -----------------------------------------------------------
+
+    def create(self):
+        """Cria (ou recupera de uma execução anterior) o segmento como escritor."""
+        with self._lock:
+            self._close()
+            size = HEADER_BYTES + self.capacity * SLOT_DTYPE.itemsize
+            try:
+                shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            except FileExistsError:
+                # Segmento órfão de um processo que caiu: reaproveitar ou recriar
+                shm = shared_memory.SharedMemory(name=self.name)
+                if shm.size < size:
+                    shm.close()
+                    shm.unlink()
+                    shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+            self._map(shm, self.capacity)
+            self._rows[:] = np.zeros(self.capacity, dtype=SLOT_DTYPE)
+            self._header["capacity"] = self.capacity
+            self._header["count"] = 0
+            self._header["heartbeat"] = time.time()
+            self._header["magic"] = BOARD_MAGIC
+            self.owner = True
+            logger.info(f"Quadro de cotações criado: {self.name} ({self.capacity} slots)")
+
+    def publish(self, quote: Dict) -> bool:
+        """Grava a cotação no slot do símbolo; False se o quadro não existe ou está cheio."""
+        if not self.owner:
+            return False
+        symbol = quote["symbol"]
+        with self._lock:
+            slot = self._index.get(symbol)
+            if slot is None:
+                count = int(self._header["count"])
+                if count >= self.capacity:
+                    if not self.full_warned:
+                        logger.warning(f"Quadro de cotações cheio ({self.capacity} slots); {symbol} ignorado")
+                        self.full_warned = True
+                    return False
+                slot = count
+                self._index[symbol] = slot
+
+            seq = int(self._rows["seq"][slot])
+            self._rows["seq"][slot] = seq + 1
+            self._rows[slot] = _row_values(symbol.encode()[:16], quote, seq + 1)
+            self._rows["seq"][slot] = seq + 2
+            if slot == self._header["count"]:
+                # Símbolo novo só fica visível depois do slot completo
+                self._header["count"] = slot + 1
+            self._header["heartbeat"] = time.time()
+        return True
+
+    def touch(self):
+        """Sinal de vida do escritor, mesmo em ciclos sem cotações novas."""
+        if self.owner:
+            self._header["heartbeat"] = time.time()
+
+    def close(self):
+        """Fecha o segmento; o escritor também o remove."""
+        with self._lock:
+            self._close()
+
+    # --- leitores -----------------------------------------------------------
+
+    def attach(self) -> bool:
+        """Abre o segmento criado pelo escritor; True se o quadro está disponível."""
+        with self._lock:
+            if self.owner:
+                return True
+            now = time.monotonic()
+            if self._shm is not None:
+                if time.time() - float(self._header["heartbeat"]) < self.STALE_SECONDS:
+                    return True
+                if now - self._last_attach < self.ATTACH_RETRY_SECONDS:
+                    return True
+                # Escritor parado ou reiniciado com outro segmento: reabrir
+                self._close()
+            if now - self._last_attach < self.ATTACH_RETRY_SECONDS:
+                return False
+            self._last_attach = now
+            try:
+                shm = shared_memory.SharedMemory(name=self.name)
+            except (FileNotFoundError, ValueError):
+                return False
+            _untrack(shm)
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+            if int(header["magic"]) != BOARD_MAGIC:
+                del header
+                shm.close()
+                return False
+            capacity = int(header["capacity"])
+            del header
+            self._map(shm, capacity)
+            return True
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """Cotação publicada para ``symbol`` ou None."""
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Cotações publicadas para os símbolos pedidos (ausentes são omitidos)."""
+        if not self.attach():
+            return {}
+        quotes: Dict[str, Dict] = {}
+        with self._lock:
+            if self._rows is None:
+                return {}
+            for symbol in symbols:
+                slot = self._slot(symbol)
+                if slot is None:
+                    continue
+                row = self._read_slot(slot)
+                if row is not None:
+                    quotes[symbol] = _row_to_quote(row)
+        return quotes
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Todas as cotações publicadas."""
+        if not self.attach():
+            return {}
+        with self._lock:
+            if self._rows is None:
+                return {}
+            count = int(self._header["count"])
+            rows = self._rows[:count].copy()
+            # Slots alterados durante a cópia são relidos individualmente
+            torn = np.nonzero((rows["seq"] & 1) | (rows["seq"] != self._rows["seq"][:count]))[0]
+            for slot in torn:
+                row = self._read_slot(int(slot))
+                rows[slot] = row if row is not None else np.zeros((), dtype=SLOT_DTYPE)
+            return {
+                row["symbol"].decode(): _row_to_quote(row)
+                for row in rows if row["seq"]
+            }
+
+    def heartbeat_age(self) -> Optional[float]:
+        """Segundos desde o último sinal do escritor."""
+        if self._header is None:
+            return None
+        return time.time() - float(self._header["heartbeat"])
+
+    # --- internos -----------------------------------------------------------
+
+    def _map(self, shm: shared_memory.SharedMemory, capacity: int):
+        self._shm = shm
+        self._header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        self._rows = np.ndarray((capacity,), dtype=SLOT_DTYPE, buffer=shm.buf, offset=HEADER_BYTES)
+        self._index = {}
+        self._indexed = 0
+
+    def _close(self):
+        if self._shm is None:
+            return
+        # Views numpy precisam sair antes de fechar o mapeamento
+        self._header = self._rows = None
+        self._index = {}
+        self._indexed = 0
+        shm, self._shm = self._shm, None
+        shm.close()
+        if self.owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.owner = False
+
+    def _slot(self, symbol: str) -> Optional[int]:
+        slot = self._index.get(symbol)
+        if slot is None:
+            count = int(self._header["count"])
+            if count > self._indexed:
+                # Índice local do leitor: só os slots novos são varridos
+                for offset, name in enumerate(self._rows["symbol"][self._indexed:count]):
+                    self._index[name.decode()] = self._indexed + offset
+                self._indexed = count
+                slot = self._index.get(symbol)
+        return slot
+
+    def _read_slot(self, slot: int):
+        for _ in range(_READ_RETRIES):
+            seq = int(self._rows["seq"][slot])
+            if seq & 1:
+                continue
+            row = self._rows[slot].copy()
+            if int(self._rows["seq"][slot]) == seq:
+                return row if seq else None
+        return None
+
+
+quote_board = QuoteBoard()
@@ -0,0 +1,103 @@
+# backend/services/quote_conflation.py
+# Redução do tráfego de cotações do RTD worker.
+# QuoteChangeDetector descarta ticks em que bid/ask/last e o último negócio
+# (time_msc/volume) não mudaram desde o último envio; QuoteConflator limita a taxa de mensagens por cliente,
+# mantendo só a cotação mais recente de cada símbolo enquanto ele espera.
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _quote_key(quote: Dict) -> Tuple:
+    return (
+        quote.get("bid"),
+        quote.get("ask"),
+        quote.get("last"),
+        quote.get("previous_close"),
+        # Um negócio novo no mesmo preço muda time_msc/volume e precisa seguir
+        # para o tick_journal e as barras intradiárias.
+        quote.get("time_msc"),
+        quote.get("volume"),
+    )
+
+
+class QuoteChangeDetector:
+    """Último estado enviado por símbolo; só cotações diferentes passam."""
+
+    def __init__(self):
+        self._last: Dict[str, Tuple] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def changed(self, quote: Dict) -> bool:
+        key = _quote_key(quote)
+        with self._lock:
+            if self._last.get(quote["symbol"]) == key:
+                self.suppressed += 1
+                return False
+            self._last[quote["symbol"]] = key
+            return True
+
+    def invalidate(self, symbol: str):
+        """Força o próximo tick do símbolo a passar (ex.: nova subscrição)."""
+        with self._lock:
+            self._last.pop(symbol, None)
+
+
+class QuoteConflator:
+    """Limita a ``max_rate`` lotes por segundo por sala, conflacionando o excesso."""
+
+    def __init__(self, max_rate: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        max_rate = max_rate or float(os.getenv("QUOTE_MAX_UPDATES_PER_SECOND", "2"))
+        self.min_interval = 1.0 / max_rate
+        self._pending: Dict[str, Dict[str, Dict]] = {}
+        self._last_sent: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.conflated = 0
+        self.batches_sent = 0
+        self.quotes_sent = 0
+
+    def push(
+        self, batches: Dict[str, List[Dict]], now: Optional[float] = None
+    ) -> Dict[str, List[Dict]]:
+        """Recebe os lotes do ciclo e devolve os que já podem ser enviados."""
+        now = self.clock() if now is None else now
+        ready: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for room, quotes in batches.items():
+                pending = self._pending.setdefault(room, {})
+                for quote in quotes:
+                    if quote["symbol"] in pending:
+                        self.conflated += 1
+                    pending[quote["symbol"]] = quote
+
+            # Salas que ficaram para trás também saem assim que liberadas
+            for room in list(self._pending):
+                if now - self._last_sent.get(room, float("-inf")) < self.min_interval:
+                    continue
+                quotes = list(self._pending.pop(room).values())
+                self._last_sent[room] = now
+                ready[room] = quotes
+                self.batches_sent += 1
+                self.quotes_sent += len(quotes)
+        return ready
+
+    def drop(self, room: str):
+        with self._lock:
+            self._pending.pop(room, None)
+            self._last_sent.pop(room, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "quotes_conflated": self.conflated,
+                "price_batches_sent": self.batches_sent,
+                "quotes_sent": self.quotes_sent,
+                "rooms_waiting": len(self._pending),
+            }
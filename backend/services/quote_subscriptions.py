@@ -0,0 +1,68 @@
+# backend/services/quote_subscriptions.py
+# Índice das subscrições de cotações do WebSocket nos dois sentidos.
+# sala → símbolos atende as estatísticas e a desconexão; símbolo → salas
+# permite montar, a cada ciclo do worker, um único lote por cliente apenas
+# com os símbolos que mudaram, sem percorrer todas as salas por símbolo.
+
+import threading
+from typing import Dict, List, Set
+
+
+class QuoteSubscriptions:
+    """Subscrições por sala com índice reverso por símbolo."""
+
+    def __init__(self):
+        self.rooms: Dict[str, Set[str]] = {}
+        self.symbol_rooms: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, room: str, symbol: str):
+        with self._lock:
+            self.rooms.setdefault(room, set()).add(symbol)
+            self.symbol_rooms.setdefault(symbol, set()).add(room)
+
+    def unsubscribe(self, room: str, symbol: str):
+        with self._lock:
+            self._discard(room, symbol)
+
+    def remove_room(self, room: str) -> Set[str]:
+        """Remove todas as subscrições da sala (desconexão do cliente)."""
+        with self._lock:
+            symbols = set(self.rooms.get(room, ()))
+            for symbol in symbols:
+                self._discard(room, symbol)
+            return symbols
+
+    def _discard(self, room: str, symbol: str):
+        symbols = self.rooms.get(room)
+        if symbols is not None:
+            symbols.discard(symbol)
+            if not symbols:
+                del self.rooms[room]
+        rooms = self.symbol_rooms.get(symbol)
+        if rooms is not None:
+            rooms.discard(room)
+            if not rooms:
+                del self.symbol_rooms[symbol]
+
+    def symbols(self) -> Set[str]:
+        """Símbolos com ao menos uma sala inscrita."""
+        with self._lock:
+            return set(self.symbol_rooms)
+
+    def rooms_for(self, symbol: str) -> Set[str]:
+        with self._lock:
+            return set(self.symbol_rooms.get(symbol, ()))
+
+    def batches(self, quotes: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Agrupa as cotações do ciclo por sala (uma mensagem por cliente)."""
+        batches: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for symbol, quote in quotes.items():
+                for room in self.symbol_rooms.get(symbol, ()):
+                    batches.setdefault(room, []).append(quote)
+        return batches
+
+    def snapshot(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {room: sorted(symbols) for room, symbols in self.rooms.items()}
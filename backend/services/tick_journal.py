@@ -0,0 +1,291 @@
+# backend/services/tick_journal.py
+# Diário de ticks do RTD worker, por símbolo e pregão.
+# Durante o pregão cada tick é anexado a <raiz>/<dia>/<SÍMBOLO>.ticks como um
+# registro binário de tamanho fixo (legível via memmap enquanto é escrito);
+# dias encerrados são selados em <SÍMBOLO>.npz, um arquivo colunar
+# comprimido (um array por campo). A leitura devolve as colunas como arrays
+# numpy e permite reproduzir o dia em ordem.
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TICK_DTYPE = np.dtype([
+    ("time_msc", "<i8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("last", "<f8"),
+    ("volume", "<f8"),
+    ("flags", "<u4"),
+])
+COLUMNS = TICK_DTYPE.names
+
+JOURNAL_SUFFIX = ".ticks"
+SEALED_SUFFIX = ".npz"
+
+
+def _time_msc(quote: Dict) -> int:
+    if quote.get("time_msc"):
+        return int(quote["time_msc"])
+    # Mesmo formato de ``datetime.fromtimestamp(tick.time).isoformat()`` do worker
+    return int(datetime.fromisoformat(quote["time"]).timestamp() * 1000)
+
+
+def tick_day(time_msc: int) -> date:
+    """Pregão do tick: o MT5 grava o horário do servidor como se fosse UTC."""
+    return datetime.fromtimestamp(time_msc / 1000, timezone.utc).date()
+
+
+class TickDay:
+    """Colunas de ticks de um símbolo em um pregão."""
+
+    def __init__(self, symbol: str, day: date, columns: Dict[str, np.ndarray], sealed: bool):
+        self.symbol = symbol
+        self.day = day
+        self.columns = columns
+        self.sealed = sealed
+
+    def __len__(self) -> int:
+        return len(self.columns["time_msc"])
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def between(self, start_msc: Optional[int] = None, end_msc: Optional[int] = None) -> "TickDay":
+        """Recorte [start_msc, end_msc) por horário (os ticks já estão em ordem)."""
+        times = self.columns["time_msc"]
+        lo = 0 if start_msc is None else int(np.searchsorted(times, start_msc, side="left"))
+        hi = len(times) if end_msc is None else int(np.searchsorted(times, end_msc, side="left"))
+        return TickDay(self.symbol, self.day, {k: v[lo:hi] for k, v in self.columns.items()}, self.sealed)
+
+    def replay(self) -> Iterator[Dict]:
+        """Ticks em ordem, no formato das cotações do worker."""
+        for i in range(len(self)):
+            time_msc = int(self.columns["time_msc"][i])
+            yield {
+                "symbol": self.symbol,
+                "time_msc": time_msc,
+                "time": datetime.fromtimestamp(time_msc / 1000).isoformat(),
+                "bid": float(self.columns["bid"][i]),
+                "ask": float(self.columns["ask"][i]),
+                "last": float(self.columns["last"][i]),
+                "volume": float(self.columns["volume"][i]),
+                "flags": int(self.columns["flags"][i]),
+            }
+
+
+class TickJournal:
+    """Grava os ticks em lote a cada ``flush_interval`` segundos e lê dias gravados."""
+
+    def __init__(self, root: Optional[str] = None, flush_interval: Optional[float] = None):
+        self.root = root or os.getenv("TICK_JOURNAL_DIR", os.path.join("data", "ticks"))
+        self.flush_interval = flush_interval or float(os.getenv("TICK_JOURNAL_FLUSH_SECONDS", "1"))
+        self.running = False
+        self._pending: Dict[Tuple[date, str], List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.ticks_written = 0
+
+    # --- gravação -----------------------------------------------------------
+
+    def append(self, quote: Dict):
+        """Enfileira o tick da cotação."""
+        time_msc = _time_msc(quote)
+        row = (
+            time_msc,
+            float(quote.get("bid") or 0),
+            float(quote.get("ask") or 0),
+            float(quote.get("last") or 0),
+            float(quote.get("volume") or 0),
+            int(quote.get("flags") or 0),
+        )
+        key = (tick_day(time_msc), quote["symbol"])
+        with self._lock:
+            self._pending.setdefault(key, []).append(row)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(rows) for rows in self._pending.values())
+
+    def flush(self) -> int:
+        """Anexa os ticks enfileirados aos arquivos do dia; retorna quantos."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        written = 0
+        with self._io_lock:
+            for (day, symbol), rows in pending.items():
+                path = self._path(day, symbol, JOURNAL_SUFFIX)
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "ab") as f:
+                        np.array(rows, dtype=TICK_DTYPE).tofile(f)
+                    written += len(rows)
+                except Exception as e:
+                    logger.error(f"Erro ao gravar ticks de {symbol} em {path}: {e}")
+                    with self._lock:
+                        self._pending[(day, symbol)] = rows + self._pending.get((day, symbol), [])
+
+        self.flushes += 1
+        self.ticks_written += written
+        return written
+
+    def seal(self, day: date) -> int:
+        """Converte os diários brutos do dia em arquivos colunares comprimidos."""
+        folder = os.path.join(self.root, day.isoformat())
+        if not os.path.isdir(folder):
+            return 0
+        sealed = 0
+        with self._io_lock:
+            for name in sorted(os.listdir(folder)):
+                if not name.endswith(JOURNAL_SUFFIX):
+                    continue
+                symbol = name[: -len(JOURNAL_SUFFIX)]
+                raw = self._read_raw(os.path.join(folder, name))
+                if raw is not None:
+                    columns = self._merge(self._read_sealed(day, symbol), raw)
+                    target = self._path(day, symbol, SEALED_SUFFIX)
+                    np.savez_compressed(target + ".tmp.npz", **columns)
+                    os.replace(target + ".tmp.npz", target)
+                    # O memmap precisa ser liberado antes de remover o arquivo
+                    del raw
+                os.remove(os.path.join(folder, name))
+                sealed += 1
+        if sealed:
+            logger.info(f"Diário de ticks de {day} selado ({sealed} símbolos)")
+        return sealed
+
+    def seal_closed_days(self, today: Optional[date] = None) -> int:
+        """Sela todos os dias anteriores a ``today`` que ainda têm diário bruto."""
+        today = today or datetime.now(timezone.utc).date()
+        if not os.path.isdir(self.root):
+            return 0
+        sealed = 0
+        for name in sorted(os.listdir(self.root)):
+            try:
+                day = date.fromisoformat(name)
+            except ValueError:
+                continue
+            if day < today:
+                sealed += self.seal(day)
+        return sealed
+
+    def _run(self):
+        current_day = datetime.now(timezone.utc).date()
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.flush()
+                today = datetime.now(timezone.utc).date()
+                if today != current_day:
+                    self.seal_closed_days(today)
+                    current_day = today
+            except Exception as e:
+                logger.error(f"Erro no diário de ticks: {e}")
+            time.sleep(max(0.0, self.flush_interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self.running:
+            return
+        try:
+            self.seal_closed_days()
+        except Exception as e:
+            logger.error(f"Erro ao selar diários de ticks anteriores: {e}")
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info(f"Diário de ticks ativo em {self.root} (intervalo {self.flush_interval}s)")
+
+    def stop(self):
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # --- leitura ------------------------------------------------------------
+
+    def days(self, symbol: str) -> List[date]:
+        """Pregões com ticks gravados para o símbolo."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            try:
+                day = date.fromisoformat(name)
+            except ValueError:
+                continue
+            if any(os.path.exists(self._path(day, symbol, s)) for s in (JOURNAL_SUFFIX, SEALED_SUFFIX)):
+                found.append(day)
+        return found
+
+    def load(self, symbol: str, day: date) -> Optional[TickDay]:
+        """Ticks do dia; o diário bruto é mapeado em memória, sem cópia."""
+        sealed = self._read_sealed(day, symbol)
+        raw = self._read_raw(self._path(day, symbol, JOURNAL_SUFFIX))
+        if sealed is None and raw is None:
+            return None
+        if raw is None:
+            return TickDay(symbol, day, sealed, sealed=True)
+        if sealed is None:
+            return TickDay(symbol, day, self._sorted({name: raw[name] for name in COLUMNS}), sealed=False)
+        return TickDay(symbol, day, self._merge(sealed, raw), sealed=False)
+
+    def replay(self, symbol: str, day: date) -> Iterator[Dict]:
+        ticks = self.load(symbol, day)
+        return ticks.replay() if ticks is not None else iter(())
+
+    # --- internos -----------------------------------------------------------
+
+    def _path(self, day: date, symbol: str, suffix: str) -> str:
+        return os.path.join(self.root, day.isoformat(), f"{symbol}{suffix}")
+
+    @staticmethod
+    def _read_raw(path: str) -> Optional[np.ndarray]:
+        if not os.path.exists(path):
+            return None
+        # Um registro incompleto no fim (gravação em andamento) é ignorado
+        count = os.path.getsize(path) // TICK_DTYPE.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+
+    def _read_sealed(self, day: date, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._path(day, symbol, SEALED_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return {name: data[name] for name in COLUMNS}
+
+    @staticmethod
+    def _sorted(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        times = columns["time_msc"]
+        if len(times) < 2 or bool(np.all(times[1:] >= times[:-1])):
+            return columns
+        order = np.argsort(times, kind="stable")
+        return {name: np.asarray(values)[order] for name, values in columns.items()}
+
+    @classmethod
+    def _merge(cls, sealed: Optional[Dict[str, np.ndarray]], raw: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+        parts = []
+        if sealed is not None:
+            parts.append(sealed)
+        if raw is not None:
+            parts.append({name: np.asarray(raw[name]) for name in COLUMNS})
+        return cls._sorted({
+            name: np.concatenate([part[name] for part in parts]).astype(TICK_DTYPE[name], copy=False)
+            for name in COLUMNS
+        })
+
+
+tick_journal = TickJournal()
@@ -0,0 +1,15 @@
+from backend import db
+
+
+def dialect_insert(table, bind=None):
+    """Retorna um INSERT com suporte a ON CONFLICT para o banco em uso.
+
+    Produção usa PostgreSQL; os testes rodam em SQLite, que aceita a mesma
+    cláusula ON CONFLICT. Fora do contexto Flask, informe a engine em ``bind``.
+    """
+    bind = bind if bind is not None else db.session.get_bind()
+    if bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(table)
@@ -0,0 +1,169 @@
+"""Redução de séries temporais para gráficos (parâmetro ``points=`` das rotas).
+
+``lttb`` (Largest-Triangle-Three-Buckets) preserva o formato visual da linha;
+``minmax`` mantém a mínima e a máxima de cada faixa, sem perder picos. Séries
+OHLC são agregadas por faixa (abertura, máxima, mínima, fechamento, volume).
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from flask import jsonify
+
+METHODS = ("lttb", "minmax")
+MIN_POINTS = 3
+
+
+def parse_points(args):
+    """Lê ``points`` e ``downsample`` da query; retorna (points, method, resposta de erro).
+
+    ``points`` ausente ou 0 desliga a redução.
+    """
+    try:
+        points = int(args.get("points", 0))
+    except (TypeError, ValueError):
+        points = -1
+    if points != 0 and points < MIN_POINTS:
+        return None, None, (
+            jsonify({"success": False, "error": f"'points' deve ser um inteiro >= {MIN_POINTS}"}),
+            400,
+        )
+    method = args.get("downsample", "lttb")
+    if method not in METHODS:
+        return None, None, (
+            jsonify({"success": False, "error": f"'downsample' deve ser um de: {', '.join(METHODS)}"}),
+            400,
+        )
+    return points, method, None
+
+
+def _bucket_edges(n: int, buckets: int) -> np.ndarray:
+    # Faixas de tamanho quase igual sobre os pontos internos [1, n - 1)
+    return np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Índices escolhidos pelo LTTB (primeiro e último sempre incluídos)."""
+    n = len(y)
+    if points >= n or points < MIN_POINTS:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = _bucket_edges(n, points - 2)
+
+    # Média de cada faixa, calculada de uma vez com somas acumuladas
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = np.diff(edges)
+    avg_x = (csx[edges[1:]] - csx[edges[:-1]]) / counts
+    avg_y = (csy[edges[1:]] - csy[edges[:-1]]) / counts
+    avg_x = np.append(avg_x, x[-1])
+    avg_y = np.append(avg_y, y[-1])
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # Cada faixa depende do ponto escolhido na anterior; dentro dela é vetorizado
+        area = np.abs(
+            (x[prev] - avg_x[b + 1]) * (y[lo:hi] - y[prev])
+            - (x[prev] - x[lo:hi]) * (avg_y[b + 1] - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, points: int) -> np.ndarray:
+    """Índices da mínima e da máxima de cada faixa, em ordem, mais as pontas."""
+    n = len(y)
+    if points >= n or points < MIN_POINTS:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    if points < 4:
+        # Só cabe um ponto interno: o mais afastado da média
+        interior = np.nan_to_num(y[1:-1], nan=float(np.nanmean(y)) if np.isfinite(y).any() else 0.0)
+        k = 1 + int(np.argmax(np.abs(interior - interior.mean())))
+        return np.array([0, k, n - 1])
+    buckets = (points - 2) // 2
+    edges = _bucket_edges(n, buckets)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Matriz faixas × posições com preenchimento, para argmin/argmax de uma vez
+    width = int((ends - starts).max())
+    idx = starts[:, None] + np.arange(width)[None, :]
+    valid = idx < ends[:, None]
+    values = y[np.minimum(idx, n - 1)]
+    lows = np.where(valid & ~np.isnan(values), values, np.inf)
+    highs = np.where(valid & ~np.isnan(values), values, -np.inf)
+    rows = np.arange(len(starts))
+    picked = np.concatenate((
+        [0],
+        idx[rows, lows.argmin(axis=1)],
+        idx[rows, highs.argmax(axis=1)],
+        [n - 1],
+    ))
+    return np.unique(picked)
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, points: int, method: str = "lttb") -> np.ndarray:
+    if method == "minmax":
+        return minmax_indices(y, points)
+    return lttb_indices(x, y, points)
+
+
+def _time_axis(values: Sequence) -> np.ndarray:
+    """Eixo numérico a partir de datas ISO; posições se não forem datas."""
+    try:
+        return np.asarray(values, dtype="datetime64[ms]").astype(np.int64).astype(np.float64)
+    except (TypeError, ValueError):
+        return np.arange(len(values), dtype=np.float64)
+
+
+def downsample_records(
+    records: List[Dict],
+    points: int,
+    y_key: str,
+    x_key: Optional[str] = "date",
+    method: str = "lttb",
+) -> List[Dict]:
+    """Subconjunto de ``records`` com no máximo ``points`` itens (0 = todos)."""
+    if not points or len(records) <= points:
+        return records
+    y = np.array([r[y_key] if r[y_key] is not None else np.nan for r in records], dtype=np.float64)
+    x = _time_axis([r[x_key] for r in records]) if x_key else np.arange(len(records), dtype=np.float64)
+    return [records[i] for i in downsample_indices(x, y, points, method)]
+
+
+def downsample_ohlc(records: List[Dict], points: int, time_key: str = "date") -> List[Dict]:
+    """Agrupa barras consecutivas em até ``points`` barras (OHLC e volume somado)."""
+    n = len(records)
+    if not points or n <= points:
+        return records
+    starts = np.linspace(0, n, points + 1).astype(np.int64)[:-1]
+    starts = np.unique(starts)
+    ends = np.append(starts[1:], n) - 1
+
+    def column(key):
+        return np.array([r.get(key) if r.get(key) is not None else np.nan for r in records], dtype=np.float64)
+
+    high = np.fmax.reduceat(column("high"), starts)
+    low = np.fmin.reduceat(column("low"), starts)
+    merged = []
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        bar = dict(records[e])
+        bar[time_key] = records[s][time_key]
+        bar["open"] = records[s].get("open")
+        bar["high"] = None if np.isnan(high[i]) else float(high[i])
+        bar["low"] = None if np.isnan(low[i]) else float(low[i])
+        merged.append(bar)
+    if "volume" in records[0]:
+        volume = np.add.reduceat(np.nan_to_num(column("volume")), starts)
+        for bar, v in zip(merged, volume):
+            bar["volume"] = float(v)
+    if "ticks" in records[0]:
+        ticks = np.add.reduceat(np.array([r.get("ticks") or 0 for r in records]), starts)
+        for bar, t in zip(merged, ticks):
+            bar["ticks"] = int(t)
+    return merged
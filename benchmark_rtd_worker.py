@@ -0,0 +1,133 @@
+# Benchmark do RTD worker sobre o terminal MT5 simulado.
+# Roda ciclos do loop de cotações com N símbolos e M clientes inscritos e
+# reporta a latência por ciclo e a vazão (cotações e lotes por segundo).
+#
+# Uso: python benchmark_rtd_worker.py --symbols 300 --clients 200 --cycles 60
+
+import argparse
+import json
+import logging
+import time
+from typing import Dict
+
+import numpy as np
+
+from backend.services import metatrader5_rtd_worker as worker_module
+from backend.services.asset_metrics_writer import asset_metrics_writer
+from backend.services.mt5_simulator import SimulatedMT5
+from backend.services.quote_conflation import QuoteConflator
+
+
+class _CountingSocketIO:
+    """Socket.IO de mentira: conta mensagens e bytes serializados."""
+
+    def __init__(self):
+        self.messages = 0
+        self.quotes = 0
+        self.bytes = 0
+
+    def emit(self, event, data, room=None):
+        self.messages += 1
+        self.quotes += len(data.get("quotes", ()))
+        self.bytes += len(json.dumps(data, default=str))
+
+
+class _BenchmarkWorker(worker_module.MetaTrader5RTDWorker):
+    def _initialize_database(self):
+        self.db_engine = None
+
+    def _get_portfolio_symbols(self):
+        return []
+
+
+def run_benchmark(
+    symbols: int = 300,
+    clients: int = 100,
+    symbols_per_client: int = 20,
+    cycles: int = 60,
+    ticks_per_second: float = 1.0,
+    interval: float = 1.0,
+    max_rate: float = 2.0,
+    seed: int = 0,
+) -> Dict:
+    """Executa ``cycles`` ciclos do worker em tempo simulado e devolve o relatório."""
+    clock = {"now": 0.0}
+    sim = SimulatedMT5(clock=lambda: clock["now"])
+    names = [f"SIM{i:04d}" for i in range(symbols)]
+    sim.load_synthetic(names, ticks_per_second=ticks_per_second, seed=seed)
+
+    saved = worker_module.mt5 if hasattr(worker_module, "mt5") else None, worker_module.MT5_AVAILABLE
+    worker_module.mt5, worker_module.MT5_AVAILABLE = sim, True
+    try:
+        socketio = _CountingSocketIO()
+        worker = _BenchmarkWorker(socketio)
+        worker.main_symbols = list(names)
+        worker.conflator = QuoteConflator(max_rate=max_rate, clock=lambda: clock["now"])
+        worker.initialize_mt5()
+
+        rng = np.random.default_rng(seed)
+        for client in range(clients):
+            picks = rng.choice(names, size=min(symbols_per_client, symbols), replace=False)
+            for symbol in picks:
+                worker.subscribe_ticker(f"client{client}", str(symbol))
+
+        terminal_calls_before = sum(sim.calls.values())
+        latencies = []
+        updated = 0
+        for _ in range(cycles):
+            clock["now"] += interval
+            started = time.perf_counter()
+            updated += worker._poll_symbols(set(names), worker.subscriptions.symbols())
+            latencies.append(time.perf_counter() - started)
+        terminal_calls = sum(sim.calls.values()) - terminal_calls_before
+    finally:
+        worker_module.mt5, worker_module.MT5_AVAILABLE = saved
+        asset_metrics_writer.flush()
+
+    latencies_ms = np.array(latencies) * 1000
+    busy = float(np.sum(latencies))
+    return {
+        "symbols": symbols,
+        "clients": clients,
+        "cycles": cycles,
+        "loop_ms_p50": round(float(np.percentile(latencies_ms, 50)), 3),
+        "loop_ms_p95": round(float(np.percentile(latencies_ms, 95)), 3),
+        "loop_ms_max": round(float(latencies_ms.max()), 3),
+        "quotes_per_second": round(symbols * cycles / busy, 1) if busy else None,
+        "quotes_updated": updated,
+        "quotes_suppressed": worker.change_detector.suppressed,
+        **worker.conflator.stats(),
+        "socket_messages": socketio.messages,
+        "socket_kb": round(socketio.bytes / 1024, 1),
+        "terminal_calls_per_cycle": round(terminal_calls / cycles, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do RTD worker com MT5 simulado")
+    parser.add_argument("--symbols", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--symbols-per-client", type=int, default=20)
+    parser.add_argument("--cycles", type=int, default=60)
+    parser.add_argument("--ticks-per-second", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--max-rate", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger("backend").setLevel(logging.WARNING)
+    report = run_benchmark(
+        symbols=args.symbols,
+        clients=args.clients,
+        symbols_per_client=args.symbols_per_client,
+        cycles=args.cycles,
+        ticks_per_second=args.ticks_per_second,
+        interval=args.interval,
+        max_rate=args.max_rate,
+        seed=args.seed,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import pytest
 from backend import create_app, db
 from backend.config import Config
+from backend.services.editable_metrics_cache import editable_metrics_cache
+from backend.services.portfolio_risk import portfolio_risk_engine
+from backend.services.portfolio_summary_cache import portfolio_summary_cache
+from backend.services.price_matrix import price_matrix
 
 
 @pytest.fixture
-def client():
+def client(tmp_path):
     Config.SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    portfolio_summary_cache.clear()
+    editable_metrics_cache.clear()
+    portfolio_risk_engine.clear()
+    price_matrix.clear(root=str(tmp_path / "price_matrix"))
     app = create_app()
     app.config["TESTING"] = True
     with app.test_client() as client:
@@ -56,13 +56,15 @@ export function useRealTimeQuotes(symbols: string[]) {
       setConnected(false);
     });
 
-    socket.on('price_update', (data: RealTimeQuote) => {
-      // Atualizar o estado com a nova cotação
-      console.log('Received price update:', data);
-      setQuotes(prev => ({
-        ...prev,
-        [data.symbol]: data
-      }));
+    socket.on('price_batch', (data: { quotes: RealTimeQuote[] }) => {
+      // Um lote por ciclo do servidor: aplicar todas as cotações de uma vez
+      setQuotes(prev => {
+        const next = { ...prev };
+        for (const quote of data.quotes) {
+          next[quote.symbol] = quote;
+        }
+        return next;
+      });
     });
 
     socket.on('connect_error', (error) => {
@@ -0,0 +1,45 @@
+"""add corporate_actions and daily_prices.adj_factor
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2025-09-29 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5b6c7d8e9f0'
+down_revision: Union[str, Sequence[str], None] = 'f4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'daily_prices',
+        sa.Column('adj_factor', sa.Numeric(20, 10), nullable=False, server_default='1'),
+    )
+    op.execute("UPDATE daily_prices SET adj_close = close")
+    op.create_table(
+        'corporate_actions',
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('ex_date', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('value', sa.Numeric(20, 8), nullable=False),
+        sa.Column('applies_before', sa.Date(), nullable=True),
+        sa.Column('factor', sa.Numeric(20, 10), nullable=True),
+        sa.Column('source', sa.String(length=20), nullable=True),
+        sa.Column('applied_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('symbol', 'ex_date', 'kind'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('corporate_actions')
+    op.drop_column('daily_prices', 'adj_factor')
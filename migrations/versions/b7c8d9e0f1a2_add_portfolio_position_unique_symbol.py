@@ -0,0 +1,42 @@
+"""add unique (portfolio_id, symbol) to portfolio_positions
+
+Revision ID: b7c8d9e0f1a2
+Revises: 9a1b2c3d4e5f
+Create Date: 2025-09-02 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c8d9e0f1a2'
+down_revision: Union[str, Sequence[str], None] = '9a1b2c3d4e5f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Mantém apenas a posição mais recente de cada símbolo antes de criar a restrição
+    op.execute(
+        """
+        DELETE FROM portfolio_positions
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM portfolio_positions GROUP BY portfolio_id, symbol
+        )
+        """
+    )
+    op.create_unique_constraint(
+        "uix_portfolio_position_symbol",
+        "portfolio_positions",
+        ["portfolio_id", "symbol"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(
+        "uix_portfolio_position_symbol", "portfolio_positions", type_="unique"
+    )
@@ -0,0 +1,43 @@
+"""add portfolio_intraday_cotas
+
+Revision ID: c1d2e3f4a5b6
+Revises: b7c8d9e0f1a2
+Create Date: 2025-09-05 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1d2e3f4a5b6'
+down_revision: Union[str, Sequence[str], None] = 'b7c8d9e0f1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'portfolio_intraday_cotas',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('portfolio_id', sa.Integer(), nullable=False),
+        sa.Column('minute', sa.DateTime(), nullable=False),
+        sa.Column('cota_open', sa.Numeric(20, 8), nullable=False),
+        sa.Column('cota_high', sa.Numeric(20, 8), nullable=False),
+        sa.Column('cota_low', sa.Numeric(20, 8), nullable=False),
+        sa.Column('cota_close', sa.Numeric(20, 8), nullable=False),
+        sa.Column('variacao_cota_pct', sa.Numeric(12, 6), nullable=False),
+        sa.Column('patrimonio_liquido', sa.Numeric(20, 2), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('portfolio_id', 'minute', name='uix_portfolio_intraday_minute'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('portfolio_intraday_cotas')
@@ -0,0 +1,55 @@
+"""add benchmark_weights and portfolio_attribution_daily
+
+Revision ID: d2e3f4a5b6c7
+Revises: c1d2e3f4a5b6
+Create Date: 2025-09-08 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e3f4a5b6c7'
+down_revision: Union[str, Sequence[str], None] = 'c1d2e3f4a5b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'benchmark_weights',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('benchmark', sa.String(length=20), nullable=False),
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('weight', sa.Numeric(12, 6), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('benchmark', 'symbol', 'date', name='uix_benchmark_symbol_date'),
+    )
+    op.create_table(
+        'portfolio_attribution_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('portfolio_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('sector', sa.String(length=255), nullable=False),
+        sa.Column('portfolio_weight', sa.Numeric(20, 10), nullable=False),
+        sa.Column('benchmark_weight', sa.Numeric(20, 10), nullable=False),
+        sa.Column('portfolio_return', sa.Numeric(20, 10), nullable=False),
+        sa.Column('benchmark_return', sa.Numeric(20, 10), nullable=False),
+        sa.Column('allocation', sa.Numeric(20, 10), nullable=False),
+        sa.Column('selection', sa.Numeric(20, 10), nullable=False),
+        sa.Column('interaction', sa.Numeric(20, 10), nullable=False),
+        sa.ForeignKeyConstraint(['portfolio_id'], ['portfolios.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('portfolio_id', 'date', 'sector', name='uix_portfolio_attribution_day_sector'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('portfolio_attribution_daily')
+    op.drop_table('benchmark_weights')
@@ -0,0 +1,40 @@
+"""add intraday_bars
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2025-09-15 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3f4a5b6c7d8'
+down_revision: Union[str, Sequence[str], None] = 'd2e3f4a5b6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'intraday_bars',
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('timeframe', sa.String(length=4), nullable=False),
+        sa.Column('bar_time', sa.DateTime(), nullable=False),
+        sa.Column('open', sa.Numeric(20, 6), nullable=False),
+        sa.Column('high', sa.Numeric(20, 6), nullable=False),
+        sa.Column('low', sa.Numeric(20, 6), nullable=False),
+        sa.Column('close', sa.Numeric(20, 6), nullable=False),
+        sa.Column('volume', sa.Numeric(24, 2), nullable=False),
+        sa.Column('ticks', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('symbol', 'timeframe', 'bar_time'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('intraday_bars')
@@ -0,0 +1,39 @@
+"""add daily_prices
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2025-09-22 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a5b6c7d8e9'
+down_revision: Union[str, Sequence[str], None] = 'e3f4a5b6c7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_prices',
+        sa.Column('symbol', sa.String(length=20), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('open', sa.Numeric(20, 6), nullable=True),
+        sa.Column('high', sa.Numeric(20, 6), nullable=True),
+        sa.Column('low', sa.Numeric(20, 6), nullable=True),
+        sa.Column('close', sa.Numeric(20, 6), nullable=False),
+        sa.Column('adj_close', sa.Numeric(20, 6), nullable=True),
+        sa.Column('volume', sa.Numeric(24, 2), nullable=True),
+        sa.PrimaryKeyConstraint('symbol', 'date'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_prices')
@@ -4,6 +4,7 @@ import logging
 from flask_socketio import SocketIO
 from backend import create_app, socketio
 from backend.services.metatrader5_rtd_worker import initialize_rtd_worker
+from backend.services.eod_snapshot import eod_snapshot_scheduler
 from backend.routes.realtime_routes import register_socketio_events
 
 if sys.stdout.encoding.lower() != "utf-8":
@@ -25,6 +26,12 @@ app = create_app()
 logger.info("🔧 Inicializando o Worker de Dados em Tempo Real (RTD)...")
 initialize_rtd_worker(socketio)
 
+# --- SNAPSHOT DE FECHAMENTO ---
+# Grava o fechamento de todas as carteiras uma vez por pregão; com vários
+# processos, só o que obtém o advisory lock no Postgres executa a rotina
+logger.info("🕔 Inicializando o agendador de snapshot de fechamento...")
+eod_snapshot_scheduler.start(app)
+
 # --- REGISTRO DOS EVENTOS WEBSOCKET ---
 # Registra os handlers como @socketio.on('connect'), etc.
 logger.info("🔌 Registrando eventos de WebSocket...")
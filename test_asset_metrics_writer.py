@@ -0,0 +1,68 @@
+from sqlalchemy import event
+
+from backend import db
+from backend.models import AssetMetrics, Ticker
+from backend.services.asset_metrics_writer import AssetMetricsWriter
+
+
+def _quote(symbol, last, previous_close=None, **extra):
+    return {"symbol": symbol, "last": last, "previous_close": previous_close, "volume": 100, **extra}
+
+
+def test_flush_upserts_all_symbols_in_constant_statements(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            AssetMetrics(symbol="VALE3", last_price=10, previous_close_correct=9.5),
+        ])
+        db.session.commit()
+        engine = db.engine
+
+    writer = AssetMetricsWriter(flush_interval=1)
+    for i in range(300):
+        writer.add(_quote(f"SYM{i}", 10 + i, previous_close=10, open=9, high=11, low=8))
+    # Cotação sem fechamento anterior: usa o já gravado
+    writer.add(_quote("VALE3", 11.0))
+    writer.add(_quote("VALE3", 10.45))
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert writer.flush(engine) == 301
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert len(statements) == 2
+    assert writer.pending() == 0
+
+    with client.application.app_context():
+        assert Ticker.query.count() == 301
+        vale = db.session.get(AssetMetrics, "VALE3")
+        assert float(vale.last_price) == 10.45
+        assert float(vale.previous_close_correct) == 9.5
+        assert float(vale.price_change) == 0.95
+        assert float(vale.price_change_percent) == 10.0
+        sym = db.session.get(AssetMetrics, "SYM2")
+        assert float(sym.price_change_percent) == 20.0
+        assert (float(sym.open_price), float(sym.high_price), float(sym.low_price)) == (9, 11, 8)
+
+
+def test_failed_flush_keeps_newer_quotes(client):
+    class BrokenEngine:
+        class dialect:
+            name = "sqlite"
+
+        def begin(self):
+            raise RuntimeError("banco indisponível")
+
+    writer = AssetMetricsWriter(flush_interval=1)
+    writer.add(_quote("VALE3", 10.0, previous_close=9))
+    assert writer.flush(BrokenEngine()) == 0
+    writer.add(_quote("VALE3", 10.5, previous_close=9))
+
+    with client.application.app_context():
+        assert writer.flush(db.engine) == 1
+        assert float(db.session.get(AssetMetrics, "VALE3").last_price) == 10.5
@@ -0,0 +1,96 @@
+from collections import Counter
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+from backend.services import metatrader5_rtd_worker as worker_module
+from backend.services.daily_bar_cache import DailyBarCache
+
+
+def _rate(day, open_, high, low, close):
+    ts = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    return {"time": ts, "open": open_, "high": high, "low": low, "close": close}
+
+
+def test_cache_seeds_once_per_trading_day_and_tracks_ticks():
+    calls = []
+    bars = {
+        date(2025, 1, 2): [
+            _rate(date(2025, 1, 1), 9, 10, 8, 9.5),
+            _rate(date(2025, 1, 2), 9.6, 10.2, 9.4, 10),
+        ],
+        date(2025, 1, 3): [_rate(date(2025, 1, 2), 9.6, 10.4, 9.4, 10.1)],
+    }
+    day = {"current": date(2025, 1, 2)}
+
+    def loader(symbol):
+        calls.append(symbol)
+        return bars[day["current"]]
+
+    cache = DailyBarCache(loader)
+    bar = cache.get("VALE3", date(2025, 1, 2))
+    assert bar.as_dict() == {"open": 9.6, "high": 10.2, "low": 9.4, "previous_close": 9.5}
+
+    cache.update("VALE3", 10.4, date(2025, 1, 2))
+    cache.update("VALE3", 9.3, date(2025, 1, 2))
+    bar = cache.update("VALE3", 10.0, date(2025, 1, 2))
+    assert (bar.high, bar.low) == (10.4, 9.3)
+    assert calls == ["VALE3"]
+
+    # Novo pregão antes do primeiro negócio: a última barra é a de ontem
+    day["current"] = date(2025, 1, 3)
+    bar = cache.update("VALE3", 10.3, date(2025, 1, 3))
+    assert bar.as_dict() == {"open": 10.3, "high": 10.3, "low": 10.3, "previous_close": 10.1}
+    assert calls == ["VALE3", "VALE3"]
+
+
+def test_cache_throttles_reseed_when_terminal_has_no_bars():
+    calls = []
+    cache = DailyBarCache(lambda symbol: calls.append(symbol))
+
+    for _ in range(5):
+        bar = cache.update("PETR4", 20.0, date(2025, 1, 2))
+    assert len(calls) == 1
+    assert bar.previous_close == 0
+    assert (bar.open, bar.high, bar.low) == (20.0, 20.0, 20.0)
+
+
+class _FakeMT5:
+    TIMEFRAME_D1 = "D1"
+    TIMEFRAME_M1 = "M1"
+
+    def __init__(self, today):
+        self.today = today
+        self.calls = Counter()
+
+    def copy_rates_from_pos(self, symbol, timeframe, start, count):
+        self.calls["copy_rates_from_pos"] += 1
+        return [_rate(date(2025, 1, 1), 9, 10, 8, 9.5), _rate(self.today, 9.6, 10.2, 9.4, 10)]
+
+    def symbol_info_tick(self, symbol):
+        self.calls["symbol_info_tick"] += 1
+        return SimpleNamespace(
+            bid=10.0, ask=10.1, last=10.05, volume=100, time=1735826400, flags=0, volume_real=100.0
+        )
+
+
+def test_worker_uses_one_terminal_call_per_symbol_after_seeding(monkeypatch):
+    today = datetime.now(worker_module.MARKET_TZ).date()
+    fake = _FakeMT5(today)
+    monkeypatch.setattr(worker_module, "mt5", fake, raising=False)
+    monkeypatch.setattr(worker_module, "MT5_AVAILABLE", True)
+    monkeypatch.setattr(worker_module.MetaTrader5RTDWorker, "_initialize_database", lambda self: None)
+
+    worker = worker_module.MetaTrader5RTDWorker()
+    worker.mt5_connected = True
+    worker.mt5_symbols = {"VALE3", "PETR4"}
+    worker.realtime_symbols = {"VALE3", "PETR4"}
+
+    for _ in range(10):
+        for symbol in ("VALE3", "PETR4"):
+            quote = worker.get_mt5_quote(symbol)
+
+    assert fake.calls == {"copy_rates_from_pos": 2, "symbol_info_tick": 20}
+    assert quote["previous_close"] == 9.5
+    assert quote["high"] == 10.2
+    assert worker._get_previous_close("VALE3") == 9.5
+    assert fake.calls["copy_rates_from_pos"] == 2
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+from backend.utils.downsample import (
+    downsample_ohlc,
+    downsample_records,
+    lttb_indices,
+    minmax_indices,
+)
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    idx = lttb_indices(np.arange(1000), y, 50)
+    assert len(idx) == 50
+    assert idx[0] == 0 and idx[-1] == 999
+    assert 437 in idx
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_small_series_untouched():
+    assert list(lttb_indices(np.arange(5), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_minmax_keeps_extremes():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=2000)
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 100
+    assert idx[0] == 0 and idx[-1] == 1999
+    assert int(np.argmin(y)) in idx and int(np.argmax(y)) in idx
+
+    # Nunca mais que ``points``, mesmo com apenas um ponto interno
+    idx = minmax_indices(y, 3)
+    assert len(idx) == 3 and idx[0] == 0 and idx[-1] == 1999
+    assert len(minmax_indices(y, 4)) <= 4
+
+
+def test_downsample_records_with_dates_and_nulls():
+    start = date(2020, 1, 1)
+    records = [
+        {"date": (start + timedelta(days=i)).isoformat(), "value": None if i % 7 == 0 else float(i % 13)}
+        for i in range(400)
+    ]
+    out = downsample_records(records, 40, "value")
+    assert len(out) == 40
+    assert out[0] is records[0] and out[-1] is records[-1]
+    assert downsample_records(records, 0, "value") is records
+
+
+def test_downsample_ohlc_merges_bars():
+    bars = [
+        {"time": f"2024-01-02T10:{i:02d}:00", "open": i, "high": i + 2, "low": i - 1, "close": i + 1, "volume": 10.0, "ticks": 2}
+        for i in range(10)
+    ]
+    out = downsample_ohlc(bars, 5, time_key="time")
+    assert len(out) == 5
+    assert out[0] == {"time": "2024-01-02T10:00:00", "open": 0, "high": 3.0, "low": -1.0, "close": 2, "volume": 20.0, "ticks": 4}
+    assert out[-1]["close"] == 10
+
+
+def test_ibov_history_points(monkeypatch, client):
+    from backend.services import price_history
+
+    def fake_download(symbols, start=None, end=None, progress=None, **kwargs):
+        idx = pd.bdate_range(end=date.today() - timedelta(days=7), periods=200)
+        values = np.sin(np.arange(200) / 10.0) + 100
+        return pd.DataFrame(
+            {field: values for field in ('Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume')},
+            index=idx,
+        )
+
+    monkeypatch.setattr(price_history, 'yf', type('obj', (), {'download': fake_download}))
+
+    data = client.get('/api/market/ibov-history?points=30').get_json()
+    assert data['success'] is True
+    assert len(data['history']) == 30
+
+    data = client.get('/api/market/ibov-history?points=30&downsample=minmax').get_json()
+    assert 2 < len(data['history']) <= 30
+
+    assert client.get('/api/market/ibov-history?points=1').status_code == 400
+    assert client.get('/api/market/ibov-history?points=30&downsample=foo').status_code == 400
@@ -0,0 +1,84 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from backend import db
+from backend.models import Portfolio, PortfolioEditableMetric
+from backend.services.editable_metrics_cache import EditableMetricsCache, editable_metrics_cache
+
+
+def _setup_metrics(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Portfolio(id=1, name="P1"),
+            Portfolio(id=2, name="P2"),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="qtdCotas", metric_value=100, date=date(2025, 1, 2)
+            ),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="caixaBruto", metric_value=50, date=date(2025, 1, 2)
+            ),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="caixaBruto", metric_value=70, date=date(2025, 1, 3)
+            ),
+            PortfolioEditableMetric(
+                portfolio_id=2, metric_key="cotaD1", metric_value=1.5, date=date(2025, 1, 1)
+            ),
+        ])
+        db.session.commit()
+
+
+def test_latest_value_per_metric_in_one_query(client):
+    _setup_metrics(client)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with client.application.app_context():
+        event.listen(db.engine, "before_cursor_execute", count)
+        try:
+            metrics = editable_metrics_cache.get_many([1, 2, 3])
+            assert editable_metrics_cache.summary_inputs(1) == (0.0, 100.0, 70.0)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count)
+
+    # qtdCotas não foi lançada em 03/01: mantém o último valor conhecido
+    assert metrics == {1: {"qtdCotas": 100.0, "caixaBruto": 70.0}, 2: {"cotaD1": 1.5}, 3: {}}
+    assert len(statements) == 1
+
+
+def test_update_editable_metrics_invalidates_cache(client):
+    _setup_metrics(client)
+
+    resp = client.get("/api/portfolio/1/editable-metrics")
+    assert {m["metric_key"]: m["metric_value"] for m in resp.get_json()["metrics"]} == {
+        "qtdCotas": 100.0,
+        "caixaBruto": 70.0,
+    }
+
+    client.post("/api/portfolio/1/editable-metrics", json=[{"metric_key": "caixaBruto", "metric_value": 90}])
+
+    resp = client.get("/api/portfolio/1/editable-metrics")
+    assert {m["metric_key"]: m["metric_value"] for m in resp.get_json()["metrics"]} == {
+        "qtdCotas": 100.0,
+        "caixaBruto": 90.0,
+    }
+
+
+def test_entries_follow_data_version_or_expire(client):
+    _setup_metrics(client)
+    cache = EditableMetricsCache(ttl_seconds=60)
+
+    with client.application.app_context():
+        assert cache.get(1)["caixaBruto"] == 70.0
+        # Gravação feita por outro processo
+        PortfolioEditableMetric.query.filter_by(
+            portfolio_id=1, metric_key="caixaBruto", date=date(2025, 1, 3)
+        ).one().metric_value = 95
+        db.session.commit()
+
+        assert cache.get(1)["caixaBruto"] == 70.0
+        # Versão nova vinda do banco força a releitura
+        assert cache.get(1, version=1)["caixaBruto"] == 95.0
+        assert EditableMetricsCache(ttl_seconds=0).get(2) == {"cotaD1": 1.5}
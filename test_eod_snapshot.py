@@ -0,0 +1,102 @@
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from backend import db
+from backend.models import (
+    Ticker,
+    Portfolio,
+    PortfolioPosition,
+    AssetMetrics,
+    PortfolioDailyValue,
+    PortfolioDailyMetric,
+    PortfolioEditableMetric,
+)
+from backend.services.eod_snapshot import EodSnapshotScheduler
+
+
+def _setup_portfolios(client, count=20):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Ticker(symbol="PETR4", type="stock"),
+            AssetMetrics(symbol="VALE3", last_price=10),
+            AssetMetrics(symbol="PETR4", last_price=20),
+        ])
+        for pid in range(1, count + 1):
+            db.session.add_all([
+                Portfolio(id=pid, name=f"P{pid}"),
+                PortfolioPosition(portfolio_id=pid, symbol="VALE3", quantity=pid, avg_price=5),
+                PortfolioPosition(portfolio_id=pid, symbol="PETR4", quantity=-1, avg_price=20),
+                PortfolioEditableMetric(portfolio_id=pid, metric_key="qtdCotas", metric_value=10),
+            ])
+        db.session.commit()
+
+
+def test_snapshot_all_portfolios_in_constant_statements(client):
+    _setup_portfolios(client)
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with client.application.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        resp = client.post("/api/portfolio/snapshots", json={"date": "2025-01-02"})
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert resp.status_code == 201
+    report = resp.get_json()["report"]
+    assert report["portfolios"] == 20
+    assert {"load_ms", "value_ms", "write_ms", "total_ms"} <= set(report)
+    assert len(statements) <= 6
+
+    with client.application.app_context():
+        value = PortfolioDailyValue.query.filter_by(portfolio_id=3, date=date(2025, 1, 2)).one()
+        assert float(value.total_value) == 10.0
+        assert float(value.total_cost) == -5.0
+        cota = PortfolioDailyMetric.query.filter_by(
+            portfolio_id=3, metric_id="valorCota", date=date(2025, 1, 2)
+        ).one()
+        assert float(cota.value) == 1.0
+
+
+def test_snapshot_is_idempotent(client):
+    _setup_portfolios(client, count=3)
+
+    client.post("/api/portfolio/snapshots", json={"date": "2025-01-02"})
+    with client.application.app_context():
+        db.session.get(AssetMetrics, "VALE3").last_price = 11
+        db.session.commit()
+    client.post("/api/portfolio/snapshots", json={"date": "2025-01-02"})
+
+    with client.application.app_context():
+        assert PortfolioDailyValue.query.count() == 3
+        assert PortfolioDailyMetric.query.count() == 6
+        value = PortfolioDailyValue.query.filter_by(portfolio_id=1).one()
+        assert float(value.total_value) == -9.0
+
+
+def test_scheduler_runs_once_per_trading_day(client):
+    _setup_portfolios(client, count=2)
+    scheduler = EodSnapshotScheduler()
+    scheduler.app = client.application
+
+    # Janeiro: fechamento às 18:00 (EUA no horário padrão) + 30 minutos
+    assert not scheduler.due(datetime(2025, 1, 2, 17, 45))
+    assert scheduler.due(datetime(2025, 1, 2, 18, 30))
+    assert not scheduler.due(datetime(2025, 1, 4, 19, 0))
+    # Julho: fechamento às 17:00; Carnaval sem pregão
+    assert scheduler.due(datetime(2025, 7, 1, 17, 45))
+    assert not scheduler.due(datetime(2025, 3, 4, 19, 0))
+    # SQLite: processo único, sempre agendador
+    assert scheduler.is_leader()
+
+    report = scheduler.run(date(2025, 1, 2))
+    assert report["portfolios"] == 2
+    assert scheduler.last_report is report
+    assert not scheduler.due(datetime(2025, 1, 2, 19, 0))
+    assert scheduler.due(datetime(2025, 1, 3, 18, 30))
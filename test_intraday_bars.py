@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+
+from backend import db
+from backend.models import IntradayBar
+from backend.routes import historical_routes
+from backend.services.intraday_bars import IntradayBarAggregator
+
+T0 = int(datetime(2024, 5, 6, 10, 0, tzinfo=timezone.utc).timestamp())
+
+
+def _feed(agg):
+    agg.add_tick("VALE3", T0 + 5, 61.0, 100)
+    agg.add_tick("VALE3", T0 + 30, 61.4, 200)
+    agg.add_tick("VALE3", T0 + 59, 60.8, 100)
+    agg.add_tick("VALE3", T0 + 61, 61.1, 300)
+    agg.add_tick("VALE3", T0 + 301, 61.5, 50)
+
+
+def test_ticks_build_bars_per_timeframe():
+    agg = IntradayBarAggregator(capacity=10)
+    _feed(agg)
+
+    one = agg.bars("VALE3", "1m")
+    assert [b["time"] for b in one] == ["2024-05-06T10:00:00", "2024-05-06T10:01:00", "2024-05-06T10:05:00"]
+    assert one[0] == {
+        "time": "2024-05-06T10:00:00", "open": 61.0, "high": 61.4, "low": 60.8,
+        "close": 60.8, "volume": 400.0, "ticks": 3,
+    }
+    five = agg.bars("VALE3", "5m")
+    assert len(five) == 2
+    assert five[0]["close"] == 61.1 and five[0]["volume"] == 700.0
+    assert len(agg.bars("VALE3", "60m")) == 1
+    assert agg.bars("VALE3", "1m", limit=1)[0]["close"] == 61.5
+
+    agg.add_tick("VALE3", T0 + 10, 99.0)
+    assert agg.late_ticks == 1
+    assert agg.bars("VALE3", "1m")[0]["high"] == 61.4
+
+
+def test_ring_keeps_latest_bars():
+    agg = IntradayBarAggregator(capacity=3)
+    for i in range(5):
+        agg.add_tick("PETR4", T0 + i * 60, 38.0 + i)
+    bars = agg.bars("PETR4", "1m")
+    assert [b["close"] for b in bars] == [40.0, 41.0, 42.0]
+
+
+def test_closed_bars_are_flushed_once(client):
+    agg = IntradayBarAggregator(capacity=10)
+    _feed(agg)
+    # Relógio de outro símbolo fecha as barras em aberto de VALE3
+    agg.add_tick("PETR4", T0 + 3600, 38.0)
+    assert agg.close_due() > 0
+    assert agg.close_due() == 0
+
+    with client.application.app_context():
+        written = agg.flush(db.engine)
+        assert written == agg.bars_written
+        rows = IntradayBar.query.filter_by(symbol="VALE3", timeframe="1m").order_by(IntradayBar.bar_time).all()
+        assert [float(r.close) for r in rows] == [60.8, 61.1, 61.5]
+        assert rows[0].ticks == 3
+        assert agg.flush(db.engine) == 0
+
+
+def test_intraday_route_serves_memory_then_database(client, monkeypatch):
+    agg = IntradayBarAggregator(capacity=10)
+    _feed(agg)
+    monkeypatch.setattr(historical_routes, "intraday_bars", agg)
+
+    resp = client.get("/api/historical/vale3/intraday?tf=1m")
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert body["source"] == "memory"
+    assert len(body["data"]) == 3
+
+    assert client.get("/api/historical/VALE3/intraday?tf=2m").status_code == 400
+
+    agg.close_due(T0 + 3600)
+    with client.application.app_context():
+        agg.flush(db.engine)
+    monkeypatch.setattr(historical_routes, "intraday_bars", IntradayBarAggregator())
+    body = client.get("/api/historical/VALE3/intraday?tf=5m").get_json()
+    assert body["source"] == "database"
+    assert [b["close"] for b in body["data"]] == [61.1, 61.5]
+
+
+def test_trades_count_once_and_repeated_quotes_add_no_volume():
+    agg = IntradayBarAggregator(capacity=10)
+    msc = T0 * 1000
+    trades = [
+        {"time_msc": msc + 100, "last": 61.0, "volume": 100},
+        {"time_msc": msc + 100, "last": 61.1, "volume": 200},
+        {"time_msc": msc + 900, "last": 61.2, "volume": 300},
+    ]
+    assert agg.add_trades("VALE3", trades) == 3
+    assert agg.trade_cursor("VALE3") == msc + 900
+    # Próxima leitura começa no segundo do cursor e repete negócios já vistos
+    assert agg.add_trades("VALE3", trades[2:] + [{"time_msc": msc + 1500, "last": 61.3, "volume": 50}]) == 1
+    bar = agg.bars("VALE3", "1m")[0]
+    assert bar["volume"] == 650.0 and bar["ticks"] == 4
+
+    quote = {"symbol": "PETR4", "last": 38.0, "volume": 500, "time_msc": msc}
+    for _ in range(3):
+        agg.add_quote(quote)
+    agg.add_quote(dict(quote, last=38.1, time_msc=msc + 10))
+    bar = agg.bars("PETR4", "1m")[0]
+    assert bar["volume"] == 1000.0 and bar["ticks"] == 2 and bar["close"] == 38.1
@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import numpy as np
+
+from backend import db
+from backend.models import (
+    AssetMetrics,
+    Portfolio,
+    PortfolioEditableMetric,
+    PortfolioIntradayCota,
+    PortfolioPosition,
+    Ticker,
+)
+from backend.services import intraday_cota_recorder as recorder_module
+from backend.services.intraday_cota_recorder import IntradayCotaRecorder
+from backend.services.portfolio_state_cache import PortfolioState, PortfolioStateCache
+from backend.services.portfolio_valuation import PortfolioBook
+
+
+def _state():
+    book = PortfolioBook(
+        symbols=["VALE3"],
+        quantity=np.array([100.0]),
+        avg_price=np.array([50.0]),
+        target_pct=np.array([0.0]),
+        last_price=np.array([60.0]),
+        daily_change_pct=np.array([0.0]),
+        previous_close=np.array([60.0]),
+        open_price=np.array([np.nan]),
+    )
+    return PortfolioState(1, "P1", book, caixa_bruto=0.0, qtd_cotas=100.0, cota_d1=50.0)
+
+
+def test_recorder_rolls_samples_into_minute_bars(client, monkeypatch):
+    cache = PortfolioStateCache()
+    cache.start()
+    cache.store(_state())
+    monkeypatch.setattr(recorder_module, "portfolio_state_cache", cache)
+
+    with client.application.app_context():
+        db.session.add(Portfolio(id=1, name="P1"))
+        db.session.commit()
+        engine = db.engine
+
+    recorder = IntradayCotaRecorder(interval_seconds=15)
+    for second, price in ((0, 60.0), (15, 63.0), (30, 57.0), (45, 61.0)):
+        cache.apply_quote("VALE3", price)
+        recorder.sample(datetime(2025, 1, 2, 10, 0, second))
+    cache.apply_quote("VALE3", 62.0)
+    recorder.sample(datetime(2025, 1, 2, 10, 1, 0))
+
+    assert recorder.flush(engine) == 1
+    # Fora do pregão o minuto em aberto é fechado
+    assert recorder.sample(datetime(2025, 1, 2, 18, 0, 0)) == 0
+    assert recorder.flush(engine) == 1
+
+    with client.application.app_context():
+        bars = PortfolioIntradayCota.query.order_by(PortfolioIntradayCota.minute).all()
+        assert [b.minute for b in bars] == [datetime(2025, 1, 2, 10, 0), datetime(2025, 1, 2, 10, 1)]
+        first = bars[0]
+        ohlc = [first.cota_open, first.cota_high, first.cota_low, first.cota_close]
+        assert [float(v) for v in ohlc] == [60.0, 63.0, 57.0, 61.0]
+        assert float(first.variacao_cota_pct) == 22.0
+        assert first.samples == 4
+
+
+def test_intraday_cota_route_downsamples(client):
+    with client.application.app_context():
+        db.session.add(Portfolio(id=1, name="P1"))
+        db.session.add_all([
+            PortfolioIntradayCota(
+                portfolio_id=1,
+                minute=datetime(2025, 1, 2, 10, m),
+                cota_open=10 + m,
+                cota_high=10.5 + m,
+                cota_low=9.5 + m,
+                cota_close=10.2 + m,
+                variacao_cota_pct=m,
+                patrimonio_liquido=1000 + m,
+                samples=4,
+            )
+            for m in range(10)
+        ])
+        db.session.commit()
+
+    resp = client.get("/api/portfolio/1/intraday-cota?start=2025-01-02&points=3")
+    data = resp.get_json()
+    assert resp.status_code == 200
+    assert data["minutes"] == 10
+    assert [p["time"] for p in data["points"]] == [
+        "2025-01-02T10:00:00", "2025-01-02T10:04:00", "2025-01-02T10:08:00"
+    ]
+    assert data["points"][0]["open"] == 10
+    assert data["points"][0]["high"] == 13.5
+    assert data["points"][0]["low"] == 9.5
+    assert data["points"][0]["close"] == 13.2
+    assert data["points"][-1]["variacao_cota_pct"] == 9
+
+    assert len(client.get("/api/portfolio/1/intraday-cota?start=2025-01-02").get_json()["points"]) == 10
+    assert client.get("/api/portfolio/1/intraday-cota?start=02-01-2025").status_code == 400
+    resp = client.get("/api/portfolio/1/intraday-cota?start=2025-01-02&points=abc")
+    assert resp.status_code == 400
+    assert resp.get_json()["success"] is False
+
+
+def test_recorder_loads_every_portfolio_and_reloads_after_invalidation(client, monkeypatch):
+    cache = PortfolioStateCache()
+    cache.start()
+    monkeypatch.setattr(recorder_module, "portfolio_state_cache", cache)
+
+    with client.application.app_context():
+        db.session.add(Ticker(symbol="VALE3", type="stock"))
+        db.session.add_all([Portfolio(id=1, name="P1"), Portfolio(id=2, name="P2")])
+        db.session.add(PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=100, avg_price=50))
+        db.session.add(AssetMetrics(symbol="VALE3", last_price=60))
+        db.session.add(PortfolioEditableMetric(portfolio_id=1, metric_key="qtdCotas", metric_value=100))
+        db.session.commit()
+        engine = db.engine
+
+    recorder = IntradayCotaRecorder(interval_seconds=15)
+    # Nenhuma carteira foi aberta: todas entram no cache mesmo assim
+    assert recorder.load_states(engine) == 2
+    assert sorted(cache.versions()) == [1, 2]
+    assert recorder.load_states(engine) == 0
+
+    # Gravação feita por outro processo: só o data_version do banco muda
+    with client.application.app_context():
+        db.session.get(Portfolio, 2).data_version += 1
+        db.session.commit()
+    assert recorder.load_states(engine) == 1
+
+    recorder.engine = engine
+    cache.invalidate(1)
+    assert recorder.sample(datetime(2025, 1, 2, 10, 0, 0)) == 2
+    assert sorted(cache.versions()) == [1, 2]
@@ -0,0 +1,29 @@
+from datetime import date, datetime, time
+
+from backend.services.market_calendar import MarketCalendar, b3_holidays, easter
+
+
+def test_holidays_follow_easter_and_fixed_dates():
+    assert easter(2025) == date(2025, 4, 20)
+    holidays = b3_holidays(2025)
+    assert {date(2025, 3, 3), date(2025, 3, 4), date(2025, 4, 18), date(2025, 6, 19)} <= holidays
+    assert {date(2025, 11, 20), date(2025, 12, 24), date(2025, 12, 31)} <= holidays
+    assert date(2023, 11, 20) not in b3_holidays(2023)
+
+
+def test_close_follows_us_daylight_saving():
+    calendar = MarketCalendar(extra_holidays=[])
+    assert calendar.session(date(2025, 1, 2)) == (time(10, 0), time(18, 0))
+    assert calendar.session(date(2025, 3, 10)) == (time(10, 0), time(17, 0))
+    assert calendar.session(date(2025, 11, 3)) == (time(10, 0), time(18, 0))
+
+    assert calendar.is_open(datetime(2025, 1, 2, 17, 30))
+    assert not calendar.is_open(datetime(2025, 7, 1, 17, 30))
+    assert not calendar.is_open(datetime(2025, 3, 4, 11, 0))
+
+
+def test_last_complete_session_skips_holidays_and_open_market():
+    calendar = MarketCalendar(extra_holidays=[date(2025, 1, 3)])
+    assert calendar.last_complete_session(datetime(2025, 1, 6, 17, 30)) == date(2025, 1, 2)
+    assert calendar.last_complete_session(datetime(2025, 1, 6, 18, 0)) == date(2025, 1, 6)
+    assert calendar.last_complete_session(datetime(2025, 3, 5, 9, 0)) == date(2025, 2, 28)
@@ -1,17 +1,24 @@
 import pandas as pd
-from datetime import datetime
+from datetime import date, timedelta
 
 def test_get_ibov_history(monkeypatch, client):
-    from backend.routes import market_routes
+    from backend.services import price_history
 
-    def fake_download(symbol, start=None, end=None, progress=None):
-        idx = pd.date_range(datetime(2024, 1, 1), periods=3, freq='D')
-        return pd.DataFrame({'Adj Close': [100, 101, 102]}, index=idx)
+    calls = []
 
-    monkeypatch.setattr(market_routes, 'yf', type('obj', (), {'download': fake_download}))
+    def fake_download(symbols, start=None, end=None, progress=None, **kwargs):
+        calls.append(symbols)
+        idx = pd.bdate_range(end=date.today() - timedelta(days=7), periods=3)
+        return pd.DataFrame(
+            {field: [100, 101, 102] for field in ('Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume')},
+            index=idx,
+        )
+
+    monkeypatch.setattr(price_history, 'yf', type('obj', (), {'download': fake_download}))
 
     resp = client.get('/api/market/ibov-history')
     assert resp.status_code == 200
     data = resp.get_json()
     assert data['success'] is True
     assert len(data['history']) == 3
+    assert calls == [['^BVSP']]
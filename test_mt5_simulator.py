@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from backend.services import metatrader5_rtd_worker as worker_module
+from backend.services.mt5_simulator import SimulatedMT5
+from benchmark_rtd_worker import run_benchmark
+
+
+def test_synthetic_stream_follows_clock():
+    clock = {"now": 0.0}
+    sim = SimulatedMT5(clock=lambda: clock["now"])
+    sim.load_synthetic(["VALE3", "PETR4"], ticks_per_second=2, duration_seconds=10, seed=1)
+
+    assert sim.initialize()
+    assert {s.name for s in sim.symbols_get()} == {"VALE3", "PETR4"}
+    assert sim.symbol_select("VALE3", True)
+    assert not sim.symbol_select("XXXX3", True)
+
+    first = sim.symbol_info_tick("VALE3")
+    clock["now"] = 3.0
+    later = sim.symbol_info_tick("VALE3")
+    assert later.last == sim.streams["VALE3"].last[6]
+    assert later.time - first.time == 3
+    # Sem tick novo, a consulta repete o último tick (mesmo time_msc)
+    clock["now"] = 3.2
+    assert sim.symbol_info_tick("VALE3").time_msc == later.time_msc
+    trades = sim.copy_ticks_from("VALE3", first.time, 100, sim.COPY_TICKS_TRADE)
+    assert list(trades["last"]) == list(sim.streams["VALE3"].last[:7])
+    assert trades["time_msc"][-1] == later.time_msc
+    assert first.bid < first.last < first.ask
+
+    d1 = sim.copy_rates_from_pos("VALE3", sim.TIMEFRAME_D1, 0, 2)
+    assert len(d1) == 2
+    assert d1[0]["close"] == sim.streams["VALE3"].previous_close
+    assert d1[1]["high"] >= later.last >= d1[1]["low"]
+    assert len(sim.copy_rates_from_pos("VALE3", sim.TIMEFRAME_D1, 1, 1)) == 1
+
+
+def test_recorded_stream_replays_csv(tmp_path):
+    path = tmp_path / "ticks.csv"
+    path.write_text(
+        "time,symbol,bid,ask,last,volume\n"
+        "100,VALE3,9.99,10.01,10.00,100\n"
+        "101.5,VALE3,10.09,10.11,10.10,200\n"
+        "100,PETR4,19.99,20.01,20.00,300\n"
+    )
+    clock = {"now": 0.0}
+    sim = SimulatedMT5(clock=lambda: clock["now"], loop=False)
+    sim.load_recorded(str(path))
+
+    assert sim.symbol_info_tick("VALE3").last == 10.0
+    clock["now"] = 1.6
+    assert sim.symbol_info_tick("VALE3").last == 10.1
+    clock["now"] = 50
+    assert sim.symbol_info_tick("VALE3").last == 10.1
+    assert sim.symbol_info_tick("PETR4").volume == 300
+
+
+def test_worker_reads_quotes_from_simulator(monkeypatch):
+    sim = SimulatedMT5()
+    sim.load_synthetic(["VALE3"], seed=2)
+    monkeypatch.setattr(worker_module, "mt5", sim, raising=False)
+    monkeypatch.setattr(worker_module, "MT5_AVAILABLE", True)
+    monkeypatch.setattr(worker_module.MetaTrader5RTDWorker, "_initialize_database", lambda self: None)
+
+    worker = worker_module.MetaTrader5RTDWorker()
+    worker.initialize_mt5()
+    assert worker.realtime_symbols == {"VALE3"}
+
+    quote = worker.get_mt5_quote("VALE3")
+    assert quote["source"] == "mt5_realtime"
+    assert quote["previous_close"] == sim.streams["VALE3"].previous_close
+    assert datetime.fromisoformat(quote["time"])
+
+
+def test_benchmark_reports_latency_and_throughput():
+    available = worker_module.MT5_AVAILABLE
+    report = run_benchmark(symbols=30, clients=10, symbols_per_client=5, cycles=5)
+
+    assert report["cycles"] == 5
+    assert report["loop_ms_p50"] > 0
+    assert report["quotes_per_second"] > 0
+    assert report["socket_messages"] == 50
+    # Depois do primeiro ciclo, um symbol_info_tick por símbolo
+    assert report["terminal_calls_per_cycle"] == (30 * 5 + 30) / 5
+    assert worker_module.MT5_AVAILABLE is available
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+
+from backend import db
+from backend.models import Portfolio, PortfolioPosition, Ticker
+from backend.services.metatrader5_rtd_worker import MetaTrader5RTDWorker
+from backend.services.poll_scheduler import PollScheduler
+
+OPEN = datetime(2024, 5, 6, 11, 0)      # segunda-feira, pregão aberto
+CLOSED = datetime(2024, 5, 6, 20, 0)
+SATURDAY = datetime(2024, 5, 4, 11, 0)
+INTERVALS = {"subscribed": 1.0, "portfolio": 2.0, "background": 10.0}
+
+
+def _scheduler(**kwargs):
+    return PollScheduler(intervals=INTERVALS, **kwargs)
+
+
+def test_due_orders_by_tier_and_respects_intervals():
+    sched = _scheduler()
+    args = (["VALE3"], ["PETR4", "VALE3"], ["BOVA11", "PETR4"])
+
+    assert sched.due(*args, market_now=OPEN, now=0.0) == ["VALE3", "PETR4", "BOVA11"]
+    assert sched.due(*args, market_now=OPEN, now=0.5) == []
+    assert sched.due(*args, market_now=OPEN, now=1.0) == ["VALE3"]
+    assert sched.due(*args, market_now=OPEN, now=2.0) == ["VALE3", "PETR4"]
+    assert sched.due(*args, market_now=OPEN, now=10.0) == ["VALE3", "PETR4", "BOVA11"]
+    assert sched.stats()["symbols_by_tier"] == {"subscribed": 1, "portfolio": 1, "background": 1}
+
+
+def test_late_cycle_skips_missed_deadlines():
+    sched = _scheduler()
+    sched.due(["VALE3"], [], [], market_now=OPEN, now=0.0)
+
+    assert sched.due(["VALE3"], [], [], market_now=OPEN, now=5.3) == ["VALE3"]
+    assert sched.due(["VALE3"], [], [], market_now=OPEN, now=5.5) == []
+    assert sched.sleep_seconds(now=5.5) == pytest.approx(0.8)
+
+
+def test_subscription_promotes_background_symbol():
+    sched = _scheduler()
+    sched.due([], [], ["BOVA11"], market_now=OPEN, now=0.0)
+    assert sched.due([], [], ["BOVA11"], market_now=OPEN, now=1.0) == []
+
+    assert sched.due(["BOVA11"], [], ["BOVA11"], market_now=OPEN, now=1.5) == []
+    assert sched.due(["BOVA11"], [], ["BOVA11"], market_now=OPEN, now=2.5) == ["BOVA11"]
+
+
+def test_closed_market_polls_only_once():
+    sched = _scheduler()
+    assert sched.due(["VALE3"], [], [], market_now=CLOSED, now=0.0) == ["VALE3"]
+    assert sched.due(["VALE3"], [], [], market_now=CLOSED, now=5.0) == []
+    assert sched.due(["VALE3"], [], [], market_now=SATURDAY, now=10.0) == []
+    assert sched.stats()["polls_skipped_closed"] == 2
+
+    assert sched.is_open("WINM24", datetime(2024, 5, 6, 9, 30))
+    assert not sched.is_open("VALE3", datetime(2024, 5, 6, 9, 30))
+    # Fechamento sazonal (18:00 com os EUA no horário padrão) e feriados
+    assert sched.is_open("VALE3", datetime(2024, 11, 18, 17, 30))
+    assert not sched.is_open("VALE3", datetime(2024, 5, 6, 17, 30))
+    assert not sched.is_open("VALE3", datetime(2024, 11, 20, 11, 0))
+
+
+def test_max_per_cycle_defers_lowest_priority():
+    sched = _scheduler(max_per_cycle=2)
+    args = (["VALE3"], ["PETR4"], ["BOVA11"])
+
+    assert sched.due(*args, market_now=OPEN, now=0.0) == ["VALE3", "PETR4"]
+    assert sched.due(*args, market_now=OPEN, now=0.1) == ["BOVA11"]
+    assert sched.stats()["polls_deferred"] == 1
+
+
+def test_removed_symbols_leave_schedule():
+    sched = _scheduler()
+    sched.due(["VALE3"], [], ["PETR4"], market_now=OPEN, now=0.0)
+    sched.due([], [], ["PETR4"], market_now=OPEN, now=0.5)
+
+    assert sched.sleep_seconds(now=0.5) == 1.0
+    assert sched.due(["VALE3"], [], ["PETR4"], market_now=OPEN, now=0.6) == ["VALE3"]
+
+
+def test_portfolio_tier_includes_short_positions(client):
+    with client.application.app_context():
+        db.session.add_all([Ticker(symbol=s, type="stock") for s in ("VALE3", "PETR4", "ITUB4")])
+        db.session.add(Portfolio(id=1, name="P1"))
+        db.session.add_all([
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=100, avg_price=50),
+            PortfolioPosition(portfolio_id=1, symbol="PETR4", quantity=-50, avg_price=30),
+            PortfolioPosition(portfolio_id=1, symbol="ITUB4", quantity=0, avg_price=25),
+        ])
+        db.session.commit()
+        engine = db.engine
+
+    class Worker(MetaTrader5RTDWorker):
+        def _initialize_database(self):
+            self.db_engine = engine
+
+    assert sorted(Worker()._get_portfolio_symbols()) == ["PETR4", "VALE3"]
@@ -0,0 +1,145 @@
+import math
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from backend import db
+from backend.models import (
+    Ticker,
+    Portfolio,
+    PortfolioPosition,
+    AssetMetrics,
+    PortfolioAttributionDaily,
+    PortfolioEditableMetric,
+)
+from backend.services import portfolio_attribution
+from backend.services.portfolio_attribution import brinson_components
+
+
+def _closes(symbols, start, end):
+    index = [date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 6)]
+    frame = pd.DataFrame(
+        {
+            "VALE3": [10.0, 11.0, 10.5, 11.5],
+            "PETR4": [20.0, 19.0, 19.5, 21.0],
+            "ITUB4": [30.0, 30.3, 30.0, 31.0],
+            "^BVSP": [100.0, 101.0, 100.5, 102.0],
+        },
+        index=index,
+    )
+    return frame[[s for s in symbols if s in frame]]
+
+
+def _setup_portfolio(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Ticker(symbol="PETR4", type="stock"),
+            Ticker(symbol="ITUB4", type="stock"),
+            AssetMetrics(symbol="VALE3", sector="Materiais", last_price=11.5),
+            AssetMetrics(symbol="PETR4", sector="Energia", last_price=21),
+            AssetMetrics(symbol="ITUB4", sector="Financeiro", last_price=31),
+            Portfolio(id=1, name="P1"),
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=100, avg_price=8),
+            PortfolioPosition(portfolio_id=1, symbol="PETR4", quantity=20, avg_price=20),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="caixaBruto", metric_value=200, date=date(2024, 12, 31)
+            ),
+        ])
+        db.session.commit()
+
+
+def test_brinson_components_sum_to_active_return():
+    rng = np.random.default_rng(1)
+    days, assets = 20, 6
+    wp = rng.uniform(0, 1, (days, assets))
+    wp[:, 0] = 0
+    wp /= wp.sum(axis=1, keepdims=True)
+    wb = rng.uniform(0, 1, (days, assets))
+    wb[:, 5] = 0
+    wb /= wb.sum(axis=1, keepdims=True)
+    returns = rng.normal(0, 0.02, (days, assets))
+    sectors = np.zeros((assets, 3))
+    sectors[[0, 1], 0] = sectors[[2, 3], 1] = sectors[[4, 5], 2] = 1
+
+    c = brinson_components(wp, wb, returns, sectors)
+
+    effects = (c["allocation"] + c["selection"] + c["interaction"]).sum(axis=1)
+    active = (wp * returns).sum(axis=1) - (wb * returns).sum(axis=1)
+    assert np.allclose(effects, active)
+
+
+def test_attribution_links_daily_effects_over_range(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_attribution, "matrix_adjusted_closes", _closes)
+
+    resp = client.post(
+        "/api/portfolio/benchmark-weights",
+        json={"date": "2024-12-31", "weights": {"VALE3": 30, "PETR4": 30, "ITUB4": 40}},
+    )
+    assert resp.status_code == 201
+    assert resp.get_json()["symbols"] == 3
+
+    payload = {"start": "2025-01-02", "end": "2025-01-06"}
+    resp = client.post("/api/portfolio/1/attribution", json=payload)
+    assert resp.status_code == 201
+    assert resp.get_json()["days"] == 3
+    # Recalcular o mesmo período não duplica linhas
+    client.post("/api/portfolio/1/attribution", json=payload)
+    with client.application.app_context():
+        assert PortfolioAttributionDaily.query.count() == 12
+
+    data = client.get("/api/portfolio/1/attribution?start=2025-01-02&end=2025-01-06").get_json()
+    assert data["days"] == 3
+
+    nav = np.array([1000 + 400 + 200, 1100 + 380 + 200, 1050 + 390 + 200, 1150 + 420 + 200])
+    portfolio_return = nav[-1] / nav[0] - 1
+    prices = _closes(["VALE3", "PETR4", "ITUB4"], None, None).to_numpy()
+    bench_daily = (np.array([0.3, 0.3, 0.4]) * (prices[1:] / prices[:-1] - 1)).sum(axis=1)
+    benchmark_return = np.prod(1 + bench_daily) - 1
+
+    assert math.isclose(data["portfolio_return_pct"], portfolio_return * 100, rel_tol=1e-6)
+    assert math.isclose(data["benchmark_return_pct"], benchmark_return * 100, rel_tol=1e-6)
+    effects = data["allocation_pct"] + data["selection_pct"] + data["interaction_pct"]
+    assert math.isclose(effects, data["active_return_pct"], rel_tol=1e-6)
+
+    sectors = {s["sector"]: s for s in data["sectors"]}
+    assert set(sectors) == {"Caixa", "Energia", "Financeiro", "Materiais"}
+    assert sectors["Financeiro"]["avg_portfolio_weight_pct"] == 0
+    assert sectors["Financeiro"]["selection_pct"] == 0
+    assert math.isclose(sectors["Caixa"]["avg_benchmark_weight_pct"], 0)
+
+
+def test_attribution_falls_back_to_index_without_composition(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_attribution, "matrix_adjusted_closes", _closes)
+
+    resp = client.post("/api/portfolio/1/attribution", json={"start": "2025-01-02", "end": "2025-01-06"})
+    assert resp.get_json()["benchmark"] == "^BVSP"
+
+    data = client.get("/api/portfolio/1/attribution?start=2025-01-02&end=2025-01-06").get_json()
+    assert math.isclose(data["benchmark_return_pct"], 2.0)
+    assert {s["sector"] for s in data["sectors"]} == {"Caixa", "Energia", "IBOV", "Materiais"}
+
+
+def test_sector_weights_compare_against_index(client):
+    _setup_portfolio(client)
+    client.post(
+        "/api/portfolio/benchmark-weights",
+        json={"date": "2024-12-31", "weights": {"VALE3": 30, "PETR4": 30, "ITUB4": 40}},
+    )
+
+    weights = {w["sector"]: w for w in client.get("/api/portfolio/1/sector-weights").get_json()["weights"]}
+    assert math.isclose(weights["Financeiro"]["ibovWeight"], 40)
+    assert weights["Financeiro"]["portfolioWeight"] == 0
+    assert math.isclose(weights["Financeiro"]["owUw"], -40)
+    materiais = weights["Materiais"]
+    assert math.isclose(materiais["owUw"], materiais["portfolioWeight"] - 30)
+
+
+def test_attribution_validates_input(client):
+    _setup_portfolio(client)
+    assert client.post("/api/portfolio/99/attribution", json={}).status_code == 404
+    assert client.get("/api/portfolio/1/attribution?start=2025-13-01").status_code == 400
+    assert client.post("/api/portfolio/benchmark-weights", json={"weights": {}}).status_code == 400
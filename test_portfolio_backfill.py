@@ -0,0 +1,211 @@
+import math
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from backend import db
+from backend.models import (
+    DailyPrice,
+    Ticker,
+    Portfolio,
+    PortfolioPosition,
+    PortfolioDailyValue,
+    PortfolioDailyMetric,
+    PortfolioEditableMetric,
+)
+from backend.services import portfolio_backfill
+from backend.services.portfolio_backfill import (
+    compute_nav_series,
+    matrix_adjusted_closes,
+    matrix_daily_closes,
+)
+from backend.services.price_history import upsert_daily_prices
+from backend.services.price_matrix import price_matrix
+
+
+def _closes(symbols, start, end):
+    index = [date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3), date(2025, 1, 6)]
+    return pd.DataFrame(
+        {"VALE3": [9.0, 10.0, np.nan, 12.0], "PETR4": [np.nan, 20.0, 21.0, 22.0]},
+        index=index,
+    )
+
+
+def _setup_portfolio(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Ticker(symbol="PETR4", type="stock"),
+            Portfolio(id=1, name="P1"),
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=100, avg_price=8),
+            PortfolioPosition(portfolio_id=1, symbol="PETR4", quantity=-10, avg_price=20),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="caixaBruto", metric_value=500, date=date(2024, 12, 31)
+            ),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="qtdCotas", metric_value=100, date=date(2024, 12, 31)
+            ),
+            PortfolioEditableMetric(
+                portfolio_id=1, metric_key="qtdCotas", metric_value=200, date=date(2025, 1, 3)
+            ),
+        ])
+        db.session.commit()
+
+
+def test_compute_nav_series_matches_row_by_row_valuation():
+    rng = np.random.default_rng(0)
+    quantity = rng.integers(-100, 100, 5).astype(float)
+    avg_price = rng.uniform(5, 50, 5)
+    closes = rng.uniform(5, 50, (30, 5))
+    closes[3, 2] = np.nan
+    caixa = np.full(30, 1000.0)
+    cotas = np.full(30, 50.0)
+
+    series = compute_nav_series(quantity, avg_price, closes, caixa, cotas)
+
+    for d in range(30):
+        value = sum(q * c for q, c in zip(quantity, closes[d]) if not math.isnan(c))
+        cost = float((quantity * avg_price).sum())
+        assert math.isclose(series["total_value"][d], value)
+        assert math.isclose(series["total_gain_percent"][d], (value - cost) / cost * 100)
+        assert math.isclose(series["valor_cota"][d], (value + 1000) / 50)
+
+
+def test_backfill_route_writes_nav_and_cota(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_backfill, "fetch_daily_closes", _closes)
+
+    resp = client.post(
+        "/api/portfolio/1/backfill", json={"start": "2025-01-02", "end": "2025-01-06"}
+    )
+    assert resp.status_code == 201
+    assert resp.get_json()["days"] == 3
+
+    values = client.get("/api/portfolio/1/daily-values").get_json()["values"]
+    assert [v["date"] for v in values] == ["2025-01-02", "2025-01-03", "2025-01-06"]
+    # 03/01 sem preço de VALE3: usa o fechamento anterior
+    assert [v["total_value"] for v in values] == [800.0, 790.0, 980.0]
+    assert values[0]["total_cost"] == 600.0
+
+    with client.application.app_context():
+        cotas = {
+            m.date: float(m.value)
+            for m in PortfolioDailyMetric.query.filter_by(portfolio_id=1, metric_id="valorCota")
+        }
+    assert cotas == {date(2025, 1, 2): 13.0, date(2025, 1, 3): 6.45, date(2025, 1, 6): 7.4}
+
+
+def test_backfill_is_idempotent(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_backfill, "fetch_daily_closes", _closes)
+    payload = {"start": "2025-01-02", "end": "2025-01-06"}
+
+    client.post("/api/portfolio/1/backfill", json=payload)
+    client.post("/api/portfolio/1/backfill", json=payload)
+
+    with client.application.app_context():
+        assert PortfolioDailyValue.query.count() == 3
+        assert PortfolioDailyMetric.query.count() == 6
+
+
+def test_backfill_skips_dates_without_prices(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_backfill, "fetch_daily_closes", _closes)
+
+    resp = client.post(
+        "/api/portfolio/1/backfill", json={"start": "2025-01-01", "end": "2025-01-06"}
+    )
+    body = resp.get_json()
+    # 01/01 sem preço de PETR4 (nem anterior): fica de fora em vez de valer zero
+    assert body["days"] == 3
+    assert body["skipped_days"] == 1
+
+    with client.application.app_context():
+        assert PortfolioDailyValue.query.filter_by(date=date(2025, 1, 1)).count() == 0
+
+
+def test_backfill_keeps_recorded_closes_unless_overwrite(client, monkeypatch):
+    _setup_portfolio(client)
+    monkeypatch.setattr(portfolio_backfill, "fetch_daily_closes", _closes)
+    with client.application.app_context():
+        db.session.add_all([
+            PortfolioDailyValue(
+                portfolio_id=1, date=date(2025, 1, 3), total_value=1234,
+                total_cost=600, total_gain=634, total_gain_percent=105.6667,
+            ),
+            PortfolioDailyMetric(
+                portfolio_id=1, metric_id="valorCota", date=date(2025, 1, 3), value=8.67
+            ),
+        ])
+        db.session.commit()
+    payload = {"start": "2025-01-02", "end": "2025-01-06"}
+
+    body = client.post("/api/portfolio/1/backfill", json=payload).get_json()
+    assert body["written_days"] == 2
+    with client.application.app_context():
+        assert float(PortfolioDailyValue.query.filter_by(date=date(2025, 1, 3)).one().total_value) == 1234
+        cota = PortfolioDailyMetric.query.filter_by(metric_id="valorCota", date=date(2025, 1, 3)).one()
+        assert float(cota.value) == 8.67
+
+    client.post("/api/portfolio/1/backfill", json={**payload, "overwrite": True})
+    with client.application.app_context():
+        assert float(PortfolioDailyValue.query.filter_by(date=date(2025, 1, 3)).one().total_value) == 790
+        cota = PortfolioDailyMetric.query.filter_by(metric_id="valorCota", date=date(2025, 1, 3)).one()
+        assert float(cota.value) == 6.45
+
+
+def test_matrix_loader_fetches_only_symbols_missing_from_matrix(client, monkeypatch):
+    days = [date(2025, 1, 2), date(2025, 1, 3)]
+    with client.application.app_context():
+        upsert_daily_prices([
+            {"symbol": "VALE3", "date": d, "open": None, "high": None, "low": None,
+             "close": 10.0 + i, "adj_close": None, "volume": None}
+            for i, d in enumerate(days)
+        ])
+        db.session.commit()
+        price_matrix.build()
+
+    requested = []
+
+    def _fetch(symbols, start, end):
+        requested.append(list(symbols))
+        return _closes(symbols, start, end)
+
+    monkeypatch.setattr(portfolio_backfill, "fetch_daily_closes", _fetch)
+    closes = matrix_daily_closes(["VALE3", "PETR4"], days[0], days[-1])
+
+    assert requested == [["PETR4"]]
+    assert list(closes.columns) == ["VALE3", "PETR4"]
+    assert closes.loc[days, "VALE3"].tolist() == [10.0, 11.0]
+    assert closes.loc[days, "PETR4"].tolist() == [20.0, 21.0]
+
+
+def test_matrix_adjusted_loader_reads_adjusted_closes(client, monkeypatch):
+    days = [date(2025, 1, 2), date(2025, 1, 3)]
+    with client.application.app_context():
+        upsert_daily_prices([
+            {"symbol": "VALE3", "date": d, "open": None, "high": None, "low": None,
+             "close": 10.0, "adj_close": None, "volume": None}
+            for d in days
+        ])
+        # Provento com data ex em 03/01: o fechamento anterior é ajustado
+        DailyPrice.query.filter_by(symbol="VALE3", date=days[0]).update({"adj_close": 9.5})
+        db.session.commit()
+        price_matrix.build()
+
+    monkeypatch.setattr(portfolio_backfill, "fetch_adjusted_closes", _closes)
+    closes = matrix_adjusted_closes(["VALE3", "PETR4"], days[0], days[-1])
+
+    assert closes.loc[days, "VALE3"].tolist() == [9.5, 10.0]
+    assert closes.loc[days, "PETR4"].tolist() == [20.0, 21.0]
+    assert matrix_daily_closes(["VALE3"], days[0], days[-1])["VALE3"].tolist() == [10.0, 10.0]
+
+
+def test_backfill_validates_input(client):
+    _setup_portfolio(client)
+    assert client.post("/api/portfolio/1/backfill", json={"start": "02/01/2025"}).status_code == 400
+    assert client.post(
+        "/api/portfolio/1/backfill", json={"start": "2025-02-01", "end": "2025-01-01"}
+    ).status_code == 400
+    assert client.post("/api/portfolio/99/backfill", json={}).status_code == 404
@@ -0,0 +1,135 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from backend import db
+from backend.models import Ticker, Portfolio, PortfolioPosition, AssetMetrics, PortfolioEditableMetric
+from backend.services.portfolio_rebalance import solve_rebalance
+
+
+def _objective(quantity, price, delta, targets, nav):
+    return (((quantity + delta) * price / nav - targets) ** 2).sum()
+
+
+def test_solver_respects_lots_and_cash():
+    rng = np.random.default_rng(3)
+    quantity = np.array([1000.0, 0.0, -500.0, 300.0])
+    price = np.array([12.3, 45.6, 7.8, 101.1])
+    lot = np.array([100.0, 100.0, 100.0, 1.0])
+    nav = 100_000.0
+    cash = nav - quantity @ price
+    targets = rng.uniform(-0.1, 0.4, (50, 4))
+
+    delta = solve_rebalance(quantity, price, lot, targets, nav, cash)
+
+    assert np.all(np.mod(delta, lot) == 0)
+    assert np.all(cash - delta @ price >= -1e-6)
+
+
+def test_solver_matches_brute_force_on_small_problem():
+    quantity = np.array([0.0, 0.0])
+    price = np.array([10.0, 25.0])
+    lot = np.array([100.0, 100.0])
+    nav = cash = 10_000.0
+    targets = np.array([[0.55, 0.45], [0.2, 0.9], [0.0, 0.0]])
+
+    delta = solve_rebalance(quantity, price, lot, targets, nav, cash)
+
+    for k, target in enumerate(targets):
+        best = min(
+            (
+                np.array([a, b], dtype=float)
+                for a, b in itertools.product(range(0, 1100, 100), range(0, 500, 100))
+                if a * 10 + b * 25 <= cash
+            ),
+            key=lambda d: _objective(quantity, price, d, target, nav),
+        )
+        assert np.isclose(
+            _objective(quantity, price, delta[k], target, nav),
+            _objective(quantity, price, best, target, nav),
+        )
+
+
+def _setup_portfolio(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Ticker(symbol="BOVA11", type="etf"),
+            Ticker(symbol="PETR4", type="stock"),
+            Portfolio(id=1, name="P1"),
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=500, avg_price=10, target_weight=50),
+            PortfolioPosition(portfolio_id=1, symbol="BOVA11", quantity=0, avg_price=0, target_weight=30),
+            AssetMetrics(symbol="VALE3", last_price=10),
+            AssetMetrics(symbol="BOVA11", last_price=123),
+            AssetMetrics(symbol="PETR4", last_price=30),
+            PortfolioEditableMetric(portfolio_id=1, metric_key="caixaBruto", metric_value=5000),
+        ])
+        db.session.commit()
+
+
+def test_rebalance_route_uses_stored_targets(client):
+    _setup_portfolio(client)
+
+    resp = client.get("/api/portfolio/1/rebalance")
+    assert resp.status_code == 200
+    scenario = resp.get_json()["scenarios"][0]
+    orders = {o["symbol"]: o for o in scenario["orders"]}
+
+    # PL = 5.000 em VALE3 + 5.000 de caixa
+    assert orders["BOVA11"] == pytest.approx({
+        "symbol": "BOVA11", "side": "buy", "quantity": 24, "lot_size": 1, "price": 123.0,
+        "value": 2952.0, "current_pct": 0.0, "target_pct": 30.0, "final_pct": 29.52,
+    })
+    assert "VALE3" not in orders
+    assert scenario["cash_after"] == 2048.0
+
+
+def test_rebalance_route_evaluates_scenarios_in_one_call(client):
+    _setup_portfolio(client)
+
+    resp = client.post(
+        "/api/portfolio/1/rebalance",
+        json={
+            "min_cash": 1000,
+            "scenarios": [
+                {"name": "zerar", "targets": {"VALE3": 0, "BOVA11": 0}},
+                {"name": "petro", "targets": {"PETR4": 60}},
+            ],
+        },
+    )
+    assert resp.status_code == 200
+    zerar, petro = resp.get_json()["scenarios"]
+
+    assert zerar["name"] == "zerar"
+    assert zerar["orders"][0]["symbol"] == "VALE3"
+    assert zerar["orders"][0]["side"] == "sell"
+    assert zerar["orders"][0]["quantity"] == 500
+    assert zerar["tracking_error_pct"] == 0
+
+    assert petro["cash_after"] >= 1000
+    assert all(o["quantity"] % o["lot_size"] == 0 for o in petro["orders"])
+    assert petro["tracking_error_pct"] < petro["tracking_error_before_pct"]
+
+
+def test_rebalance_route_rejects_invalid_payload(client):
+    _setup_portfolio(client)
+    payload = {"scenarios": [{"targets": {"VALE3": "x"}}]}
+    assert client.post("/api/portfolio/1/rebalance", json=payload).status_code == 400
+    assert client.get("/api/portfolio/99/rebalance").status_code == 404
+
+
+def test_rebalance_route_rejects_unknown_and_unpriced_symbols(client):
+    _setup_portfolio(client)
+    with client.application.app_context():
+        db.session.add(Ticker(symbol="ITUB4", type="stock"))
+        db.session.commit()
+
+    resp = client.post("/api/portfolio/1/rebalance", json={"scenarios": [{"targets": {"XPTO3": 10}}]})
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "Ativos desconhecidos: XPTO3"
+
+    # ITUB4 está cadastrado, mas sem cotação: o alvo seria ignorado em silêncio
+    resp = client.post("/api/portfolio/1/rebalance", json={"scenarios": [{"targets": {"ITUB4": 10}}]})
+    assert resp.status_code == 400
+    assert resp.get_json()["error"] == "Ativos sem preço: ITUB4"
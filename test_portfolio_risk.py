@@ -0,0 +1,140 @@
+import math
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from backend import db
+from backend.models import Ticker, Portfolio, PortfolioPosition, AssetMetrics
+from backend.services import portfolio_risk
+from backend.services.portfolio_risk import PortfolioRiskEngine, RiskModel
+
+
+def _closes(n=120, seed=1):
+    rng = np.random.default_rng(seed)
+    index = [date(2025, 1, 1) + timedelta(days=i) for i in range(n)]
+    bench = rng.normal(0, 0.01, n)
+    returns = {
+        "^BVSP": bench,
+        "VALE3": 1.5 * bench + rng.normal(0, 0.005, n),
+        "PETR4": 0.5 * bench + rng.normal(0, 0.01, n),
+    }
+    return pd.DataFrame({s: 10 * np.cumprod(1 + r) for s, r in returns.items()}, index=index)
+
+
+def _summary(vale=1000.0, petr=-400.0, nav=1000.0):
+    return {
+        "patrimonio_liquido": nav,
+        "holdings": [
+            {"symbol": "VALE3", "quantity": 100, "position_value": vale},
+            {"symbol": "PETR4", "quantity": -40, "position_value": petr},
+        ],
+    }
+
+
+def test_risk_model_matches_direct_computation():
+    closes = _closes()
+    model = RiskModel(closes[["VALE3", "PETR4", "^BVSP"]])
+    weights = model.weights_for(_summary()["holdings"], 1000.0)
+    risk = model.evaluate(weights)[0]
+
+    returns = closes.pct_change().iloc[1:]
+    pnl = returns[["VALE3", "PETR4"]].to_numpy() @ np.array([1.0, -0.4])
+    sigma = pnl.std(ddof=1)
+    var_hist = -np.quantile(pnl, 0.05)
+
+    assert math.isclose(risk["volatility_annual_pct"], sigma * math.sqrt(252) * 100)
+    assert math.isclose(risk["var_historical_pct"], var_hist * 100)
+    assert risk["cvar_historical_pct"] >= risk["var_historical_pct"]
+    assert risk["cvar_parametric_pct"] >= risk["var_parametric_pct"]
+
+    bench = returns["^BVSP"].to_numpy()
+    beta = np.cov(pnl, bench)[0, 1] / bench.var(ddof=1)
+    assert math.isclose(risk["beta"], beta)
+
+    components = sum(h["component_risk_pct"] for h in risk["holdings"])
+    assert math.isclose(components, risk["volatility_daily_pct"])
+    assert math.isclose(sum(h["risk_contribution_pct"] for h in risk["holdings"]), 100)
+
+
+def test_engine_batches_portfolios_and_caches_per_trading_day():
+    calls = []
+
+    def loader(symbols, start, end):
+        calls.append(list(symbols))
+        return _closes()
+
+    engine = PortfolioRiskEngine(price_loader=loader)
+    day = date(2025, 5, 1)
+    results = engine.evaluate({1: _summary(), 2: _summary(petr=0.0)}, trading_day=day)
+
+    assert len(calls) == 1
+    assert results[1]["volatility_daily_pct"] != results[2]["volatility_daily_pct"]
+    assert math.isclose(results[1]["var_historical_value"], results[1]["var_historical_pct"] * 10)
+
+    again = engine.evaluate({1: _summary()}, trading_day=day)[1]
+    assert again == results[1]
+    assert len(calls) == 1
+
+    # Mesma composição com o patrimônio de agora: % reaproveitado, R$ recalculado
+    moved = engine.evaluate({1: _summary(nav=2000.0)}, trading_day=day)[1]
+    assert len(calls) == 1
+    assert moved["var_historical_pct"] == results[1]["var_historical_pct"]
+    assert math.isclose(moved["var_historical_value"], results[1]["var_historical_pct"] * 20)
+
+    engine.evaluate({1: _summary()}, trading_day=day + timedelta(days=1))
+    assert len(calls) == 2
+
+
+def test_engine_loads_model_once_per_day_outside_the_lock():
+    calls = []
+    release = threading.Event()
+    engine = PortfolioRiskEngine()
+
+    def loader(symbols, start, end):
+        calls.append(list(symbols))
+        assert not engine._lock.locked()
+        release.wait(5)
+        return _closes()
+
+    engine._price_loader = loader
+    day = date(2025, 5, 1)
+    results = {}
+
+    def run(pid):
+        results.update(engine.evaluate({pid: _summary()}, trading_day=day))
+
+    threads = [threading.Thread(target=run, args=(pid,)) for pid in (1, 2, 3)]
+    for t in threads:
+        t.start()
+    # Enquanto a carga está parada, o cache continua respondendo
+    assert engine.evaluate({}, trading_day=day) == {}
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results[1] == results[2] == results[3]
+
+
+def test_risk_route(client, monkeypatch):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Portfolio(id=1, name="P1"),
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=100, avg_price=8),
+            AssetMetrics(symbol="VALE3", last_price=10),
+        ])
+        db.session.commit()
+    monkeypatch.setattr(portfolio_risk, "matrix_adjusted_closes", lambda symbols, start, end: _closes())
+
+    resp = client.get("/api/portfolio/1/risk?confidence=0.99")
+    assert resp.status_code == 200
+    risk = resp.get_json()["risk"]
+    assert risk["confidence"] == 0.99
+    assert [h["symbol"] for h in risk["holdings"]] == ["VALE3"]
+    assert math.isclose(risk["holdings"][0]["weight_pct"], 100)
+
+    assert client.get("/api/portfolio/1/risk?confidence=2").status_code == 400
+    assert client.get("/api/portfolio/99/risk").status_code == 404
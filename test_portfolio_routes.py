@@ -2,11 +2,12 @@ from backend import db
 from backend.models import Company, Ticker, PortfolioPosition, AssetMetrics, Portfolio
 
 
-def test_upsert_positions_requires_type_for_new_ticker(client):
+def test_upsert_positions_defaults_type_for_new_ticker(client):
     payload = [{"symbol": "XXXX", "quantity": 1, "avg_price": 1}]
     resp = client.post("/api/portfolio/1/positions", json=payload)
-    assert resp.status_code == 400
-    assert resp.get_json()["error"] == "Tipo do ticker não fornecido"
+    assert resp.status_code == 201
+    with client.application.app_context():
+        assert Ticker.query.filter_by(symbol="XXXX").one().type == "stock"
 
 
 def test_upsert_positions_creates_ticker_and_position_when_type_provided(client):
@@ -42,9 +43,6 @@ def test_upsert_positions_inserts_when_ticker_exists(client):
         assert float(pos.avg_price) == 5
 
 
-
-
-
 def test_get_daily_contribution_returns_data(client):
     with client.application.app_context():
         company = Company(id=1, company_name="Vale")
@@ -109,3 +107,81 @@ def test_get_sector_weights_returns_data(client):
     assert round(weight["portfolioWeight"], 2) == 100.0
 
 
+def test_upsert_positions_updates_and_removes_in_bulk(client):
+    first = [
+        {"symbol": "AAAA3", "quantity": 1, "avg_price": 10, "type": "stock"},
+        {"symbol": "BBBB3", "quantity": 2, "avg_price": 20, "type": "stock"},
+    ]
+    assert client.post("/api/portfolio/1/positions", json=first).status_code == 201
+
+    second = [
+        {"symbol": "BBBB3", "quantity": 5, "avg_price": 21, "target_weight": 3},
+        {"symbol": "CCCC3", "quantity": 7, "avg_price": 30, "type": "stock"},
+        {"symbol": "CCCC3", "quantity": 8, "avg_price": 31, "type": "stock"},
+    ]
+    assert client.post("/api/portfolio/1/positions", json=second).status_code == 201
+
+    with client.application.app_context():
+        positions = {
+            p.symbol: p for p in PortfolioPosition.query.filter_by(portfolio_id=1).all()
+        }
+        assert set(positions) == {"BBBB3", "CCCC3"}
+        assert float(positions["BBBB3"].quantity) == 5
+        assert float(positions["BBBB3"].target_weight) == 3
+        assert float(positions["CCCC3"].quantity) == 8
+
+
+def test_upsert_positions_uses_constant_number_of_statements(client):
+    from sqlalchemy import event
+
+    payload = [
+        {"symbol": f"T{i:03d}", "quantity": i, "avg_price": 1, "type": "stock"}
+        for i in range(200)
+    ]
+    with client.application.app_context():
+        engine = db.engine
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        resp = client.post("/api/portfolio/1/positions", json=payload)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert resp.status_code == 201
+    assert len(statements) <= 10
+
+
+def test_get_portfolio_summaries_values_funds_together(client):
+    with client.application.app_context():
+        db.session.add_all([
+            Ticker(symbol="VALE3", type="stock"),
+            Ticker(symbol="PETR4", type="stock"),
+            Portfolio(id=1, name="P1"),
+            Portfolio(id=2, name="P2"),
+            PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=10, avg_price=5),
+            PortfolioPosition(portfolio_id=2, symbol="VALE3", quantity=-4, avg_price=5),
+            PortfolioPosition(portfolio_id=2, symbol="PETR4", quantity=3, avg_price=20),
+            AssetMetrics(symbol="VALE3", last_price=10, price_change_percent=2),
+            AssetMetrics(symbol="PETR4", last_price=30, price_change_percent=0),
+        ])
+        db.session.commit()
+
+    resp = client.get("/api/portfolio/summaries?ids=1,2,3")
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["not_found"] == [3]
+    assert data["summaries"]["1"]["total_value"] == 100
+    assert data["summaries"]["2"]["total_value"] == 50
+    assert data["summaries"]["2"]["posicao_vendida_pct"] == 80
+
+    single = client.get("/api/portfolio/2/summary").get_json()["portfolio"]
+    assert single["holdings"] == data["summaries"]["2"]["holdings"]
+
+
+def test_get_portfolio_summaries_rejects_invalid_ids(client):
+    assert client.get("/api/portfolio/summaries").status_code == 400
+    assert client.get("/api/portfolio/summaries?ids=1,a").status_code == 400
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+from backend.services.portfolio_state_cache import PortfolioState, PortfolioStateCache
+from backend.services.portfolio_valuation import PortfolioBook
+
+
+def _book():
+    return PortfolioBook(
+        symbols=["VALE3", "PETR4", "ITUB4"],
+        quantity=np.array([100.0, -50.0, 30.0]),
+        avg_price=np.array([50.0, 30.0, 25.0]),
+        target_pct=np.array([40.0, -10.0, 10.0]),
+        last_price=np.array([60.0, 32.0, 0.0]),
+        daily_change_pct=np.array([1.0, -2.0, 0.0]),
+        previous_close=np.array([59.0, 32.0, np.nan]),
+        open_price=np.array([np.nan, np.nan, np.nan]),
+    )
+
+
+def _state(book=None):
+    return PortfolioState(1, "P1", book or _book(), caixa_bruto=1000.0, qtd_cotas=100.0, cota_d1=60.0)
+
+
+def test_cache_is_bypassed_when_not_live():
+    cache = PortfolioStateCache()
+    summary = cache.store(_state())
+
+    assert summary["id"] == 1
+    assert cache.snapshot(1) is None
+    assert cache.summary(1) is None
+    assert cache.apply_quote("VALE3", 61.0) == 0
+
+
+def test_apply_quote_patches_totals_by_delta():
+    cache = PortfolioStateCache()
+    cache.start()
+    cache.store(_state())
+
+    assert cache.apply_quote("PETR4", 30.0, previous_close=32.0) == 1
+    assert cache.apply_quote("ITUB4", 20.0, open_price=25.0) == 1
+    assert cache.apply_quote("BBDC4", 10.0) == 0
+
+    snapshot = cache.snapshot(1)
+    expected = _state(
+        PortfolioBook(
+            symbols=["VALE3", "PETR4", "ITUB4"],
+            quantity=np.array([100.0, -50.0, 30.0]),
+            avg_price=np.array([50.0, 30.0, 25.0]),
+            target_pct=np.array([40.0, -10.0, 10.0]),
+            last_price=np.array([60.0, 30.0, 20.0]),
+            daily_change_pct=np.array([1.0, -6.25, -20.0]),
+        )
+    ).summary()
+
+    for key in ("patrimonio_liquido", "valor_cota", "net_long_pct", "exposicao_total_pct"):
+        assert math.isclose(snapshot[key], expected[key])
+
+    holdings = {h["symbol"]: h for h in cache.summary(1)["holdings"]}
+    assert math.isclose(holdings["PETR4"]["daily_change_pct"], -6.25)
+    assert math.isclose(holdings["ITUB4"]["daily_change_pct"], -20.0)
+
+
+def test_previous_close_is_kept_when_quote_omits_it():
+    cache = PortfolioStateCache()
+    cache.start()
+    cache.store(_state())
+
+    cache.apply_quote("VALE3", 64.9, previous_close=0.0)
+
+    holding = cache.summary(1)["holdings"][0]
+    assert math.isclose(holding["daily_change_pct"], 10.0)
+
+
+def test_store_replays_quotes_received_before_load():
+    cache = PortfolioStateCache()
+    cache.start()
+    cache.apply_quote("VALE3", 70.0, previous_close=59.0)
+
+    summary = cache.store(_state())
+
+    assert summary["holdings"][0]["last_price"] == 70.0
+
+
+def test_invalidate_and_stop_drop_state():
+    cache = PortfolioStateCache()
+    cache.start()
+    cache.store(_state())
+    cache.invalidate(1)
+    assert cache.snapshot(1) is None
+
+    cache.store(_state())
+    cache.stop()
+    assert cache.summary(1) is None
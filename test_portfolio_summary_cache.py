@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from backend import db
+from backend.models import Ticker, Portfolio, PortfolioPosition, AssetMetrics
+from backend.routes import portfolio_routes, portfolio_summary_routes
+from backend.services.portfolio_state_cache import PortfolioStateCache
+
+
+def _setup_portfolio(client):
+    with client.application.app_context():
+        ticker = Ticker(symbol="VALE3", type="stock")
+        portfolio = Portfolio(id=1, name="P1")
+        pos = PortfolioPosition(portfolio_id=1, symbol="VALE3", quantity=10, avg_price=5)
+        metric = AssetMetrics(
+            symbol="VALE3", last_price=10, price_change_percent=2,
+            updated_at=datetime(2025, 1, 2, 10, 0),
+        )
+        db.session.add_all([ticker, portfolio, pos, metric])
+        db.session.commit()
+
+
+def _count_loads(monkeypatch):
+    calls = []
+    original = portfolio_routes.load_position_rows
+
+    def counting(portfolio_ids):
+        calls.append(list(portfolio_ids))
+        return original(portfolio_ids)
+
+    monkeypatch.setattr(portfolio_routes, "load_position_rows", counting)
+    return calls
+
+
+def test_dashboard_routes_share_one_summary_computation(client, monkeypatch):
+    _setup_portfolio(client)
+    calls = _count_loads(monkeypatch)
+
+    for url in (
+        "/api/portfolio/1/daily-contribution",
+        "/api/portfolio/1/suggested",
+        "/api/portfolio/1/sector-weights",
+        "/api/portfolio-summary/1/summary",
+    ):
+        assert client.get(url).status_code == 200
+
+    assert len(calls) == 1
+
+
+def test_summary_is_recomputed_when_price_changes(client, monkeypatch):
+    _setup_portfolio(client)
+    calls = _count_loads(monkeypatch)
+    client.get("/api/portfolio/1/daily-contribution")
+
+    with client.application.app_context():
+        metric = db.session.get(AssetMetrics, "VALE3")
+        metric.last_price = 12
+        metric.updated_at = datetime(2025, 1, 2, 10, 1)
+        db.session.commit()
+
+    resp = client.get("/api/portfolio/1/summary")
+    assert len(calls) == 2
+    assert resp.get_json()["portfolio"]["total_value"] == 120
+
+
+def test_summary_is_recomputed_after_position_and_metric_writes(client, monkeypatch):
+    _setup_portfolio(client)
+    calls = _count_loads(monkeypatch)
+    client.get("/api/portfolio/1/summary")
+
+    client.post("/api/portfolio/1/positions", json=[{"symbol": "VALE3", "quantity": 20, "avg_price": 5}])
+    resp = client.get("/api/portfolio/1/summary")
+    assert len(calls) == 2
+    assert resp.get_json()["portfolio"]["total_value"] == 200
+
+    client.post("/api/portfolio/1/editable-metrics", json=[{"metric_key": "qtdCotas", "metric_value": 10}])
+    resp = client.get("/api/portfolio-summary/1/summary")
+    assert len(calls) == 3
+    assert resp.get_json()["summary"]["valor_cota"] == 20
+
+
+def test_write_from_another_process_invalidates_summary(client, monkeypatch):
+    _setup_portfolio(client)
+    calls = _count_loads(monkeypatch)
+    client.get("/api/portfolio/1/summary")
+
+    # Gravação feita por outro processo: só o banco muda, não o cache local
+    with client.application.app_context():
+        PortfolioPosition.query.filter_by(portfolio_id=1).one().quantity = 30
+        db.session.get(Portfolio, 1).data_version += 1
+        db.session.commit()
+
+    resp = client.get("/api/portfolio/1/summary")
+    assert len(calls) == 2
+    assert resp.get_json()["portfolio"]["total_value"] == 300
+
+
+def test_live_state_cache_is_checked_against_db_version(client, monkeypatch):
+    _setup_portfolio(client)
+    cache = PortfolioStateCache()
+    cache.start()
+    monkeypatch.setattr(portfolio_routes, "portfolio_state_cache", cache)
+    monkeypatch.setattr(portfolio_summary_routes, "portfolio_state_cache", cache)
+    calls = _count_loads(monkeypatch)
+    client.get("/api/portfolio/summaries?ids=1")
+    assert client.get("/api/portfolio/1/summary").get_json()["portfolio"]["total_value"] == 100
+    assert len(calls) == 1
+
+    # Outro processo grava as posições: o estado em memória deste fica velho
+    with client.application.app_context():
+        PortfolioPosition.query.filter_by(portfolio_id=1).one().quantity = 30
+        db.session.get(Portfolio, 1).data_version += 1
+        db.session.commit()
+
+    summaries = client.get("/api/portfolio/summaries?ids=1").get_json()["summaries"]
+    assert summaries["1"]["total_value"] == 300
+    assert client.get("/api/portfolio/1/summary").get_json()["portfolio"]["total_value"] == 300
+    summary = client.get("/api/portfolio-summary/1/summary").get_json()["summary"]
+    assert summary["patrimonio_liquido"] == 300
+    assert len(calls) == 2
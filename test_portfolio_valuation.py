@@ -0,0 +1,68 @@
+import numpy as np
+
+from backend.services.portfolio_valuation import PortfolioBook, compute_daily_change_pct
+
+
+def test_compute_daily_change_pct_fallbacks():
+    nan = np.nan
+    last = np.array([11.0, 11.0, 11.0, 10.0, nan])
+    prev_correct = np.array([10.0, nan, nan, 10.0, nan])
+    prev = np.array([nan, 10.0, nan, nan, nan])
+    open_price = np.array([nan, nan, 10.0, nan, nan])
+    pct_db = np.array([nan, nan, nan, 3.0, nan])
+
+    pct = compute_daily_change_pct(last, prev_correct, prev, open_price, pct_db)
+
+    # fechamento corrigido, fechamento bruto, abertura, fallback gravado, sem dados
+    np.testing.assert_allclose(pct, [10.0, 10.0, 10.0, 3.0, 0.0])
+
+
+def test_portfolio_book_value_long_short_with_cash():
+    book = PortfolioBook(
+        symbols=["VALE3", "PETR4"],
+        quantity=np.array([10.0, -5.0]),
+        avg_price=np.array([5.0, 20.0]),
+        target_pct=np.array([60.0, -10.0]),
+        last_price=np.array([10.0, 20.0]),
+        daily_change_pct=np.array([2.0, -1.0]),
+    )
+
+    result = book.value(caixa_bruto=100.0, qtd_cotas=10.0, cota_d1=10.0)
+
+    assert result["total_value"] == 0.0
+    assert result["total_cost"] == -50.0
+    assert result["patrimonio_liquido"] == 100.0
+    assert result["valor_cota"] == 10.0
+    assert result["variacao_cota_pct"] == 0.0
+    assert result["posicao_comprada_pct"] == 0.0
+    assert result["posicao_vendida_pct"] == 100.0
+    assert result["net_long_pct"] == -100.0
+    assert result["exposicao_total_pct"] == 100.0
+
+    vale, petr = result["holdings"]
+    assert vale["position_pct"] == 100.0
+    assert vale["difference"] == -40.0
+    assert vale["contribution"] == 2.0
+    assert vale["adjustment_qty"] == -4.0
+    assert petr["position_pct"] == -100.0
+    assert petr["contribution"] == 1.0
+
+
+def test_portfolio_book_value_without_equity_zeroes_ratios():
+    book = PortfolioBook(
+        symbols=["VALE3"],
+        quantity=np.array([10.0]),
+        avg_price=np.array([5.0]),
+        target_pct=np.array([50.0]),
+        last_price=np.array([0.0]),
+        daily_change_pct=np.array([0.0]),
+    )
+
+    result = book.value()
+
+    holding = result["holdings"][0]
+    assert holding["position_pct"] == 0.0
+    assert holding["difference"] == 50.0
+    assert holding["adjustment_qty"] == 0.0
+    assert result["valor_cota"] == 0.0
+    assert result["exposicao_total_pct"] == 0.0
@@ -0,0 +1,141 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from backend import db
+from backend.models import CorporateAction, DailyPrice
+from backend.services.price_adjustments import (
+    cumulative_factors,
+    event_factors,
+    rebuild_adjustments,
+    update_adjustments,
+)
+from backend.services.price_history import refresh_daily_prices
+from backend.services.price_matrix import PriceMatrixStore
+
+PRICES = {
+    date(2025, 1, 2): 10.0,
+    date(2025, 1, 3): 11.0,
+    date(2025, 1, 6): 12.0,
+    # Após o desdobramento 2:1 de 08/01 o Yahoo entrega o lote já corrigido
+    date(2025, 1, 7): 6.5,
+    date(2025, 1, 8): 7.0,
+}
+EVENTS = {date(2025, 1, 6): ("dividends", 1.1), date(2025, 1, 8): ("splits", 2.0)}
+
+
+def _loader(symbols, start, end):
+    rows = []
+    for day, price in PRICES.items():
+        if start <= day <= end:
+            row = {"symbol": "PETR4", "date": day, "open": price, "high": price, "low": price,
+                   "close": price, "adj_close": None, "volume": 100.0, "dividends": 0.0, "splits": 0.0}
+            if day in EVENTS:
+                column, value = EVENTS[day]
+                row[column] = value
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _adjusted():
+    rows = DailyPrice.query.filter_by(symbol="PETR4").order_by(DailyPrice.date).all()
+    return [float(r.adj_factor) for r in rows], [float(r.adj_close) for r in rows]
+
+
+def test_factors_are_vectorized():
+    dates = np.array(["2025-01-02", "2025-01-03", "2025-01-06"], dtype="datetime64[D]")
+    factors = event_factors(
+        dates,
+        np.array([10.0, 20.0, 30.0]),
+        np.array(["cash", "split", "cash"]),
+        np.array(["2025-01-03", "2025-01-06", "2025-01-02"], dtype="datetime64[D]"),
+        np.array([1.0, 4.0, 1.0]),
+    )
+    assert factors.tolist() == [0.9, 0.25, 1.0]
+
+    cumulative = cumulative_factors(
+        dates, np.array(["2025-01-06", "2025-01-03"], dtype="datetime64[D]"), np.array([0.5, 0.9])
+    )
+    assert cumulative.tolist() == pytest.approx([0.45, 0.5, 1.0])
+
+
+def test_incremental_adjustment_matches_rebuild(client, tmp_path):
+    with client.application.app_context():
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 6), history_days=10, loader=_loader)
+        assert update_adjustments(["PETR4"]) == {"pending": 0, "applied": 1}
+        db.session.commit()
+        factors, closes = _adjusted()
+        assert factors == pytest.approx([0.9, 0.9, 1.0])
+        assert closes == pytest.approx([9.0, 9.9, 12.0])
+
+        # O desdobramento chega no lote seguinte e só ajusta as barras já gravadas
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 8), loader=_loader)
+        assert update_adjustments(["PETR4"]) == {"pending": 0, "applied": 1}
+        db.session.commit()
+        factors, closes = _adjusted()
+        assert factors == pytest.approx([0.45, 0.45, 0.5, 1.0, 1.0])
+        assert closes == pytest.approx([4.5, 4.95, 6.0, 6.5, 7.0])
+        split = db.session.get(CorporateAction, ("PETR4", date(2025, 1, 8), "split"))
+        assert split.applies_before == date(2025, 1, 7) and float(split.factor) == 0.5
+
+        assert rebuild_adjustments(["PETR4"])["rows"] == 0
+
+        store = PriceMatrixStore(root=str(tmp_path))
+        store.build()
+        matrix = store.current()
+        assert matrix.column("PETR4").tolist() == [10.0, 11.0, 12.0, 6.5, 7.0]
+        assert matrix.column("PETR4", adjusted=True).tolist() == pytest.approx(closes)
+
+        # Um evento novo invalida os ajustados da versão anterior: reconstrução completa
+        db.session.add(CorporateAction(symbol="PETR4", ex_date=date(2025, 1, 8), kind="cash", value=0.7))
+        update_adjustments(["PETR4"])
+        db.session.commit()
+        assert not store.build()["incremental"]
+        store.CHECK_INTERVAL_SECONDS = 0
+        assert store.adjusted_daily_closes(["PETR4"], date(2025, 1, 7), date(2025, 1, 8))["PETR4"].tolist() == (
+            pytest.approx([6.5 - 0.7, 7.0])
+        )
+
+
+def test_split_lot_keeps_stored_close_of_refetched_day(client):
+    def split_adjusted(symbols, start, end):
+        # Como o Yahoo: após o desdobramento, o dia já gravado vem pela metade
+        frame = _loader(symbols, start, end)
+        frame.loc[frame["date"] <= date(2025, 1, 6), "close"] /= 2
+        return frame
+
+    with client.application.app_context():
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 6), history_days=10, loader=_loader)
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 8), loader=split_adjusted)
+        db.session.commit()
+        closes = [float(r.close) for r in DailyPrice.query.filter_by(symbol="PETR4").order_by(DailyPrice.date)]
+
+    assert closes == [10.0, 11.0, 12.0, 6.5, 7.0]
+
+
+def test_registered_dividends_from_scraper_table(client):
+    with client.application.app_context():
+        db.session.execute(text(
+            "CREATE TABLE dividends (id INTEGER PRIMARY KEY, ticker TEXT, dividend_type TEXT, "
+            "ex_date DATETIME, value_per_share FLOAT)"
+        ))
+        db.session.execute(text(
+            "INSERT INTO dividends (ticker, dividend_type, ex_date, value_per_share) VALUES "
+            "('PETR4', 'Dividendos', '2025-01-06 00:00:00', 0.6), "
+            "('PETR4', 'JCP', '2025-01-06 00:00:00', 0.5), "
+            "('PETR4', 'Bonificação', '2025-01-03 00:00:00', 0.1)"
+        ))
+        without_dividends = lambda *args: _loader(*args).assign(dividends=0.0)
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 6), history_days=10, loader=without_dividends)
+        assert update_adjustments(["PETR4"]) == {"pending": 0, "applied": 1}
+        db.session.commit()
+
+        # Dividendos e JCP da mesma data-ex somam; bonificação vem do Yahoo como desdobramento
+        action = CorporateAction.query.one()
+        assert (action.kind, action.source, float(action.value)) == ("cash", "cvm", pytest.approx(1.1))
+        assert _adjusted()[0] == pytest.approx([0.9, 0.9, 1.0])
+        db.session.execute(text("DROP TABLE dividends"))
+        db.session.commit()
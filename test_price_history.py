@@ -0,0 +1,143 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from backend import db
+from backend.models import DailyPrice
+from backend.services import price_history
+from backend.services.price_history import (
+    daily_price_history,
+    fetch_daily_ohlcv,
+    last_complete_session,
+    load_daily_prices,
+    refresh_daily_prices,
+)
+
+DAYS = pd.bdate_range("2025-01-02", "2025-01-10").date
+
+
+def _loader(calls):
+    def load(symbols, start, end):
+        calls.append((tuple(symbols), start, end))
+        rows = []
+        for i, day in enumerate(DAYS):
+            if start <= day <= end:
+                for j, symbol in enumerate(symbols):
+                    price = 10.0 * (j + 1) + i
+                    rows.append({
+                        "symbol": symbol, "date": day, "open": price, "high": price + 1,
+                        "low": price - 1, "close": price, "adj_close": price, "volume": 1000.0,
+                    })
+        return pd.DataFrame(rows)
+    return load
+
+
+def test_refresh_downloads_only_missing_days(client):
+    calls = []
+    with client.application.app_context():
+        report = refresh_daily_prices(["VALE3", "PETR4"], through=date(2025, 1, 6), history_days=30, loader=_loader(calls))
+        assert report["rows"] == 6 and report["downloads"] == 1
+        db.session.commit()
+
+        # Um símbolo novo entra com histórico completo; os demais pelos dias
+        # novos e pelo último gravado, baixado de novo
+        report = refresh_daily_prices(["VALE3", "PETR4", "ITUB4"], through=date(2025, 1, 8), history_days=30, loader=_loader(calls))
+        db.session.commit()
+        assert report["downloads"] == 2
+        assert report["rows"] == 2 * 3 + 5
+        assert calls[1] == (("ITUB4",), date(2024, 12, 9), date(2025, 1, 8))
+        assert calls[2] == (("PETR4", "VALE3"), date(2025, 1, 6), date(2025, 1, 8))
+
+        report = refresh_daily_prices(["VALE3"], through=date(2025, 1, 8), loader=_loader(calls))
+        assert report == {"through": "2025-01-08", "symbols": 1, "up_to_date": 1, "downloads": 0, "rows": 0}
+        assert DailyPrice.query.count() == 15
+
+
+def test_refresh_remembers_sessions_without_bars(client):
+    calls = []
+    with client.application.app_context():
+        # Sem barra no último pregão (feriado, ativo sem negócios): não baixa de novo
+        refresh_daily_prices(["VALE3"], through=date(2025, 1, 13), history_days=30, loader=_loader(calls))
+        db.session.commit()
+        report = refresh_daily_prices(["VALE3"], through=date(2025, 1, 13), loader=_loader(calls))
+        assert report["downloads"] == 0 and len(calls) == 1
+
+        refresh_daily_prices(["VALE3"], through=date(2025, 1, 14), loader=_loader(calls))
+        assert calls[-1] == (("VALE3",), date(2025, 1, 13), date(2025, 1, 14))
+
+        # Falha no download não marca o símbolo como consultado
+        def failing(symbols, start, end):
+            raise RuntimeError("offline")
+
+        refresh_daily_prices(["PETR4"], through=date(2025, 1, 8), history_days=30, loader=failing)
+        report = refresh_daily_prices(["PETR4"], through=date(2025, 1, 8), history_days=30, loader=_loader(calls))
+        assert report["downloads"] == 1
+
+
+def test_range_reads_for_many_tickers(client):
+    with client.application.app_context():
+        refresh_daily_prices(["VALE3", "PETR4"], through=date(2025, 1, 10), history_days=30, loader=_loader([]))
+        db.session.commit()
+
+        closes = load_daily_prices(["VALE3", "PETR4", "ITUB4"], date(2025, 1, 6), date(2025, 1, 7))
+        assert list(closes.index) == [date(2025, 1, 6), date(2025, 1, 7)]
+        assert closes["PETR4"].tolist() == [12.0, 13.0]
+        assert closes["ITUB4"].isna().all()
+
+        history = daily_price_history(["VALE3"], date(2025, 1, 9), date(2025, 1, 31))
+        assert [r["date"] for r in history["VALE3"]] == ["2025-01-09", "2025-01-10"]
+
+    resp = client.get("/api/historical/daily?tickers=vale3,petr4&start=2025-01-02&end=2025-01-03")
+    data = resp.get_json()["data"]
+    assert resp.status_code == 200
+    assert len(data["VALE3"]) == len(data["PETR4"]) == 2
+    assert data["PETR4"][0]["high"] == 11.0
+
+    resp = client.get("/api/historical/VALE3?start=2025-01-09&end=2025-01-10")
+    assert [r["close"] for r in resp.get_json()["data"]] == [25.0, 26.0]
+    assert client.get("/api/historical/daily").status_code == 400
+    assert client.get("/api/historical/daily?tickers=VALE3&start=2025-02-01&end=2025-01-01").status_code == 400
+
+
+def test_ibov_history_reads_store(client, monkeypatch):
+    calls = []
+    with client.application.app_context():
+        refresh_daily_prices(["^BVSP"], through=DAYS[-1], history_days=30, loader=_loader([]))
+        db.session.commit()
+    monkeypatch.setattr("backend.routes.market_routes.fetch_daily_ohlcv", _loader(calls))
+    monkeypatch.setattr(
+        "backend.routes.market_routes.datetime",
+        type("_dt", (), {"today": staticmethod(lambda: datetime(2025, 1, 11))}),
+    )
+
+    first = client.get("/api/market/ibov-history").get_json()
+    second = client.get("/api/market/ibov-history").get_json()
+    # GET só lê daily_prices: nenhum download nem escrita
+    assert calls == []
+    assert first == second
+    assert [h["close"] for h in first["history"]][:2] == [10.0, 11.0]
+
+
+def test_fetch_daily_ohlcv_reshapes_yahoo_frame(monkeypatch):
+    index = pd.DatetimeIndex(["2025-01-02", "2025-01-03"], name="Date")
+    columns = pd.MultiIndex.from_product([["Adj Close", "Close", "High", "Low", "Open", "Volume"], ["PETR4.SA", "^BVSP"]])
+    data = pd.DataFrame(
+        [[1, 2, 1, 2, 1.5, 2.5, 0.5, 1.5, 1, 2, 100, 200], [1, None, 1, None, 1, None, 1, None, 1, None, 1, None]],
+        index=index, columns=columns, dtype=float,
+    )
+    monkeypatch.setattr(price_history.yf, "download", lambda *a, **k: data)
+
+    frame = fetch_daily_ohlcv(["PETR4", "^BVSP"], date(2025, 1, 2), date(2025, 1, 3))
+    assert list(frame.columns) == ["symbol", "date", "open", "high", "low", "close", "adj_close", "volume"]
+    assert len(frame) == 3
+    bvsp = frame[frame["symbol"] == "^BVSP"].iloc[0]
+    assert bvsp["date"] == date(2025, 1, 2) and bvsp["high"] == 2.5 and bvsp["volume"] == 200
+
+
+def test_last_complete_session_skips_weekend_and_open_market():
+    assert last_complete_session(datetime(2025, 1, 6, 12, 0)) == date(2025, 1, 3)
+    assert last_complete_session(datetime(2025, 1, 6, 18, 0)) == date(2025, 1, 6)
+    assert last_complete_session(datetime(2025, 1, 5, 18, 0)) == date(2025, 1, 3)
+    # Fechamento às 18:00 com os EUA no horário padrão; Carnaval sem pregão
+    assert last_complete_session(datetime(2025, 1, 6, 17, 30)) == date(2025, 1, 3)
+    assert last_complete_session(datetime(2025, 3, 5, 12, 0)) == date(2025, 2, 28)
@@ -0,0 +1,91 @@
+from datetime import date
+
+import numpy as np
+
+from backend import db
+from backend.services.price_history import upsert_daily_prices
+from backend.services.price_matrix import PriceMatrixStore
+
+
+def _prices(symbol, days, base):
+    return [
+        {"symbol": symbol, "date": day, "open": None, "high": None, "low": None,
+         "close": base + i, "adj_close": None, "volume": None}
+        for i, day in enumerate(days)
+    ]
+
+
+JAN = [date(2025, 1, d) for d in (2, 3, 6, 7)]
+
+
+def test_build_and_zero_copy_slices(client, tmp_path):
+    store = PriceMatrixStore(root=str(tmp_path))
+    with client.application.app_context():
+        assert store.current() is None
+        upsert_daily_prices(_prices("PETR4", JAN, 30.0) + _prices("VALE3", JAN[1:], 60.0))
+        db.session.commit()
+        report = store.build()
+
+    assert report["dates"] == 4 and report["symbols"] == 2 and not report["incremental"]
+    matrix = store.current()
+    assert matrix.symbols == ["PETR4", "VALE3"]
+
+    vale = matrix.column("VALE3", start=date(2025, 1, 3))
+    assert np.shares_memory(vale, matrix.closes)
+    assert vale.tolist() == [60.0, 61.0, 62.0]
+
+    dates, names, values = matrix.window(end=date(2025, 1, 3))
+    assert np.shares_memory(values, matrix.closes)
+    assert dates.tolist() == [date(2025, 1, 2), date(2025, 1, 3)]
+    assert np.isnan(values[0, 1])
+
+    frame = store.daily_closes(["VALE3", "ITUB4"], date(2025, 1, 6), date(2025, 1, 7))
+    assert list(frame.index) == [date(2025, 1, 6), date(2025, 1, 7)]
+    assert frame["VALE3"].tolist() == [61.0, 62.0]
+    assert frame["ITUB4"].isna().all()
+
+
+def test_incremental_build_appends_dates_and_symbols(client, tmp_path):
+    store = PriceMatrixStore(root=str(tmp_path))
+    store.WATERMARK_LAG_SECONDS = 0
+    with client.application.app_context():
+        upsert_daily_prices(_prices("VALE3", JAN[:2], 60.0))
+        db.session.commit()
+        store.build()
+        first = store.current()
+
+        upsert_daily_prices(_prices("VALE3", JAN, 60.0)[2:] + _prices("ABEV3", JAN, 12.0))
+        db.session.commit()
+        report = store.build()
+
+    assert report["incremental"]
+    # Só as datas novas de VALE3 e todo o histórico de ABEV3 vêm do banco
+    assert report["rows_read"] == 2 + 4
+
+    store.CHECK_INTERVAL_SECONDS = 0
+    matrix = store.current()
+    assert matrix is not first
+    assert matrix.symbols == ["VALE3", "ABEV3"]
+    assert matrix.column("VALE3").tolist() == [60.0, 61.0, 62.0, 63.0]
+    assert matrix.column("ABEV3").tolist() == [12.0, 13.0, 14.0, 15.0]
+    # A versão anterior continua legível por quem ainda a tem aberta
+    assert first.column("VALE3").tolist() == [60.0, 61.0]
+
+
+def test_incremental_build_rereads_rows_written_after_watermark(client, tmp_path):
+    store = PriceMatrixStore(root=str(tmp_path))
+    with client.application.app_context():
+        upsert_daily_prices(_prices("PETR4", JAN, 30.0) + _prices("VALE3", JAN[2:], 62.0))
+        db.session.commit()
+        store.build()
+
+        # Buraco de VALE3 preenchido e fechamento antigo de PETR4 corrigido
+        upsert_daily_prices(_prices("VALE3", JAN[:2], 60.0) + _prices("PETR4", JAN[:1], 29.5))
+        db.session.commit()
+        report = store.build()
+
+    assert report["incremental"]
+    store.CHECK_INTERVAL_SECONDS = 0
+    matrix = store.current()
+    assert matrix.column("VALE3").tolist() == [60.0, 61.0, 62.0, 63.0]
+    assert matrix.column("PETR4").tolist() == [29.5, 31.0, 32.0, 33.0]
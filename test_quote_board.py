@@ -0,0 +1,97 @@
+import uuid
+
+import pytest
+
+from backend.routes import market_routes, realtime_routes
+from backend.services.quote_board import QuoteBoard
+
+
+QUOTE = {
+    "symbol": "VALE3",
+    "bid": 61.2,
+    "ask": 61.3,
+    "last": 61.25,
+    "price": 61.25,
+    "volume": 1500,
+    "time": "2024-05-06T11:00:00",
+    "source": "mt5_realtime",
+    "flags": 6,
+    "is_realtime": True,
+    "open": 60.9,
+    "high": 61.5,
+    "low": 60.8,
+    "previous_close": 60.0,
+}
+
+
+@pytest.fixture
+def boards():
+    name = f"qb_{uuid.uuid4().hex[:12]}"
+    writer = QuoteBoard(name=name, capacity=4)
+    writer.create()
+    reader = QuoteBoard(name=name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_sees_writer_quotes(boards):
+    writer, reader = boards
+    assert reader.get("VALE3") is None
+
+    writer.publish(QUOTE)
+    quote = reader.get("VALE3")
+    assert quote["last"] == 61.25
+    assert quote["previous_close"] == 60.0
+    assert quote["time"] == "2024-05-06T11:00:00"
+    assert quote["source"] == "mt5_realtime"
+    assert quote["is_realtime"] is True
+
+    writer.publish({**QUOTE, "last": 62.0})
+    writer.publish({**QUOTE, "symbol": "PETR4", "last": 38.1})
+    assert reader.get_many(["VALE3", "PETR4", "XXXX3"]).keys() == {"VALE3", "PETR4"}
+    assert reader.get("VALE3")["last"] == 62.0
+    assert set(reader.snapshot()) == {"VALE3", "PETR4"}
+
+
+def test_full_board_rejects_new_symbols(boards):
+    writer, reader = boards
+    for i in range(4):
+        assert writer.publish({**QUOTE, "symbol": f"SIM{i}"})
+    assert not writer.publish({**QUOTE, "symbol": "SIM9"})
+    assert writer.publish({**QUOTE, "symbol": "SIM0", "last": 1.0})
+    assert len(reader.snapshot()) == 4
+
+
+def test_torn_slot_is_not_returned(boards):
+    writer, reader = boards
+    writer.publish(QUOTE)
+    writer._rows["seq"][0] += 1  # escrita em andamento
+    assert reader.get("VALE3") is None
+    writer._rows["seq"][0] += 1
+    assert reader.get("VALE3")["last"] == 61.25
+
+
+def test_quote_routes_read_board_without_worker(client, monkeypatch, boards):
+    writer, reader = boards
+    writer.publish(QUOTE)
+    monkeypatch.setattr(market_routes, "quote_board", reader)
+    monkeypatch.setattr(realtime_routes, "quote_board", reader)
+
+    resp = client.get("/api/market/quote/vale3")
+    assert resp.status_code == 200
+    assert resp.get_json()["quote"]["last"] == 61.25
+    assert client.get("/api/market/quote/PETR4").status_code == 404
+
+    resp = client.get("/api/realtime/quotes?tickers=VALE3&tickers=PETR4")
+    assert resp.status_code == 200
+    assert list(resp.get_json()["data"]) == ["VALE3"]
+
+
+def test_quote_routes_without_board_or_worker(client, monkeypatch):
+    missing = QuoteBoard(name=f"qb_{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(market_routes, "quote_board", missing)
+    monkeypatch.setattr(realtime_routes, "quote_board", missing)
+
+    assert client.get("/api/market/quote/VALE3").status_code == 503
+    assert client.get("/api/realtime/quotes").status_code == 503
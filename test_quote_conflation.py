@@ -0,0 +1,87 @@
+from backend.services import metatrader5_rtd_worker as worker_module
+from backend.services.quote_conflation import QuoteChangeDetector, QuoteConflator
+
+
+def _quote(symbol, last, bid=None):
+    return {"symbol": symbol, "bid": bid or last, "ask": last + 0.01, "last": last, "previous_close": 9.0}
+
+
+def test_change_detector_suppresses_unchanged_ticks():
+    detector = QuoteChangeDetector()
+    assert detector.changed(_quote("VALE3", 10.0))
+    assert not detector.changed(_quote("VALE3", 10.0))
+    assert detector.changed(_quote("VALE3", 10.0, bid=9.99))
+    assert not detector.changed(_quote("VALE3", 10.0, bid=9.99))
+
+    detector.invalidate("VALE3")
+    assert detector.changed(_quote("VALE3", 10.0, bid=9.99))
+    assert detector.suppressed == 2
+
+
+def test_change_detector_passes_new_trade_at_same_price():
+    detector = QuoteChangeDetector()
+    assert detector.changed(dict(_quote("VALE3", 10.0), time_msc=1000, volume=100))
+    assert not detector.changed(dict(_quote("VALE3", 10.0), time_msc=1000, volume=100))
+    assert detector.changed(dict(_quote("VALE3", 10.0), time_msc=2000, volume=100))
+    assert detector.changed(dict(_quote("VALE3", 10.0), time_msc=2000, volume=300))
+
+
+def test_conflator_keeps_only_latest_quote_while_client_waits():
+    conflator = QuoteConflator(max_rate=2)
+
+    ready = conflator.push({"a": [_quote("VALE3", 10.0)]}, now=0.0)
+    assert [q["last"] for q in ready["a"]] == [10.0]
+
+    # Dentro do intervalo mínimo nada é enviado, só a última cotação fica
+    assert conflator.push({"a": [_quote("VALE3", 10.1), _quote("PETR4", 20.0)]}, now=0.2) == {}
+    assert conflator.push({"a": [_quote("VALE3", 10.2)]}, now=0.4) == {}
+
+    # Liberado sem cotações novas: o pendente sai mesmo assim
+    ready = conflator.push({}, now=0.6)
+    assert {q["symbol"]: q["last"] for q in ready["a"]} == {"VALE3": 10.2, "PETR4": 20.0}
+
+    stats = conflator.stats()
+    assert stats["quotes_conflated"] == 1
+    assert stats["price_batches_sent"] == 2
+    assert stats["quotes_sent"] == 3
+    assert stats["rooms_waiting"] == 0
+
+
+class _FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, room=None):
+        self.emitted.append((room, data))
+
+
+def test_worker_skips_unchanged_quotes_and_resends_on_new_subscription(monkeypatch):
+    monkeypatch.setattr(worker_module.MetaTrader5RTDWorker, "_initialize_database", lambda self: None)
+    written = []
+    monkeypatch.setattr(worker_module.asset_metrics_writer, "add", written.append)
+
+    socketio = _FakeSocketIO()
+    worker = worker_module.MetaTrader5RTDWorker(socketio)
+    worker.conflator = QuoteConflator(max_rate=1e9)
+    prices = {"VALE3": 10.0, "PETR4": 20.0}
+    monkeypatch.setattr(worker, "get_mt5_quote", lambda symbol: _quote(symbol, prices[symbol]))
+    worker.subscribe_ticker("a", "VALE3")
+
+    symbols = {"VALE3", "PETR4"}
+    assert worker._poll_symbols(symbols, worker.subscriptions.symbols()) == 2
+    for _ in range(5):
+        assert worker._poll_symbols(symbols, worker.subscriptions.symbols()) == 0
+    prices["PETR4"] = 20.5
+    assert worker._poll_symbols(symbols, worker.subscriptions.symbols()) == 1
+
+    assert sorted(q["symbol"] for q in written) == ["PETR4", "PETR4", "VALE3"]
+    assert len(socketio.emitted) == 1
+
+    # Nova subscrição: VALE3 volta a ser enviado mesmo sem mudança
+    worker.subscribe_ticker("b", "VALE3")
+    worker._poll_symbols(symbols, worker.subscriptions.symbols())
+    assert sorted(room for room, _ in socketio.emitted[1:]) == ["a", "b"]
+
+    stats = worker.get_subscription_stats()
+    assert stats["quotes_suppressed"] == 12
+    assert stats["price_batches_sent"] == 3
@@ -0,0 +1,54 @@
+from backend.services import metatrader5_rtd_worker as worker_module
+from backend.services.quote_subscriptions import QuoteSubscriptions
+
+
+class _FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, room=None):
+        self.emitted.append((event, room, data))
+
+
+def test_reverse_index_follows_subscribe_and_unsubscribe():
+    subs = QuoteSubscriptions()
+    subs.subscribe("a", "VALE3")
+    subs.subscribe("a", "PETR4")
+    subs.subscribe("b", "VALE3")
+
+    assert subs.rooms_for("VALE3") == {"a", "b"}
+    assert subs.symbols() == {"VALE3", "PETR4"}
+
+    subs.unsubscribe("a", "PETR4")
+    assert subs.symbols() == {"VALE3"}
+    assert subs.remove_room("a") == {"VALE3"}
+    assert subs.rooms_for("VALE3") == {"b"}
+    assert subs.snapshot() == {"b": ["VALE3"]}
+
+    subs.remove_room("b")
+    assert subs.rooms == {} and subs.symbol_rooms == {}
+
+
+def test_worker_emits_one_batch_per_room(monkeypatch):
+    monkeypatch.setattr(worker_module.MetaTrader5RTDWorker, "_initialize_database", lambda self: None)
+    socketio = _FakeSocketIO()
+    worker = worker_module.MetaTrader5RTDWorker(socketio)
+    for room in range(100):
+        worker.subscribe_ticker(f"sid{room}", "vale3")
+        worker.subscribe_ticker(f"sid{room}", "PETR4")
+    worker.subscribe_ticker("sid0", "ITUB4")
+    worker.unsubscribe_room("sid99")
+
+    quotes = {s: {"symbol": s, "last": 1.0} for s in ("VALE3", "PETR4", "ITUB4", "BBDC4")}
+    assert worker._emit_price_batch(quotes) == 99
+
+    assert len(socketio.emitted) == 99
+    assert {event for event, _, _ in socketio.emitted} == {"price_batch"}
+    by_room = {room: [q["symbol"] for q in data["quotes"]] for _, room, data in socketio.emitted}
+    assert sorted(by_room["sid0"]) == ["ITUB4", "PETR4", "VALE3"]
+    assert sorted(by_room["sid1"]) == ["PETR4", "VALE3"]
+    assert "sid99" not in by_room
+
+    stats = worker.get_subscription_stats()
+    assert stats["total_rooms"] == 99
+    assert stats["total_subscriptions"] == 199
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from backend.services.tick_journal import TickJournal
+
+DAY = date(2024, 5, 6)
+BASE_MSC = int(datetime(2024, 5, 6, 13, 0, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _tick(symbol, offset_ms, last, volume=100):
+    return {
+        "symbol": symbol,
+        "time_msc": BASE_MSC + offset_ms,
+        "bid": last - 0.01,
+        "ask": last + 0.01,
+        "last": last,
+        "volume": volume,
+        "flags": 6,
+    }
+
+
+def test_flush_appends_raw_journal_readable_by_memmap(tmp_path):
+    journal = TickJournal(root=str(tmp_path))
+    journal.append(_tick("VALE3", 0, 61.0))
+    journal.append(_tick("VALE3", 500, 61.1))
+    journal.append(_tick("PETR4", 100, 38.0))
+    assert journal.pending() == 3
+    assert journal.flush() == 3
+
+    journal.append(_tick("VALE3", 1000, 61.2, volume=300))
+    journal.flush()
+
+    ticks = journal.load("VALE3", DAY)
+    assert not ticks.sealed
+    assert isinstance(ticks["last"], np.memmap)
+    assert ticks["last"].tolist() == [61.0, 61.1, 61.2]
+    assert ticks["volume"].tolist() == [100, 100, 300]
+    assert len(ticks.between(BASE_MSC + 500)) == 2
+    assert journal.days("VALE3") == [DAY]
+    assert journal.load("ITUB4", DAY) is None
+
+
+def test_seal_writes_compressed_columns_and_replays(tmp_path):
+    journal = TickJournal(root=str(tmp_path))
+    for i in range(50):
+        journal.append(_tick("VALE3", i * 1000, 61.0 + i / 100))
+    journal.flush()
+
+    assert journal.seal_closed_days(today=date(2024, 5, 7)) == 1
+    folder = tmp_path / DAY.isoformat()
+    assert [p.name for p in folder.iterdir()] == ["VALE3.npz"]
+
+    ticks = journal.load("VALE3", DAY)
+    assert ticks.sealed
+    assert len(ticks) == 50
+    assert ticks["time_msc"].dtype == np.int64
+
+    replayed = list(journal.replay("VALE3", DAY))
+    assert replayed[0]["last"] == 61.0
+    assert replayed[-1]["time_msc"] == BASE_MSC + 49_000
+    assert replayed[-1]["flags"] == 6
+
+
+def test_late_ticks_after_seal_are_merged_in_order(tmp_path):
+    journal = TickJournal(root=str(tmp_path))
+    journal.append(_tick("VALE3", 2000, 61.2))
+    journal.flush()
+    journal.seal(DAY)
+
+    journal.append(_tick("VALE3", 1000, 61.1))
+    journal.flush()
+    assert journal.load("VALE3", DAY)["last"].tolist() == [61.1, 61.2]
+
+    journal.seal(DAY)
+    ticks = journal.load("VALE3", DAY)
+    assert ticks.sealed
+    assert ticks["time_msc"].tolist() == [BASE_MSC + 1000, BASE_MSC + 2000]
+
+
+def test_partial_trailing_record_is_ignored(tmp_path):
+    journal = TickJournal(root=str(tmp_path))
+    journal.append(_tick("VALE3", 0, 61.0))
+    journal.flush()
+    with open(tmp_path / DAY.isoformat() / "VALE3.ticks", "ab") as f:
+        f.write(b"\x00" * 7)
+
+    assert len(journal.load("VALE3", DAY)) == 1